@@ -15,10 +15,11 @@ Pipeline Overview:
 import os
 import sys
 import yaml
+import shutil
 import time
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set, Tuple
 from datetime import datetime
 
 import polars as pl
@@ -27,9 +28,21 @@ from botocore.exceptions import ClientError
 
 # Add utils to path
 sys.path.append(str(Path(__file__).parent / "utils"))
-from s3_etl_utils import S3PartitionedETL, S3Config
+from s3_etl_utils import (S3PartitionedETL, S3Config, split_partitions, published_key, PARTITION_FILE,
+                          PART_FILE_PREFIX)
+from storage_backend import LocalBackend, open_storage
+from parquet_layout import ParquetLayout, parquet_layout
+from partition_spec import PartitionSpec
 from monitoring import ETLMonitor
-from data_quality import DataQualityChecker
+from data_quality import DataQualityChecker, PartitionValidationReport, check_partition_columns
+from parquet_batches import ParquetBatchReader
+from chunk_sizing import AdaptiveChunkSizer, process_memory_mb
+from categorical_schema import enable_global_categories, encode_categoricals, categorical_mode, present_columns, align_dtypes
+from partition_accumulator import PartitionAccumulator
+from dimension_bundle import DimensionBundle
+from provider_compaction import compact_members, FanoutTracker, FANOUT_COLUMN
+from partition_staging import stage_partitions, sync_staged_partitions
+from fact_ledger import FactLedger
 
 logger = logging.getLogger(__name__)
 
@@ -54,16 +67,75 @@ class ETL3Config:
         self.S3_BUCKET = os.environ.get('S3_BUCKET', self.config.get('s3', {}).get('bucket', 'healthcare-data-lake-prod'))
         self.S3_REGION = self.config.get('s3', {}).get('region', 'us-east-1')
         self.S3_PREFIX = self.config.get('s3', {}).get('prefix', 'partitioned-data')
+        # Where partitions are written: the bucket, or a local directory (file:///mnt/stage)
+        self.STORAGE_URI = os.environ.get('ETL3_STORAGE_URI', self.config.get('s3', {}).get('storage_uri') or f"s3://{self.S3_BUCKET}")
         
         # Processing Configuration
         self.CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', self.config.get('processing', {}).get('chunk_size', 10000)))
         self.MAX_WORKERS = int(os.environ.get('MAX_WORKERS', self.config.get('processing', {}).get('max_workers', 2)))
         self.MEMORY_LIMIT_MB = int(os.environ.get('MEMORY_LIMIT_MB', self.config.get('processing', {}).get('memory_limit_mb', 2048)))
         
+        # Adaptive chunk sizing (CHUNK_SIZE is the starting size)
+        processing = self.config.get('processing', {})
+        self.ADAPTIVE_CHUNK_SIZE = str(os.environ.get('ADAPTIVE_CHUNK_SIZE', processing.get('adaptive_chunk_size', False))).lower() in ('1', 'true', 'yes')
+        self.MIN_CHUNK_SIZE = int(processing.get('min_chunk_size', 500))
+        self.MAX_CHUNK_SIZE = int(processing.get('max_chunk_size', 500_000))
+        self.MEMORY_TARGET_FRACTION = float(processing.get('memory_target_fraction', 0.6))
+        
+        # Read low-cardinality fact columns as categoricals and join on them without decoding
+        self.CATEGORICAL_COLUMNS = str(os.environ.get('CATEGORICAL_COLUMNS', processing.get('categorical_columns', False))).lower() in ('1', 'true', 'yes')
+        
+        # Spill chunk slices locally and write each partition once after the last chunk
+        self.ACCUMULATE_PARTITIONS = str(os.environ.get('ACCUMULATE_PARTITIONS', processing.get('accumulate_partitions', False))).lower() in ('1', 'true', 'yes')
+        self.PARTITION_SPILL_BUDGET_MB = int(processing.get('partition_spill_budget_mb', 4096))
+        
+        # Partition uploads run on MAX_WORKERS threads with at most this many MB queued
+        self.UPLOAD_INFLIGHT_MB = int(os.environ.get('UPLOAD_INFLIGHT_MB', processing.get('upload_inflight_mb', 256)))
+        self.UPLOAD_MAX_ATTEMPTS = int(processing.get('upload_max_attempts', 5))
+        
+        # Partitions this large in memory are streamed to S3 in parts instead of encoded whole
+        self.MULTIPART_THRESHOLD_MB = float(processing.get('multipart_threshold_mb', 256))
+        self.MULTIPART_PART_SIZE_MB = int(processing.get('multipart_part_size_mb', 16))
+        
+        # List the target prefix once at startup and answer existence checks from memory
+        self.PARTITION_INDEX = str(os.environ.get('PARTITION_INDEX', processing.get('partition_index', True))).lower() in ('1', 'true', 'yes')
+        self.PARTITION_INDEX_WORKERS = int(processing.get('partition_index_workers', 16))
+        
+        # Enrich from pre-joined, memory-mapped dimension tables (rebuilt when the dims change)
+        self.DIMENSION_BUNDLE = str(os.environ.get('DIMENSION_BUNDLE', processing.get('dimension_bundle', True))).lower() in ('1', 'true', 'yes')
+        
+        # One row per fact with provider members nested, instead of one per NPI x TIN x address
+        self.COMPACT_PROVIDERS = str(os.environ.get('COMPACT_PROVIDERS', processing.get('compact_providers', False))).lower() in ('1', 'true', 'yes')
+        
+        # 'chunked': enrich and write chunk by chunk; 'streaming': one lazy plan sunk
+        # per partition into local staging, then synced to S3 (see partition_staging.py)
+        self.ENGINE = str(os.environ.get('ETL3_ENGINE', processing.get('engine', 'chunked'))).lower()
+        
+        # Enrich only fact rows the ledger has not seen published; FULL_REFRESH ignores the ledger.
+        # Append-only: superseded and deleted facts stay published, so it is opt-in
+        self.INCREMENTAL = str(os.environ.get('INCREMENTAL', processing.get('incremental', False))).lower() in ('1', 'true', 'yes')
+        self.FULL_REFRESH = str(os.environ.get('FULL_REFRESH', False)).lower() in ('1', 'true', 'yes')
+        
+        # Partition file layout: 'query' sorts rows and adds bloom filters for code/NPI lookups,
+        # 'default' keeps arrival order and writer defaults (see parquet_layout.py); the
+        # parquet_* settings override the profile's
+        self.PARQUET_LAYOUT = str(os.environ.get('PARQUET_LAYOUT', processing.get('parquet_layout', 'query'))).lower()
+        self.PARQUET_SORT_BY = processing.get('parquet_sort_by')
+        self.PARQUET_ROW_GROUP_SIZE = processing.get('parquet_row_group_size')
+        self.PARQUET_BLOOM_FILTER_COLUMNS = processing.get('parquet_bloom_filter_columns')
+        
+        # Write a _manifest.json (rows, NPIs, codes, rate percentiles) next to every partition file
+        self.PARTITION_MANIFESTS = str(os.environ.get('PARTITION_MANIFESTS', processing.get('partition_manifests', True))).lower() in ('1', 'true', 'yes')
+        
         # Data Paths
         self.FACT_RATE_PATH = self.data_root / "gold" / "fact_rate.parquet"
         self.DIM_DIR = self.data_root / "dims"
         self.XREF_DIR = self.data_root / "xrefs"
+        self.PARTITION_SPILL_DIR = self.data_root / "partition_spill"
+        self.DIM_BUNDLE_DIR = self.data_root / "dim_bundle"
+        self.PARTITION_STAGING_DIR = self.data_root / "partition_staging"
+        self.FACT_LEDGER_DIR = self.data_root / "fact_ledger"
+        self.FACT_DELTA_PATH = self.data_root / "fact_delta.parquet"
         
         # Dimension file paths
         self.DIM_PATHS = {
@@ -89,10 +161,34 @@ class ETL3Config:
             'procedure_class', 'primary_taxonomy_code', 'stat_area_name', 'year', 'month'
         ])
         
+        # Partition file limits enforced by compaction (see partition_compaction.py)
+        partitioning = self.config.get('partitioning', {})
+        self.MAX_PARTITION_SIZE_MB = float(partitioning.get('max_partition_size_mb', 50))
+        self.MIN_PARTITION_ROWS = int(partitioning.get('min_partition_rows', 1))
+        max_rows = partitioning.get('max_partition_rows')
+        self.MAX_PARTITION_ROWS = int(max_rows) if max_rows else None
+        self.TARGET_FILE_SIZE_MB = float(partitioning.get('target_file_size_mb', 32))
+        self.MIN_FILE_SIZE_MB = float(partitioning.get('min_file_size_mb', 1))
+        # Level whose directories hold the rollups of small partitions (null: no rollups).
+        # Off by default: Athena's partition locations and the webapp's leaf keys do not reach rollups
+        self.ROLLUP_LEVEL = os.environ.get('ROLLUP_LEVEL', partitioning.get('rollup_level')) or None
+        
         # Athena configuration
         self.ATHENA_DATABASE = self.config.get('athena', {}).get('database', 'healthcare_data_lake')
         self.ATHENA_TABLE = self.config.get('athena', {}).get('table', 'fact_rate_enriched')
-        
+        # Projection overrides of partition columns (the rest come from the partition spec)
+        self.ATHENA_PROJECTION = self.config.get('athena', {}).get('projection', {})
+        
+    def parquet_layout(self) -> ParquetLayout:
+        """Layout of written partition files (ValueError for an unknown profile)."""
+        return parquet_layout(self.PARQUET_LAYOUT, sort_by=self.PARQUET_SORT_BY,
+                              row_group_size=self.PARQUET_ROW_GROUP_SIZE,
+                              bloom_filter_columns=self.PARQUET_BLOOM_FILTER_COLUMNS)
+    
+    def partition_spec(self) -> PartitionSpec:
+        """Levels of partition paths from PARTITION_COLUMNS (ValueError for a malformed level)."""
+        return PartitionSpec.parse(self.PARTITION_COLUMNS)
+    
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file."""
         try:
@@ -109,6 +205,21 @@ class ETL3Config:
         """Validate configuration and required files."""
         logger.info("Validating ETL3 configuration...")
         
+        if self.ENGINE not in ('chunked', 'streaming'):
+            logger.error(f"Unknown ETL3 engine: {self.ENGINE} (expected 'chunked' or 'streaming')")
+            return False
+        
+        try:
+            self.parquet_layout()
+            spec = self.partition_spec()
+        except ValueError as e:
+            logger.error(str(e))
+            return False
+        
+        if self.ROLLUP_LEVEL and self.ROLLUP_LEVEL not in spec.levels[:-1]:
+            logger.error(f"Rollup level {self.ROLLUP_LEVEL} is not one of the partition levels {spec.levels[:-1]}")
+            return False
+        
         # Check required files exist
         if not self.FACT_RATE_PATH.exists():
             logger.error(f"Fact table not found: {self.FACT_RATE_PATH}")
@@ -124,6 +235,11 @@ class ETL3Config:
             logger.error(f"Missing dimension files: {missing_dims}")
             return False
         
+        if isinstance(open_storage(self.STORAGE_URI), LocalBackend):
+            logger.info(f"Writing partitions to local storage {self.STORAGE_URI}; AWS is not needed")
+            logger.info("Configuration validated successfully")
+            return True
+        
         # Check AWS credentials
         try:
             sts = boto3.client('sts')
@@ -162,83 +278,161 @@ def run_etl3_pipeline(config: Optional[ETL3Config] = None) -> Dict[str, Any]:
     try:
         # Initialize S3 ETL utilities
         s3_etl = S3PartitionedETL(
-            bucket_name=config.S3_BUCKET,
-            region=config.S3_REGION
+            bucket_name=config.STORAGE_URI,
+            region=config.S3_REGION,
+            upload_workers=config.MAX_WORKERS,
+            upload_inflight_mb=config.UPLOAD_INFLIGHT_MB,
+            upload_max_attempts=config.UPLOAD_MAX_ATTEMPTS,
+            multipart_threshold_mb=config.MULTIPART_THRESHOLD_MB,
+            multipart_part_size_mb=config.MULTIPART_PART_SIZE_MB,
+            rollup_level=config.ROLLUP_LEVEL,
+            layout=config.parquet_layout(),
+            manifests=config.PARTITION_MANIFESTS,
+            partition_spec=config.partition_spec()
         )
         
-        # Load dimension tables (these are small, load once)
-        logger.info("Loading dimension tables...")
-        dimensions = {}
-        for name, path in config.DIM_PATHS.items():
-            if path.exists():
-                dimensions[name] = pl.read_parquet(path)
-                logger.info(f"Loaded {dimensions[name].height:,} {name} records")
+        if config.PARTITION_INDEX:
+            logger.info(f"Indexing existing partitions under {config.S3_PREFIX}...")
+            s3_etl.load_partition_index(config.S3_PREFIX, workers=config.PARTITION_INDEX_WORKERS)
+        
+        if config.CATEGORICAL_COLUMNS:
+            enable_global_categories()
+        
+        # Incremental runs enrich only the fact rows not yet published (see utils/fact_ledger.py)
+        fact_path = config.FACT_RATE_PATH
+        ledger = None
+        if config.INCREMENTAL:
+            ledger, fact_path = _scan_fact_ledger(config)
+            if fact_path is None:
+                return _nothing_to_publish(config, ledger, s3_etl, start_time)
         
-        # Load cross-reference tables (these are small, load once)
-        logger.info("Loading cross-reference tables...")
+        if config.ENGINE == 'streaming':
+            return _run_streaming_engine(config, s3_etl, start_time, fact_path, ledger)
+        
+        dimensions = {}
         xrefs = {}
-        for name, path in config.XREF_PATHS.items():
-            if path.exists():
-                xrefs[name] = pl.read_parquet(path)
-                logger.info(f"Loaded {xrefs[name].height:,} {name} records")
+        dim_bundle = None
+        if config.DIMENSION_BUNDLE:
+            # Pre-joined dimensions, memory-mapped (built on first use or when a dim changed)
+            dim_bundle = prepare_dimension_bundle(config)
+        else:
+            # Load dimension tables (these are small, load once)
+            logger.info("Loading dimension tables...")
+            for name, path in config.DIM_PATHS.items():
+                if path.exists():
+                    dimensions[name] = pl.read_parquet(path)
+                    if config.CATEGORICAL_COLUMNS:
+                        # Join keys must be categorical on both sides
+                        dimensions[name] = encode_categoricals(dimensions[name])
+                    logger.info(f"Loaded {dimensions[name].height:,} {name} records")
+            
+            # Load cross-reference tables (these are small, load once)
+            logger.info("Loading cross-reference tables...")
+            for name, path in config.XREF_PATHS.items():
+                if path.exists():
+                    xrefs[name] = pl.read_parquet(path)
+                    logger.info(f"Loaded {xrefs[name].height:,} {name} records")
         
         # Process fact table in streaming chunks
         logger.info("Processing fact table in streaming mode...")
-        fact_lazy = pl.scan_parquet(config.FACT_RATE_PATH)
-        total_rows = fact_lazy.select(pl.count()).collect().item()
+        chunk_size = config.CHUNK_SIZE
+        read_dictionary = None
+        if config.CATEGORICAL_COLUMNS:
+            fact_columns = pl.read_parquet_schema(fact_path)
+            read_dictionary = present_columns(fact_columns)
+            logger.info(f"Reading {read_dictionary} as categoricals")
+        fact_reader = ParquetBatchReader(fact_path, chunk_size, read_dictionary=read_dictionary)
+        total_rows = fact_reader.num_rows
         logger.info(f"Total fact records to process: {total_rows:,}")
         
-        # Process in chunks
-        chunk_size = config.CHUNK_SIZE
-        total_chunks = (total_rows + chunk_size - 1) // chunk_size
+        # Process in chunks (single pass over the fact table's row groups)
         processed_rows = 0
         total_partitions = 0
         
-        logger.info(f"Processing {total_chunks} chunks of {chunk_size:,} rows each...")
+        # With adaptive sizing each chunk is cut at the size chosen from the
+        # memory the previous chunks used
+        sizer = None
+        if config.ADAPTIVE_CHUNK_SIZE:
+            sizer = AdaptiveChunkSizer(
+                initial_size=chunk_size,
+                memory_limit_mb=config.MEMORY_LIMIT_MB,
+                baseline_mb=process_memory_mb(),
+                min_size=config.MIN_CHUNK_SIZE,
+                max_size=config.MAX_CHUNK_SIZE,
+                target_fraction=config.MEMORY_TARGET_FRACTION,
+            )
+            chunks = fact_reader.iter_sized(sizer.next_size)
+            chunks_label = "?"
+            logger.info(f"Processing adaptive chunks starting at {chunk_size:,} rows...")
+        else:
+            chunks = iter(fact_reader)
+            chunks_label = str(fact_reader.num_chunks)
+            logger.info(f"Processing {fact_reader.num_chunks} chunks of {chunk_size:,} rows each...")
         logger.info(f"Memory limit: {config.MEMORY_LIMIT_MB} MB")
         
+        accumulator = None
+        if config.ACCUMULATE_PARTITIONS:
+            accumulator = PartitionAccumulator(
+                config.PARTITION_SPILL_DIR,
+                writer=lambda partition_data, s3_path: write_partition_idempotent(partition_data, s3_path, s3_etl),
+                disk_budget_mb=config.PARTITION_SPILL_BUDGET_MB,
+            )
+            logger.info(f"Accumulating partitions in {config.PARTITION_SPILL_DIR} "
+                        f"(budget {config.PARTITION_SPILL_BUDGET_MB} MB)")
+        
+        # Enriched rows per fact row, per chunk
+        fanout = FanoutTracker()
+        
         # Progress tracking
         start_time = time.time()
         last_progress_time = start_time
+        chunks_processed = 0
+        failed_chunks = 0
+        failed_partitions: List[str] = []
+        written_partitions: Set[str] = set()
         
-        for chunk_idx in range(total_chunks):
+        for chunk_idx, chunk_data in enumerate(chunks):
             chunk_start_time = time.time()
-            logger.info(f"Processing chunk {chunk_idx + 1}/{total_chunks}...")
+            chunks_processed += 1
+            logger.info(f"Processing chunk {chunk_idx + 1}/{chunks_label} ({chunk_data.height:,} rows)...")
             
             try:
-                # Load chunk
-                chunk_start = chunk_idx * chunk_size
-                chunk_data = fact_lazy.slice(chunk_start, chunk_size).collect()
+                # The fact file may have been written in the other categorical mode
+                chunk_data = categorical_mode(chunk_data, config.CATEGORICAL_COLUMNS)
                 
-                if chunk_data.height == 0:
-                    logger.info("No more data to process")
-                    break
-                    
                 # Enrich chunk with dimensions
-                enriched_chunk = _enrich_fact_table(chunk_data, dimensions, xrefs)
+                enriched_chunk = _enrich_fact_table(chunk_data, dimensions, xrefs, bundle=dim_bundle,
+                                                    compact_providers=config.COMPACT_PROVIDERS)
+                fanout.observe(chunk_idx, chunk_data.height, enriched_chunk)
+                if sizer is not None:
+                    # Fact chunk and its enriched (fanned-out) copy are both alive here
+                    sizer.observe(chunk_data.height, process_memory_mb())
                 
                 # Create partitions for this chunk
+                # Bucket and truncate levels of the partition spec are derived columns
                 chunk_partitions = _create_partitions_for_chunk(
-                    enriched_chunk, 
-                    config.PARTITION_COLUMNS,
+                    s3_etl.partition_spec.with_partition_columns(enriched_chunk),
+                    s3_etl.partition_spec.columns,
                     s3_etl,
                     config.S3_PREFIX,
-                    config
+                    config,
+                    accumulator=accumulator,
+                    failures=failed_partitions
                 )
                 
                 total_partitions += len(chunk_partitions)
+                written_partitions.update(chunk_partitions)
                 processed_rows += chunk_data.height
                 
-                # Calculate timing and progress
+                # Calculate timing and progress (by rows, since chunk sizes may vary)
                 chunk_time = time.time() - chunk_start_time
-                progress_pct = (chunk_idx + 1) / total_chunks * 100
+                progress_pct = fact_reader.rows_read / total_rows * 100 if total_rows else 100.0
                 elapsed_time = time.time() - start_time
                 
                 # Estimate remaining time
                 if chunk_idx > 0:
-                    avg_chunk_time = elapsed_time / (chunk_idx + 1)
-                    remaining_chunks = total_chunks - (chunk_idx + 1)
-                    estimated_remaining = remaining_chunks * avg_chunk_time
+                    rows_per_second = fact_reader.rows_read / elapsed_time if elapsed_time > 0 else 0
+                    estimated_remaining = (total_rows - fact_reader.rows_read) / rows_per_second if rows_per_second else 0
                 else:
                     estimated_remaining = 0
                 
@@ -258,16 +452,40 @@ def run_etl3_pipeline(config: Optional[ETL3Config] = None) -> Dict[str, Any]:
                 
             except Exception as e:
                 logger.error(f"Error processing chunk {chunk_idx + 1}: {str(e)}")
+                failed_chunks += 1
                 # Continue with next chunk instead of failing completely
                 continue
         
+        fact_reader.close()
+        
+        if accumulator is not None:
+            try:
+                accumulator.flush_all()
+                total_partitions = accumulator.uploads
+                logger.info(f"Accumulated partitions written: {accumulator.stats()}")
+            finally:
+                accumulator.close()
+            failed_partitions.extend(accumulator.failed_partitions)
+        
+        # Finish queued uploads; failures come back in the order they were queued
+        failed_uploads = s3_etl.close()
+        if failed_uploads:
+            logger.error(f"{len(failed_uploads)} partition uploads failed")
+            total_partitions -= len(failed_uploads)
+        
+        incremental = _finish_fact_ledger(config, ledger, s3_etl, written_partitions,
+                                          failures=failed_chunks + len(failed_partitions) + len(failed_uploads))
+        
         # Create Athena table
         logger.info("Creating Athena table...")
-        output_location = f"s3://{config.S3_BUCKET}/{config.S3_PREFIX}/athena-output/"
+        output_location = s3_etl.storage.uri(f"{config.S3_PREFIX}/athena-output/")
         athena_table = s3_etl.create_athena_table(
             database_name=config.ATHENA_DATABASE,
             table_name=config.ATHENA_TABLE,
-            output_location=output_location
+            output_location=output_location,
+            compact_providers=config.COMPACT_PROVIDERS,
+            prefix=config.S3_PREFIX,
+            projection=config.ATHENA_PROJECTION
         )
         
         # Calculate execution metrics
@@ -275,13 +493,25 @@ def run_etl3_pipeline(config: Optional[ETL3Config] = None) -> Dict[str, Any]:
         total_time = end_time - start_time
         
         summary = {
+            'engine': 'chunked',
             'total_input_rows': processed_rows,
-            'total_chunks_processed': total_chunks,
+            'total_chunks_processed': chunks_processed,
+            'chunk_sizing': sizer.summary() if sizer is not None else {},
+            'partition_accumulator': accumulator.stats() if accumulator is not None else {},
+            'uploads': s3_etl.upload_pool.stats() if s3_etl.upload_pool is not None else {},
+            'failed_uploads': [failure.key for failure in failed_uploads],
+            'streamed_uploads': s3_etl.streamed_uploads,
+            'partition_index': s3_etl.partition_index.stats() if s3_etl.partition_index is not None else {},
+            'dimension_bundle': dim_bundle.stats() if dim_bundle is not None else {},
+            'fanout': fanout.summary(),
+            'incremental': incremental,
             'total_partitions_created': total_partitions,
             'total_processing_time': total_time,
             'rows_per_second': processed_rows / total_time if total_time > 0 else 0,
             's3_bucket': config.S3_BUCKET,
             's3_prefix': config.S3_PREFIX,
+            'storage_uri': config.STORAGE_URI,
+            'parquet_layout': config.PARQUET_LAYOUT,
             'athena_database': config.ATHENA_DATABASE,
             'athena_table': config.ATHENA_TABLE,
             'status': 'SUCCESS'
@@ -295,8 +525,195 @@ def run_etl3_pipeline(config: Optional[ETL3Config] = None) -> Dict[str, Any]:
         raise
 
 
+def _run_streaming_engine(config: ETL3Config, s3_etl: S3PartitionedETL, start_time: float,
+                          fact_path: Optional[Path] = None, ledger: Optional[FactLedger] = None) -> Dict[str, Any]:
+    """
+    Stage every partition from one streaming plan, then sync them to S3.
+    
+    Always enriches from the dimension bundle: its pre-joined tables are what
+    the plan joins (memory-mapped, not read into memory).
+    """
+    fact_path = fact_path or config.FACT_RATE_PATH
+    dim_bundle = prepare_dimension_bundle(config)
+    total_rows = pl.scan_parquet(fact_path).select(pl.len()).collect().item()
+    logger.info(f"Streaming {total_rows:,} fact rows into {config.PARTITION_STAGING_DIR}...")
+    
+    stage_start = time.time()
+    staged = stage_partitions(
+        _build_streaming_plan(config, dim_bundle, fact_path),
+        config.PARTITION_STAGING_DIR,
+        s3_etl.partition_spec.columns,
+        config.S3_PREFIX,
+        row_group_size=s3_etl.row_group_size,
+        layout=s3_etl.layout,
+        spec=s3_etl.partition_spec,
+    )
+    stage_seconds = time.time() - stage_start
+    
+    try:
+        sync = sync_staged_partitions(
+            staged, s3_etl,
+            merge_writer=lambda partition_data, s3_path: write_partition_idempotent(partition_data, s3_path, s3_etl)
+        )
+        failed_uploads = s3_etl.close()
+    finally:
+        shutil.rmtree(config.PARTITION_STAGING_DIR, ignore_errors=True)
+    if failed_uploads:
+        logger.error(f"{len(failed_uploads)} partition uploads failed")
+    failed = set(sync['failed']) | {failure.key for failure in failed_uploads}
+    incremental = _finish_fact_ledger(config, ledger, s3_etl,
+                                      {s3_etl.storage.uri(partition.key) for partition in staged},
+                                      failures=len(failed))
+    
+    logger.info("Creating Athena table...")
+    output_location = s3_etl.storage.uri(f"{config.S3_PREFIX}/athena-output/")
+    s3_etl.create_athena_table(
+        database_name=config.ATHENA_DATABASE,
+        table_name=config.ATHENA_TABLE,
+        output_location=output_location,
+        compact_providers=config.COMPACT_PROVIDERS,
+        prefix=config.S3_PREFIX,
+        projection=config.ATHENA_PROJECTION
+    )
+    
+    total_time = time.time() - start_time
+    summary = {
+        'engine': 'streaming',
+        'total_input_rows': total_rows,
+        'total_chunks_processed': 0,
+        'streaming': {
+            'staged_partitions': len(staged),
+            'staged_rows': sum(partition.rows for partition in staged),
+            'staged_mb': round(sum(partition.bytes for partition in staged) / (1024 * 1024), 1),
+            'stage_seconds': round(stage_seconds, 2),
+            **sync,
+        },
+        'uploads': s3_etl.upload_pool.stats() if s3_etl.upload_pool is not None else {},
+        'failed_uploads': sorted(failed),
+        'streamed_uploads': s3_etl.streamed_uploads,
+        'partition_index': s3_etl.partition_index.stats() if s3_etl.partition_index is not None else {},
+        'dimension_bundle': dim_bundle.stats(),
+        'incremental': incremental,
+        'total_partitions_created': len(staged) - len(failed),
+        'total_processing_time': total_time,
+        'rows_per_second': total_rows / total_time if total_time > 0 else 0,
+        's3_bucket': config.S3_BUCKET,
+        's3_prefix': config.S3_PREFIX,
+        'storage_uri': config.STORAGE_URI,
+        'parquet_layout': config.PARQUET_LAYOUT,
+        'athena_database': config.ATHENA_DATABASE,
+        'athena_table': config.ATHENA_TABLE,
+        'status': 'SUCCESS'
+    }
+    
+    logger.info("ETL3 Pipeline completed successfully!")
+    return summary
+
+
+def _build_streaming_plan(config: ETL3Config, bundle: DimensionBundle,
+                          fact_path: Optional[Path] = None) -> pl.LazyFrame:
+    """The whole fact table (or fact_path), enriched and with partition keys, as one lazy plan."""
+    plan = categorical_mode(pl.scan_parquet(fact_path or config.FACT_RATE_PATH), config.CATEGORICAL_COLUMNS)
+    return extract_partition_keys(bundle.enrich(plan, compact_providers=config.COMPACT_PROVIDERS))
+
+
+def _scan_fact_ledger(config: ETL3Config) -> Tuple[FactLedger, Optional[Path]]:
+    """
+    Hash the fact table against the published fact ledger.
+    
+    Returns:
+        The ledger and the fact file to process: the delta of new or changed
+        rows, the whole fact table when the ledger starts empty, or None when
+        every row is already published
+    """
+    sources = {**{f"dim_{name}": path for name, path in config.DIM_PATHS.items()},
+               **{f"xref_{name}": path for name, path in config.XREF_PATHS.items()}}
+    settings = {
+        'fact_columns': list(pl.read_parquet_schema(config.FACT_RATE_PATH)),
+        'partition_columns': list(config.PARTITION_COLUMNS),
+        'categorical': config.CATEGORICAL_COLUMNS,
+        'compact_providers': config.COMPACT_PROVIDERS,
+        'target': f"{config.STORAGE_URI.rstrip('/')}/{config.S3_PREFIX}",
+    }
+    ledger = FactLedger(config.FACT_LEDGER_DIR, sources, settings, full_refresh=config.FULL_REFRESH)
+    if not ledger.incremental:
+        ledger.scan(config.FACT_RATE_PATH, config.CHUNK_SIZE)
+        return ledger, config.FACT_RATE_PATH
+    
+    changed = ledger.scan(config.FACT_RATE_PATH, config.CHUNK_SIZE, delta_path=config.FACT_DELTA_PATH)
+    return ledger, (config.FACT_DELTA_PATH if changed else None)
+
+
+def _finish_fact_ledger(config: ETL3Config, ledger: Optional[FactLedger], s3_etl: S3PartitionedETL,
+                        written_partitions: Set[str], failures: int) -> Dict[str, Any]:
+    """Commit the ledger after a clean run and summarize what the run skipped."""
+    if ledger is None:
+        return {}
+    config.FACT_DELTA_PATH.unlink(missing_ok=True)
+    if failures:
+        logger.warning(f"Fact ledger not committed ({failures} chunks, partitions or uploads failed); "
+                       f"the next run retries their rows")
+    else:
+        ledger.commit()
+    
+    stats = ledger.stats()
+    stats['partitions_written'] = len(written_partitions)
+    index = s3_etl.partition_index
+    if index is not None and index.loaded:
+        # Partitions (leaf directories) listed before the run that it did not write
+        written = {s3_etl.storage.key(path).rsplit('/', 1)[0] for path in written_partitions}
+        # (files compaction left staged count for the directory they are published to)
+        listed = {published_key(key).rsplit('/', 1)[0] for key in index.listed_keys
+                  if key.rsplit('/', 1)[-1] == PARTITION_FILE or key.rsplit('/', 1)[-1].startswith(PART_FILE_PREFIX)}
+        stats['partitions_skipped'] = len(listed - written)
+    return stats
+
+
+def _nothing_to_publish(config: ETL3Config, ledger: FactLedger, s3_etl: S3PartitionedETL,
+                        start_time: float) -> Dict[str, Any]:
+    """Summary of an incremental run that found every fact row already published."""
+    logger.info("Every fact row is already published; no partitions to rewrite")
+    s3_etl.close()
+    total_time = time.time() - start_time
+    return {
+        'engine': config.ENGINE,
+        'total_input_rows': 0,
+        'total_chunks_processed': 0,
+        'failed_uploads': [],
+        'incremental': _finish_fact_ledger(config, ledger, s3_etl, set(), failures=0),
+        'total_partitions_created': 0,
+        'total_processing_time': total_time,
+        'rows_per_second': 0,
+        's3_bucket': config.S3_BUCKET,
+        's3_prefix': config.S3_PREFIX,
+        'storage_uri': config.STORAGE_URI,
+        'parquet_layout': config.PARQUET_LAYOUT,
+        'athena_database': config.ATHENA_DATABASE,
+        'athena_table': config.ATHENA_TABLE,
+        'status': 'SUCCESS'
+    }
+
+
+def prepare_dimension_bundle(config: ETL3Config) -> DimensionBundle:
+    """
+    Memory-map the pre-joined dimension bundle, building it first if the
+    dimension files, the fact schema or the categorical mode changed.
+    """
+    fact_columns = list(pl.read_parquet_schema(config.FACT_RATE_PATH))
+    bundle = DimensionBundle.load_or_build(
+        config.DIM_BUNDLE_DIR,
+        config.DIM_PATHS,
+        config.XREF_PATHS,
+        fact_columns,
+        categorical=config.CATEGORICAL_COLUMNS,
+    )
+    logger.info(f"Dimension bundle ready: {bundle.stats()}")
+    return bundle
+
+
 def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFrame], 
-                      xrefs: Dict[str, pl.DataFrame]) -> pl.DataFrame:
+                      xrefs: Dict[str, pl.DataFrame], bundle: Optional[DimensionBundle] = None,
+                      compact_providers: bool = False) -> pl.DataFrame:
     """
     Enrich fact table with dimension data.
     
@@ -304,6 +721,9 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
         fact_rate: Fact table DataFrame
         dimensions: Dictionary of dimension DataFrames
         xrefs: Dictionary of cross-reference DataFrames
+        bundle: Pre-joined dimensions; if given, dimensions and xrefs are not used
+        compact_providers: Nest provider group members instead of fanning out
+            (see utils/provider_compaction.py)
         
     Returns:
         Enriched fact table DataFrame
@@ -311,6 +731,12 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
     
     logger.info("Enriching fact table with dimension data...")
     
+    if bundle is not None:
+        # One join per bundle table instead of one per dimension and xref
+        enriched = extract_partition_keys(bundle.enrich(fact_rate, compact_providers=compact_providers))
+        logger.info(f"Enriched fact table from dimension bundle: {enriched.height:,} rows, {len(enriched.columns)} columns")
+        return enriched
+    
     # Start with fact table
     enriched = fact_rate
     
@@ -360,12 +786,46 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
         )
         logger.info("Joined with POS set dimension")
     
+    if compact_providers and 'pg_uid' in enriched.columns:
+        # One row per fact: provider members nested, partition keys from a representative
+        pg_rows = enriched.unique('pg_uid', keep='first', maintain_order=True)
+        members = _join_provider_members(pg_rows, dimensions, xrefs)
+        member_columns = members.columns[len(pg_rows.columns):]
+        enriched = enriched.join(compact_members(members.select(['pg_uid'] + member_columns), member_columns),
+                                 on='pg_uid', how='left')
+        enriched = enriched.with_columns(pl.col(FANOUT_COLUMN).fill_null(1))
+        logger.info(f"Joined with {len(member_columns)} provider member columns (compact)")
+    else:
+        enriched = _join_provider_members(enriched, dimensions, xrefs)
+    
+    # Add partitioning columns using the new extract_partition_keys function
+    enriched = extract_partition_keys(enriched)
+    
+    logger.info(f"Enriched fact table: {enriched.height:,} rows, {len(enriched.columns)} columns")
+    return enriched
+
+
+def _join_provider_members(frame: pl.DataFrame, dimensions: Dict[str, pl.DataFrame],
+                           xrefs: Dict[str, pl.DataFrame]) -> pl.DataFrame:
+    """
+    Join each row with its provider group's NPIs, their primary taxonomy, the
+    group's TINs and the NPIs' LOCATION addresses (one row per combination).
+    
+    Args:
+        frame: Rows with pg_uid (fact rows, or one row per provider group)
+        dimensions: Dictionary of dimension DataFrames
+        xrefs: Dictionary of cross-reference DataFrames
+        
+    Returns:
+        frame fanned out by provider group member
+    """
+    
     # Add NPI data through cross-reference (chunk-scoped filter to avoid global fan-out)
     if 'pg_member_npi' in xrefs and 'npi' in dimensions:
         try:
             # Only keep xref rows for pg_uid values present in this chunk
             chunk_pg_uids = (
-                enriched
+                frame
                 .select(pl.col('pg_uid').unique())
                 .to_series()
             )
@@ -379,8 +839,8 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
             ]) if 'primary_taxonomy_code' in dimensions['npi'].columns else dimensions['npi'].select(['npi'])
 
             # Join fact -> filtered xref -> narrow npi dim
-            enriched = (
-                enriched
+            frame = (
+                frame
                 .join(xref_npi_filtered, on='pg_uid', how='left')
                 .join(npi_dim_narrow, on='npi', how='left')
             )
@@ -393,7 +853,7 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
         try:
             # Only keep xref rows for pg_uid values present in this chunk; narrow columns
             chunk_pg_uids = (
-                enriched
+                frame
                 .select(pl.col('pg_uid').unique())
                 .to_series()
             )
@@ -402,13 +862,13 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
                 .select([col for col in ['pg_uid', 'tin_value'] if col in xrefs['pg_member_tin'].columns])
                 .filter(pl.col('pg_uid').is_in(chunk_pg_uids))
             )
-            enriched = enriched.join(xref_tin_filtered, on='pg_uid', how='left')
+            frame = frame.join(xref_tin_filtered, on='pg_uid', how='left')
             logger.info("Joined with TIN data through cross-reference (filtered by chunk pg_uid)")
         except Exception as e:
             logger.error(f"TIN cross-reference join failed: {e}")
     
     # Add geolocation data through NPI address (LOCATION addresses only)
-    if 'npi_address_geo' in dimensions and 'npi' in enriched.columns:
+    if 'npi_address_geo' in dimensions and 'npi' in frame.columns:
         # Filter for LOCATION addresses only (not MAILING) and select only geo fields
         location_addresses = dimensions['npi_address_geo'].filter(
             pl.col('address_purpose') == 'LOCATION'
@@ -418,7 +878,7 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
             'latitude', 'longitude', 'county_name', 'county_fips', 
             'stat_area_name', 'stat_area_code', 'matched_address'
         ])
-        enriched = enriched.join(
+        frame = frame.join(
             location_addresses,
             on='npi',
             how='left',
@@ -426,15 +886,13 @@ def _enrich_fact_table(fact_rate: pl.DataFrame, dimensions: Dict[str, pl.DataFra
         )
         logger.info("Joined with NPI geolocation data (LOCATION addresses only, geo fields only)")
     
-    # Add partitioning columns using the new extract_partition_keys function
-    enriched = extract_partition_keys(enriched)
-    
-    logger.info(f"Enriched fact table: {enriched.height:,} rows, {len(enriched.columns)} columns")
-    return enriched
+    return frame
 
 
 def _create_partitions_for_chunk(chunk_data: pl.DataFrame, partition_columns: List[str], 
-                                s3_etl: S3PartitionedETL, prefix: str, config: Optional[ETL3Config] = None) -> List[str]:
+                                s3_etl: S3PartitionedETL, prefix: str, config: Optional[ETL3Config] = None,
+                                accumulator: Optional[PartitionAccumulator] = None,
+                                failures: Optional[List[str]] = None) -> List[str]:
     """
     Create S3 partitions for a single chunk of data with idempotent writes.
     
@@ -444,9 +902,11 @@ def _create_partitions_for_chunk(chunk_data: pl.DataFrame, partition_columns: Li
         s3_etl: S3PartitionedETL instance
         prefix: S3 prefix for partitions
         config: ETL3Config instance for validation (optional)
+        accumulator: If given, slices are spilled locally instead of written to S3
+        failures: If given, paths of partitions that could not be written are appended
         
     Returns:
-        List of created/updated S3 partition paths
+        List of created/updated (or, when accumulating, spilled) S3 partition paths
     """
     
     created_partitions = []
@@ -460,37 +920,28 @@ def _create_partitions_for_chunk(chunk_data: pl.DataFrame, partition_columns: Li
             # Continue processing but log the validation failure
             logger.warning("Continuing with partition creation despite validation failures")
     
-    # Get unique partition combinations for this chunk
-    partition_combinations = (
-        chunk_data
-        .select(partition_columns)
-        .unique()
-        .sort(partition_columns)
-    )
+    # Group the chunk by partition once; each partition is a zero-copy slice
+    partition_groups = list(split_partitions(chunk_data, partition_columns))
     
-    logger.info(f"Processing {partition_combinations.height} unique partition combinations")
+    logger.info(f"Processing {len(partition_groups)} unique partition combinations")
     
     # Process each partition combination
-    for partition_row in partition_combinations.iter_rows(named=True):
+    for partition_row, partition_data in partition_groups:
         # Create S3 path
         s3_path = s3_etl.create_s3_path(partition_row, prefix)
         
-        # Filter data for this partition
-        partition_filter = _create_partition_filter(partition_row)
-        partition_data = chunk_data.filter(partition_filter)
-        
-        # Skip if no data
-        if partition_data.height == 0:
-            logger.debug(f"No data for partition: {s3_path}")
-            continue
-        
         # Write partition idempotently (handles duplicates and existing partitions)
         try:
-            write_partition_idempotent(partition_data, s3_path, s3_etl)
+            if accumulator is not None:
+                accumulator.append(s3_path, partition_data)
+            else:
+                write_partition_idempotent(partition_data, s3_path, s3_etl)
             created_partitions.append(s3_path)
             logger.debug(f"Successfully processed partition: {s3_path} ({partition_data.height:,} rows)")
         except Exception as e:
             logger.error(f"Failed to process partition {s3_path}: {e}")
+            if failures is not None:
+                failures.append(s3_path)
             # Continue with next partition instead of failing completely
             continue
     
@@ -498,18 +949,6 @@ def _create_partitions_for_chunk(chunk_data: pl.DataFrame, partition_columns: Li
     return created_partitions
 
 
-def _create_partition_filter(partition_row: Dict[str, Any]) -> pl.Expr:
-    """Create filter condition for partition."""
-    conditions = []
-    for col, value in partition_row.items():
-        if value is None:
-            conditions.append(pl.col(col).is_null())
-        else:
-            conditions.append(pl.col(col) == value)
-    
-    return pl.all_horizontal(conditions)
-
-
 def merge_partition_data(existing_data: pl.DataFrame, new_data: pl.DataFrame) -> pl.DataFrame:
     """
     Merge partition data handling duplicates.
@@ -533,6 +972,9 @@ def merge_partition_data(existing_data: pl.DataFrame, new_data: pl.DataFrame) ->
             existing_data = existing_data.select(common_columns)
             new_data = new_data.select(common_columns)
         
+        # Partitions written before/after switching categorical mode differ in dtype
+        existing_data = align_dtypes(existing_data, new_data.schema)
+        
         # Add unique row identifiers if not present
         if 'row_id' not in existing_data.columns:
             existing_data = existing_data.with_row_index('row_id', offset=0)
@@ -573,7 +1015,10 @@ def merge_partition_data(existing_data: pl.DataFrame, new_data: pl.DataFrame) ->
 def write_partition_idempotent(partition_data: pl.DataFrame, s3_path: str, s3_etl: S3PartitionedETL) -> str:
     """
     Write partition data idempotently.
-    If partition exists, merge with existing data.
+    If partition exists, merge with existing data. A partition that compaction
+    split or rolled up is written back as its own file, and S3PartitionedETL
+    then takes it out of the parts or rollup (the next compaction folds it in
+    again).
     
     Args:
         partition_data: Data to write
@@ -597,14 +1042,14 @@ def write_partition_idempotent(partition_data: pl.DataFrame, s3_path: str, s3_et
             # Merge with new data (handle duplicates by unique key)
             merged_data = merge_partition_data(existing_data, partition_data)
             
-            # Write back merged data
-            s3_etl.upload_partition_to_s3(merged_data, s3_path)
+            # Write back merged data (queued; a later read of this path waits for it)
+            s3_etl.submit_partition_upload(merged_data, s3_path)
             
             logger.info(f"Successfully merged and wrote partition: {s3_path}")
         else:
             # New partition, write directly
             logger.info(f"New partition, writing directly: {s3_path}")
-            s3_etl.upload_partition_to_s3(partition_data, s3_path)
+            s3_etl.submit_partition_upload(partition_data, s3_path)
             
             logger.info(f"Successfully wrote new partition: {s3_path}")
         
@@ -615,16 +1060,20 @@ def write_partition_idempotent(partition_data: pl.DataFrame, s3_path: str, s3_et
         raise
 
 
-def validate_partition_data(df: pl.DataFrame, config: ETL3Config) -> bool:
+def validate_partition_data(df: pl.DataFrame, config: ETL3Config) -> PartitionValidationReport:
     """
     Validate that partition columns have real data, not defaults.
     
+    Every column's checks and the partition combination count are one
+    aggregation over the chunk (see check_partition_columns).
+    
     Args:
         df: DataFrame with partition columns
-        config: ETL3Config instance with PARTITION_COLUMNS
+        config: ETL3Config instance with PARTITION_COLUMNS (bucket and
+            truncate levels are checked by their derived columns)
         
     Returns:
-        True if validation passes
+        PartitionValidationReport of the passed validation
         
     Raises:
         ValueError: If partition validation fails
@@ -632,71 +1081,23 @@ def validate_partition_data(df: pl.DataFrame, config: ETL3Config) -> bool:
     
     logger.info("Validating partition data quality...")
     
-    issues = []
+    report = check_partition_columns(df, config.partition_spec().columns)
     
-    for partition_col in config.PARTITION_COLUMNS:
-        if partition_col not in df.columns:
-            issues.append(f"Partition column {partition_col} not found in data")
-            continue
-            
-        # Check for excessive defaults (Unknown values)
-        unknown_count = df.filter(pl.col(partition_col) == 'Unknown').height
-        unknown_ratio = unknown_count / df.height if df.height > 0 else 0
-        
-        if unknown_ratio > 0.1:  # More than 10% defaults
-            issues.append(f"Column {partition_col} has {unknown_ratio:.1%} default values ({unknown_count:,}/{df.height:,} rows)")
-        
-        # Check for __NULL__ values (our explicit null strategy)
-        null_count = df.filter(pl.col(partition_col) == '__NULL__').height
-        null_ratio = null_count / df.height if df.height > 0 else 0
-        
-        # Set different thresholds for different columns
-        null_threshold = 0.2  # Default 20% threshold
-        if partition_col == 'stat_area_name':
-            null_threshold = 0.5  # 50% threshold for geographical data (common to be missing)
-        elif partition_col in ['primary_taxonomy_code']:
-            null_threshold = 0.3  # 30% threshold for taxonomy data
-        
-        if null_ratio > null_threshold:
-            issues.append(f"Column {partition_col} has {null_ratio:.1%} __NULL__ values ({null_count:,}/{df.height:,} rows, threshold: {null_threshold:.1%})")
-        
-        # Check for actual null values (should be handled by __NULL__ strategy)
-        actual_null_count = df.filter(pl.col(partition_col).is_null()).height
-        actual_null_ratio = actual_null_count / df.height if df.height > 0 else 0
-        
-        if actual_null_ratio > 0.05:  # More than 5% actual nulls
-            issues.append(f"Column {partition_col} has {actual_null_ratio:.1%} actual null values ({actual_null_count:,}/{df.height:,} rows)")
-        
-        # Log validation details for each column
+    for partition_col in report.columns:
         logger.debug(f"Partition validation for {partition_col}: "
-                    f"Unknown={unknown_ratio:.1%}, __NULL__={null_ratio:.1%}, "
-                    f"Actual nulls={actual_null_ratio:.1%}")
+                    f"Unknown={report.ratio(partition_col, 'unknown'):.1%}, "
+                    f"__NULL__={report.ratio(partition_col, 'null_marker'):.1%}, "
+                    f"Actual nulls={report.ratio(partition_col, 'null'):.1%}")
+    if report.combinations is not None:
+        logger.info(f"Found {report.combinations} unique partition combinations")
     
-    # Check for partition key uniqueness and distribution
-    if len(config.PARTITION_COLUMNS) > 1:
-        # Check partition distribution
-        partition_combinations = (
-            df
-            .select(config.PARTITION_COLUMNS)
-            .unique()
-            .height
-        )
-        
-        # Warn if too few unique partition combinations (but don't fail for small datasets)
-        if partition_combinations < 3 and df.height > 10:
-            issues.append(f"Only {partition_combinations} unique partition combinations found (may indicate data quality issues)")
-        elif partition_combinations < 2:
-            issues.append(f"Only {partition_combinations} unique partition combinations found (insufficient for partitioning)")
-        
-        logger.info(f"Found {partition_combinations} unique partition combinations")
-    
-    if issues:
-        error_message = f"Partition validation failed:\n" + "\n".join(f"  - {issue}" for issue in issues)
+    if report.issues:
+        error_message = f"Partition validation failed:\n" + "\n".join(f"  - {issue}" for issue in report.issues)
         logger.error(error_message)
         raise ValueError(error_message)
     
     logger.info("Partition validation passed successfully")
-    return True
+    return report
 
 
 def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
@@ -705,7 +1106,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
     No defaults - only use actual values or handle nulls explicitly.
     
     Args:
-        enriched_df: Input DataFrame (enriched with all dimension data)
+        enriched_df: Input DataFrame (enriched with all dimension data), or a LazyFrame
         
     Returns:
         DataFrame with correct partition columns added
@@ -725,6 +1126,9 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
     logger.info("Extracting partition keys from enriched data...")
     
     try:
+        # Schema-only, so the streaming engine can pass its LazyFrame plan
+        columns = enriched_df.collect_schema().names()
+        
         # Define the partition column mapping
         partition_mapping = {
             'payer_slug': 'payer_slug',  # from fact
@@ -741,7 +1145,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
         # Validate that all source columns exist
         missing_columns = []
         for partition_key, source_column in partition_mapping.items():
-            if source_column not in enriched_df.columns:
+            if source_column not in columns:
                 missing_columns.append(f"{partition_key} -> {source_column}")
         
         if missing_columns:
@@ -752,7 +1156,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
         result_df = enriched_df
         
         # Extract year and month from year_month column
-        if 'year_month' in enriched_df.columns:
+        if 'year_month' in columns:
             result_df = result_df.with_columns([
                 pl.when(pl.col('year_month').is_null())
                 .then(pl.lit('__NULL__'))
@@ -772,7 +1176,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("year_month column not found, using __NULL__")
         
         # Handle payer_slug (already in fact table)
-        if 'payer_slug' in enriched_df.columns:
+        if 'payer_slug' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('payer_slug').is_null())
                 .then(pl.lit('__NULL__'))
@@ -785,7 +1189,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("payer_slug not found, using __NULL__")
         
         # Handle state (from dim_npi_address_geo, LOCATION addresses only)
-        if 'state_geo' in enriched_df.columns:
+        if 'state_geo' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('state_geo').is_null())
                 .then(pl.lit('__NULL__'))
@@ -793,7 +1197,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
                 .alias('state')
             )
             logger.info("Added state partition key from dim_npi_address_geo.state (LOCATION addresses)")
-        elif 'state' in enriched_df.columns:
+        elif 'state' in columns:
             # Fallback to fact table state if geo state not available
             result_df = result_df.with_columns(
                 pl.when(pl.col('state').is_null())
@@ -807,7 +1211,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("No state column found, using __NULL__")
         
         # Handle billing_class (already in fact table)
-        if 'billing_class' in enriched_df.columns:
+        if 'billing_class' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('billing_class').is_null())
                 .then(pl.lit('__NULL__'))
@@ -820,7 +1224,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("billing_class not found, using __NULL__")
         
         # Handle procedure_set (from dim_code_cat)
-        if 'proc_set' in enriched_df.columns:
+        if 'proc_set' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('proc_set').is_null())
                 .then(pl.lit('__NULL__'))
@@ -833,7 +1237,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("proc_set not found in dim_code_cat, using __NULL__")
         
         # Handle procedure_class (from dim_code_cat)
-        if 'proc_class' in enriched_df.columns:
+        if 'proc_class' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('proc_class').is_null())
                 .then(pl.lit('__NULL__'))
@@ -846,7 +1250,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("proc_class not found in dim_code_cat, using __NULL__")
         
         # Handle primary_taxonomy_code (from dim_npi)
-        if 'primary_taxonomy_code' in enriched_df.columns:
+        if 'primary_taxonomy_code' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('primary_taxonomy_code').is_null())
                 .then(pl.lit('__NULL__'))
@@ -859,7 +1263,7 @@ def extract_partition_keys(enriched_df: pl.DataFrame) -> pl.DataFrame:
             logger.warning("primary_taxonomy_code not found, using __NULL__")
         
         # Handle stat_area_name (from dim_npi_address_geo, LOCATION addresses only)
-        if 'stat_area_name' in enriched_df.columns:
+        if 'stat_area_name' in columns:
             result_df = result_df.with_columns(
                 pl.when(pl.col('stat_area_name').is_null())
                 .then(pl.lit('__NULL__'))
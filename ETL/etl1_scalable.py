@@ -25,15 +25,32 @@ import hashlib
 import re
 import gc
 import psutil
+import multiprocessing
+from collections import deque
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
 
 import polars as pl
+import pyarrow.parquet as pq
 import duckdb
 from tqdm import tqdm
 
+# Add utils to path
+sys.path.append(str(Path(__file__).parent / "utils"))
+from key_hashing import with_md5, pg_uid_key, pos_set_key, fact_uid
+from parquet_batches import ParquetBatchReader
+from chunk_merge import ChunkMerger, MergeStats
+from seen_keys import DimensionKeyFilter
+from run_manifest import RunManifest, parquet_fingerprint, STATUS_PROCESSING, STATUS_MERGING, STATUS_COMPLETE
+from chunk_sizing import AdaptiveChunkSizer
+from distinct_values import DistinctValueMapper
+from categorical_schema import enable_global_categories, encode_categoricals
+
 
 @dataclass
 class ETL1Config:
@@ -51,6 +68,18 @@ class ETL1Config:
     payer_slug_override: Optional[str] = None
     chunk_size: int = 1000  # Very conservative chunk size for memory-constrained systems
     memory_limit_mb: int = 1024  # Very conservative memory limit
+    workers: int = 1  # Worker processes for chunk processing (1 = serial)
+    merge_fan_in: int = 10  # Max temp files read per merge pass
+    merge_workers: int = 4  # Tables merged concurrently
+    
+    # Adaptive chunk sizing: steer chunk_size from measured memory per row
+    adaptive_chunk_size: bool = False
+    min_chunk_size: int = 500
+    max_chunk_size: int = 500_000
+    memory_target_fraction: float = 0.6  # Fraction of memory_limit_mb chunks should fill
+    
+    # Write low-cardinality fact_rate columns as dictionary-encoded categoricals
+    categorical_columns: bool = False
     
     # File patterns
     rates_file_pattern: str = "202508_{payer}_ga_rates.parquet"
@@ -72,6 +101,14 @@ class ETL1Config:
     # Cleanup options
     force_cleanup: bool = False
     
+    # Cross-chunk seen-key filter for dimension temp files
+    filter_seen_keys: bool = True
+    seen_keys_memory_mb: int = 256  # Key sets beyond this budget spill to disk
+    
+    # Checkpoint/resume (manifest lives in data_root, next to gold/)
+    resume: bool = True
+    manifest_file: str = "etl1_run_manifest.db"
+    
     def __post_init__(self):
         """Initialize paths and create directories"""
         # Convert string paths to Path objects and resolve relative to script location
@@ -161,8 +198,16 @@ class ETL1Config:
             config.chunk_size = args.chunk_size
         if hasattr(args, 'memory_limit') and args.memory_limit:
             config.memory_limit_mb = args.memory_limit
+        if hasattr(args, 'workers') and args.workers:
+            config.workers = args.workers
+        if hasattr(args, 'adaptive_chunks') and args.adaptive_chunks:
+            config.adaptive_chunk_size = True
+        if hasattr(args, 'categorical') and args.categorical:
+            config.categorical_columns = True
         if hasattr(args, 'force_cleanup'):
             config.force_cleanup = args.force_cleanup
+        if hasattr(args, 'no_resume') and args.no_resume:
+            config.resume = False
         
         return config
 
@@ -190,6 +235,23 @@ class ScalableETL1:
         
         # Initialize DuckDB connection for upserts
         self.db_conn = None
+        
+        # Run manifest for checkpoint/resume (opened by run_pipeline)
+        self.manifest = None
+        
+        # Cross-chunk seen-key filter for dimension temp files (created by run_pipeline)
+        self.seen_keys = None
+        
+        # RSS measured by process_chunk_to_temp once a chunk's tables are built
+        self.last_chunk_memory_mb = 0.0
+        
+        # Python normalizers run once per distinct input value (cached across chunks)
+        self.payer_slug_mapper = DistinctValueMapper(self.payer_slug_from_name, pl.Utf8)
+        self.yymm_mapper = DistinctValueMapper(self.normalize_yymm, pl.Utf8)
+        self.service_codes_mapper = DistinctValueMapper(self.normalize_service_codes, pl.List(pl.Utf8))
+        
+        if self.config.categorical_columns:
+            enable_global_categories()
     
     def get_memory_usage(self) -> Dict[str, float]:
         """Get current memory usage statistics"""
@@ -240,6 +302,10 @@ class ScalableETL1:
         """Context manager exit"""
         if self.db_conn:
             self.db_conn.close()
+        if self.manifest is not None:
+            self.manifest.close()
+        if self.seen_keys is not None:
+            self.seen_keys.close()
     
     def cleanup_temp_files(self, base_path: Path) -> None:
         """Clean up temporary files that might be left behind"""
@@ -348,7 +414,7 @@ class ScalableETL1:
         return sorted(set(cleaned))
     
     def pos_set_id_from_members(self, members) -> str:
-        """Generate stable ID from POS members list"""
+        """Generate stable ID from POS members list (per-row reference for key_hashing)"""
         if members is None:
             return self.md5("none")
         
@@ -370,7 +436,7 @@ class ScalableETL1:
         return self.md5(key)
     
     def fact_uid_from_struct(self, s: dict) -> str:
-        """Generate deterministic fact UID"""
+        """Generate deterministic fact UID (per-row reference for key_hashing.fact_uid)"""
         rate_val = s.get("negotiated_rate")
         try:
             rate_str = f"{float(rate_val):.4f}" if rate_val is not None else ""
@@ -413,39 +479,19 @@ class ScalableETL1:
     
     def process_rates_chunk(self, chunk: pl.DataFrame) -> pl.DataFrame:
         """Process a chunk of rates data"""
-        # Add derived columns
+        # Add derived columns (normalizers run once per distinct value, see utils/distinct_values.py)
         chunk = chunk.with_columns([
-            pl.col("reporting_entity_name").map_elements(
-                self.payer_slug_from_name, return_dtype=pl.Utf8
-            ).alias("payer_slug"),
-            
-            pl.col("last_updated_on").map_elements(
-                self.normalize_yymm, return_dtype=pl.Utf8
-            ).alias("year_month"),
-            
-            pl.col("service_codes").map_elements(
-                self.normalize_service_codes, return_dtype=pl.List(pl.Utf8)
-            ).alias("pos_members"),
+            self.payer_slug_mapper.map(chunk["reporting_entity_name"]).alias("payer_slug"),
+            self.yymm_mapper.map(chunk["last_updated_on"]).alias("year_month"),
+            self.service_codes_mapper.map(chunk["service_codes"]).alias("pos_members"),
         ])
         
-        # Generate POS set ID
-        chunk = chunk.with_columns([
-            pl.col("pos_members").map_elements(
-                self.pos_set_id_from_members, return_dtype=pl.Utf8
-            ).alias("pos_set_id")
-        ])
+        # Generate POS set ID (vectorized md5, same digests as pos_set_id_from_members)
+        chunk = with_md5(chunk, pos_set_key("pos_members"), "pos_set_id")
         
-        # Generate provider group UID (use provider_reference_id for rates)
-        chunk = chunk.with_columns([
-            pl.concat_str([
-                pl.col("payer_slug"),
-                pl.col("version").fill_null(""),
-                pl.col("provider_reference_id").fill_null(""),
-                pl.lit(""),  # provider_group_id doesn't exist in rates
-            ], separator="|").map_elements(
-                self.md5, return_dtype=pl.Utf8
-            ).alias("pg_uid")
-        ])
+        # Generate provider group UID (use provider_reference_id for rates;
+        # provider_group_id doesn't exist in rates)
+        chunk = with_md5(chunk, pg_uid_key("provider_reference_id"), "pg_uid")
         
         return chunk
     
@@ -453,22 +499,12 @@ class ScalableETL1:
         """Process a chunk of providers data"""
         # Add payer slug
         chunk = chunk.with_columns([
-            pl.col("reporting_entity_name").map_elements(
-                self.payer_slug_from_name, return_dtype=pl.Utf8
-            ).alias("payer_slug")
+            self.payer_slug_mapper.map(chunk["reporting_entity_name"]).alias("payer_slug")
         ])
         
-        # Generate provider group UID (use provider_group_id for providers)
-        chunk = chunk.with_columns([
-            pl.concat_str([
-                pl.col("payer_slug"),
-                pl.col("version").fill_null(""),
-                pl.col("provider_group_id").fill_null(""),
-                pl.lit(""),  # provider_reference_id doesn't exist in providers
-            ], separator="|").map_elements(
-                self.md5, return_dtype=pl.Utf8
-            ).alias("pg_uid")
-        ])
+        # Generate provider group UID (use provider_group_id for providers;
+        # provider_reference_id doesn't exist in providers)
+        chunk = with_md5(chunk, pg_uid_key("provider_group_id"), "pg_uid")
         
         return chunk
     
@@ -486,121 +522,54 @@ class ScalableETL1:
         self.logger.info(f"Writing {df_new.height:,} rows to temp file: {temp_path.name}")
         df_new.write_parquet(temp_path, compression="zstd")
         
+        # Make the file durable before the chunk is recorded in the run manifest
+        with open(temp_path, "rb") as f:
+            os.fsync(f.fileno())
+        
         return temp_path
     
-    def merge_temp_files(self, output_path: Path, table_name: str, keys: List[str]) -> None:
-        """Merge all temporary files into final output file using batched approach"""
+    def merge_temp_files(self, output_path: Path, table_name: str, keys: List[str],
+                         memory_limit_mb: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Merge all temporary chunk files for a table into its final output file.
+        
+        Rows are deduplicated on keys, keeping the row from the latest chunk
+        ("last wins"). See utils/chunk_merge.py.
+        
+        Returns:
+            Bytes/rows merge statistics, or None if there was nothing to merge
+        """
         temp_dir = output_path.parent / "temp_chunks"
         temp_pattern = f"{table_name}_chunk_*.parquet"
         
-        # Find all temp files for this table
-        temp_files = list(temp_dir.glob(temp_pattern))
+        # Find all temp files for this table in chunk order (sorted numerically:
+        # adaptive runs number provider chunks past the rates row count)
+        temp_files = sorted(temp_dir.glob(temp_pattern), key=lambda p: int(p.stem.rsplit("_", 1)[1]))
         
         if not temp_files:
             self.logger.warning(f"No temp files found for {table_name}")
-            return
-        
-        self.logger.info(f"Merging {len(temp_files)} temp files for {table_name}")
+            return None
         
-        # Set memory limit for DuckDB operations
-        memory_limit_gb = max(1, self.config.memory_limit_mb // 1024)
-        self.db_conn.execute(f"SET memory_limit='{memory_limit_gb}GB'")
+        self.logger.info(f"Merging {len(temp_files)} temp files for {table_name} on keys {keys}")
+        spill_dir = temp_dir / f"{table_name}_spill"
         
         try:
-            if len(temp_files) == 1:
-                # Single file - just rename it
-                os.rename(temp_files[0], output_path)
+            if len(temp_files) == 1 and not keys:
+                # Single file without keys - just rename it (no bytes read or written)
+                os.replace(temp_files[0], output_path)
                 self.logger.info(f"Renamed single temp file to {output_path}")
+                stats = MergeStats(table=table_name, input_files=1,
+                                   rows_written=pq.ParquetFile(output_path).metadata.num_rows)
             else:
-                # Multiple files - merge them in batches to avoid memory issues
-                max_files_per_batch = 10  # Process max 10 files at a time
-                
-                if len(temp_files) <= max_files_per_batch:
-                    # Small number of files - merge all at once
-                    temp_paths_str = "', '".join(str(f) for f in temp_files)
-                    
-                    if table_name == "fact_rate":
-                        # For fact table, just concatenate all files
-                        self.db_conn.execute(f"""
-                            COPY (
-                                SELECT * FROM read_parquet(['{temp_paths_str}'])
-                            ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                        """)
-                    else:
-                        # For dimensions, deduplicate using simple DISTINCT
-                        self.db_conn.execute(f"""
-                            COPY (
-                                SELECT DISTINCT * FROM read_parquet(['{temp_paths_str}'])
-                            ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                        """)
-                else:
-                    # Large number of files - merge in batches
-                    self.logger.info(f"Large number of files ({len(temp_files)}), merging in batches of {max_files_per_batch}")
-                    
-                    # Create intermediate merge files
-                    intermediate_files = []
-                    batch_num = 0
-                    
-                    for i in range(0, len(temp_files), max_files_per_batch):
-                        batch_files = temp_files[i:i + max_files_per_batch]
-                        batch_paths_str = "', '".join(str(f) for f in batch_files)
-                        
-                        # Create intermediate file for this batch
-                        intermediate_file = temp_dir / f"{table_name}_batch_{batch_num:03d}.parquet"
-                        intermediate_files.append(intermediate_file)
-                        
-                        if table_name == "fact_rate":
-                            # For fact table, just concatenate
-                            self.db_conn.execute(f"""
-                                COPY (
-                                    SELECT * FROM read_parquet(['{batch_paths_str}'])
-                                ) TO '{intermediate_file}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                            """)
-                        else:
-                            # For dimensions, deduplicate
-                            self.db_conn.execute(f"""
-                                COPY (
-                                    SELECT DISTINCT * FROM read_parquet(['{batch_paths_str}'])
-                                ) TO '{intermediate_file}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                            """)
-                        
-                        batch_num += 1
-                        self.logger.info(f"Created intermediate batch file {batch_num}: {intermediate_file.name}")
-                        
-                        # Clean up original temp files in this batch
-                        for temp_file in batch_files:
-                            try:
-                                os.remove(temp_file)
-                            except (OSError, PermissionError):
-                                self.logger.warning(f"Could not remove temp file {temp_file}")
-                    
-                    # Now merge all intermediate files into final output
-                    if len(intermediate_files) == 1:
-                        os.rename(intermediate_files[0], output_path)
-                    else:
-                        intermediate_paths_str = "', '".join(str(f) for f in intermediate_files)
-                        
-                        if table_name == "fact_rate":
-                            self.db_conn.execute(f"""
-                                COPY (
-                                    SELECT * FROM read_parquet(['{intermediate_paths_str}'])
-                                ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                            """)
-                        else:
-                            self.db_conn.execute(f"""
-                                COPY (
-                                    SELECT DISTINCT * FROM read_parquet(['{intermediate_paths_str}'])
-                                ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION ZSTD)
-                            """)
-                        
-                        # Clean up intermediate files
-                        for intermediate_file in intermediate_files:
-                            try:
-                                os.remove(intermediate_file)
-                            except (OSError, PermissionError):
-                                self.logger.warning(f"Could not remove intermediate file {intermediate_file}")
-                
-                self.logger.info(f"Merged {len(temp_files)} temp files into {output_path}")
+                merger = ChunkMerger(
+                    memory_limit_mb=memory_limit_mb or self.config.memory_limit_mb,
+                    spill_dir=spill_dir,
+                    fan_in=self.config.merge_fan_in,
+                )
+                stats = merger.merge(table_name, temp_files, output_path, keys)
+            
+            if table_name == "fact_rate" and self.config.categorical_columns:
+                self._encode_merged_categoricals(output_path)
             
             # Clean up any remaining temp files
             for temp_file in temp_files:
@@ -610,16 +579,83 @@ class ScalableETL1:
                 except (OSError, PermissionError):
                     self.logger.warning(f"Could not remove temp file {temp_file}")
             
+            shutil.rmtree(spill_dir, ignore_errors=True)
+            
             # Remove temp directory if empty
             try:
                 temp_dir.rmdir()
             except OSError:
                 pass  # Directory not empty or other error
+            
+            return stats.to_dict()
                 
         except Exception as e:
             self.logger.error(f"Failed to merge temp files for {table_name}: {e}")
             raise
     
+    def _encode_merged_categoricals(self, output_path: Path) -> None:
+        """
+        Restore the categorical columns of a merged fact_rate file.
+        
+        DuckDB writes the merged rows back as VARCHAR; the file is streamed
+        once more through Polars so it stores them as categoricals, as the
+        chunks did.
+        """
+        staging_path = output_path.with_suffix(".categorical.parquet")
+        try:
+            encode_categoricals(pl.scan_parquet(output_path)).sink_parquet(staging_path, compression="zstd")
+            os.replace(staging_path, output_path)
+        finally:
+            staging_path.unlink(missing_ok=True)
+    
+    def merge_all_temp_files(self, output_files: Dict[str, Path]) -> Dict[str, Dict[str, Any]]:
+        """
+        Merge the temp chunk files of every table, merge_workers tables at a time.
+        
+        Each concurrent merge gets an equal share of memory_limit_mb as its
+        DuckDB memory limit and spills beyond it. Tables the run manifest
+        already lists as merged are skipped; others are recorded as they finish.
+        
+        Returns:
+            Merge statistics per table
+        """
+        already_merged = set(self.manifest.merged_tables()) if self.manifest is not None else set()
+        pending = {name: path for name, path in output_files.items() if name not in already_merged}
+        if already_merged:
+            self.logger.info(f"Skipping tables merged by a previous run: {sorted(already_merged)}")
+        
+        concurrency = max(1, min(self.config.merge_workers, len(pending)))
+        memory_share_mb = self.config.memory_limit_mb // concurrency
+        merge_stats = {}
+        errors = {}
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self.merge_temp_files, output_path, table_name,
+                    self._get_dimension_keys(table_name), memory_share_mb
+                ): table_name
+                for table_name, output_path in pending.items()
+            }
+            for future in as_completed(futures):
+                table_name = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    errors[table_name] = e
+                    continue
+                if stats is not None:
+                    merge_stats[table_name] = stats
+                    if self.manifest is not None:
+                        self.manifest.record_merged(table_name, pending[table_name])
+        
+        # Report the first failure in table order so it is deterministic
+        for table_name in pending:
+            if table_name in errors:
+                raise errors[table_name]
+        
+        return {name: merge_stats[name] for name in pending if name in merge_stats}
+    
     def process_dimensions(self, rates_chunk: pl.DataFrame, providers_chunk: pl.DataFrame) -> Dict[str, pl.DataFrame]:
         """Process dimension tables from chunks"""
         dims = {}
@@ -633,7 +669,7 @@ class ScalableETL1:
                 pl.col("name").alias("code_name"),
             ])
             .drop_nulls(subset=["code_type", "code"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Dim Payer
@@ -644,7 +680,7 @@ class ScalableETL1:
                 pl.col("version"),
             ])
             .drop_nulls(subset=["payer_slug"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Dim Provider Group (from rates data - use provider_reference_id)
@@ -656,14 +692,14 @@ class ScalableETL1:
                 pl.col("version"),
             ])
             .drop_nulls(subset=["pg_uid"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Dim POS Set
         dims["dim_pos_set"] = (
             rates_chunk.select(["pos_set_id", "pos_members"])
             .drop_nulls(subset=["pos_set_id"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Xref PG NPI (only if providers_chunk is not empty)
@@ -671,7 +707,7 @@ class ScalableETL1:
             dims["xref_pg_npi"] = (
                 providers_chunk.select(["pg_uid", "npi"])
                 .drop_nulls(subset=["pg_uid", "npi"])
-                .unique()
+                .unique(maintain_order=True)
             )
         else:
             dims["xref_pg_npi"] = pl.DataFrame({"pg_uid": [], "npi": []})
@@ -681,7 +717,7 @@ class ScalableETL1:
             dims["xref_pg_tin"] = (
                 providers_chunk.select(["pg_uid", "tin_type", "tin_value"])
                 .drop_nulls(subset=["pg_uid", "tin_value"])
-                .unique()
+                .unique(maintain_order=True)
             )
         else:
             dims["xref_pg_tin"] = pl.DataFrame({"pg_uid": [], "tin_type": [], "tin_value": []})
@@ -701,21 +737,21 @@ class ScalableETL1:
                 pl.col("version"),
             ])
             .drop_nulls(subset=["pg_uid"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Xref PG NPI
         dims["xref_pg_npi"] = (
             providers_chunk.select(["pg_uid", "npi"])
             .drop_nulls(subset=["pg_uid", "npi"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         # Xref PG TIN
         dims["xref_pg_tin"] = (
             providers_chunk.select(["pg_uid", "tin_type", "tin_value"])
             .drop_nulls(subset=["pg_uid", "tin_value"])
-            .unique()
+            .unique(maintain_order=True)
         )
         
         return dims
@@ -735,23 +771,330 @@ class ScalableETL1:
                 pl.col("provider_reference_id").alias("provider_group_id_raw"),  # Use provider_reference_id since provider_group_id doesn't exist in rates
                 "reporting_entity_name",
             ])
-            .with_columns([
-                pl.struct([
-                    "state", "year_month", "payer_slug", "billing_class", "code_type", "code",
-                    "pg_uid", "pos_set_id", "negotiated_type", "negotiation_arrangement",
-                    "expiration_date", "negotiated_rate", "provider_group_id_raw"
-                ]).map_elements(self.fact_uid_from_struct, return_dtype=pl.Utf8).alias("fact_uid")
-            ])
+        )
+        
+        # Vectorized fact_uid (same digests as fact_uid_from_struct)
+        fact = (
+            fact
+            .with_columns(fact_uid(fact))
             .select([
                 "fact_uid", "state", "year_month", "payer_slug", "billing_class", "code_type", "code",
                 "pg_uid", "pos_set_id", "negotiated_type", "negotiation_arrangement",
                 "negotiated_rate", "expiration_date", "provider_group_id_raw", "reporting_entity_name"
             ])
-            .unique()
+            .unique(maintain_order=True)
         )
         
+        # Encode after hashing so fact_uid is computed from the string values
+        if self.config.categorical_columns:
+            fact = encode_categoricals(fact)
+        
         return fact
     
+    def build_rates_chunk_tables(self, rates_chunk: pl.DataFrame) -> Tuple[int, Dict[str, pl.DataFrame]]:
+        """
+        Run rates chunk -> dimensions -> fact
+        
+        Returns:
+            (rows processed, table name -> rows for its temp file)
+        """
+        rates_chunk = self.process_rates_chunk(rates_chunk)
+        
+        # Process dimensions and fact table
+        tables = self.process_dimensions(rates_chunk, pl.DataFrame())  # Empty providers for rates-only dims
+        tables["fact_rate"] = self.process_fact_table(rates_chunk)
+        
+        return rates_chunk.height, tables
+    
+    def build_providers_chunk_tables(self, providers_chunk: pl.DataFrame) -> Tuple[int, Dict[str, pl.DataFrame]]:
+        """
+        Run providers chunk -> provider dimensions
+        
+        Returns:
+            (rows processed, table name -> rows for its temp file)
+        """
+        providers_chunk = self.process_providers_chunk(providers_chunk)
+        prov_dims = self.process_provider_dimensions(providers_chunk)
+        tables = {
+            dim_name: prov_dims[dim_name]
+            for dim_name in ["dim_provider_group", "xref_pg_npi", "xref_pg_tin"]
+            if dim_name in prov_dims
+        }
+        
+        return providers_chunk.height, tables
+    
+    def build_chunk_tables(self, kind: str, chunk: pl.DataFrame) -> Tuple[int, Dict[str, pl.DataFrame]]:
+        """Build the temp tables of a rates or providers chunk"""
+        if kind == "rates":
+            return self.build_rates_chunk_tables(chunk)
+        return self.build_providers_chunk_tables(chunk)
+    
+    def write_chunk_tables(self, tables: Dict[str, pl.DataFrame], temp_idx: int,
+                           output_files: Dict[str, Path]) -> List[Path]:
+        """Write the non-empty tables of a chunk to temp files and return their paths"""
+        written = []
+        for table_name, df in tables.items():
+            if not df.is_empty():
+                written.append(self.write_chunk_to_temp(df, output_files[table_name], table_name, temp_idx))
+        return written
+    
+    def filter_seen_dimension_rows(self, tables: Dict[str, pl.DataFrame]) -> Dict[str, pl.DataFrame]:
+        """Drop dimension rows that earlier chunks already emitted (no-op when the filter is off)"""
+        if self.seen_keys is None:
+            return tables
+        return {name: self.seen_keys.filter(name, df) for name, df in tables.items()}
+    
+    def process_chunk_to_temp(self, kind: str, chunk: pl.DataFrame, temp_idx: int,
+                              output_files: Dict[str, Path], filter_seen: bool = True) -> Tuple[int, List[Path]]:
+        """
+        Process a rates or providers chunk and write its temp files under temp_idx
+        
+        Returns:
+            (rows processed, temp files written)
+        """
+        rows, tables = self.build_chunk_tables(kind, chunk)
+        # Peak-ish memory of this chunk (input and derived tables both alive)
+        self.last_chunk_memory_mb = self.get_memory_usage()["process_mb"]
+        if filter_seen:
+            tables = self.filter_seen_dimension_rows(tables)
+        return rows, self.write_chunk_tables(tables, temp_idx, output_files)
+    
+    def get_pool_memory_mb(self) -> float:
+        """Resident memory of this process plus all of its worker processes"""
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return total / (1024 * 1024)
+    
+    def _chunk_pool(self) -> ProcessPoolExecutor:
+        """Create the worker pool for parallel chunk processing, with every worker started"""
+        # Spawn rather than fork: forking a process that already started
+        # Polars/DuckDB thread pools can deadlock the children.
+        pool = ProcessPoolExecutor(
+            max_workers=self.config.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chunk_worker,
+            initargs=(self.config,),
+        )
+        # Split the cores between workers so they don't oversubscribe threads.
+        # Polars reads POLARS_MAX_THREADS when it is imported, so the workers
+        # must be spawned with it: it is set only while they start, leaving
+        # this process's environment as it was.
+        threads = max(1, (os.cpu_count() or 1) // self.config.workers)
+        try:
+            with _spawn_environment(POLARS_MAX_THREADS=str(threads)):
+                list(pool.map(_worker_ready, range(self.config.workers)))
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        return pool
+    
+    def _chunk_sizer(self, memory_mb: float) -> Optional[AdaptiveChunkSizer]:
+        """Create the chunk size controller for one phase (None unless adaptive sizing is on)"""
+        if not self.config.adaptive_chunk_size:
+            return None
+        return AdaptiveChunkSizer(
+            initial_size=self.config.chunk_size,
+            memory_limit_mb=self.config.memory_limit_mb,
+            baseline_mb=memory_mb,
+            min_size=self.config.min_chunk_size,
+            max_size=self.config.max_chunk_size,
+            target_fraction=self.config.memory_target_fraction,
+        )
+    
+    def _pending_chunks(self, reader: ParquetBatchReader, completed: Dict[int, int],
+                        sizer: Optional[AdaptiveChunkSizer] = None) -> Iterator[Tuple[int, int, pl.DataFrame]]:
+        """
+        Yield (chunk_idx, start_row, chunk) for chunks not recorded as completed
+        in the run manifest.
+        
+        With a sizer, chunk boundaries depend on earlier chunks, so only the
+        leading run of completed chunks is skipped (run_pipeline drops the rest)
+        and each later chunk is cut at the size the sizer chooses.
+        """
+        start_chunk = 0
+        while start_chunk in completed:
+            start_chunk += 1
+        if start_chunk:
+            self.logger.info(f"Resuming at chunk {start_chunk + 1} ({len(completed)} chunks already completed)")
+        
+        if sizer is not None:
+            start_row = sum(completed[idx] for idx in range(start_chunk))
+            for chunk_idx, chunk in enumerate(reader.iter_sized(sizer.next_size, start_row), start=start_chunk):
+                yield chunk_idx, start_row, chunk
+                start_row += chunk.height
+            return
+        
+        for chunk_idx, chunk in enumerate(reader.iter_chunks(start_chunk), start=start_chunk):
+            if chunk_idx not in completed:
+                yield chunk_idx, chunk_idx * reader.chunk_size, chunk
+    
+    def _record_chunk(self, kind: str, chunk_idx: int, rows: int, written: List[Path]) -> None:
+        """Mark a chunk as durable in the run manifest"""
+        if self.manifest is not None:
+            self.manifest.record_chunk(kind, chunk_idx, rows, written)
+    
+    def _run_chunks_serial(self, kind: str, reader: ParquetBatchReader, total_chunks: int,
+                           completed: Dict[int, int], temp_offset: int,
+                           output_files: Dict[str, Path]) -> Tuple[int, float, Optional[AdaptiveChunkSizer]]:
+        """
+        Process chunks one after another in this process.
+        
+        With adaptive chunk sizing the memory measured for each chunk is fed to
+        the chunk size controller before the next chunk is cut.
+        
+        Returns:
+            (rows processed, peak memory in MB, chunk size controller or None)
+        """
+        processed = 0
+        peak_memory_mb = 0.0
+        
+        last_completed = max(completed, default=-1)
+        sizer = self._chunk_sizer(self.get_memory_usage()["process_mb"])
+        chunks_label = "?" if sizer is not None else str(total_chunks)
+        
+        for chunk_idx, chunk_start, chunk in self._pending_chunks(reader, completed, sizer):
+            chunk_end = chunk_start + chunk.height
+            
+            self.logger.info(f"Processing {kind} chunk {chunk_idx + 1}/{chunks_label} (rows {chunk_start:,}-{chunk_end:,} of {reader.num_rows:,})")
+            rows, written = self.process_chunk_to_temp(
+                kind, chunk, temp_offset + chunk_idx, output_files,
+                filter_seen=chunk_idx > last_completed,
+            )
+            self._record_chunk(kind, chunk_idx, rows, written)
+            processed += rows
+            peak_memory_mb = max(peak_memory_mb, self.last_chunk_memory_mb)
+            if sizer is not None:
+                sizer.observe(chunk.height, self.last_chunk_memory_mb)
+            
+            # Memory cleanup
+            del chunk
+            self.cleanup_memory()
+            peak_memory_mb = max(peak_memory_mb, self.get_memory_usage()["process_mb"])
+            
+            # Check memory limits every 5 chunks (the adaptive sizer reacts on every chunk)
+            if sizer is None and chunk_idx % 5 == 0:
+                if not self.check_memory_limits():
+                    self.logger.warning(f"Memory pressure detected at {kind} chunk {chunk_idx + 1}")
+                    # Force more aggressive cleanup
+                    gc.collect()
+                    if self.get_memory_usage()["process_mb"] > self.config.memory_limit_mb * 0.8:
+                        self.logger.warning("Memory still high after cleanup - consider reducing chunk size or enabling adaptive_chunk_size")
+        
+        return processed, peak_memory_mb, sizer
+    
+    def _run_chunks_parallel(self, pool: ProcessPoolExecutor, kind: str, reader: ParquetBatchReader,
+                             total_chunks: int, completed: Dict[int, int], temp_offset: int,
+                             output_files: Dict[str, Path]) -> Tuple[int, float, Optional[AdaptiveChunkSizer]]:
+        """
+        Feed chunks from reader to the worker pool.
+        
+        At most two chunks per worker are in flight. Before each submit the
+        combined RSS of this process and the workers is checked against
+        memory_limit_mb; above 80% the oldest chunk is awaited before more
+        work is queued. Chunks are recorded in the run manifest as they finish.
+        With adaptive chunk sizing that measurement, over the rows in flight,
+        also sizes the next chunk for max_in_flight chunks at once.
+        
+        Returns:
+            (rows processed, peak combined memory in MB, chunk size controller or None)
+        """
+        max_in_flight = self.config.workers * 2
+        memory_budget_mb = self.config.memory_limit_mb * 0.8
+        in_flight = deque()
+        processed = 0
+        peak_memory_mb = 0.0
+        sizer = self._chunk_sizer(self.get_pool_memory_mb())
+        chunks_label = "?" if sizer is not None else str(total_chunks)
+        
+        # Workers write the fact table themselves and hand dimension rows back,
+        # so the seen-key filter runs here over chunks in order
+        defer_dims = self.seen_keys is not None
+        last_completed = max(completed, default=-1)
+        
+        def finish_oldest() -> int:
+            chunk_idx, _, future = in_flight.popleft()
+            rows, written, dims = future.result()
+            if dims:
+                if chunk_idx > last_completed:
+                    dims = self.filter_seen_dimension_rows(dims)
+                written += self.write_chunk_tables(dims, temp_offset + chunk_idx, output_files)
+            self._record_chunk(kind, chunk_idx, rows, written)
+            return rows
+        
+        for chunk_idx, _, chunk in self._pending_chunks(reader, completed, sizer):
+            throttled = False
+            observed = False
+            while in_flight:
+                memory_mb = self.get_pool_memory_mb()
+                peak_memory_mb = max(peak_memory_mb, memory_mb)
+                if sizer is not None and not observed:
+                    sizer.observe(sum(rows for _, rows, _ in in_flight), memory_mb, concurrency=max_in_flight)
+                    observed = True
+                if len(in_flight) < max_in_flight and memory_mb <= memory_budget_mb:
+                    break
+                if memory_mb > memory_budget_mb and not throttled:
+                    self.logger.warning(
+                        f"Memory budget reached ({memory_mb:.1f}MB / {self.config.memory_limit_mb}MB across workers) "
+                        f"- holding {kind} chunk {chunk_idx + 1} until in-flight chunks finish"
+                    )
+                    throttled = True
+                processed += finish_oldest()
+            
+            self.logger.info(f"Submitting {kind} chunk {chunk_idx + 1}/{chunks_label} ({chunk.height:,} rows)")
+            future = pool.submit(_process_chunk_in_worker, kind, chunk, temp_offset + chunk_idx,
+                                 output_files, defer_dims)
+            in_flight.append((chunk_idx, chunk.height, future))
+            del chunk
+        
+        while in_flight:
+            peak_memory_mb = max(peak_memory_mb, self.get_pool_memory_mb())
+            processed += finish_oldest()
+        
+        return processed, peak_memory_mb, sizer
+    
+    def _run_key(self, payer: str, rates_file: Path, providers_file: Path) -> Dict[str, Any]:
+        """Everything that determines the temp chunk outputs of a run"""
+        config = self.config
+        return {
+            "payer": payer,
+            "state": config.state,
+            "payer_slug_override": config.payer_slug_override,
+            "chunk_size": config.chunk_size,
+            "adaptive_chunk_size": config.adaptive_chunk_size,
+            # Adaptive chunk boundaries follow these settings
+            "adaptive": {
+                "min_chunk_size": config.min_chunk_size,
+                "max_chunk_size": config.max_chunk_size,
+                "memory_target_fraction": config.memory_target_fraction,
+                "memory_limit_mb": config.memory_limit_mb,
+            } if config.adaptive_chunk_size else None,
+            # Column dtypes of the fact temp files and rows of the dimension temp files
+            "categorical_columns": config.categorical_columns,
+            "filter_seen_keys": config.filter_seen_keys,
+            "inputs": {
+                "rates": parquet_fingerprint(rates_file),
+                "providers": parquet_fingerprint(providers_file),
+            },
+        }
+    
+    def _discard_unrecorded_temp_files(self, output_files: Dict[str, Path]) -> None:
+        """Remove temp files that no recorded chunk owns (partial writes of an interrupted chunk)"""
+        recorded = {str(p) for p in self.manifest.recorded_outputs()}
+        temp_dirs = {output_path.parent / "temp_chunks" for output_path in output_files.values()}
+        for temp_dir in temp_dirs:
+            if not temp_dir.exists():
+                continue
+            for path in temp_dir.iterdir():
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)  # Stale merge spill directory
+                elif str(path) not in recorded:
+                    path.unlink(missing_ok=True)
+    
     def run_pipeline(self, payer: str) -> Dict[str, Any]:
         """Run the complete ETL1 pipeline"""
         start_time = time.time()
@@ -761,137 +1104,157 @@ class ScalableETL1:
         rates_file, providers_file = self.config.get_input_files(payer)
         output_files = self.config.get_output_files()
         
-        # Clean up any existing temp files and directories
-        self.logger.info("Cleaning up any existing temporary files...")
-        for output_path in output_files.values():
-            self.cleanup_temp_files(output_path)
-            # Clean up temp chunks directory
-            temp_dir = output_path.parent / "temp_chunks"
-            if temp_dir.exists():
-                import shutil
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                self.logger.info(f"Cleaned up temp directory: {temp_dir}")
-        
-        # Force cleanup of existing files if requested
-        if hasattr(self.config, 'force_cleanup') and self.config.force_cleanup:
-            self.logger.info("Force cleanup requested - removing existing output files...")
-            for output_path in output_files.values():
-                self.force_cleanup_existing_file(output_path)
-        
         # Verify input files exist
         if not rates_file.exists():
             raise FileNotFoundError(f"Rates file not found: {rates_file}")
         if not providers_file.exists():
             raise FileNotFoundError(f"Providers file not found: {providers_file}")
         
-        # Get total row counts for progress tracking
-        rates_total = pl.scan_parquet(rates_file).select(pl.len()).collect().item()
-        providers_total = pl.scan_parquet(providers_file).select(pl.len()).collect().item()
+        # Decide whether a previous run with the same inputs can be resumed
+        run_key = self._run_key(payer, rates_file, providers_file)
+        run_mode = "fresh"
+        if self.config.resume:
+            self.manifest = RunManifest(self.config.data_root / self.config.manifest_file)
+            if self.manifest.matches(run_key) and not self.config.force_cleanup:
+                status = self.manifest.status
+                if status == STATUS_COMPLETE and self.manifest.outputs_intact():
+                    run_mode = "up_to_date"
+                elif status == STATUS_MERGING:
+                    run_mode = "merge_only"
+                elif status == STATUS_PROCESSING:
+                    run_mode = "resume"
+                    self.manifest.drop_incomplete_chunks()
+                    if self.config.adaptive_chunk_size:
+                        # Adaptive chunk boundaries after a gap can't be reproduced
+                        for phase in ("rates", "providers"):
+                            self.manifest.truncate_chunks(phase)
+                    self._discard_unrecorded_temp_files(output_files)
+        
+        if run_mode == "up_to_date":
+            self.logger.info("Inputs unchanged since the last completed run - outputs are up to date")
+        elif run_mode == "merge_only":
+            self.logger.info("All chunks completed in a previous run - skipping straight to the merge")
+        elif run_mode == "resume":
+            self.logger.info("Resuming previous run from its manifest")
+        else:
+            # Clean up any existing temp files and directories
+            self.logger.info("Cleaning up any existing temporary files...")
+            for output_path in output_files.values():
+                self.cleanup_temp_files(output_path)
+                # Clean up temp chunks directory
+                temp_dir = output_path.parent / "temp_chunks"
+                if temp_dir.exists():
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    self.logger.info(f"Cleaned up temp directory: {temp_dir}")
+            
+            # Force cleanup of existing files if requested
+            if hasattr(self.config, 'force_cleanup') and self.config.force_cleanup:
+                self.logger.info("Force cleanup requested - removing existing output files...")
+                for output_path in output_files.values():
+                    self.force_cleanup_existing_file(output_path)
+            
+            if self.manifest is not None:
+                self.manifest.start(run_key)
+        
+        # Open single-pass chunk readers (row counts come from the Parquet footers)
+        chunk_size = self.config.chunk_size
+        rates_reader = ParquetBatchReader(rates_file, chunk_size)
+        providers_reader = ParquetBatchReader(providers_file, chunk_size)
+        rates_total = rates_reader.num_rows
+        providers_total = providers_reader.num_rows
         
         self.logger.info(f"Processing {rates_total:,} rates records and {providers_total:,} provider records")
         
         # Process in chunks
-        chunk_size = self.config.chunk_size
-        rates_chunks = (rates_total + chunk_size - 1) // chunk_size
-        providers_chunks = (providers_total + chunk_size - 1) // chunk_size
+        rates_chunks = rates_reader.num_chunks
+        providers_chunks = providers_reader.num_chunks
+        
+        if self.config.adaptive_chunk_size:
+            self.logger.info(f"Processing with adaptive chunk sizes starting at {chunk_size:,} rows "
+                             f"(target {self.config.memory_target_fraction:.0%} of {self.config.memory_limit_mb}MB)")
+        else:
+            self.logger.info(f"Processing in {rates_chunks} rates chunks and {providers_chunks} provider chunks of {chunk_size:,} rows each")
         
-        self.logger.info(f"Processing in {rates_chunks} rates chunks and {providers_chunks} provider chunks of {chunk_size:,} rows each")
+        # Chunks already completed by a previous run of the same inputs
+        if run_mode in ("resume", "merge_only", "up_to_date"):
+            rates_done = self.manifest.completed_chunks("rates")
+            providers_done = self.manifest.completed_chunks("providers")
+        else:
+            rates_done, providers_done = {}, {}
         
         # Initialize progress tracking
-        processed_rates = 0
-        processed_providers = 0
-        
-        # Process rates data
-        self.logger.info("Processing rates data...")
-        for chunk_idx in range(rates_chunks):
-            chunk_start = chunk_idx * chunk_size
-            chunk_end = min(chunk_start + chunk_size, rates_total)
-            
-            self.logger.info(f"Processing rates chunk {chunk_idx + 1}/{rates_chunks} (rows {chunk_start:,}-{chunk_end:,})")
-            
-            # Load chunk
-            rates_chunk = pl.scan_parquet(rates_file).slice(chunk_start, chunk_size).collect()
-            if rates_chunk.is_empty():
-                break
-            
-            # Process chunk
-            rates_chunk = self.process_rates_chunk(rates_chunk)
-            
-            # Process dimensions and fact table
-            dims = self.process_dimensions(rates_chunk, pl.DataFrame())  # Empty providers for rates-only dims
-            fact_chunk = self.process_fact_table(rates_chunk)
-            
-            # Write dimensions to temp files
-            for dim_name, dim_data in dims.items():
-                if not dim_data.is_empty():
-                    output_path = output_files[dim_name]
-                    self.write_chunk_to_temp(dim_data, output_path, dim_name, chunk_idx)
-            
-            # Write fact table to temp file
-            if not fact_chunk.is_empty():
-                self.write_chunk_to_temp(fact_chunk, output_files["fact_rate"], "fact_rate", chunk_idx)
-            
-            processed_rates += rates_chunk.height
-            
-            # Memory cleanup
-            del rates_chunk, dims, fact_chunk
-            self.cleanup_memory()
-            
-            # Check memory limits every 5 chunks (more frequent)
-            if chunk_idx % 5 == 0:
-                if not self.check_memory_limits():
-                    self.logger.warning(f"Memory pressure detected at chunk {chunk_idx + 1}")
-                    # Force more aggressive cleanup
-                    gc.collect()
-                    # If memory is still high, reduce chunk size for next iteration
-                    if self.get_memory_usage()["process_mb"] > self.config.memory_limit_mb * 0.8:
-                        self.logger.warning("Memory still high after cleanup - consider reducing chunk size")
+        processed_rates = sum(rates_done.values())
+        processed_providers = sum(providers_done.values())
+        peak_memory_mb = 0.0
+        
+        # Dimension rows already emitted by an earlier chunk are not written again
+        if self.config.filter_seen_keys and run_mode in ("fresh", "resume"):
+            self.seen_keys = DimensionKeyFilter(
+                {name: self._get_dimension_keys(name) for name in output_files if name != "fact_rate"},
+                spill_dir=self.config.data_root / "seen_keys_spill",
+                max_memory_mb=self.config.seen_keys_memory_mb,
+            )
         
-        # Process providers data
-        self.logger.info("Processing providers data...")
-        for chunk_idx in range(providers_chunks):
-            chunk_start = chunk_idx * chunk_size
-            chunk_end = min(chunk_start + chunk_size, providers_total)
-            
-            self.logger.info(f"Processing providers chunk {chunk_idx + 1}/{providers_chunks} (rows {chunk_start:,}-{chunk_end:,})")
-            
-            # Load chunk
-            providers_chunk = pl.scan_parquet(providers_file).slice(chunk_start, chunk_size).collect()
-            if providers_chunk.is_empty():
-                break
-            
-            # Process chunk
-            providers_chunk = self.process_providers_chunk(providers_chunk)
-            
-            # Process provider-specific dimensions
-            prov_dims = self.process_provider_dimensions(providers_chunk)
-            
-            # Write provider dimensions to temp files
-            for dim_name in ["dim_provider_group", "xref_pg_npi", "xref_pg_tin"]:
-                if dim_name in prov_dims and not prov_dims[dim_name].is_empty():
-                    output_path = output_files[dim_name]
-                    self.write_chunk_to_temp(prov_dims[dim_name], output_path, dim_name, chunk_idx)
-            
-            processed_providers += providers_chunk.height
-            
-            # Memory cleanup
-            del providers_chunk, prov_dims
-            self.cleanup_memory()
+        # Provider chunks are numbered after the rates chunks so their temp files
+        # never overwrite rates temp files of the same table, and win on merge.
+        # Adaptive runs don't know the rates chunk count up front, but it can't
+        # exceed the rates row count.
+        providers_offset = max(1, rates_total) if self.config.adaptive_chunk_size else rates_chunks
+        sizers = {}
+        
+        if run_mode in ("merge_only", "up_to_date"):
+            pass
+        elif self.config.workers > 1:
+            # Parallel mode: chunks are read here and processed by a process pool
+            self.logger.info(f"Processing chunks with {self.config.workers} worker processes")
+            # The pool starts its workers up front, so their idle memory is part of the sizer's baseline
+            with self._chunk_pool() as pool:
+                self.logger.info("Processing rates data...")
+                rows, peak_rates, sizers["rates"] = self._run_chunks_parallel(
+                    pool, "rates", rates_reader, rates_chunks, rates_done, 0, output_files
+                )
+                processed_rates += rows
+                self.logger.info("Processing providers data...")
+                rows, peak_providers, sizers["providers"] = self._run_chunks_parallel(
+                    pool, "providers", providers_reader, providers_chunks, providers_done, providers_offset, output_files
+                )
+                processed_providers += rows
+            peak_memory_mb = max(peak_rates, peak_providers)
+        else:
+            # Process rates data
+            self.logger.info("Processing rates data...")
+            rows, peak_rates, sizers["rates"] = self._run_chunks_serial(
+                "rates", rates_reader, rates_chunks, rates_done, 0, output_files
+            )
+            processed_rates += rows
             
-            # Check memory limits every 5 chunks (more frequent)
-            if chunk_idx % 5 == 0:
-                if not self.check_memory_limits():
-                    self.logger.warning(f"Memory pressure detected at provider chunk {chunk_idx + 1}")
-                    gc.collect()
-                    # If memory is still high, reduce chunk size for next iteration
-                    if self.get_memory_usage()["process_mb"] > self.config.memory_limit_mb * 0.8:
-                        self.logger.warning("Memory still high after cleanup - consider reducing chunk size")
+            # Process providers data
+            self.logger.info("Processing providers data...")
+            rows, peak_providers, sizers["providers"] = self._run_chunks_serial(
+                "providers", providers_reader, providers_chunks, providers_done, providers_offset, output_files
+            )
+            processed_providers += rows
+            peak_memory_mb = max(peak_rates, peak_providers)
+        
+        rates_reader.close()
+        providers_reader.close()
+        
+        seen_key_stats = {}
+        if self.seen_keys is not None:
+            seen_key_stats = self.seen_keys.stats()
+            self.seen_keys.close()
+            self.seen_keys = None
+            shutil.rmtree(self.config.data_root / "seen_keys_spill", ignore_errors=True)
         
         # Final merge step - combine all temp files into final outputs
-        self.logger.info("Merging all temporary files into final outputs...")
-        for table_name, output_path in output_files.items():
-            keys = self._get_dimension_keys(table_name)
-            self.merge_temp_files(output_path, table_name, keys)
+        merge_stats = {}
+        if run_mode != "up_to_date":
+            if self.manifest is not None:
+                self.manifest.set_status(STATUS_MERGING)
+            self.logger.info("Merging all temporary files into final outputs...")
+            merge_stats = self.merge_all_temp_files(output_files)
+            if self.manifest is not None:
+                self.manifest.set_status(STATUS_COMPLETE)
         
         # Final summary
         end_time = time.time()
@@ -904,6 +1267,13 @@ class ScalableETL1:
             "processed_rates": processed_rates,
             "processed_providers": processed_providers,
             "chunk_size": chunk_size,
+            "chunk_sizing": {kind: sizer.summary() for kind, sizer in sizers.items() if sizer is not None},
+            "workers": self.config.workers,
+            "peak_memory_mb": round(peak_memory_mb, 1),
+            "run_mode": run_mode,
+            "resumed_chunks": {"rates": len(rates_done), "providers": len(providers_done)},
+            "seen_key_filter": seen_key_stats,
+            "merge_stats": merge_stats,
             "output_files": {k: str(v) for k, v in output_files.items()}
         }
         
@@ -921,10 +1291,58 @@ class ScalableETL1:
             "dim_pos_set": ["pos_set_id"],
             "xref_pg_npi": ["pg_uid", "npi"],
             "xref_pg_tin": ["pg_uid", "tin_value"],
+            "fact_rate": ["fact_uid"],
         }
         return key_mapping.get(dim_name, [])
 
 
+# Per-process pipeline instance used by parallel chunk workers
+_worker_etl: Optional[ScalableETL1] = None
+
+
+@contextmanager
+def _spawn_environment(**values: str) -> Iterator[None]:
+    """Set environment variables that are not set yet for processes spawned inside the block"""
+    added = [name for name in values if name not in os.environ]
+    os.environ.update({name: values[name] for name in added})
+    try:
+        yield
+    finally:
+        for name in added:
+            os.environ.pop(name, None)
+
+
+def _init_chunk_worker(config: ETL1Config) -> None:
+    """Process pool initializer: build one pipeline instance per worker"""
+    global _worker_etl
+    config._setup_logging()
+    _worker_etl = ScalableETL1(config)
+
+
+def _worker_ready(_: int) -> int:
+    """No-op task used to start every worker of the pool"""
+    return os.getpid()
+
+
+def _process_chunk_in_worker(kind: str, chunk: pl.DataFrame, temp_idx: int, output_files: Dict[str, Path],
+                             defer_dims: bool) -> Tuple[int, List[Path], Dict[str, pl.DataFrame]]:
+    """
+    Process one rates or providers chunk inside a worker and write its temp files.
+    
+    With defer_dims only the fact table is written here; the dimension rows are
+    returned so the parent can filter them against its seen-key sets.
+    """
+    rows, tables = _worker_etl.build_chunk_tables(kind, chunk)
+    del chunk
+    dims = {}
+    if defer_dims:
+        dims = {name: df for name, df in tables.items() if name != "fact_rate"}
+        tables = {name: df for name, df in tables.items() if name == "fact_rate"}
+    written = _worker_etl.write_chunk_tables(tables, temp_idx, output_files)
+    _worker_etl.cleanup_memory()
+    return rows, written, dims
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="Scalable ETL1 Pipeline")
@@ -932,9 +1350,13 @@ def main():
     parser.add_argument("--payer-slug", help="Payer slug override")
     parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size for processing (default: 1000)")
     parser.add_argument("--memory-limit", type=int, default=1024, help="Memory limit in MB (default: 1024)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for chunk processing (default: 1 = serial)")
+    parser.add_argument("--adaptive-chunks", action="store_true", help="Adjust the chunk size from measured memory use (starts at --chunk-size)")
+    parser.add_argument("--categorical", action="store_true", help="Write low-cardinality fact_rate columns as categoricals")
     parser.add_argument("--config", help="Path to YAML config file")
     parser.add_argument("--payer", required=True, help="Payer name (e.g., aetna, uhc)")
     parser.add_argument("--force-cleanup", action="store_true", help="Force cleanup of existing output files before processing")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the run manifest and reprocess all chunks")
     
     args = parser.parse_args()
     
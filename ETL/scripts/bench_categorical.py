@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Memory and file-size benchmark for the categorical schema mode.
+
+Loads fact_rate (by default the GA output of ETL1, data/gold/fact_rate.parquet)
+once with String columns and once with the low-cardinality columns read as
+categoricals, and reports:
+- in-memory size of the fact table
+- Parquet size when the table is written from each representation
+- in-memory size of the first enriched ETL3 chunk, when the dims/xrefs next to
+  the fact table are available
+
+Without a fact file a synthetic GA-shaped one is generated.
+
+Usage:
+    python ETL/scripts/bench_categorical.py
+    python ETL/scripts/bench_categorical.py --fact data/gold/fact_rate.parquet --chunk-size 100000
+    python ETL/scripts/bench_categorical.py --rows 2000000
+"""
+
+import sys
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from categorical_schema import enable_global_categories, encode_categoricals, decode_categoricals, present_columns
+from parquet_batches import ParquetBatchReader
+
+
+def write_synthetic_fact(path: Path, rows: int, seed: int = 5) -> None:
+    """Write a GA-shaped fact_rate file."""
+    rng = np.random.default_rng(seed)
+
+    def pick(values, n=rows):
+        values = np.array(values)
+        return values[rng.integers(0, len(values), n)]
+
+    pl.DataFrame({
+        "fact_uid": [f"{v:032x}" for v in rng.integers(0, 2**62, rows)],
+        "state": ["GA"] * rows,
+        "year_month": pick(["2025-08", "2025-07"]),
+        "payer_slug": pick(["aetna", "uhc"]),
+        "billing_class": pick(["professional", "institutional"]),
+        "code_type": pick(["CPT", "HCPCS", "RC", "MS-DRG"]),
+        "code": pick([str(c) for c in range(99201, 99499)]),
+        "pg_uid": [f"{v:032x}" for v in rng.integers(0, 50_000, rows)],
+        "pos_set_id": pick([f"{v:032x}" for v in range(40)]),
+        "negotiated_type": pick(["negotiated", "fee schedule", "percentage"]),
+        "negotiation_arrangement": pick(["ffs", "bundle", "capitation"]),
+        "negotiated_rate": rng.random(rows) * 2000,
+        "expiration_date": ["9999-12-31"] * rows,
+        "provider_group_id_raw": rng.integers(0, 50_000, rows),
+        "reporting_entity_name": pick(["Aetna Life Insurance Company", "UnitedHealthcare of Georgia, Inc."]),
+    }).write_parquet(path, compression="zstd")
+
+
+def mb(n_bytes: float) -> str:
+    return f"{n_bytes / (1024 * 1024):,.1f}MB"
+
+
+def report(label: str, plain: float, categorical: float) -> None:
+    saved = (1 - categorical / plain) * 100 if plain else 0.0
+    print(f"{label:<28} {mb(plain):>12} {mb(categorical):>12} {saved:>8.1f}%")
+
+
+def enriched_chunk_sizes(fact_path: Path, chunk_size: int, read_dictionary) -> tuple:
+    """In-memory size of the first enriched chunk, String vs categorical (None without dims)."""
+    from ETL.ETL_3 import ETL3Config, _enrich_fact_table
+    logging.getLogger("ETL.ETL_3").setLevel(logging.ERROR)
+
+    config = ETL3Config()
+    data_root = fact_path.parent.parent
+    dim_paths = {name: data_root / "dims" / path.name for name, path in config.DIM_PATHS.items()}
+    xref_paths = {name: data_root / "xrefs" / path.name for name, path in config.XREF_PATHS.items()}
+    dims = {name: pl.read_parquet(p) for name, p in dim_paths.items() if p.exists()}
+    xrefs = {name: pl.read_parquet(p) for name, p in xref_paths.items() if p.exists()}
+    if not dims:
+        return None
+
+    cat_dims = {name: encode_categoricals(df) for name, df in dims.items()}
+    with ParquetBatchReader(fact_path, chunk_size) as reader:
+        plain = _enrich_fact_table(decode_categoricals(next(iter(reader))), dims, xrefs)
+    with ParquetBatchReader(fact_path, chunk_size, read_dictionary=read_dictionary) as reader:
+        categorical = _enrich_fact_table(next(iter(reader)), cat_dims, xrefs)
+    return plain.height, plain.estimated_size(), categorical.estimated_size()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark categorical low-cardinality columns")
+    parser.add_argument("--fact", type=Path, default=project_root / "data" / "gold" / "fact_rate.parquet",
+                        help="fact_rate.parquet to measure (default: data/gold/fact_rate.parquet)")
+    parser.add_argument("--rows", type=int, default=1_000_000,
+                        help="Rows of synthetic fact data when --fact does not exist (default: 1000000)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows in the enriched chunk (default: 100000)")
+    args = parser.parse_args()
+
+    enable_global_categories()
+    with tempfile.TemporaryDirectory() as tmp:
+        fact_path = args.fact
+        if not fact_path.exists():
+            fact_path = Path(tmp) / "fact_rate.parquet"
+            print(f"📝 {args.fact} not found - writing {args.rows:,} synthetic GA fact rows")
+            write_synthetic_fact(fact_path, args.rows)
+
+        read_dictionary = present_columns(pl.read_parquet_schema(fact_path))
+        plain = decode_categoricals(pl.read_parquet(fact_path))
+        with ParquetBatchReader(fact_path, max(1, plain.height), read_dictionary=read_dictionary) as reader:
+            categorical = pl.concat(list(reader))
+
+        plain_file = Path(tmp) / "plain.parquet"
+        categorical_file = Path(tmp) / "categorical.parquet"
+        plain.write_parquet(plain_file, compression="zstd")
+        categorical.write_parquet(categorical_file, compression="zstd")
+
+        print(f"\n🔬 {fact_path} ({plain.height:,} rows; categorical: {', '.join(read_dictionary)})")
+        print(f"{'Measure':<28} {'String':>12} {'Categorical':>12} {'Saved':>9}")
+        print("-" * 64)
+        report("fact_rate in memory", plain.estimated_size(), categorical.estimated_size())
+        encoded = plain.select(read_dictionary)
+        report("  encoded columns only", encoded.estimated_size(), categorical.select(read_dictionary).estimated_size())
+        report("Parquet file (zstd)", plain_file.stat().st_size, categorical_file.stat().st_size)
+
+        enriched = enriched_chunk_sizes(fact_path, args.chunk_size, read_dictionary)
+        if enriched is None:
+            print("(no dims next to the fact table - enriched chunk skipped)")
+        else:
+            rows, plain_size, categorical_size = enriched
+            report(f"enriched chunk ({rows:,} rows)", plain_size, categorical_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ETL3 enrichment from the precomputed dimension bundle.
+
+Writes synthetic dimension and xref Parquet files shaped like ETL1/NPPES
+output, then compares:
+
+- cold start: reading every dim with pl.read_parquet (per-dim path) vs
+  building the bundle (first run) vs memory-mapping it (later runs)
+- per-chunk enrichment: the per-dim joins of _enrich_fact_table vs one join
+  per bundle table, checking both give the same rows
+
+Usage:
+    python ETL/scripts/bench_dimension_bundle.py
+    python ETL/scripts/bench_dimension_bundle.py --provider-groups 50000 --npis 500000 --chunk-rows 5000
+"""
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from dimension_bundle import DimensionBundle
+from ETL.ETL_3 import _enrich_fact_table
+
+
+def make_sources(root: Path, codes: int, provider_groups: int, npis: int, seed: int = 11):
+    """Write synthetic dims/xrefs; return (dim_paths, xref_paths, fact columns, chunk maker)."""
+    rng = np.random.default_rng(seed)
+    code_values = [str(70000 + i) for i in range(codes)]
+    pg_uids = [f"{v:032x}" for v in rng.integers(0, 2**62, provider_groups)]
+    npi_values = np.arange(1_000_000_000, 1_000_000_000 + npis)
+    members = provider_groups * 4
+
+    tables = {
+        'dim_code': pl.DataFrame({
+            'code_type': ['CPT'] * codes,
+            'code': code_values,
+            'code_description': [f"Procedure {c}" for c in code_values],
+            'code_name': [f"P{c}" for c in code_values],
+        }),
+        'dim_code_cat': pl.DataFrame({
+            'proc_cd': code_values,
+            'proc_set': [f"set_{i % 8}" for i in range(codes)],
+            'proc_class': [f"class_{i % 24}" for i in range(codes)],
+            'proc_group': [f"group_{i % 60}" for i in range(codes)],
+        }),
+        'dim_payer': pl.DataFrame({'payer_slug': ['aetna'], 'reporting_entity_name': ['Aetna'], 'version': ['1.0']}),
+        'dim_provider_group': pl.DataFrame({
+            'pg_uid': pg_uids,
+            'payer_slug': ['aetna'] * provider_groups,
+            'provider_group_id_raw': [str(i) for i in range(provider_groups)],
+            'version': ['1.0'] * provider_groups,
+        }),
+        'dim_pos_set': pl.DataFrame({'pos_set_id': ['none', 'ps1'], 'pos_members': [[], ['11', '22']]}),
+        'dim_npi': pl.DataFrame({
+            'npi': npi_values,
+            'primary_taxonomy_code': [f"{i % 400:09d}X" for i in range(npis)],
+            'provider_name': [f"Provider {i}" for i in range(npis)],
+        }),
+        'dim_npi_address_geo': pl.DataFrame({
+            'npi': np.repeat(npi_values, 2),
+            'address_purpose': ['LOCATION', 'MAILING'] * npis,
+            'state': ['GA', 'FL'] * npis,
+            'latitude': rng.random(2 * npis) * 10 + 25,
+            'longitude': rng.random(2 * npis) * 10 - 90,
+            'county_name': ['Fulton', 'Dade'] * npis,
+            'county_fips': ['13121', '12086'] * npis,
+            'stat_area_name': [f"CBSA {i % 30}" for i in range(2 * npis)],
+            'stat_area_code': [f"{i % 30:05d}" for i in range(2 * npis)],
+            'matched_address': [f"{i} Main St" for i in range(2 * npis)],
+        }),
+        'xref_pg_member_npi': pl.DataFrame({
+            'pg_uid': pl.Series(pg_uids).gather(rng.integers(0, provider_groups, members)),
+            'npi': rng.choice(npi_values, members),
+        }).unique(),
+        'xref_pg_member_tin': pl.DataFrame({
+            'pg_uid': pg_uids,
+            'tin_type': ['ein'] * provider_groups,
+            'tin_value': [f"{i:09d}" for i in range(provider_groups)],
+        }),
+    }
+    dim_paths, xref_paths = {}, {}
+    for name, df in tables.items():
+        path = root / f"{name}.parquet"
+        df.write_parquet(path)
+        kind, key = name.split('_', 1)
+        (dim_paths if kind == 'dim' else xref_paths)[key] = path
+
+    def make_chunk(rows: int, chunk_seed: int) -> pl.DataFrame:
+        r = np.random.default_rng(chunk_seed)
+        return pl.DataFrame({
+            'fact_uid': [f"{v:032x}" for v in r.integers(0, 2**62, rows)],
+            'state': ['GA'] * rows,
+            'year_month': ['2025-08'] * rows,
+            'payer_slug': ['aetna'] * rows,
+            'billing_class': ['professional'] * rows,
+            'code_type': ['CPT'] * rows,
+            'code': pl.Series(code_values).gather(r.integers(0, codes, rows)),
+            # A chunk comes from a few files, so it sees a slice of the provider groups
+            'pg_uid': pl.Series(pg_uids).gather(r.integers(0, max(1, provider_groups // 50), rows)),
+            'pos_set_id': ['none'] * rows,
+            'negotiated_type': ['negotiated'] * rows,
+            'negotiation_arrangement': ['ffs'] * rows,
+            'negotiated_rate': r.random(rows) * 2000,
+            'expiration_date': ['9999-12-31'] * rows,
+            'provider_group_id_raw': ['0'] * rows,
+            'reporting_entity_name': ['Aetna'] * rows,
+        })
+
+    return dim_paths, xref_paths, make_chunk(1, 0).columns, make_chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL3 dimension bundle enrichment")
+    parser.add_argument("--codes", type=int, default=20_000, help="Distinct billing codes (default: 20000)")
+    parser.add_argument("--provider-groups", type=int, default=20_000, help="Provider groups (default: 20000)")
+    parser.add_argument("--npis", type=int, default=300_000, help="NPIs (default: 300000)")
+    parser.add_argument("--chunk-rows", type=int, default=2_000, help="Fact rows per chunk (default: 2000)")
+    parser.add_argument("--chunks", type=int, default=10, help="Chunks to enrich (default: 10)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        dim_paths, xref_paths, fact_columns, make_chunk = make_sources(root, args.codes, args.provider_groups, args.npis)
+        chunks = [make_chunk(args.chunk_rows, seed) for seed in range(1, args.chunks + 1)]
+
+        start = time.perf_counter()
+        dimensions = {name: pl.read_parquet(path) for name, path in dim_paths.items()}
+        xrefs = {name: pl.read_parquet(path) for name, path in xref_paths.items()}
+        read_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        DimensionBundle.load_or_build(root / "bundle", dim_paths, xref_paths, fact_columns)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bundle = DimensionBundle.load_or_build(root / "bundle", dim_paths, xref_paths, fact_columns)
+        warm_s = time.perf_counter() - start
+        assert not bundle.rebuilt
+
+        per_dim_s = bundle_s = 0.0
+        enriched_rows = 0
+        for chunk in chunks:
+            start = time.perf_counter()
+            expected = _enrich_fact_table(chunk, dimensions, xrefs)
+            per_dim_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = _enrich_fact_table(chunk, {}, {}, bundle=bundle)
+            bundle_s += time.perf_counter() - start
+
+            sort_cols = ['fact_uid', 'npi', 'tin_value', 'state_geo']
+            if not actual.sort(sort_cols).equals(expected.sort(sort_cols)):
+                raise AssertionError("Bundle enrichment differs from per-dim joins")
+            enriched_rows += actual.height
+
+        print(f"\n🔬 {args.chunks} chunks x {args.chunk_rows:,} fact rows -> {enriched_rows:,} enriched rows "
+              f"(outputs identical); bundle {bundle.stats()['provider_rows']:,} provider rows")
+        print(f"{'Step':<34} {'Seconds':>9}")
+        print("-" * 44)
+        print(f"{'cold start: read all dims':<34} {read_s:>9.2f}")
+        print(f"{'cold start: build bundle (once)':<34} {build_s:>9.2f}")
+        print(f"{'cold start: map current bundle':<34} {warm_s:>9.3f}")
+        print(f"{'enrich: per-dim joins':<34} {per_dim_s:>9.2f}")
+        print(f"{'enrich: bundle joins':<34} {bundle_s:>9.2f}")
+        print(f"\n⚡ Start-up: {read_s / warm_s:.0f}x faster, enrichment: {per_dim_s / bundle_s:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
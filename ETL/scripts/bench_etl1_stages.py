@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Stage-level ETL1 benchmark on synthetic MRF inputs.
+
+Generates rates/providers files at the requested scales (utils/synthetic_mrf.py)
+and runs the ETL1 chunk loop stage by stage, the same calls run_pipeline makes
+in serial mode:
+- read:        next chunk from ParquetBatchReader
+- derive:      process_rates_chunk / process_providers_chunk
+- dims:        process_dimensions / process_provider_dimensions
+- fact:        process_fact_table (rates only)
+- seen_filter: drop dimension rows earlier chunks already emitted
+- temp_write:  write_chunk_tables
+- merge:       merge_all_temp_files
+
+For every stage it reports rows/sec and the peak RSS seen while the stage was
+running (sampled in a background thread), and saves everything as JSON so
+runs can be compared with --baseline.
+
+Usage:
+    python ETL/scripts/bench_etl1_stages.py
+    python ETL/scripts/bench_etl1_stages.py --scales 100k 1m 10m --chunk-size 100000 --output bench_etl1.json
+    python ETL/scripts/bench_etl1_stages.py --scales 1m --baseline bench_etl1.json
+"""
+
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import duckdb
+import psutil
+import polars as pl
+import pyarrow
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from synthetic_mrf import SCALES, generate_mrf_files
+from parquet_batches import ParquetBatchReader
+from seen_keys import DimensionKeyFilter
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+
+STAGES = ["read", "derive", "dims", "fact", "seen_filter", "temp_write", "merge"]
+
+
+class StageMeter:
+    """Accumulates wall time, rows and peak RSS per named stage."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.stats = {name: {"seconds": 0.0, "rows": 0, "calls": 0, "peak_rss_mb": 0.0} for name in STAGES}
+        self.peak_rss_mb = 0.0
+        self._current: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def _sample(self) -> None:
+        rss_mb = self.process.memory_info().rss / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        current = self._current
+        if current is not None:
+            stats = self.stats[current]
+            stats["peak_rss_mb"] = max(stats["peak_rss_mb"], rss_mb)
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """Time the enclosed block as one call of stage name covering rows input rows."""
+        self._current = name
+        self._sample()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.stats[name]
+            stats["seconds"] += time.perf_counter() - start
+            stats["rows"] += rows
+            stats["calls"] += 1
+            self._sample()
+            self._current = None
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for name, stats in self.stats.items():
+            if stats["calls"] == 0:
+                continue
+            seconds = stats["seconds"]
+            results[name] = {
+                "seconds": round(seconds, 4),
+                "rows": stats["rows"],
+                "calls": stats["calls"],
+                "rows_per_sec": round(stats["rows"] / seconds, 1) if seconds > 0 else None,
+                "peak_rss_mb": round(stats["peak_rss_mb"], 1),
+            }
+        return results
+
+
+def _inputs_match(paths: Dict[str, Path], rates_rows: int, providers_rows: int) -> bool:
+    """True if previously generated inputs have the requested row counts."""
+    try:
+        return (pq.ParquetFile(paths["rates"]).metadata.num_rows == rates_rows
+                and pq.ParquetFile(paths["providers"]).metadata.num_rows == providers_rows)
+    except (OSError, pyarrow.ArrowInvalid):
+        return False
+
+
+def run_stages(etl: ScalableETL1, rates_file: Path, providers_file: Path, meter: StageMeter) -> Dict[str, int]:
+    """Run the serial ETL1 chunk loop and merge, timing each stage."""
+    config = etl.config
+    output_files = config.get_output_files()
+    for output_path in output_files.values():
+        shutil.rmtree(output_path.parent / "temp_chunks", ignore_errors=True)
+    if config.filter_seen_keys:
+        etl.seen_keys = DimensionKeyFilter(
+            {name: etl._get_dimension_keys(name) for name in output_files if name != "fact_rate"},
+            spill_dir=config.data_root / "seen_keys_spill",
+            max_memory_mb=config.seen_keys_memory_mb,
+        )
+
+    temp_rows = 0
+    temp_idx = 0
+    counts = {"rates": 0, "providers": 0}
+    for kind, path in (("rates", rates_file), ("providers", providers_file)):
+        with ParquetBatchReader(path, config.chunk_size) as reader:
+            chunks = iter(reader)
+            while True:
+                with meter.stage("read"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                rows = chunk.height
+                meter.stats["read"]["rows"] += rows
+                counts[kind] += rows
+
+                if kind == "rates":
+                    with meter.stage("derive", rows):
+                        chunk = etl.process_rates_chunk(chunk)
+                    with meter.stage("dims", rows):
+                        tables = etl.process_dimensions(chunk, pl.DataFrame())
+                    with meter.stage("fact", rows):
+                        tables["fact_rate"] = etl.process_fact_table(chunk)
+                else:
+                    with meter.stage("derive", rows):
+                        chunk = etl.process_providers_chunk(chunk)
+                    with meter.stage("dims", rows):
+                        prov_dims = etl.process_provider_dimensions(chunk)
+                        tables = {name: prov_dims[name] for name in ["dim_provider_group", "xref_pg_npi", "xref_pg_tin"]}
+                del chunk
+
+                if etl.seen_keys is not None:
+                    with meter.stage("seen_filter", rows):
+                        tables = etl.filter_seen_dimension_rows(tables)
+                table_rows = sum(df.height for df in tables.values())
+                with meter.stage("temp_write", table_rows):
+                    etl.write_chunk_tables(tables, temp_idx, output_files)
+                temp_rows += table_rows
+                temp_idx += 1
+                del tables
+
+    if etl.seen_keys is not None:
+        etl.seen_keys.close()
+        etl.seen_keys = None
+        shutil.rmtree(config.data_root / "seen_keys_spill", ignore_errors=True)
+
+    with meter.stage("merge", temp_rows):
+        etl.merge_all_temp_files(output_files)
+
+    counts["temp_rows"] = temp_rows
+    return counts
+
+
+def run_benchmark(data_root: Path, rates_rows: int, chunk_size: int, providers_rows: Optional[int] = None,
+                  seed: int = 42, memory_limit_mb: int = 4096, label: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generate (or reuse) synthetic inputs under data_root/input and benchmark every ETL1 stage.
+
+    Returns:
+        JSON-serializable result for one scale
+    """
+    data_root = Path(data_root)
+    providers_rows = providers_rows if providers_rows is not None else max(1, rates_rows // 4)
+    input_dir = data_root / "input"
+    paths = {
+        "rates": input_dir / "202508_aetna_ga_rates.parquet",
+        "providers": input_dir / "202508_aetna_ga_providers.parquet",
+    }
+
+    generate_seconds = 0.0
+    if not _inputs_match(paths, rates_rows, providers_rows):
+        start = time.perf_counter()
+        paths = generate_mrf_files(input_dir, rates_rows, providers_rows, seed=seed)
+        generate_seconds = time.perf_counter() - start
+
+    config = ETL1Config(data_root=data_root, log_file=None, log_level="WARNING")
+    config.chunk_size = chunk_size
+    config.memory_limit_mb = memory_limit_mb
+
+    meter = StageMeter()
+    start = time.perf_counter()
+    try:
+        with ScalableETL1(config) as etl:
+            counts = run_stages(etl, paths["rates"], paths["providers"], meter)
+    finally:
+        meter.close()
+    total_seconds = time.perf_counter() - start
+
+    outputs = {name: pq.ParquetFile(path).metadata.num_rows
+               for name, path in config.get_output_files().items() if path.exists()}
+    return {
+        "label": label or f"{rates_rows:,} rows",
+        "rates_rows": counts["rates"],
+        "providers_rows": counts["providers"],
+        "temp_rows": counts["temp_rows"],
+        "chunk_size": chunk_size,
+        "generate_seconds": round(generate_seconds, 2),
+        "total_seconds": round(total_seconds, 3),
+        "rows_per_sec": round((counts["rates"] + counts["providers"]) / total_seconds, 1),
+        "peak_rss_mb": round(meter.peak_rss_mb, 1),
+        "stages": meter.results(),
+        "output_rows": outputs,
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": psutil.cpu_count(),
+        "memory_gb": round(psutil.virtual_memory().total / 1024 ** 3, 1),
+        "polars": pl.__version__,
+        "pyarrow": pyarrow.__version__,
+        "duckdb": duckdb.__version__,
+    }
+
+
+def print_run(run: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    print(f"\n🔬 {run['label']}: {run['rates_rows']:,} rates + {run['providers_rows']:,} providers rows, "
+          f"chunks of {run['chunk_size']:,}")
+    header = f"{'Stage':<12} {'Seconds':>9} {'Rows/s':>13} {'Peak RSS':>10}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in run["stages"].items():
+        rate = stats["rows_per_sec"]
+        line = f"{name:<12} {stats['seconds']:>9.2f} {rate or 0:>13,.0f} {stats['peak_rss_mb']:>8.0f}MB"
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base and base.get("rows_per_sec") and rate:
+            line += f" {rate / base['rows_per_sec']:>7.2f}x"
+        print(line)
+    print(f"{'total':<12} {run['total_seconds']:>9.2f} {run['rows_per_sec']:>13,.0f} {run['peak_rss_mb']:>8.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL1 stages on synthetic MRF data")
+    parser.add_argument("--scales", nargs="+", default=["100k"],
+                        help=f"Scales to run: {', '.join(SCALES)} or a row count (default: 100k)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    parser.add_argument("--memory-limit", type=int, default=4096, help="ETL1 memory_limit_mb, used by the merge (default: 4096)")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed (default: 42)")
+    parser.add_argument("--data-root", type=Path,
+                        help="Keep inputs/outputs here (one subdirectory per scale) instead of a temp dir; "
+                             "inputs of the same size are reused")
+    parser.add_argument("--output", type=Path, default=Path("bench_etl1_stages.json"),
+                        help="JSON results file (default: bench_etl1_stages.json)")
+    parser.add_argument("--baseline", type=Path, help="Earlier results JSON to compare rows/sec against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    baseline_runs = {}
+    if args.baseline:
+        baseline_runs = {run["label"]: run for run in json.loads(args.baseline.read_text())["runs"]}
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.data_root or Path(tmp)
+        for scale in args.scales:
+            rows = SCALES.get(scale.lower()) or int(scale)
+            print(f"📝 Running {scale} ({rows:,} rates rows)...")
+            run = run_benchmark(root / scale.lower(), rows, args.chunk_size, seed=args.seed,
+                                memory_limit_mb=args.memory_limit, label=scale.lower())
+            results["runs"].append(run)
+            print_run(run, baseline_runs.get(run["label"]))
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
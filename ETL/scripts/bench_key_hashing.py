@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for ETL1 surrogate key hashing.
+
+Compares the per-row map_elements path (ScalableETL1.md5 /
+pos_set_id_from_members / fact_uid_from_struct) with the vectorized
+key_hashing module on a synthetic rates chunk.
+
+Usage:
+    python ETL/scripts/bench_key_hashing.py
+    python ETL/scripts/bench_key_hashing.py --rows 1000000 --repeat 3
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+from key_hashing import with_md5, pg_uid_key, pos_set_key, fact_uid
+
+
+def make_rates_chunk(rows: int, seed: int = 42) -> pl.DataFrame:
+    """Build a derived rates chunk (post process_rates_chunk columns) for hashing."""
+    rng = random.Random(seed)
+    pos_sets = [[], ["11"], ["11", "22"], ["02", "10", "11"]]
+    return pl.DataFrame({
+        "state": ["GA"] * rows,
+        "year_month": ["2025-08"] * rows,
+        "payer_slug": ["aetna"] * rows,
+        "version": ["1.0.0"] * rows,
+        "billing_class": [rng.choice(["professional", "institutional"]) for _ in range(rows)],
+        "code_type": [rng.choice(["CPT", "HCPCS"]) for _ in range(rows)],
+        "code": [str(rng.randint(10000, 99999)) for _ in range(rows)],
+        "provider_reference_id": [rng.randint(1, 50000) for _ in range(rows)],
+        "provider_group_id_raw": [rng.randint(1, 50000) for _ in range(rows)],
+        "pos_members": [rng.choice(pos_sets) for _ in range(rows)],
+        "negotiated_type": ["negotiated"] * rows,
+        "negotiation_arrangement": ["ffs"] * rows,
+        "negotiated_rate": [round(rng.random() * 2000, 2) for _ in range(rows)],
+        "expiration_date": ["9999-12-31"] * rows,
+    }, schema_overrides={"pos_members": pl.List(pl.Utf8)})
+
+
+def per_row_keys(etl: ScalableETL1, chunk: pl.DataFrame) -> pl.DataFrame:
+    """Baseline: keys built with map_elements calls into Python."""
+    chunk = chunk.with_columns([
+        pl.col("pos_members").map_elements(etl.pos_set_id_from_members, return_dtype=pl.Utf8).alias("pos_set_id"),
+        pg_uid_key("provider_reference_id").map_elements(etl.md5, return_dtype=pl.Utf8).alias("pg_uid"),
+    ])
+    return chunk.with_columns(
+        pl.struct([
+            "state", "year_month", "payer_slug", "billing_class", "code_type", "code",
+            "pg_uid", "pos_set_id", "negotiated_type", "negotiation_arrangement",
+            "expiration_date", "negotiated_rate", "provider_group_id_raw"
+        ]).map_elements(etl.fact_uid_from_struct, return_dtype=pl.Utf8).alias("fact_uid")
+    )
+
+
+def vectorized_keys(chunk: pl.DataFrame) -> pl.DataFrame:
+    """Vectorized key_hashing path."""
+    chunk = with_md5(chunk, pos_set_key("pos_members"), "pos_set_id")
+    chunk = with_md5(chunk, pg_uid_key("provider_reference_id"), "pg_uid")
+    return chunk.with_columns(fact_uid(chunk))
+
+
+def time_it(func, repeat: int) -> float:
+    """Best-of-N wall time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL1 surrogate key hashing")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic chunk (default: 200000)")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1_000, 50_000],
+                        help="Chunk sizes to split the rows into (default: 1000 50000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement (default: 3)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING")
+        etl = ScalableETL1(config)
+
+        data = make_rates_chunk(args.rows)
+        print(f"🔬 Key hashing benchmark: {args.rows:,} rows")
+        print(f"{'Chunk size':<12} {'Per-row (rows/s)':>18} {'Vectorized (rows/s)':>21} {'Speedup':>9}")
+        print("-" * 64)
+
+        for chunk_size in args.chunk_sizes:
+            chunks = [data.slice(i, chunk_size) for i in range(0, data.height, chunk_size)]
+
+            # Parity check on the first chunk before timing
+            expected = per_row_keys(etl, chunks[0]).select(["pos_set_id", "pg_uid", "fact_uid"])
+            actual = vectorized_keys(chunks[0]).select(["pos_set_id", "pg_uid", "fact_uid"])
+            if not expected.equals(actual):
+                print("❌ Vectorized keys differ from per-row keys")
+                return 1
+
+            per_row = time_it(lambda: [per_row_keys(etl, c) for c in chunks], args.repeat)
+            vectorized = time_it(lambda: [vectorized_keys(c) for c in chunks], args.repeat)
+            print(f"{chunk_size:<12,} {args.rows / per_row:>18,.0f} {args.rows / vectorized:>21,.0f} "
+                  f"{per_row / vectorized:>8.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
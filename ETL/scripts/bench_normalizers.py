@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for ETL1's Python normalizers.
+
+Derives payer_slug, year_month and pos_members for a synthetic rates file
+(default 5M rows) chunk by chunk, once with per-row map_elements calls and once
+with DistinctValueMapper (one call per distinct value, cached across chunks),
+checks that both give identical columns and reports time and Python calls.
+
+Usage:
+    python ETL/scripts/bench_normalizers.py
+    python ETL/scripts/bench_normalizers.py --rows 1000000 --chunk-size 50000
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from parquet_batches import ParquetBatchReader
+from distinct_values import DistinctValueMapper
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+
+COLUMNS = ["reporting_entity_name", "last_updated_on", "service_codes"]
+
+
+def write_rates_file(path: Path, rows: int, seed: int = 11) -> None:
+    """Write the normalizer input columns of a synthetic MRF rates file."""
+    rng = np.random.default_rng(seed)
+    names = np.array(["Aetna Life Insurance Company", "Aetna Health Inc. (Georgia)"])
+    dates = np.array(["2025-08-01", "2025-07-15", "2025/06/30", "202505"])
+    codes = np.array(['["11"]', '["11","22"]', '["22","11","81"]', '["02","10","11"]', "11;22"])
+    pl.DataFrame({
+        "reporting_entity_name": names[rng.integers(0, len(names), rows)],
+        "last_updated_on": dates[rng.integers(0, len(dates), rows)],
+        "service_codes": codes[rng.integers(0, len(codes), rows)],
+    }).write_parquet(path, compression="zstd", row_group_size=100_000)
+
+
+def derive_per_row(etl: ScalableETL1, chunk: pl.DataFrame) -> pl.DataFrame:
+    """Baseline: one Python call per row and column."""
+    return chunk.select([
+        pl.col("reporting_entity_name").map_elements(etl.payer_slug_from_name, return_dtype=pl.Utf8).alias("payer_slug"),
+        pl.col("last_updated_on").map_elements(etl.normalize_yymm, return_dtype=pl.Utf8).alias("year_month"),
+        pl.col("service_codes").map_elements(etl.normalize_service_codes, return_dtype=pl.List(pl.Utf8)).alias("pos_members"),
+    ])
+
+
+def derive_distinct(mappers, chunk: pl.DataFrame) -> pl.DataFrame:
+    """One Python call per distinct value, cached across chunks."""
+    return pl.DataFrame([
+        mappers[0].map(chunk["reporting_entity_name"]).alias("payer_slug"),
+        mappers[1].map(chunk["last_updated_on"]).alias("year_month"),
+        mappers[2].map(chunk["service_codes"]).alias("pos_members"),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL1 normalizer evaluation")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Rows in the synthetic rates file (default: 5000000)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per chunk (default: 50000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "rates.parquet"
+        print(f"📝 Writing {args.rows:,} synthetic rates rows...")
+        write_rates_file(path, args.rows)
+
+        etl = ScalableETL1(ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING"))
+        mappers = [
+            DistinctValueMapper(etl.payer_slug_from_name, pl.Utf8),
+            DistinctValueMapper(etl.normalize_yymm, pl.Utf8),
+            DistinctValueMapper(etl.normalize_service_codes, pl.List(pl.Utf8)),
+        ]
+
+        per_row_s = distinct_s = 0.0
+        with ParquetBatchReader(path, args.chunk_size, columns=COLUMNS) as reader:
+            for chunk in reader:
+                start = time.perf_counter()
+                expected = derive_per_row(etl, chunk)
+                per_row_s += time.perf_counter() - start
+
+                start = time.perf_counter()
+                actual = derive_distinct(mappers, chunk)
+                distinct_s += time.perf_counter() - start
+
+                if not actual.equals(expected):
+                    raise AssertionError("Distinct-value results differ from map_elements")
+
+    per_row_calls = 3 * args.rows
+    distinct_calls = sum(m.calls for m in mappers)
+    print(f"\n🔬 Normalizers over {args.rows:,} rows in chunks of {args.chunk_size:,} (outputs identical)")
+    print(f"{'Method':<16} {'Seconds':>9} {'Rows/s':>12} {'Python calls':>14}")
+    print("-" * 54)
+    print(f"{'map_elements':<16} {per_row_s:>9.2f} {args.rows / per_row_s:>12,.0f} {per_row_calls:>14,}")
+    print(f"{'distinct + LRU':<16} {distinct_s:>9.2f} {args.rows / distinct_s:>12,.0f} {distinct_calls:>14,}")
+    print(f"\n⚡ Speedup: {per_row_s / distinct_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the partition file layouts (utils/parquet_layout.py) under
+selective DuckDB queries.
+
+Writes the same synthetic enriched rows (bench_partition_split.py's shape,
+plus code_type and tin_value) once per layout, partition by partition through
+S3PartitionedETL into a local directory, then runs lookups by code, NPI and
+TIN (and a code and an NPI that are in no partition) with DuckDB over each copy. Bytes
+read are the process's read() bytes (/proc/self/io rchar, Linux) during the
+query, on a fresh connection each time so nothing is cached between queries.
+
+Usage:
+    python ETL/scripts/bench_parquet_layout.py
+    python ETL/scripts/bench_parquet_layout.py --rows 2000000 --providers 20000 --row-group-size 32768
+    python ETL/scripts/bench_parquet_layout.py --partition-levels 9   # ETL3's full partitioning (small files)
+"""
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import duckdb
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from s3_etl_utils import S3PartitionedETL, split_partitions
+from parquet_layout import parquet_layout
+from bench_partition_split import PARTITION_COLUMNS, make_enriched_chunk
+
+PREFIX = "partitioned-data"
+
+
+def bytes_read() -> int:
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("rchar:"):
+                return int(line.split()[1])
+    raise RuntimeError("rchar not available")
+
+
+def write_copy(data: pl.DataFrame, root: Path, layout, partition_columns) -> int:
+    """Write every partition with the layout; returns bytes on disk"""
+    s3_etl = S3PartitionedETL(f"file://{root}", layout=layout)
+    for values, rows in split_partitions(data, partition_columns):
+        s3_etl.upload_partition_to_s3(rows, s3_etl.create_s3_path(values, PREFIX))
+    return sum(p.stat().st_size for p in root.rglob("*.parquet"))
+
+
+def run_query(root: Path, where: str):
+    """(result, bytes read, seconds) of one lookup on a fresh connection"""
+    con = duckdb.connect()
+    sql = (f"SELECT count(*), round(sum(negotiated_rate), 4) "
+           f"FROM read_parquet('{root}/{PREFIX}/**/*.parquet') WHERE {where}")
+    before, start = bytes_read(), time.perf_counter()
+    result = con.execute(sql).fetchone()
+    seconds, read = time.perf_counter() - start, bytes_read() - before
+    con.close()
+    return result, read, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare partition file layouts under selective DuckDB queries")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Enriched rows (default: 1000000)")
+    parser.add_argument("--providers", type=int, default=5_000, help="Distinct NPIs (default: 5000)")
+    parser.add_argument("--taxonomies", type=int, default=20, help="Distinct taxonomy codes (default: 20)")
+    parser.add_argument("--cbsas", type=int, default=4, help="Distinct CBSA names (default: 4)")
+    parser.add_argument("--partition-levels", type=int, default=2,
+                        help="Partition by the first N partition columns, as in large or rolled-up partitions (default: 2)")
+    parser.add_argument("--row-group-size", type=int, help="Rows per row group of the query layout (default: the profile's)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    data = make_enriched_chunk(args.rows, args.providers, args.taxonomies, args.cbsas).with_columns(
+        pl.lit("CPT").alias("code_type"),
+        ("T" + (pl.col("npi") // 7).cast(pl.String)).alias("tin_value"),
+        # Even NPIs only, so an odd one is absent yet inside every row group's min/max
+        (1_000_000_000 + (pl.col("npi") - 1_000_000_000) * 2).alias("npi"),
+    )
+    partition_columns = PARTITION_COLUMNS[:args.partition_levels]
+    partitions = data.select(partition_columns).n_unique()
+    sample = data.row(len(data) // 2, named=True)
+    queries = {
+        "code": f"code_type = 'CPT' AND code = '{sample['code']}'",
+        "npi": f"npi = {sample['npi']}",
+        "tin_value": f"tin_value = '{sample['tin_value']}'",
+        # Inside the min/max of the row groups, so only bloom filters can skip them
+        "absent code": f"code_type = 'CPT' AND code = '{sample['code']}A'",
+        "absent npi": f"npi = {sample['npi'] + 1}",
+    }
+    layouts = {
+        "default": parquet_layout("default"),
+        "query": parquet_layout("query", row_group_size=args.row_group_size),
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, layout in layouts.items():
+            root = Path(tmp) / name
+            start = time.perf_counter()
+            size = write_copy(data, root, layout, partition_columns)
+            write_s = time.perf_counter() - start
+            results[name] = {'size': size, 'write_s': write_s,
+                             'queries': {q: run_query(root, where) for q, where in queries.items()}}
+
+    for query in queries:
+        answers = {name: result['queries'][query][0] for name, result in results.items()}
+        if len(set(answers.values())) != 1:
+            raise AssertionError(f"Layouts disagree on {query}: {answers}")
+
+    print(f"\n🔬 {args.rows:,} rows in {partitions:,} partitions (query results identical across layouts)")
+    print(f"{'Layout':<10} {'MB on disk':>11} {'Write s':>9}")
+    print("-" * 32)
+    for name, result in results.items():
+        print(f"{name:<10} {result['size'] / 1e6:>11.1f} {result['write_s']:>9.2f}")
+
+    print(f"\n{'Lookup':<14} {'Rows':>8} {'Default MB':>11} {'Query MB':>10} {'Reduction':>10} "
+          f"{'Default ms':>11} {'Query ms':>9}")
+    print("-" * 79)
+    for query in queries:
+        (rows, _), default_bytes, default_s = results['default']['queries'][query]
+        _, query_bytes, query_s = results['query']['queries'][query]
+        reduction = (1 - query_bytes / default_bytes) * 100 if default_bytes else 0.0
+        print(f"{query:<14} {rows:>8,} {default_bytes / 1e6:>11.2f} {query_bytes / 1e6:>10.2f} {reduction:>9.0f}% "
+              f"{default_s * 1000:>11.1f} {query_s * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for chunked Parquet reads.
+
+Compares the old per-chunk pl.scan_parquet(path).slice(start, n).collect()
+pattern with the single-pass ParquetBatchReader used by ETL1 and ETL3.
+For each file size the whole file is read in fixed-size chunks; a linear
+reader keeps microseconds-per-row flat as the file grows.
+
+Usage:
+    python ETL/scripts/bench_parquet_reader.py
+    python ETL/scripts/bench_parquet_reader.py --sizes 100000 200000 400000 800000 --chunk-size 1000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from parquet_batches import ParquetBatchReader
+
+
+def write_fact_file(path: Path, rows: int, row_group_size: int, seed: int = 7) -> None:
+    """Write a synthetic fact_rate-shaped Parquet file."""
+    rng = random.Random(seed)
+    pl.DataFrame({
+        "fact_uid": [f"{rng.getrandbits(128):032x}" for _ in range(rows)],
+        "state": ["GA"] * rows,
+        "year_month": ["2025-08"] * rows,
+        "payer_slug": ["aetna"] * rows,
+        "billing_class": [rng.choice(["professional", "institutional"]) for _ in range(rows)],
+        "code": [str(rng.randint(10000, 99999)) for _ in range(rows)],
+        "negotiated_rate": [round(rng.random() * 2000, 2) for _ in range(rows)],
+    }).write_parquet(path, compression="zstd", row_group_size=row_group_size)
+
+
+def read_with_slices(path: Path, chunk_size: int) -> int:
+    """Old pattern: rebuild the scan for every chunk."""
+    total = pl.scan_parquet(path).select(pl.len()).collect().item()
+    rows = 0
+    for start in range(0, total, chunk_size):
+        rows += pl.scan_parquet(path).slice(start, chunk_size).collect().height
+    return rows
+
+
+def read_with_reader(path: Path, chunk_size: int) -> int:
+    """New pattern: one pass over the row groups."""
+    rows = 0
+    with ParquetBatchReader(path, chunk_size) as reader:
+        for chunk in reader:
+            rows += chunk.height
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunked Parquet reads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 100_000, 200_000, 400_000],
+                        help="File sizes in rows (default: 50000 100000 200000 400000)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per chunk (default: 1000)")
+    parser.add_argument("--row-group-size", type=int, default=100_000, help="Parquet row group size (default: 100000)")
+    args = parser.parse_args()
+
+    print(f"🔬 Chunked read benchmark (chunk size {args.chunk_size:,})")
+    print(f"{'Rows':>10} {'slice() s':>11} {'slice() us/row':>15} {'reader s':>10} {'reader us/row':>14}")
+    print("-" * 64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            path = Path(tmp) / f"fact_{rows}.parquet"
+            write_fact_file(path, rows, args.row_group_size)
+
+            start = time.perf_counter()
+            sliced = read_with_slices(path, args.chunk_size)
+            slice_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            streamed = read_with_reader(path, args.chunk_size)
+            reader_time = time.perf_counter() - start
+
+            if sliced != rows or streamed != rows:
+                print(f"❌ Row count mismatch: expected {rows:,}, slice={sliced:,}, reader={streamed:,}")
+                return 1
+
+            print(f"{rows:>10,} {slice_time:>11.2f} {slice_time / rows * 1e6:>15.2f} "
+                  f"{reader_time:>10.2f} {reader_time / rows * 1e6:>14.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for splitting an enriched ETL3 chunk into its S3 partitions.
+
+Compares the old loop (unique partition tuples, then one chunk.filter() per
+tuple, O(partitions x rows)) with split_partitions (one stable sort, then a
+zero-copy slice per partition) on a synthetic enriched chunk partitioned by
+ETL3's nine default partition columns, and checks both give identical
+partitions.
+
+Usage:
+    python ETL/scripts/bench_partition_split.py
+    python ETL/scripts/bench_partition_split.py --rows 1000000 --providers 1000 --taxonomies 400 --cbsas 60
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from s3_etl_utils import split_partitions
+
+PARTITION_COLUMNS = [
+    "payer_slug", "state", "billing_class", "procedure_set",
+    "procedure_class", "primary_taxonomy_code", "stat_area_name", "year", "month",
+]
+
+
+def make_enriched_chunk(rows: int, providers: int, taxonomies: int, cbsas: int, seed: int = 3) -> pl.DataFrame:
+    """
+    Synthetic enriched chunk shaped like ETL3 output.
+
+    Taxonomy, CBSA and state are provider attributes and procedure set/class
+    follow the billing code, so partition cardinality grows with the provider
+    pool rather than with the row count.
+    """
+    rng = np.random.default_rng(seed)
+
+    def skewed(n: int, size: int) -> np.ndarray:
+        return np.minimum((rng.random(size) ** 2 * n).astype(np.int64), n - 1)
+
+    def pick(values: List[Any], idx: np.ndarray) -> pl.Series:
+        return pl.Series(values).gather(pl.Series(idx, dtype=pl.UInt32))
+
+    states = ["GA", "FL", "AL", "SC", "TN", None]
+    taxonomy_codes = [f"{i:09d}X" for i in range(taxonomies)] + [None]
+    cbsa_names = [f"CBSA {i}" for i in range(cbsas)] + [None]
+    codes = list(range(99201, 99499))
+
+    provider_state = skewed(len(states), providers)
+    provider_taxonomy = skewed(len(taxonomy_codes), providers)
+    provider_cbsa = skewed(len(cbsa_names), providers)
+    provider = skewed(providers, rows)
+    code = skewed(len(codes), rows)
+
+    return pl.DataFrame({
+        "fact_uid": [f"{v:032x}" for v in rng.integers(0, 2**62, rows)],
+        "payer_slug": pl.repeat("aetna", rows, eager=True),
+        "state": pick(states, provider_state[provider]),
+        "billing_class": pick(["professional", "institutional"], skewed(2, rows)),
+        "procedure_set": pick([f"set_{i:02d}" for i in range(8)], code % 24 // 3),
+        "procedure_class": pick([f"class_{i:02d}" for i in range(24)], code % 24),
+        "primary_taxonomy_code": pick(taxonomy_codes, provider_taxonomy[provider]),
+        "stat_area_name": pick(cbsa_names, provider_cbsa[provider]),
+        "year": pl.repeat("2025", rows, eager=True),
+        "month": pl.repeat("08", rows, eager=True),
+        "code": pick([str(c) for c in codes], code),
+        "npi": 1_000_000_000 + provider,
+        "negotiated_rate": rng.random(rows) * 2000,
+    })
+
+
+def split_with_filters(df: pl.DataFrame, partition_cols: List[str]) -> List[Dict[str, Any]]:
+    """Old loop: unique tuples, then one full filter per tuple."""
+    partitions = []
+    combinations = df.select(partition_cols).unique().sort(partition_cols)
+    for partition_row in combinations.iter_rows(named=True):
+        conditions = [pl.col(c).is_null() if v is None else pl.col(c) == v for c, v in partition_row.items()]
+        partitions.append((partition_row, df.filter(pl.all_horizontal(conditions))))
+    return partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL3 partition splitting")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the enriched chunk (default: 1000000)")
+    parser.add_argument("--providers", type=int, default=150, help="Distinct providers (default: 150)")
+    parser.add_argument("--taxonomies", type=int, default=200, help="Distinct taxonomy codes (default: 200)")
+    parser.add_argument("--cbsas", type=int, default=30, help="Distinct CBSA names (default: 30)")
+    args = parser.parse_args()
+
+    chunk = make_enriched_chunk(args.rows, args.providers, args.taxonomies, args.cbsas)
+
+    start = time.perf_counter()
+    expected = split_with_filters(chunk, PARTITION_COLUMNS)
+    filter_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = list(split_partitions(chunk, PARTITION_COLUMNS))
+    split_s = time.perf_counter() - start
+
+    if len(actual) != len(expected):
+        raise AssertionError(f"Partition counts differ: {len(actual)} vs {len(expected)}")
+    for (exp_row, exp_df), (act_row, act_df) in zip(expected, actual):
+        if exp_row != act_row or not exp_df.equals(act_df):
+            raise AssertionError(f"Partition {exp_row} differs")
+
+    print(f"\n🔬 {args.rows:,}-row enriched chunk -> {len(actual):,} partitions (outputs identical)")
+    print(f"{'Method':<22} {'Seconds':>9} {'ms/partition':>13}")
+    print("-" * 46)
+    print(f"{'filter per tuple':<22} {filter_s:>9.2f} {filter_s * 1000 / len(actual):>13.2f}")
+    print(f"{'sort + slice':<22} {split_s:>9.2f} {split_s * 1000 / len(actual):>13.2f}")
+    print(f"\n⚡ Speedup: {filter_s / split_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark separating ETL3 compute time from storage (network) time.
+
+Writes a synthetic fact table and dims (the shapes of
+bench_dimension_bundle.py), then runs the same ETL3 pipeline once per storage
+target:
+
+- local: a file:// directory in the temp dir, so the run is enrichment,
+  partitioning and Parquet encoding plus local disk writes
+- each --storage-uri given (e.g. s3://my-scratch-bucket), or moto's
+  in-process S3 with --moto
+
+The local run is the compute baseline; the rest of each other run's wall time
+is what reaching its storage costs (requests, transfer, retries).
+
+Usage:
+    python ETL/scripts/bench_storage_backend.py --moto
+    python ETL/scripts/bench_storage_backend.py --storage-uri s3://my-scratch-bucket --engine streaming
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from ETL.ETL_3 import ETL3Config, run_etl3_pipeline
+from bench_dimension_bundle import make_sources
+from bench_streaming_engine import _sources
+
+
+def run_target(root: Path, storage_uri: str, name: str, args) -> dict:
+    """One full-refresh pipeline run writing partitions to storage_uri"""
+    dim_paths, xref_paths = _sources(root)
+    config = ETL3Config(str(root / "missing.yaml"))
+    config.FACT_RATE_PATH = root / "fact_rate.parquet"
+    config.DIM_PATHS, config.XREF_PATHS = dim_paths, xref_paths
+    config.DIM_BUNDLE_DIR = root / "bundle"
+    config.PARTITION_SPILL_DIR = root / f"spill_{name}"
+    config.PARTITION_STAGING_DIR = root / f"staging_{name}"
+    config.FACT_LEDGER_DIR = root / f"ledger_{name}"
+    config.FACT_DELTA_PATH = root / "fact_delta.parquet"
+    config.STORAGE_URI = storage_uri
+    config.ENGINE = args.engine
+    config.COMPACT_PROVIDERS = args.compact_providers
+    config.CHUNK_SIZE = args.chunk_size
+    config.MAX_WORKERS = args.upload_workers
+    config.FULL_REFRESH = True
+
+    start = time.perf_counter()
+    summary = run_etl3_pipeline(config)
+    return {'seconds': time.perf_counter() - start, 'partitions': summary['total_partitions_created']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Separate ETL3 compute time from storage time")
+    parser.add_argument("--fact-rows", type=int, default=100_000, help="Fact rows (default: 100000)")
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="Chunked engine rows per chunk (default: 20000)")
+    parser.add_argument("--engine", choices=["chunked", "streaming"], default="streaming", help="ETL3 engine (default: streaming)")
+    parser.add_argument("--upload-workers", type=int, default=4, help="Upload threads (default: 4)")
+    parser.add_argument("--compact-providers", action="store_true", help="Nest provider members (one row per fact)")
+    parser.add_argument("--storage-uri", action="append", default=[], help="Storage target to compare (repeatable)")
+    parser.add_argument("--moto", action="store_true", help="Also run against moto's in-process S3")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _, _, _, make_chunk = make_sources(root, 2_000, 5_000, 50_000)
+        writer = None
+        for seed, offset in enumerate(range(0, args.fact_rows, 100_000), start=1):
+            table = make_chunk(min(100_000, args.fact_rows - offset), seed).to_arrow()
+            writer = writer or pq.ParquetWriter(root / "fact_rate.parquet", table.schema)
+            writer.write_table(table)
+        writer.close()
+
+        # Build the dimension bundle up front so no run pays for it
+        results = {'local': run_target(root, f"file://{root}/warmup", "warmup", args)}
+        results['local'] = run_target(root, f"file://{root}/stage", "local", args)
+        for uri in args.storage_uri:
+            results[uri] = run_target(root, uri, f"target{len(results)}", args)
+        if args.moto:
+            from moto import mock_aws
+            os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+            os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+            os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+            with mock_aws():
+                import boto3
+                boto3.client('s3').create_bucket(Bucket="bench-bucket")
+                results['s3://bench-bucket (moto)'] = run_target(root, "s3://bench-bucket", "moto", args)
+
+    local = results['local']['seconds']
+    print(f"\n🔬 {args.fact_rows:,} fact rows, {args.engine} engine -> {results['local']['partitions']:,} partitions")
+    print(f"{'Storage':<32} {'Seconds':>9} {'Rows/sec':>12} {'Storage s':>10} {'Storage %':>10}")
+    print("-" * 77)
+    for name, result in results.items():
+        storage = max(0.0, result['seconds'] - local)
+        print(f"{name:<32} {result['seconds']:>9.2f} {args.fact_rows / result['seconds']:>12,.0f} "
+              f"{storage:>10.2f} {storage / result['seconds'] * 100:>9.0f}%")
+    print(f"\n⚙️  Compute (local run): {local:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the streaming ETL3 engine against the chunked engine.
+
+Writes a synthetic fact table and dims (the shapes of
+bench_dimension_bundle.py), builds the dimension bundle once, then runs each
+engine in its own process up to the point where partitions would go to S3:
+
+- chunked: fact chunks read with ParquetBatchReader, enriched from the bundle,
+  split per partition and accumulated (PartitionAccumulator), each partition
+  written once to a local directory
+- streaming: the one lazy plan of ETL_3._build_streaming_plan staged with one
+  file per partition (partition_staging.stage_partitions)
+
+Reports wall time, fact rows/second and peak RSS of each engine, and checks
+that both wrote the same partitions with the same fact_uids.
+
+Usage:
+    python ETL/scripts/bench_streaming_engine.py
+    python ETL/scripts/bench_streaming_engine.py --fact-rows 1000000 --chunk-size 50000 --compact-providers
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+import polars as pl
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from dimension_bundle import DimensionBundle
+from partition_accumulator import PartitionAccumulator
+from partition_staging import stage_partitions
+from parquet_batches import ParquetBatchReader
+from s3_etl_utils import split_partitions, partition_key
+from ETL.ETL_3 import ETL3Config, _build_streaming_plan, _enrich_fact_table
+from bench_dimension_bundle import make_sources
+
+PREFIX = "partitioned-data"
+
+
+def _sources(root: Path):
+    """Dim and xref paths as make_sources wrote them"""
+    dim_paths = {p.stem.split('_', 1)[1]: p for p in root.glob("dim_*.parquet")}
+    xref_paths = {p.stem.split('_', 1)[1]: p for p in root.glob("xref_*.parquet")}
+    return dim_paths, xref_paths
+
+
+def _bundle(root: Path) -> DimensionBundle:
+    dim_paths, xref_paths = _sources(root)
+    return DimensionBundle.load_or_build(root / "bundle", dim_paths, xref_paths,
+                                         list(pl.read_parquet_schema(root / "fact_rate.parquet")))
+
+
+def run_chunked(root: Path, out: Path, chunk_size: int, compact: bool, partition_columns) -> int:
+    bundle = _bundle(root)
+
+    def write(data: pl.DataFrame, key: str):
+        path = out / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data.write_parquet(path)
+
+    accumulator = PartitionAccumulator(root / "spill", writer=write, disk_budget_mb=1 << 20)
+    with ParquetBatchReader(root / "fact_rate.parquet", chunk_size) as reader:
+        for chunk in reader:
+            enriched = _enrich_fact_table(chunk, {}, {}, bundle=bundle, compact_providers=compact)
+            for values, rows in split_partitions(enriched, partition_columns):
+                accumulator.append(partition_key(values, PREFIX), rows)
+            del chunk, enriched
+    accumulator.flush_all()
+    accumulator.close()
+    return accumulator.uploads
+
+
+def run_streaming(root: Path, out: Path, compact: bool, partition_columns) -> int:
+    config = SimpleNamespace(FACT_RATE_PATH=root / "fact_rate.parquet", CATEGORICAL_COLUMNS=False,
+                             COMPACT_PROVIDERS=compact)
+    return len(stage_partitions(_build_streaming_plan(config, _bundle(root)), out, partition_columns, PREFIX))
+
+
+def worker(args):
+    """Run one engine in this process and print its measurements as JSON"""
+    logging.disable(logging.INFO)
+    root = Path(args.root)
+    out = root / f"out_{args.worker}"
+    partition_columns = ETL3Config().PARTITION_COLUMNS
+    start = time.perf_counter()
+    if args.worker == "chunked":
+        partitions = run_chunked(root, out, args.chunk_size, args.compact_providers, partition_columns)
+    else:
+        partitions = run_streaming(root, out, args.compact_providers, partition_columns)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': seconds,
+        'partitions': partitions,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def fact_uids(out: Path) -> dict:
+    return {path.relative_to(out).as_posix(): sorted(pl.read_parquet(path, columns=['fact_uid'])['fact_uid'])
+            for path in out.rglob("*.parquet")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming ETL3 engine against the chunked engine")
+    parser.add_argument("--fact-rows", type=int, default=200_000, help="Fact rows (default: 200000)")
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="Chunked engine rows per chunk (default: 20000)")
+    parser.add_argument("--codes", type=int, default=2_000, help="Distinct billing codes (default: 2000)")
+    parser.add_argument("--provider-groups", type=int, default=5_000, help="Provider groups (default: 5000)")
+    parser.add_argument("--npis", type=int, default=50_000, help="NPIs (default: 50000)")
+    parser.add_argument("--compact-providers", action="store_true", help="Nest provider members (one row per fact)")
+    parser.add_argument("--worker", choices=["chunked", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _, _, _, make_chunk = make_sources(root, args.codes, args.provider_groups, args.npis)
+        writer = None
+        for seed, offset in enumerate(range(0, args.fact_rows, 100_000), start=1):
+            table = make_chunk(min(100_000, args.fact_rows - offset), seed).to_arrow()
+            writer = writer or pq.ParquetWriter(root / "fact_rate.parquet", table.schema)
+            writer.write_table(table)
+        writer.close()
+        _bundle(root)
+
+        results = {}
+        for engine in ("chunked", "streaming"):
+            command = [sys.executable, __file__, "--worker", engine, "--root", str(root),
+                       "--chunk-size", str(args.chunk_size)]
+            if args.compact_providers:
+                command.append("--compact-providers")
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results[engine] = json.loads(output.strip().splitlines()[-1])
+
+        if fact_uids(root / "out_chunked") != fact_uids(root / "out_streaming"):
+            raise AssertionError("Engines wrote different partitions or rows")
+
+        mode = "compact" if args.compact_providers else "expanded"
+        print(f"\n🔬 {args.fact_rows:,} fact rows ({mode} providers) -> "
+              f"{results['streaming']['partitions']:,} partitions (outputs identical)")
+        print(f"{'Engine':<12} {'Seconds':>9} {'Rows/sec':>12} {'Peak RSS MB':>12}")
+        print("-" * 48)
+        for engine, result in results.items():
+            print(f"{engine:<12} {result['seconds']:>9.2f} {args.fact_rows / result['seconds']:>12,.0f} "
+                  f"{result['peak_rss_mb']:>12,.0f}")
+        chunked, streaming = results['chunked'], results['streaming']
+        print(f"\n⚡ Streaming: {chunked['seconds'] / streaming['seconds']:.1f}x the throughput, "
+              f"{streaming['peak_rss_mb'] / chunked['peak_rss_mb']:.2f}x the peak RSS")
+
+
+if __name__ == "__main__":
+    main()
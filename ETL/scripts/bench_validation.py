@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ETL3's chunk validators.
+
+Compares the old validators, which ran one df.filter(...).height per check
+(three per partition column plus a unique() for validate_partition_data, one
+or two per rule for DataQualityChecker.validate_partition), with the one-pass
+versions (a single lazy select of aggregations) on a synthetic enriched chunk,
+and checks both find the same counts.
+
+Usage:
+    python ETL/scripts/bench_validation.py
+    python ETL/scripts/bench_validation.py --rows 1000000 --repeat 5
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+sys.path.append(str(project_root / "ETL" / "scripts"))
+
+from data_quality import DataQualityChecker, check_partition_columns
+from bench_partition_split import PARTITION_COLUMNS, make_enriched_chunk
+
+
+def with_quality_columns(chunk: pl.DataFrame, seed: int = 4) -> pl.DataFrame:
+    """The chunk with geocoding and Medicare columns, a few markers and a few invalid rows."""
+    rng = np.random.default_rng(seed)
+    rows = chunk.height
+    marker = rng.random(rows)
+    return chunk.with_columns(
+        pl.when(pl.Series(marker < 0.02)).then(pl.lit('__NULL__')).otherwise(pl.col('stat_area_name'))
+        .alias('stat_area_name'),
+        pl.when(pl.Series(marker > 0.99)).then(pl.lit('Unknown')).otherwise(pl.col('billing_class'))
+        .alias('billing_class'),
+        pl.Series('latitude', rng.uniform(-95, 95, rows)),
+        pl.Series('longitude', rng.uniform(-170, 170, rows)),
+        pl.Series('county_name', [f"County {i}" for i in rng.integers(0, 150, rows)]),
+        pl.Series('medicare_state_rate', np.where(rng.random(rows) < 0.8, rng.random(rows) * 500, np.nan))
+        .fill_nan(None),
+    )
+
+
+def check_with_filters(df: pl.DataFrame, partition_columns: List[str]) -> Dict[str, Any]:
+    """Old validate_partition_data: three filters per column and a unique() (counts only)."""
+    counts = {}
+    for column in partition_columns:
+        counts[column] = {
+            'unknown': df.filter(pl.col(column) == 'Unknown').height,
+            'null_marker': df.filter(pl.col(column) == '__NULL__').height,
+            'null': df.filter(pl.col(column).is_null()).height,
+        }
+    combinations = df.select(partition_columns).unique().height
+    return {'columns': counts, 'combinations': combinations}
+
+
+def validate_with_filters(checker: DataQualityChecker, df: pl.DataFrame) -> Dict[str, int]:
+    """Old DataQualityChecker.validate_partition: one filter per check and per metric (failing rows by check)."""
+    rules = checker.quality_rules
+    rate = rules['rate_validation']
+    found = {}
+    for field in rules['required_fields']['fields']:
+        found[f'required_fields.{field}.null'] = df.filter(pl.col(field).is_null()).height
+    found['rate_validation.negotiated_rate.negative'] = df.filter(pl.col('negotiated_rate') < 0).height
+    found['rate_validation.negotiated_rate.range'] = df.filter(
+        (pl.col('negotiated_rate') < rate['min_value']) | (pl.col('negotiated_rate') > rate['max_value'])).height
+    found['state_validation.state.invalid'] = df.filter(
+        ~pl.col('state').is_in(rules['state_validation']['valid_values'])).height
+    found['payer_validation.payer_slug.invalid'] = df.filter(pl.col('payer_slug').str.contains(r'[^a-z0-9-]')).height
+    npi = pl.col('npi').cast(pl.String)
+    found['npi_validation.npi.invalid'] = df.filter(
+        npi.is_not_null() & ~npi.str.contains(rules['npi_validation']['pattern'])).height
+    geo = rules['geocoding_validation']
+    for field, (low, high) in (('latitude', geo['latitude_range']), ('longitude', geo['longitude_range'])):
+        found[f'geocoding_validation.{field}.range'] = df.filter(
+            pl.col(field).is_not_null() & ((pl.col(field) < low) | (pl.col(field) > high))).height
+
+    # Metrics: the completeness filters again, then a unique pass per column
+    for field in rules['required_fields']['fields']:
+        df.filter(pl.col(field).is_null()).height
+    df.select('negotiated_rate').describe()
+    for field in ('stat_area_name', 'county_name', 'npi'):
+        df.select(field).n_unique()
+    df.filter(pl.col('medicare_state_rate').is_not_null()).height
+    return found
+
+
+def timed(func, repeat: int):
+    """(result, best seconds of repeat runs)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ETL3 chunk validation")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the enriched chunk (default: 1000000)")
+    parser.add_argument("--providers", type=int, default=150, help="Distinct providers (default: 150)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per validator, best is reported (default: 3)")
+    args = parser.parse_args()
+
+    chunk = with_quality_columns(make_enriched_chunk(args.rows, args.providers, 200, 30))
+    checker = DataQualityChecker()
+
+    old_partition, old_partition_s = timed(lambda: check_with_filters(chunk, PARTITION_COLUMNS), args.repeat)
+    new_partition, new_partition_s = timed(lambda: check_partition_columns(chunk, PARTITION_COLUMNS), args.repeat)
+    if (old_partition['columns'], old_partition['combinations']) != (new_partition.columns,
+                                                                       new_partition.combinations):
+        raise AssertionError("Partition column counts differ")
+
+    old_quality, old_quality_s = timed(lambda: validate_with_filters(checker, chunk), args.repeat)
+    new_quality, new_quality_s = timed(lambda: checker.validate_partition(chunk), args.repeat)
+    new_counts = {f"{c['rule']}.{c['field']}.{c['check']}": c['rows'] for c in new_quality['checks']}
+    if new_counts != old_quality:
+        raise AssertionError(f"Quality check counts differ: {old_quality} vs {new_counts}")
+
+    print(f"\n🔬 {args.rows:,}-row enriched chunk, {len(PARTITION_COLUMNS)} partition columns, "
+          f"{len(new_counts)} quality checks (counts identical)")
+    print(f"{'Validator':<24} {'Filters (s)':>12} {'One pass (s)':>13} {'Speedup':>8}")
+    print("-" * 60)
+    for name, old_s, new_s in (("validate_partition_data", old_partition_s, new_partition_s),
+                               ("validate_partition", old_quality_s, new_quality_s)):
+        print(f"{name:<24} {old_s:>12.3f} {new_s:>13.3f} {old_s / new_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
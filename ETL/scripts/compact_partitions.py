@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Partition Compaction Runner
+
+Splits ETL3 partition files over the size/row limits and rolls up the ones
+under them (see ETL/utils/partition_compaction.py). Limits default to the
+partitioning section of etl3_config.yaml.
+
+Usage:
+    python ETL/scripts/compact_partitions.py --dry-run                 # Plan and report only
+    python ETL/scripts/compact_partitions.py                           # Compact the configured storage
+    python ETL/scripts/compact_partitions.py --storage-uri file:///mnt/stage --min-file-mb 4
+    python ETL/scripts/compact_partitions.py --rollup-level procedure_class  # Also roll up small partitions
+"""
+
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from ETL.ETL_3 import ETL3Config
+from s3_etl_utils import S3PartitionedETL
+from partition_compaction import CompactionPolicy, PartitionCompactor, SplitAction, RollupAction
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact ETL3 partition files (split oversized, roll up undersized)")
+    parser.add_argument("--config", help="ETL3 config file (default: ETL/config/etl3_config.yaml)")
+    parser.add_argument("--storage-uri", help="s3://bucket or file:///local/dir (default: from config)")
+    parser.add_argument("--prefix", help="Partition prefix (default: s3.prefix)")
+    parser.add_argument("--dry-run", action="store_true", help="Plan and report without writing")
+    parser.add_argument("--max-file-mb", type=float, help="Split partition files larger than this")
+    parser.add_argument("--max-rows", type=int, help="Split partition files with more rows than this")
+    parser.add_argument("--target-file-mb", type=float, help="Size of split parts and rollups")
+    parser.add_argument("--min-file-mb", type=float, help="Roll up partition files smaller than this")
+    parser.add_argument("--min-rows", type=int, help="Roll up partition files with fewer rows than this")
+    parser.add_argument("--rollup-level", help="Partition level whose directories hold rollups of small partitions "
+                        "(default: rollup_level, off; 'none' disables rollups)")
+    parser.add_argument("--show-plan", action="store_true", help="Print every planned action")
+    args = parser.parse_args()
+
+    config = ETL3Config(args.config)
+    config.STORAGE_URI = args.storage_uri or config.STORAGE_URI
+    prefix = args.prefix or config.S3_PREFIX
+    for attr, value in (('MAX_PARTITION_SIZE_MB', args.max_file_mb), ('MAX_PARTITION_ROWS', args.max_rows),
+                        ('TARGET_FILE_SIZE_MB', args.target_file_mb), ('MIN_FILE_SIZE_MB', args.min_file_mb),
+                        ('MIN_PARTITION_ROWS', args.min_rows)):
+        if value is not None:
+            setattr(config, attr, value)
+    if args.rollup_level:
+        config.ROLLUP_LEVEL = None if args.rollup_level.lower() == 'none' else args.rollup_level
+
+    policy = CompactionPolicy.from_config(config)
+    s3_etl = S3PartitionedETL(config.STORAGE_URI, config.S3_REGION, rollup_level=config.ROLLUP_LEVEL,
+                              layout=config.parquet_layout(), partition_spec=config.partition_spec())
+    compactor = PartitionCompactor(s3_etl, prefix, policy)
+
+    print(f"🗜️  Compacting {s3_etl.storage.uri(prefix)}")
+    print(f"   Split over {config.MAX_PARTITION_SIZE_MB} MB / {config.MAX_PARTITION_ROWS} rows, "
+          f"roll up under {config.MIN_FILE_SIZE_MB} MB / {config.MIN_PARTITION_ROWS} rows "
+          f"to {config.ROLLUP_LEVEL}, target {config.TARGET_FILE_SIZE_MB} MB")
+    actions = compactor.plan()
+    if args.show_plan:
+        for action in actions:
+            if isinstance(action, SplitAction):
+                print(f"   split  {action.key} -> {action.parts} parts")
+            elif isinstance(action, RollupAction):
+                print(f"   rollup {len(action.partitions)} partitions -> {action.key}")
+            else:
+                print(f"   purge  stale copies of {action.key}")
+
+    report = compactor.run(actions, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+    print(f"\n📊 Files: {report['files_before']:,} -> {report['files_after']:,} "
+          f"({report['bytes_per_get_before'] / 1024:,.1f} -> {report['bytes_per_get_after'] / 1024:,.1f} KB per GET)")
+    if report['failed']:
+        print(f"❌ {len(report['failed'])} actions failed; rerun to retry them")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
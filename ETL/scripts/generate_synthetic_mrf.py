@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic MRF rates/providers inputs for ETL1.
+
+Writes 202508_{payer}_ga_rates.parquet and 202508_{payer}_ga_providers.parquet
+(see utils/synthetic_mrf.py) so etl1_scalable.py, test_etl1_scalable.py and
+compare_etl_versions.py can run without the real payer extracts.
+
+Usage:
+    python ETL/scripts/generate_synthetic_mrf.py --scale 1m
+    python ETL/scripts/generate_synthetic_mrf.py --rows 250000 --payer uhc --output-dir /tmp/etl/input
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from synthetic_mrf import SCALES, generate_mrf_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic MRF inputs for ETL1")
+    parser.add_argument("--scale", choices=list(SCALES), default="100k", help="Rates rows preset (default: 100k)")
+    parser.add_argument("--rows", type=int, help="Rates rows (overrides --scale)")
+    parser.add_argument("--providers-rows", type=int, help="Providers rows (default: a quarter of the rates rows)")
+    parser.add_argument("--payer", default="aetna", help="Payer slug for file names (default: aetna)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--output-dir", type=Path, default=project_root / "data" / "input",
+                        help="Directory to write to (default: data/input)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    rows = args.rows or SCALES[args.scale]
+    start = time.time()
+    paths = generate_mrf_files(args.output_dir, rows, args.providers_rows, payer=args.payer, seed=args.seed)
+    print(f"✅ Generated in {time.time() - start:.1f}s")
+    for kind, path in paths.items():
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"   {kind:<10} {pq.ParquetFile(path).metadata.num_rows:>12,} rows  {size_mb:>8.1f}MB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Partition Spec Planner
+
+Suggests partition levels (partitioning.partition_columns) that keep most
+partition files within a target size range, from a sample of the fact table
+(see plan_partition_spec in ETL/utils/partition_spec.py). Every Nth fact row
+is enriched as ETL3 enriches it; the bytes per row are measured by writing
+the sample in the configured Parquet layout, and partition file sizes are
+extrapolated to the whole fact table. The range defaults to the compaction
+limits of etl3_config.yaml (min_file_size_mb to max_partition_size_mb).
+
+Usage:
+    python ETL/scripts/plan_partition_spec.py
+    python ETL/scripts/plan_partition_spec.py --sample-rows 500000 --min-file-mb 8 --max-file-mb 128
+    python ETL/scripts/plan_partition_spec.py --buckets 8,16,32
+"""
+
+import io
+import sys
+import math
+import logging
+import argparse
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from ETL.ETL_3 import ETL3Config, extract_partition_keys, prepare_dimension_bundle
+from categorical_schema import categorical_mode
+from partition_spec import PARTITION_LEVELS, partition_file_sizes, plan_partition_spec
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def sample_enriched(config: ETL3Config, sample_rows: int):
+    """(every Nth fact row enriched with partition keys, fact rows per sampled fact row)"""
+    total_rows = pl.scan_parquet(config.FACT_RATE_PATH).select(pl.len()).collect().item()
+    step = max(1, total_rows // max(1, sample_rows))
+    plan = categorical_mode(pl.scan_parquet(config.FACT_RATE_PATH).gather_every(step), config.CATEGORICAL_COLUMNS)
+    bundle = prepare_dimension_bundle(config)
+    enriched = extract_partition_keys(bundle.enrich(plan, compact_providers=config.COMPACT_PROVIDERS)).collect()
+    return enriched, total_rows / max(1, math.ceil(total_rows / step))
+
+
+def describe(sizes: pl.Series, min_bytes: int, max_bytes: int) -> str:
+    within = ((sizes >= min_bytes) & (sizes <= max_bytes)).mean()
+    return (f"{len(sizes):>9,} files  {within:>6.1%} within range  "
+            f"{(sizes < min_bytes).mean():>6.1%} under  {(sizes > max_bytes).mean():>6.1%} over  "
+            f"median {sizes.median() / MB:>8.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest ETL3 partition levels from a sample of the fact table")
+    parser.add_argument("--config", help="ETL3 config file (default: ETL/config/etl3_config.yaml)")
+    parser.add_argument("--sample-rows", type=int, default=200_000, help="Fact rows to sample (default: 200000)")
+    parser.add_argument("--min-file-mb", type=float, help="Smallest wanted file (default: partitioning.min_file_size_mb)")
+    parser.add_argument("--max-file-mb", type=float,
+                        help="Largest wanted file (default: partitioning.max_partition_size_mb)")
+    parser.add_argument("--buckets", default="4,8,16,32,64", help="Bucket counts to try (default: 4,8,16,32,64)")
+    args = parser.parse_args()
+
+    config = ETL3Config(args.config)
+    min_bytes = int((args.min_file_mb if args.min_file_mb is not None else config.MIN_FILE_SIZE_MB) * MB)
+    max_bytes = int((args.max_file_mb if args.max_file_mb is not None else config.MAX_PARTITION_SIZE_MB) * MB)
+    bucket_counts = [int(n) for n in args.buckets.split(",") if n.strip()]
+
+    sample, scale = sample_enriched(config, args.sample_rows)
+    if sample.is_empty():
+        print("❌ The fact table sample enriched to no rows")
+        return 1
+    layout = config.parquet_layout()
+    buffer = io.BytesIO()
+    layout.write(layout.order(sample), buffer)
+    bytes_per_row = buffer.tell() / sample.height
+
+    current = config.partition_spec()
+    suggested, report = plan_partition_spec(sample, scale, bytes_per_row, min_bytes, max_bytes,
+                                            levels=PARTITION_LEVELS, bucket_counts=bucket_counts)
+
+    print(f"\n📐 {sample.height:,} enriched sample rows x {scale:,.1f}, {bytes_per_row:.0f} bytes/row "
+          f"({config.PARQUET_LAYOUT} layout), target {min_bytes / MB:g}-{max_bytes / MB:g} MB")
+    print("\nShare of files within range per option (levels below dropped):")
+    for level, options in report.items():
+        print(f"   {level}: " + ", ".join(f"{option} {share:.0%}" for option, share in options.items()))
+
+    print(f"\nCurrent:   {describe(partition_file_sizes(sample, current, scale, bytes_per_row), min_bytes, max_bytes)}")
+    print(f"Suggested: {describe(partition_file_sizes(sample, suggested, scale, bytes_per_row), min_bytes, max_bytes)}")
+
+    print("\n# etl3_config.yaml")
+    print("partitioning:")
+    print("  partition_columns:")
+    for entry in suggested.entries:
+        print(f'    - "{entry}"')
+    if config.ROLLUP_LEVEL and config.ROLLUP_LEVEL not in suggested.levels[:-1]:
+        # Rollups need a level with levels below it
+        rollup = f'"{suggested.levels[-2]}"' if len(suggested.levels) > 1 else "null"
+        print(f"  rollup_level: {rollup}    # {config.ROLLUP_LEVEL} is not a level any more")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,14 @@ Designed for memory-constrained systems (4-8GB RAM) with automatic memory manage
 Usage:
     python ETL/scripts/run_etl3.py                    # Default memory-optimized settings
     python ETL/scripts/run_etl3.py --chunk-size 500   # Custom chunk size
+    python ETL/scripts/run_etl3.py --adaptive-chunks  # Size chunks from measured memory
+    python ETL/scripts/run_etl3.py --accumulate-partitions  # Upload each partition once
+    python ETL/scripts/run_etl3.py --prepare-dimensions  # Build the dimension bundle only
+    python ETL/scripts/run_etl3.py --compact-providers  # One row per fact, providers nested
+    python ETL/scripts/run_etl3.py --engine streaming  # One streaming plan, staged then synced
+    python ETL/scripts/run_etl3.py --full-refresh     # Republish every fact row, ignoring the ledger
+    python ETL/scripts/run_etl3.py --storage-uri file:///mnt/stage  # Write partitions locally (no AWS)
+    python ETL/scripts/run_etl3.py --parquet-layout default  # Arrival order, writer defaults
     python ETL/scripts/run_etl3.py --validate-only    # Validation only
     python ETL/scripts/run_etl3.py --dry-run          # Dry run mode
 """
@@ -27,7 +35,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 sys.path.append(str(project_root / "ETL" / "utils"))
 
-from ETL.ETL_3 import run_etl3_pipeline, ETL3Config
+from ETL.ETL_3 import run_etl3_pipeline, prepare_dimension_bundle, ETL3Config
 from ETL.utils.monitoring import ETLMonitor
 from ETL.utils.data_quality import DataQualityChecker
 
@@ -105,7 +113,8 @@ class MemoryMonitor:
             # Check again after cleanup
             memory_after = self.get_memory_usage()
             if memory_after["process_mb"] > self.memory_limit_mb * 0.8:
-                logger.error(f"Memory still high after cleanup: {memory_after['process_mb']:.1f}MB")
+                logger.error(f"Memory still high after cleanup: {memory_after['process_mb']:.1f}MB "
+                             f"- run with --adaptive-chunks to shrink chunks automatically")
                 return False
         
         # Warn if system memory is low
@@ -160,6 +169,54 @@ def parse_arguments():
         help='Override memory limit in MB (default: 1024)'
     )
     
+    parser.add_argument(
+        '--adaptive-chunks',
+        action='store_true',
+        help='Adjust chunk size from measured memory per row (starts at --chunk-size)'
+    )
+    
+    parser.add_argument(
+        '--accumulate-partitions',
+        action='store_true',
+        help='Spill chunk slices to local disk and upload each partition once after the last chunk'
+    )
+    
+    parser.add_argument(
+        '--prepare-dimensions',
+        action='store_true',
+        help='Build (or refresh) the pre-joined dimension bundle and exit'
+    )
+    
+    parser.add_argument(
+        '--compact-providers',
+        action='store_true',
+        help='Keep one row per fact and nest its provider group members instead of expanding them'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=['chunked', 'streaming'],
+        help='Processing engine (default: processing.engine from the config, else chunked)'
+    )
+    
+    parser.add_argument(
+        '--full-refresh',
+        action='store_true',
+        help='Enrich and publish every fact row instead of only those the fact ledger has not seen published'
+    )
+    
+    parser.add_argument(
+        '--storage-uri',
+        type=str,
+        help='Where partitions are written: s3://bucket or file:///local/dir (default: s3.storage_uri, else the bucket)'
+    )
+    
+    parser.add_argument(
+        '--parquet-layout',
+        choices=['query', 'default'],
+        help='Partition file layout: query (sorted, bloom filters) or default (default: processing.parquet_layout, else query)'
+    )
+    
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -193,6 +250,20 @@ def setup_environment(args):
     # Set processing parameters
     os.environ['CHUNK_SIZE'] = str(args.chunk_size)
     os.environ['MEMORY_LIMIT_MB'] = str(args.memory_limit)
+    if args.adaptive_chunks:
+        os.environ['ADAPTIVE_CHUNK_SIZE'] = 'true'
+    if args.accumulate_partitions:
+        os.environ['ACCUMULATE_PARTITIONS'] = 'true'
+    if args.compact_providers:
+        os.environ['COMPACT_PROVIDERS'] = 'true'
+    if args.engine:
+        os.environ['ETL3_ENGINE'] = args.engine
+    if args.full_refresh:
+        os.environ['FULL_REFRESH'] = 'true'
+    if args.storage_uri:
+        os.environ['ETL3_STORAGE_URI'] = args.storage_uri
+    if args.parquet_layout:
+        os.environ['PARQUET_LAYOUT'] = args.parquet_layout
     
     # Create necessary directories
     Path('logs').mkdir(exist_ok=True)
@@ -201,6 +272,13 @@ def setup_environment(args):
     logger.info(f"Environment set up for memory optimization:")
     logger.info(f"  Chunk size: {args.chunk_size:,}")
     logger.info(f"  Memory limit: {args.memory_limit} MB")
+    logger.info(f"  Adaptive chunk size: {args.adaptive_chunks}")
+    logger.info(f"  Accumulate partitions: {args.accumulate_partitions}")
+    logger.info(f"  Compact providers: {args.compact_providers}")
+    logger.info(f"  Engine: {args.engine or 'from config'}")
+    logger.info(f"  Full refresh: {args.full_refresh}")
+    logger.info(f"  Storage: {args.storage_uri or 'from config'}")
+    logger.info(f"  Parquet layout: {args.parquet_layout or 'from config'}")
     logger.info(f"  Thread limits: All set to 1")
 
 
@@ -232,7 +310,12 @@ def validate_prerequisites():
         logger.error(f"Missing dimension tables: {missing_dims}")
         return False
     
-    # Check AWS credentials
+    # Check AWS credentials (not needed when partitions are written to a local directory)
+    storage_uri = os.environ.get('ETL3_STORAGE_URI', '')
+    if storage_uri.startswith(('file://', '/', '.')):
+        logger.info(f"Local storage {storage_uri}: skipping the AWS credential check")
+        logger.info("All prerequisites validated")
+        return True
     try:
         import boto3
         sts = boto3.client('sts')
@@ -315,6 +398,14 @@ def main():
         validation_results = run_validation_only()
         sys.exit(0 if not validation_results['has_errors'] else 1)
     
+    # Build the dimension bundle ahead of the run (otherwise the first run builds it)
+    if args.prepare_dimensions:
+        bundle = prepare_dimension_bundle(MemoryOptimizedETL3Config(args.config))
+        stats = bundle.stats()
+        print(f"Dimension bundle {'built' if stats['rebuilt'] else 'already current'}: "
+              f"{stats['code_rows']:,} code rows, {stats['provider_rows']:,} provider rows")
+        sys.exit(0)
+    
     # Dry run mode
     if args.dry_run:
         logger.info("Running in dry-run mode - no actual processing will occur")
@@ -336,6 +427,13 @@ def main():
         config = MemoryOptimizedETL3Config(args.config)
         config.CHUNK_SIZE = args.chunk_size
         config.MEMORY_LIMIT_MB = args.memory_limit
+        config.ADAPTIVE_CHUNK_SIZE = args.adaptive_chunks
+        config.ACCUMULATE_PARTITIONS = config.ACCUMULATE_PARTITIONS or args.accumulate_partitions
+        config.COMPACT_PROVIDERS = config.COMPACT_PROVIDERS or args.compact_providers
+        config.ENGINE = args.engine or config.ENGINE
+        config.FULL_REFRESH = config.FULL_REFRESH or args.full_refresh
+        config.STORAGE_URI = args.storage_uri or config.STORAGE_URI
+        config.PARQUET_LAYOUT = args.parquet_layout or config.PARQUET_LAYOUT
         
         # Run pipeline with memory monitoring
         summary = run_etl3_pipeline(config)
@@ -355,6 +453,8 @@ def main():
         print(f"Processing rate: {summary['rows_per_second']:.0f} rows/second")
         print(f"S3 Bucket: {summary['s3_bucket']}")
         print(f"S3 Prefix: {summary['s3_prefix']}")
+        print(f"Storage: {summary['storage_uri']}")
+        print(f"Parquet layout: {summary['parquet_layout']}")
         print(f"Athena Database: {summary['athena_database']}")
         print(f"Athena Table: {summary['athena_table']}")
         print("\n" + "-"*40)
@@ -366,6 +466,43 @@ def main():
         print(f"Memory limit: {memory_summary['memory_limit_mb']}MB")
         print(f"Memory warnings: {memory_summary['memory_warnings']}")
         print(f"Memory efficiency: {memory_summary['peak_memory_mb']/memory_summary['memory_limit_mb']*100:.1f}% of limit")
+        chunk_sizing = summary.get('chunk_sizing')
+        if chunk_sizing:
+            print(f"Chunk sizes: {chunk_sizing['initial_size']:,} -> {chunk_sizing['final_size']:,} rows "
+                  f"(range {chunk_sizing['smallest_size']:,}-{chunk_sizing['largest_size']:,}, "
+                  f"{chunk_sizing['adjustment_count']} adjustments, {chunk_sizing['backoffs']} back-offs)")
+        accumulated = summary.get('partition_accumulator')
+        if accumulated:
+            print(f"Partition uploads: {accumulated['uploads']:,} for {accumulated['slices_appended']:,} chunk slices "
+                  f"({accumulated['puts_avoided']:,} PUTs / {accumulated['gets_avoided']:,} GETs avoided, "
+                  f"peak spill {accumulated['peak_spill_mb']:.1f}MB)")
+        bundle = summary.get('dimension_bundle')
+        if bundle:
+            print(f"Dimension bundle: {'rebuilt' if bundle['rebuilt'] else 'reused'} "
+                  f"(build {bundle['build_seconds']:.1f}s, load {bundle['load_seconds']:.3f}s)")
+        fanout = summary.get('fanout')
+        if fanout and fanout['chunks']:
+            print(f"Provider fan-out: {fanout['fact_rows']:,} fact rows -> {fanout['expanded_rows']:,} expanded rows "
+                  f"(mean {fanout['mean_ratio']:.1f}x, max {fanout['max_ratio']:.1f}x in chunk {fanout['max_ratio_chunk']}); "
+                  f"{fanout['output_rows']:,} rows written")
+        streaming = summary.get('streaming')
+        if streaming:
+            print(f"Streaming engine: {streaming['staged_partitions']:,} partitions staged "
+                  f"({streaming['staged_rows']:,} rows, {streaming['staged_mb']:.1f}MB) in {streaming['stage_seconds']:.1f}s; "
+                  f"{streaming['uploaded']:,} uploaded, {streaming['merged']:,} merged in {streaming['sync_seconds']:.1f}s")
+        incremental = summary.get('incremental')
+        if incremental:
+            skipped = incremental.get('partitions_skipped')
+            print(f"Fact ledger ({incremental['mode']}"
+                  f"{': ' + incremental['reset_reason'] if incremental['reset_reason'] else ''}): "
+                  f"{incremental['rows_new']:,} new, {incremental['rows_changed']:,} changed, "
+                  f"{incremental['rows_skipped']:,} skipped rows; {incremental['partitions_written']:,} partitions written"
+                  f"{f', {skipped:,} skipped' if skipped is not None else ''}"
+                  f"{'' if incremental['committed'] else ' (ledger not committed)'}")
+        index = summary.get('partition_index')
+        if index:
+            print(f"Partition index: {index['objects_listed']:,} existing partitions from "
+                  f"{index['list_requests']:,} LIST requests ({index['heads_avoided']:,} HEADs avoided)")
         print("="*60)
         
         logger.info("Memory-Optimized ETL3 Pipeline completed successfully!")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the categorical schema mode (utils/categorical_schema.py).
+
+ETL1 with categorical_columns must write the same fact rows with dictionary
+pages, and ETL3's enrichment of categorical chunks must decode to exactly the
+rows it builds from String chunks.
+"""
+
+import sys
+import logging
+import tempfile
+from pathlib import Path
+
+import polars as pl
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from categorical_schema import (LOW_CARDINALITY_COLUMNS, encode_categoricals, decode_categoricals, present_columns,
+                                categorical_mode)
+from parquet_batches import ParquetBatchReader
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+from ETL.ETL_3 import _enrich_fact_table, merge_partition_data
+from test_etl1_parallel import _write_inputs, _sorted
+
+logging.getLogger("ETL.ETL_3").setLevel(logging.ERROR)
+
+
+def _run_etl1(data_root: Path, categorical: bool) -> dict:
+    config = ETL1Config(data_root=data_root, log_file=None, log_level="WARNING")
+    config.chunk_size = 700
+    config.categorical_columns = categorical
+    with ScalableETL1(config) as etl:
+        return etl.run_pipeline("aetna")["output_files"]
+
+
+def test_etl1_categorical_output():
+    """Categorical mode writes the same fact rows, with dictionary pages"""
+    with tempfile.TemporaryDirectory() as plain_tmp, tempfile.TemporaryDirectory() as cat_tmp:
+        outputs = {}
+        for tmp, categorical in ((plain_tmp, False), (cat_tmp, True)):
+            (Path(tmp) / "input").mkdir()
+            _write_inputs(Path(tmp) / "input")
+            outputs[categorical] = _run_etl1(Path(tmp), categorical)
+
+        for name, path in outputs[False].items():
+            expected = _sorted(pl.read_parquet(path))
+            actual = _sorted(decode_categoricals(pl.read_parquet(outputs[True][name])))
+            assert expected.equals(actual), f"{name} differs"
+
+        fact_path = outputs[True]["fact_rate"]
+        # The merged output keeps the chunks' categorical dtypes
+        schema = pl.read_parquet_schema(fact_path)
+        assert all(schema[name] == pl.Categorical for name in present_columns(schema))
+        assert pl.read_parquet_schema(outputs[False]["fact_rate"])["billing_class"] == pl.Utf8
+        row_group = pq.ParquetFile(fact_path).metadata.row_group(0)
+        encoded = present_columns(pl.read_parquet_schema(fact_path))
+        assert len(encoded) == len(LOW_CARDINALITY_COLUMNS)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            if column.path_in_schema in encoded:
+                assert column.has_dictionary_page, f"{column.path_in_schema} lost its dictionary pages"
+
+
+def test_etl3_enrich_categorical():
+    """Enriching categorical chunks gives the same rows as String chunks, in either ETL3 mode"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(tmp)
+        (data_root / "input").mkdir()
+        _write_inputs(data_root / "input")
+        outputs = _run_etl1(data_root, categorical=True)
+
+        dims = {
+            "code": pl.read_parquet(outputs["dim_code"]),
+            "payer": pl.read_parquet(outputs["dim_payer"]),
+            "provider_group": pl.read_parquet(outputs["dim_provider_group"]),
+            "pos_set": pl.read_parquet(outputs["dim_pos_set"]),
+        }
+        xrefs = {"pg_member_tin": pl.read_parquet(outputs["xref_pg_tin"])}
+        cat_dims = {name: encode_categoricals(df) for name, df in dims.items()}
+
+        fact_path = outputs["fact_rate"]
+        plain = ParquetBatchReader(fact_path, 1_000)
+        categorical = ParquetBatchReader(fact_path, 1_000,
+                                         read_dictionary=present_columns(pl.read_parquet_schema(fact_path)))
+        for plain_chunk, cat_chunk in zip(plain, categorical):
+            assert cat_chunk.schema["billing_class"] == pl.Categorical
+            # Without categorical mode ETL3 decodes the categorical fact file
+            plain_chunk = categorical_mode(plain_chunk, categorical=False)
+            assert plain_chunk.schema["billing_class"] == pl.Utf8
+            assert categorical_mode(plain_chunk, categorical=True).schema["billing_class"] == pl.Categorical
+            expected = _enrich_fact_table(plain_chunk, dims, xrefs)
+            actual = _enrich_fact_table(cat_chunk, cat_dims, xrefs)
+            assert actual.schema["code_type"] == pl.Categorical
+            assert actual["code_description"].null_count() == expected["code_description"].null_count()
+            assert _sorted(expected).equals(_sorted(decode_categoricals(actual)))
+
+
+def test_merge_across_modes():
+    """An existing String partition merges with new categorical rows"""
+    existing = pl.DataFrame({"fact_uid": ["a", "b"], "billing_class": ["professional", "institutional"]})
+    new = encode_categoricals(pl.DataFrame({"fact_uid": ["b", "c"], "billing_class": ["professional", "professional"]}))
+    merged = merge_partition_data(existing, new).sort("fact_uid")
+    assert merged["fact_uid"].to_list() == ["a", "b", "c"]
+    assert merged["billing_class"].cast(pl.Utf8).to_list() == ["professional", "professional", "professional"]
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("ETL1 categorical output", test_etl1_categorical_output),
+        ("ETL3 enrich categorical", test_etl3_enrich_categorical),
+        ("Merge across modes", test_merge_across_modes),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
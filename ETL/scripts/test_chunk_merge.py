@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the key-aware temp chunk merge (utils/chunk_merge.py).
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from chunk_merge import ChunkMerger
+
+
+def _write_chunks(temp_dir: Path, chunks) -> list:
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for idx, chunk in enumerate(chunks):
+        path = temp_dir / f"dim_code_chunk_{idx:06d}.parquet"
+        chunk.write_parquet(path)
+        paths.append(path)
+    return paths
+
+
+def _chunks():
+    """Key (CPT, 99213) appears in every chunk; the last occurrence has a null description."""
+    return [
+        pl.DataFrame({"code_type": ["CPT", "CPT"], "code": ["99213", "99214"], "code_description": ["v0", "a"]}),
+        pl.DataFrame({"code_type": ["CPT", "CPT"], "code": ["99213", "99213"], "code_description": ["v1", "v2"]}),
+        pl.DataFrame({"code_type": ["HCPCS"], "code": ["J1100"], "code_description": ["b"]}),
+        pl.DataFrame({"code_type": ["CPT"], "code": ["99213"], "code_description": [None]},
+                     schema_overrides={"code_description": pl.Utf8}),
+        pl.DataFrame({"code_type": ["CPT"], "code": ["99214"], "code_description": ["a2"]}),
+    ]
+
+
+def _merge(fan_in: int, keys) -> pl.DataFrame:
+    with tempfile.TemporaryDirectory() as tmp:
+        dims_dir = Path(tmp)
+        files = _write_chunks(dims_dir / "temp_chunks", _chunks())
+        output = dims_dir / "dim_code.parquet"
+        merger = ChunkMerger(memory_limit_mb=256, spill_dir=dims_dir / "temp_chunks" / "spill", fan_in=fan_in)
+        stats = merger.merge("dim_code", files, output, keys)
+        assert stats.rows_written == pl.read_parquet(output).height
+        assert stats.bytes_read > 0 and stats.bytes_written > 0
+        assert not list((dims_dir / "temp_chunks").glob("dim_code_run_*"))
+        return pl.read_parquet(output).sort(["code_type", "code"])
+
+
+def test_last_wins_on_keys():
+    """Latest chunk (and latest row within a chunk) wins, including null values"""
+    merged = _merge(fan_in=10, keys=["code_type", "code"])
+    assert merged.columns == ["code_type", "code", "code_description"]
+    assert merged.rows() == [("CPT", "99213", None), ("CPT", "99214", "a2"), ("HCPCS", "J1100", "b")]
+
+
+def test_multi_pass_matches_single_pass():
+    """Intermediate runs keep the original chunk order"""
+    single = _merge(fan_in=10, keys=["code_type", "code"])
+    for fan_in in (2, 3):
+        assert _merge(fan_in=fan_in, keys=["code_type", "code"]).equals(single)
+
+
+def test_no_keys_concatenates():
+    """Tables without keys keep every row"""
+    merged = _merge(fan_in=2, keys=[])
+    assert merged.height == sum(c.height for c in _chunks())
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Last wins on keys", test_last_wins_on_keys),
+        ("Multi-pass matches single pass", test_multi_pass_matches_single_pass),
+        ("No keys concatenates", test_no_keys_concatenates),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
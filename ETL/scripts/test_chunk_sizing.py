@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive chunk sizing (utils/chunk_sizing.py).
+
+Checks the controller against a simulated memory model, the reader's
+variable-size chunking, and that adaptive ETL1 runs (including a resumed one)
+produce the same outputs as fixed-size runs.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from chunk_sizing import AdaptiveChunkSizer
+from parquet_batches import ParquetBatchReader
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+from test_etl1_parallel import _write_inputs, _sorted
+
+
+def _simulate(sizer: AdaptiveChunkSizer, mb_per_row: float, baseline_mb: float, chunks: int):
+    """Feed the sizer a linear memory model and return the sizes it chose."""
+    sizes = []
+    for _ in range(chunks):
+        size = sizer.next_size()
+        sizes.append(size)
+        sizer.observe(size, baseline_mb + size * mb_per_row)
+    return sizes
+
+
+def test_grows_to_target():
+    """With headroom the size doubles per chunk and settles at the target"""
+    sizer = AdaptiveChunkSizer(1_000, memory_limit_mb=1_000, baseline_mb=100, max_size=10**7)
+    sizes = _simulate(sizer, mb_per_row=0.001, baseline_mb=100, chunks=12)
+    assert sizes[:4] == [1_000, 2_000, 4_000, 8_000]
+    # target is 60% of 1000MB: (600 - 100) / 0.001 rows
+    assert abs(sizes[-1] - 500_000) <= 500_000 * sizer.deadband
+    assert sizes[-1] == sizes[-2]
+
+
+def test_backs_off_under_pressure():
+    """Memory above the pressure mark cuts the size at once, down to what fits"""
+    sizer = AdaptiveChunkSizer(200_000, memory_limit_mb=1_000, baseline_mb=100)
+    sizes = _simulate(sizer, mb_per_row=0.005, baseline_mb=100, chunks=3)
+    # 200k rows at 5MB per 1k rows = 1100MB; 500MB of budget fits 100k rows
+    assert sizes[0] == 200_000
+    assert sizes[1] <= 100_000
+    assert sizer.backoffs == 1
+    assert sizer.summary()["adjustments"][0]["reason"] == "pressure"
+
+
+def test_respects_bounds():
+    """Chosen sizes never leave [min_size, max_size]"""
+    sizer = AdaptiveChunkSizer(1_000, memory_limit_mb=500, baseline_mb=450, min_size=200, max_size=5_000)
+    sizes = _simulate(sizer, mb_per_row=0.5, baseline_mb=450, chunks=5)
+    assert min(sizes) >= 200 and max(sizes) <= 5_000
+    sizer = AdaptiveChunkSizer(1_000, memory_limit_mb=10_000, baseline_mb=10, min_size=200, max_size=5_000)
+    assert max(_simulate(sizer, mb_per_row=0.0001, baseline_mb=10, chunks=10)) == 5_000
+
+
+def test_reader_variable_sizes():
+    """iter_sized cuts each chunk at the size asked for and covers every row once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "data.parquet"
+        pl.DataFrame({"x": range(10_000)}).write_parquet(path, row_group_size=1_500)
+        sizes = iter([100, 2_500, 7, 4_000, 10_000])
+        reader = ParquetBatchReader(path, chunk_size=1_000)
+        chunks = list(reader.iter_sized(lambda: next(sizes), start_row=50))
+        assert [c.height for c in chunks] == [100, 2_500, 7, 4_000, 3_343]
+        assert pl.concat(chunks)["x"].to_list() == list(range(50, 10_000))
+
+
+def _run(data_root: Path, **overrides) -> dict:
+    config = ETL1Config(data_root=data_root, log_file=None, log_level="WARNING")
+    config.chunk_size = 400
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    with ScalableETL1(config) as etl:
+        summary = etl.run_pipeline("aetna")
+    summary["outputs"] = {name: _sorted(pl.read_parquet(path)) for name, path in summary["output_files"].items()}
+    return summary
+
+
+def test_adaptive_run_matches_fixed():
+    """Adaptive chunking changes chunk boundaries but not the outputs"""
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "input").mkdir()
+        _write_inputs(Path(tmp) / "input")
+        fixed = _run(Path(tmp), resume=False)
+        adaptive = _run(Path(tmp), resume=False, adaptive_chunk_size=True, min_chunk_size=100)
+
+    assert adaptive["processed_rates"] == fixed["processed_rates"]
+    assert adaptive["chunk_sizing"]["rates"]["chunks_observed"] > 0
+    assert fixed["chunk_sizing"] == {}
+    for name, expected in fixed["outputs"].items():
+        assert expected.equals(adaptive["outputs"][name]), f"{name} differs"
+
+
+def test_adaptive_resume():
+    """An interrupted adaptive run resumes after its completed chunks with the same outputs"""
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "input").mkdir()
+        _write_inputs(Path(tmp) / "input")
+        expected = _run(Path(tmp), resume=False)["outputs"]
+
+        config = ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING")
+        config.chunk_size = 400
+        config.adaptive_chunk_size = True
+        config.min_chunk_size = 100
+        with ScalableETL1(config) as etl:
+            original_write = etl.write_chunk_to_temp
+
+            def failing_write(df, output_path, table_name, chunk_idx):
+                if table_name == "fact_rate" and chunk_idx == 2:
+                    raise RuntimeError("interrupted")
+                return original_write(df, output_path, table_name, chunk_idx)
+
+            etl.write_chunk_to_temp = failing_write
+            try:
+                etl.run_pipeline("aetna")
+                assert False, "pipeline should have been interrupted"
+            except RuntimeError:
+                pass
+
+        resumed = _run(Path(tmp), adaptive_chunk_size=True, min_chunk_size=100)
+
+    assert resumed["run_mode"] == "resume"
+    assert resumed["resumed_chunks"]["rates"] == 2
+    assert resumed["processed_rates"] == 3_000
+    for name, frame in expected.items():
+        assert frame.equals(resumed["outputs"][name]), f"{name} differs"
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Grows to target", test_grows_to_target),
+        ("Backs off under pressure", test_backs_off_under_pressure),
+        ("Respects bounds", test_respects_bounds),
+        ("Reader variable sizes", test_reader_variable_sizes),
+        ("Adaptive run matches fixed", test_adaptive_run_matches_fixed),
+        ("Adaptive resume", test_adaptive_resume),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
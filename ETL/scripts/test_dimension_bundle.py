@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Tests for the precomputed dimension bundle (utils/dimension_bundle.py).
+
+Synthetic dims with the schemas ETL1 and the NPPES fetchers write (including
+the awkward cases: duplicate dim keys, pg_uids missing from dim_provider_group,
+NPIs without a LOCATION address, codes without a category) are enriched both
+through the per-dim joins of _enrich_fact_table and through the bundle; the
+results must match in rows, column names, order and dtypes. The bundle must
+be reused while the dims are unchanged and rebuilt when their content changes.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from dimension_bundle import DimensionBundle
+from categorical_schema import enable_global_categories, encode_categoricals
+from ETL.ETL_3 import _enrich_fact_table
+
+
+def _dims() -> dict:
+    """Dimension and xref tables keyed by their ETL3Config names."""
+    return {
+        'code': pl.DataFrame({
+            'code_type': ['CPT', 'CPT', 'CPT', 'HCPCS'],
+            'code': ['99213', '99214', '99214', 'J1100'],
+            'code_description': ['Office visit', 'Office visit', 'Office visit (est.)', 'Dexamethasone'],
+            'code_name': ['OV3', 'OV4', 'OV4', 'DEXA'],
+        }),
+        'code_cat': pl.DataFrame({
+            'proc_cd': ['99213', '99214', '70450'],
+            'proc_set': ['E&M', 'E&M', 'Imaging'],
+            'proc_class': ['Office', 'Office', 'CT'],
+            'proc_group': ['Visits', 'Visits', 'Head'],
+        }),
+        'payer': pl.DataFrame({
+            'payer_slug': ['aetna', 'cigna'],
+            'reporting_entity_name': ['Aetna Inc', 'Cigna Corp'],
+            'version': ['1.0', '2.0'],
+        }),
+        'provider_group': pl.DataFrame({
+            'pg_uid': ['pg1', 'pg2', 'pg3'],
+            'payer_slug': ['aetna', 'aetna', 'cigna'],
+            'provider_group_id_raw': ['1', '2', '3'],
+            'version': ['1.0', '1.0', '2.0'],
+        }),
+        'pos_set': pl.DataFrame({
+            'pos_set_id': ['none', 'ps1'],
+            'pos_members': [[], ['11', '22']],
+        }),
+        'npi': pl.DataFrame({
+            'npi': [1001, 1002, 1003, 1004],
+            'primary_taxonomy_code': ['207Q00000X', '208D00000X', None, '207R00000X'],
+            'provider_name': ['A', 'B', 'C', 'D'],
+        }),
+        'npi_address_geo': pl.DataFrame({
+            'npi': [1001, 1001, 1001, 1002, 1004],
+            'address_purpose': ['LOCATION', 'LOCATION', 'MAILING', 'LOCATION', 'MAILING'],
+            'state': ['GA', 'FL', 'GA', 'AL', 'TX'],
+            'latitude': [33.7, 25.8, 33.7, 32.4, 29.8],
+            'longitude': [-84.4, -80.2, -84.4, -86.3, -95.4],
+            'county_name': ['Fulton', 'Miami-Dade', 'Fulton', 'Montgomery', 'Harris'],
+            'county_fips': ['13121', '12086', '13121', '01101', '48201'],
+            'stat_area_name': ['Atlanta', 'Miami', 'Atlanta', 'Montgomery', 'Houston'],
+            'stat_area_code': ['12060', '33100', '12060', '33860', '26420'],
+            'matched_address': ['1 Peachtree', '2 Ocean', 'PO Box 1', '3 Dexter', 'PO Box 2'],
+        }),
+    }, {
+        'pg_member_npi': pl.DataFrame({
+            'pg_uid': ['pg1', 'pg1', 'pg2', 'pg4', 'pg4'],
+            'npi': [1001, 1002, 1003, 1004, 1001],
+        }),
+        'pg_member_tin': pl.DataFrame({
+            'pg_uid': ['pg1', 'pg2', 'pg2', 'pg5'],
+            'tin_type': ['ein', 'ein', 'npi', 'ein'],
+            'tin_value': ['11-111', '22-222', '1003', '55-555'],
+        }),
+    }
+
+
+def _fact() -> pl.DataFrame:
+    rows = [
+        ('CPT', '99213', 'aetna', 'pg1', 'none'),
+        ('CPT', '99214', 'aetna', 'pg2', 'ps1'),
+        ('HCPCS', 'J1100', 'cigna', 'pg3', 'ps1'),
+        ('CPT', '70450', 'aetna', 'pg4', 'none'),   # code only in code_cat
+        ('CPT', '99999', 'uhc', 'pg5', 'ps9'),      # unknown code, payer and POS set
+        ('CPT', '99213', 'aetna', 'pg9', 'none'),   # pg_uid nowhere
+        ('CPT', '99213', 'aetna', None, 'none'),
+    ]
+    return pl.DataFrame({
+        'fact_uid': [f"f{i}" for i in range(len(rows))],
+        'state': ['GA'] * len(rows),
+        'year_month': ['2025-08'] * len(rows),
+        'payer_slug': [r[2] for r in rows],
+        'billing_class': ['professional'] * len(rows),
+        'code_type': [r[0] for r in rows],
+        'code': [r[1] for r in rows],
+        'pg_uid': [r[3] for r in rows],
+        'pos_set_id': [r[4] for r in rows],
+        'negotiated_type': ['negotiated'] * len(rows),
+        'negotiation_arrangement': ['ffs'] * len(rows),
+        'negotiated_rate': [float(i) for i in range(len(rows))],
+        'expiration_date': ['9999-12-31'] * len(rows),
+        'provider_group_id_raw': ['1'] * len(rows),
+        'reporting_entity_name': ['Aetna Inc'] * len(rows),
+    })
+
+
+def _write(root: Path, dims: dict, xrefs: dict):
+    dim_paths = {name: root / f"dim_{name}.parquet" for name in dims}
+    xref_paths = {name: root / f"xref_{name}.parquet" for name in xrefs}
+    for name, df in dims.items():
+        df.write_parquet(dim_paths[name])
+    for name, df in xrefs.items():
+        df.write_parquet(xref_paths[name])
+    return dim_paths, xref_paths
+
+
+def _sorted(df: pl.DataFrame) -> pl.DataFrame:
+    keys = [name for name, dtype in df.schema.items() if not isinstance(dtype, pl.List)]
+    return df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8).name.suffix('__sort')) \
+        .sort([f"{k}__sort" if df.schema[k] == pl.Categorical else k for k in keys], nulls_last=True) \
+        .select(df.columns)
+
+
+def _check_matches(categorical: bool):
+    dims, xrefs = _dims()
+    fact = _fact()
+    if categorical:
+        enable_global_categories()
+        fact = encode_categoricals(fact)
+    with tempfile.TemporaryDirectory() as tmp:
+        dim_paths, xref_paths = _write(Path(tmp), dims, xrefs)
+        bundle = DimensionBundle.load_or_build(Path(tmp) / "bundle", dim_paths, xref_paths,
+                                               fact.columns, categorical=categorical)
+        if categorical:
+            dims = {name: encode_categoricals(df) for name, df in dims.items()}
+        expected = _enrich_fact_table(fact, dims, xrefs)
+        actual = _enrich_fact_table(fact, {}, {}, bundle=bundle)
+
+        assert actual.columns == expected.columns, f"{actual.columns} != {expected.columns}"
+        assert actual.schema == expected.schema
+        assert actual.height == expected.height > fact.height
+        assert _sorted(actual).equals(_sorted(expected))
+
+
+def test_matches_per_dim_joins():
+    """Bundle enrichment equals the per-dim joins (rows, names, order, dtypes)"""
+    _check_matches(categorical=False)
+
+
+def test_matches_per_dim_joins_categorical():
+    """Same in categorical mode, where join keys and dims are categoricals"""
+    _check_matches(categorical=True)
+
+
+def test_reused_until_dims_change():
+    """The bundle is rebuilt only when a source's content or the fact schema changes"""
+    dims, xrefs = _dims()
+    fact_columns = _fact().columns
+    with tempfile.TemporaryDirectory() as tmp:
+        dim_paths, xref_paths = _write(Path(tmp), dims, xrefs)
+        bundle_dir = Path(tmp) / "bundle"
+
+        def load(columns=fact_columns):
+            return DimensionBundle.load_or_build(bundle_dir, dim_paths, xref_paths, columns)
+
+        assert load().rebuilt
+        assert not load().rebuilt
+
+        # Touched but unchanged: re-hashed, not rebuilt
+        stat = dim_paths['payer'].stat()
+        os.utime(dim_paths['payer'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert not load().rebuilt
+
+        # Changed content: rebuilt, and the change is visible
+        dims['payer'].with_columns(pl.lit('Renamed').alias('reporting_entity_name')).write_parquet(dim_paths['payer'])
+        bundle = load()
+        assert bundle.rebuilt
+        assert set(bundle.payer['reporting_entity_name_right'].to_list()) == {'Renamed'}
+
+        # A different fact schema changes the output columns
+        assert load(fact_columns[:-1]).rebuilt
+
+
+def test_chunk_gathers_only_its_provider_groups():
+    """Only the chunk's provider groups are read from the provider table"""
+    dims, xrefs = _dims()
+    with tempfile.TemporaryDirectory() as tmp:
+        dim_paths, xref_paths = _write(Path(tmp), dims, xrefs)
+        bundle = DimensionBundle.load_or_build(Path(tmp) / "bundle", dim_paths, xref_paths, _fact().columns)
+        rows = bundle._provider_rows(pl.Series(['pg2', 'pg9', None, 'pg2']))
+        assert set(rows['pg_uid'].to_list()) == {'pg2'}
+        assert rows.height == bundle.provider.filter(pl.col('pg_uid') == 'pg2').height
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Matches per-dim joins", test_matches_per_dim_joins),
+        ("Matches per-dim joins (categorical)", test_matches_per_dim_joins_categorical),
+        ("Reused until dims change", test_reused_until_dims_change),
+        ("Chunk gathers only its provider groups", test_chunk_gathers_only_its_provider_groups),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
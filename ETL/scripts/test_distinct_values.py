@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for distinct-value evaluation of ETL1's Python normalizers
+(utils/distinct_values.py).
+
+The mapped columns must equal the per-row map_elements results they replace,
+while calling the normalizer only once per distinct value.
+"""
+
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from distinct_values import DistinctValueMapper
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+
+DATES = ["2025-08-01", "2025/07/15", "202506", "2025-05", "last update 2025/04", "", "garbage", None]
+SERVICE_CODES = ['["11","22"]', '["22","11"]', "11;22|33", "", "[1, null]", "[not json", None]
+NAMES = ["Aetna Life Insurance Co", "UnitedHealthcare", "BCBS of Georgia, Inc.", None]
+
+
+def _etl() -> ScalableETL1:
+    with tempfile.TemporaryDirectory() as tmp:
+        return ScalableETL1(ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING"))
+
+
+def _series(name: str, pool: list, rows: int, seed: int) -> pl.Series:
+    rng = random.Random(seed)
+    return pl.Series(name, [rng.choice(pool) for _ in range(rows)], dtype=pl.Utf8)
+
+
+def test_matches_map_elements():
+    """Each normalizer gives the same column as map_elements"""
+    etl = _etl()
+    cases = [
+        (etl.payer_slug_from_name, pl.Utf8, _series("reporting_entity_name", NAMES, 2_000, 1)),
+        (etl.normalize_yymm, pl.Utf8, _series("last_updated_on", DATES, 2_000, 2)),
+        (etl.normalize_service_codes, pl.List(pl.Utf8), _series("service_codes", SERVICE_CODES, 2_000, 3)),
+    ]
+    for func, dtype, series in cases:
+        expected = series.map_elements(func, return_dtype=dtype)
+        actual = DistinctValueMapper(func, dtype).map(series)
+        assert actual.name == series.name
+        assert actual.equals(expected), f"{func.__name__} differs"
+
+
+def test_one_call_per_distinct_value():
+    """Calls equal distinct values; later chunks with the same values hit the cache"""
+    etl = _etl()
+    mapper = DistinctValueMapper(etl.normalize_yymm, pl.Utf8)
+    for seed in range(5):
+        mapper.map(_series("last_updated_on", DATES, 1_000, seed))
+    stats = mapper.stats()
+    assert stats["rows"] == 5_000
+    assert stats["calls"] == len([d for d in DATES if d is not None])
+    assert stats["cache_hits"] == 4 * stats["calls"]
+
+
+def test_lru_eviction():
+    """The cache keeps only the most recently used results"""
+    calls = []
+    mapper = DistinctValueMapper(lambda v: calls.append(v) or v.upper(), pl.Utf8, cache_size=2)
+    mapper.map(pl.Series(["a", "b"]))
+    mapper.map(pl.Series(["a", "c"]))  # evicts b
+    mapper.map(pl.Series(["a", "b"]))
+    assert calls == ["a", "b", "c", "b"]
+
+
+def test_list_and_null_inputs():
+    """List values are passed as Python lists; all-null input maps to nulls"""
+    etl = _etl()
+    series = pl.Series("service_codes", [["22", "11"], None, ["11", "22", "11"], [], ["22", "11"]])
+    mapper = DistinctValueMapper(etl.normalize_service_codes, pl.List(pl.Utf8))
+    assert mapper.map(series).to_list() == [["11", "22"], None, ["11", "22"], [], ["11", "22"]]
+    assert mapper.stats()["calls"] == 3
+
+    nulls = mapper.map(pl.Series("service_codes", [None, None], dtype=pl.Utf8))
+    assert nulls.to_list() == [None, None] and nulls.dtype == pl.List(pl.Utf8)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Matches map_elements", test_matches_map_elements),
+        ("One call per distinct value", test_one_call_per_distinct_value),
+        ("LRU eviction", test_lru_eviction),
+        ("List and null inputs", test_list_and_null_inputs),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Parity test for ETL1 parallel chunk processing.
+
+Runs the pipeline on a small synthetic payer in serial mode and with a
+process pool, and checks that every dimension, xref and fact output holds
+the same rows.
+"""
+
+import os
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+
+
+def _write_inputs(input_dir: Path, rates_rows: int = 3_000, provider_rows: int = 1_200) -> None:
+    """Write synthetic rates/providers files for payer 'aetna'"""
+    rng = random.Random(11)
+    pos_choices = ['["11","22"]', '["02"]', "", None, '["11"]']
+    pl.DataFrame({
+        "last_updated_on": [rng.choice(["2025-08-01", "202507", None]) for _ in range(rates_rows)],
+        "reporting_entity_name": ["Aetna Life Insurance"] * rates_rows,
+        "version": ["1.0.0"] * rates_rows,
+        "billing_class": [rng.choice(["professional", "institutional"]) for _ in range(rates_rows)],
+        "billing_code_type": [rng.choice(["CPT", "HCPCS"]) for _ in range(rates_rows)],
+        "billing_code": [str(rng.randint(99201, 99260)) for _ in range(rates_rows)],
+        "service_codes": [rng.choice(pos_choices) for _ in range(rates_rows)],
+        "negotiated_type": ["negotiated"] * rates_rows,
+        "negotiation_arrangement": ["ffs"] * rates_rows,
+        "negotiated_rate": [round(rng.random() * 500, 2) for _ in range(rates_rows)],
+        "expiration_date": ["9999-12-31"] * rates_rows,
+        "description": ["office visit"] * rates_rows,
+        "name": ["E/M"] * rates_rows,
+        "provider_reference_id": [rng.randint(1, 300) for _ in range(rates_rows)],
+        "reporting_entity_type": ["health insurance issuer"] * rates_rows,
+    }).write_parquet(input_dir / "202508_aetna_ga_rates.parquet", row_group_size=700)
+
+    pl.DataFrame({
+        "last_updated_on": ["2025-08-01"] * provider_rows,
+        "reporting_entity_name": ["Aetna Life Insurance"] * provider_rows,
+        "version": ["1.0.0"] * provider_rows,
+        "provider_group_id": [rng.randint(1, 300) for _ in range(provider_rows)],
+        "npi": [rng.randint(1_000_000_000, 1_000_000_500) for _ in range(provider_rows)],
+        "tin_type": ["ein"] * provider_rows,
+        "tin_value": [str(rng.randint(100, 150)) for _ in range(provider_rows)],
+        "reporting_entity_type": ["health insurance issuer"] * provider_rows,
+    }).write_parquet(input_dir / "202508_aetna_ga_providers.parquet")
+
+
+def _run(data_root: Path, workers: int) -> dict:
+    config = ETL1Config(data_root=data_root, log_file=None, log_level="WARNING")
+    config.chunk_size = 700
+    config.workers = workers
+    with ScalableETL1(config) as etl:
+        summary = etl.run_pipeline("aetna")
+    return {name: pl.read_parquet(path) for name, path in summary["output_files"].items()}
+
+
+def _sorted(df: pl.DataFrame) -> pl.DataFrame:
+    cols = sorted(df.columns)
+    return df.select(cols).sort(cols, nulls_last=True)
+
+
+def test_parallel_matches_serial():
+    """workers=3 produces the same tables as the serial run and leaves the environment alone"""
+    with tempfile.TemporaryDirectory() as serial_tmp, tempfile.TemporaryDirectory() as parallel_tmp:
+        for tmp in (serial_tmp, parallel_tmp):
+            (Path(tmp) / "input").mkdir()
+            _write_inputs(Path(tmp) / "input")
+
+        environment = dict(os.environ)
+        serial = _run(Path(serial_tmp), workers=1)
+        parallel = _run(Path(parallel_tmp), workers=3)
+        # Worker thread settings stay out of this process's environment
+        assert dict(os.environ) == environment
+
+        assert serial.keys() == parallel.keys()
+        for name in serial:
+            assert _sorted(serial[name]).equals(_sorted(parallel[name])), f"{name} differs"
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Parallel matches serial", test_parallel_matches_serial),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
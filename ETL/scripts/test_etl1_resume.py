@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Checkpoint/resume tests for ETL1.
+
+Interrupts the pipeline mid-chunk and mid-merge, reruns it, and checks that
+the resumed run skips completed work and produces the same outputs as an
+uninterrupted run.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(Path(__file__).parent))
+
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+from test_etl1_parallel import _write_inputs, _sorted
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _config(data_root: Path) -> ETL1Config:
+    config = ETL1Config(data_root=data_root, log_file=None, log_level="WARNING")
+    config.chunk_size = 700
+    return config
+
+
+def _outputs(summary: dict) -> dict:
+    return {name: _sorted(pl.read_parquet(path)) for name, path in summary["output_files"].items()}
+
+
+def _reference() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "input").mkdir()
+        _write_inputs(Path(tmp) / "input")
+        with ScalableETL1(_config(Path(tmp))) as etl:
+            return _outputs(etl.run_pipeline("aetna"))
+
+
+def _assert_same(expected: dict, actual: dict):
+    assert expected.keys() == actual.keys()
+    for name in expected:
+        assert expected[name].equals(actual[name]), f"{name} differs"
+
+
+def test_resume_after_chunk_failure():
+    """A run killed inside rates chunk 3 resumes at chunk 3 with identical output"""
+    expected = _reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(tmp)
+        (data_root / "input").mkdir()
+        _write_inputs(data_root / "input")
+
+        with ScalableETL1(_config(data_root)) as etl:
+            original_write = etl.write_chunk_to_temp
+
+            def failing_write(df, output_path, table_name, chunk_idx):
+                if table_name == "fact_rate" and chunk_idx == 3:
+                    raise Interrupted()  # dims of chunk 3 are already on disk
+                return original_write(df, output_path, table_name, chunk_idx)
+
+            etl.write_chunk_to_temp = failing_write
+            try:
+                etl.run_pipeline("aetna")
+                assert False, "pipeline should have been interrupted"
+            except Interrupted:
+                pass
+
+        with ScalableETL1(_config(data_root)) as etl:
+            summary = etl.run_pipeline("aetna")
+
+        assert summary["run_mode"] == "resume"
+        assert summary["resumed_chunks"] == {"rates": 3, "providers": 0}
+        assert summary["processed_rates"] == 3_000
+        _assert_same(expected, _outputs(summary))
+
+
+def test_merge_only_and_up_to_date():
+    """A run killed during the merge skips straight to it; an unchanged rerun does nothing"""
+    expected = _reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(tmp)
+        (data_root / "input").mkdir()
+        _write_inputs(data_root / "input")
+
+        with ScalableETL1(_config(data_root)) as etl:
+            original_merge = etl.merge_temp_files
+
+            def failing_merge(output_path, table_name, keys, memory_limit_mb=None):
+                if table_name == "fact_rate":
+                    raise Interrupted()
+                return original_merge(output_path, table_name, keys, memory_limit_mb)
+
+            etl.merge_temp_files = failing_merge
+            try:
+                etl.run_pipeline("aetna")
+                assert False, "pipeline should have been interrupted"
+            except Interrupted:
+                pass
+
+        with ScalableETL1(_config(data_root)) as etl:
+            summary = etl.run_pipeline("aetna")
+        assert summary["run_mode"] == "merge_only"
+        assert list(summary["merge_stats"]) == ["fact_rate"]
+        _assert_same(expected, _outputs(summary))
+
+        with ScalableETL1(_config(data_root)) as etl:
+            summary = etl.run_pipeline("aetna")
+        assert summary["run_mode"] == "up_to_date"
+        _assert_same(expected, _outputs(summary))
+
+
+def test_changed_input_starts_fresh():
+    """Rewriting an input file invalidates the manifest"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(tmp)
+        (data_root / "input").mkdir()
+        _write_inputs(data_root / "input")
+
+        with ScalableETL1(_config(data_root)) as etl:
+            etl.run_pipeline("aetna")
+
+        _write_inputs(data_root / "input", rates_rows=2_000)
+        with ScalableETL1(_config(data_root)) as etl:
+            summary = etl.run_pipeline("aetna")
+        assert summary["run_mode"] == "fresh"
+        assert summary["processed_rates"] == 2_000
+
+
+def test_changed_settings_start_fresh():
+    """Settings that change chunk outputs invalidate the manifest of an interrupted run"""
+    def failing_merge(*args, **kwargs):
+        raise Interrupted()
+
+    changes = [
+        lambda config: setattr(config, 'categorical_columns', True),
+        lambda config: setattr(config, 'filter_seen_keys', False),
+        lambda config: setattr(config, 'adaptive_chunk_size', True),
+    ]
+    for change in changes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_root = Path(tmp)
+            (data_root / "input").mkdir()
+            _write_inputs(data_root / "input")
+
+            with ScalableETL1(_config(data_root)) as etl:
+                etl.merge_temp_files = failing_merge
+                try:
+                    etl.run_pipeline("aetna")
+                    assert False, "pipeline should have been interrupted"
+                except Interrupted:
+                    pass
+
+            config = _config(data_root)
+            change(config)
+            with ScalableETL1(config) as etl:
+                summary = etl.run_pipeline("aetna")
+            assert summary["run_mode"] == "fresh"
+            assert summary["processed_rates"] == 3_000
+
+    # Adaptive settings count only while adaptive sizing is on
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(tmp)
+        (data_root / "input").mkdir()
+        _write_inputs(data_root / "input")
+        with ScalableETL1(_config(data_root)) as etl:
+            inputs = etl.config.get_input_files("aetna")
+            fixed = etl._run_key("aetna", *inputs)
+            etl.config.max_chunk_size = 1_000
+            assert etl._run_key("aetna", *inputs) == fixed
+            etl.config.adaptive_chunk_size = True
+            adaptive = etl._run_key("aetna", *inputs)
+            etl.config.max_chunk_size = 2_000
+            assert etl._run_key("aetna", *inputs) != adaptive
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Resume after chunk failure", test_resume_after_chunk_failure),
+        ("Merge-only and up-to-date reruns", test_merge_only_and_up_to_date),
+        ("Changed input starts fresh", test_changed_input_starts_fresh),
+        ("Changed settings start fresh", test_changed_settings_start_fresh),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental ETL3 (utils/fact_ledger.py and the ledger steps of
+ETL_3.run_etl3_pipeline).
+
+The ledger is checked against a plain dict of the hashes it should hold, and
+an incremental publish (full run, then the delta of a later fact table merged
+into the same bucket) is compared with a full publish of the later table into
+a second bucket, against moto's in-process S3 (skipped without moto).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from fact_ledger import FactLedger
+from dimension_bundle import DimensionBundle
+from ETL.ETL_3 import _scan_fact_ledger, _finish_fact_ledger, _enrich_fact_table, _create_partitions_for_chunk
+from test_dimension_bundle import _dims, _fact, _write
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the publish test
+    mock_aws = None
+
+PREFIX = "partitioned-data"
+PARTITION_COLUMNS = ['payer_slug', 'state', 'billing_class', 'procedure_set', 'procedure_class',
+                     'primary_taxonomy_code', 'stat_area_name', 'year', 'month']
+SETTINGS = {'partition_columns': PARTITION_COLUMNS, 'compact_providers': False}
+
+
+def _facts(rows: int, offset: int = 0) -> pl.DataFrame:
+    return pl.DataFrame({
+        'fact_uid': [f"f{i}" for i in range(offset, offset + rows)],
+        'negotiated_rate': [float(i) for i in range(offset, offset + rows)],
+    })
+
+
+def _ledger(root: Path, **kwargs) -> FactLedger:
+    sources = {'dim_code': root / "dim_code.parquet"}
+    return FactLedger(root / "ledger", sources, kwargs.pop('settings', SETTINGS), **kwargs)
+
+
+def _published(ledger: FactLedger) -> dict:
+    return dict(zip(np.asarray(ledger.keys).tolist(), np.asarray(ledger.vals).tolist()))
+
+
+def test_only_new_and_changed_rows_pass():
+    """After a commit, unchanged rows are skipped; new and changed rows pass and are recorded"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        pl.DataFrame({'code': ['1']}).write_parquet(root / "dim_code.parquet")
+        first = _facts(1000)
+        ledger = _ledger(root)
+        assert not ledger.incremental and ledger.changed_mask(first).all()
+        ledger.commit()
+
+        second = pl.concat([
+            first.with_columns(pl.when(pl.col('fact_uid') == 'f7').then(-1.0)
+                               .otherwise(pl.col('negotiated_rate')).alias('negotiated_rate')),
+            _facts(10, offset=1000),
+        ])
+        ledger = _ledger(root)
+        assert ledger.incremental and len(ledger) == 1000
+        mask = ledger.changed_mask(second)
+        assert second.filter(pl.Series(mask))['fact_uid'].to_list() == ['f7'] + [f"f{i}" for i in range(1000, 1010)]
+        assert (ledger.rows_new, ledger.rows_changed, ledger.stats()['rows_skipped']) == (10, 1, 999)
+        ledger.commit()
+
+        ledger = _ledger(root)
+        assert len(ledger) == 1010 and not ledger.changed_mask(second).any()
+
+
+def test_commit_merges_in_blocks():
+    """Commits in small blocks give the same sorted key -> last row hash map as a dict"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        pl.DataFrame({'code': ['1']}).write_parquet(root / "dim_code.parquet")
+        rng = np.random.default_rng(7)
+        expected = {}
+        for _ in range(4):
+            ledger = _ledger(root)
+            ledger.MERGE_BLOCK = 37
+            uids = rng.integers(0, 3000, size=800)
+            chunk = pl.DataFrame({'fact_uid': [f"f{u}" for u in uids],
+                                  'negotiated_rate': rng.integers(0, 3, size=800).astype(float)})
+            ledger.changed_mask(chunk)
+            key_hashes = chunk.select('fact_uid').hash_rows(seed=0x5EED).to_list()
+            row_hashes = chunk.hash_rows(seed=0xD1A5).to_list()
+            expected.update(zip(key_hashes, row_hashes))
+            ledger.commit()
+            assert np.all(np.diff(np.asarray(ledger.keys).astype(np.float64)) >= 0)
+            assert _published(ledger) == expected
+        assert len(list((root / "ledger").glob("*.npy"))) == 2
+
+
+def test_signature_change_and_full_refresh_reset():
+    """A changed dimension file, setting or --full-refresh starts from an empty ledger; incremental is opt-in"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        pl.DataFrame({'code': ['1']}).write_parquet(root / "dim_code.parquet")
+        ledger = _ledger(root)
+        ledger.changed_mask(_facts(50))
+        ledger.commit()
+
+        assert _ledger(root).incremental
+        assert "full refresh" in _ledger(root, full_refresh=True).reset_reason
+        changed = _ledger(root, settings={**SETTINGS, 'compact_providers': True})
+        assert not changed.incremental and "compact_providers" in changed.reset_reason
+
+        pl.DataFrame({'code': ['2']}).write_parquet(root / "dim_code.parquet")
+        changed = _ledger(root)
+        assert not changed.incremental and "dim_code" in changed.reset_reason
+        assert changed.changed_mask(_facts(50)).all()
+
+        # Incremental publishing is append-only, so ETL3 runs it only when asked
+        from ETL.ETL_3 import ETL3Config
+        assert not ETL3Config(str(root / "missing.yaml")).INCREMENTAL
+
+
+def _config(root: Path, fact_path: Path, dim_paths, xref_paths, bucket: str, full_refresh: bool = False):
+    return SimpleNamespace(
+        FACT_RATE_PATH=fact_path, DIM_PATHS=dim_paths, XREF_PATHS=xref_paths,
+        PARTITION_COLUMNS=PARTITION_COLUMNS, CATEGORICAL_COLUMNS=False, COMPACT_PROVIDERS=True,
+        S3_BUCKET=bucket, STORAGE_URI=f"s3://{bucket}", S3_PREFIX=PREFIX, FACT_LEDGER_DIR=root / f"ledger_{bucket}",
+        FACT_DELTA_PATH=root / "fact_delta.parquet", FULL_REFRESH=full_refresh, CHUNK_SIZE=4,
+    )
+
+
+def _run(config, bundle: DimensionBundle, s3_etl) -> dict:
+    """
+    The chunked engine's ledger steps around one enrich-and-write pass
+    (compact providers: the chunked engine writes a brand-new partition's
+    expanded rows as they are, and only a later merge collapses them)
+    """
+    ledger, fact_path = _scan_fact_ledger(config)
+    written = set()
+    if fact_path is not None:
+        rows = _enrich_fact_table(pl.read_parquet(fact_path), {}, {}, bundle=bundle, compact_providers=True)
+        written.update(_create_partitions_for_chunk(rows, PARTITION_COLUMNS, s3_etl, PREFIX))
+    assert not s3_etl.close()
+    return _finish_fact_ledger(config, ledger, s3_etl, written, failures=0)
+
+
+def _bucket_contents(s3_etl) -> dict:
+    """Partition key (without the bucket) -> rows"""
+    return {path.split('/', 3)[3]: s3_etl.read_partition(path).sort('fact_uid')
+            for path in s3_etl.list_partitions(PREFIX)}
+
+
+def test_incremental_publish_matches_full_publish():
+    """Full run then an incremental run over a later fact table equals a full run of the later table"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    from s3_etl_utils import S3PartitionedETL
+
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        root = Path(tmp)
+        dims, xrefs = _dims()
+        dims['code'] = dims['code'].unique(['code_type', 'code'], keep='first', maintain_order=True)
+        dim_paths, xref_paths = _write(root, dims, xrefs)
+        august = _fact()
+        september = august.with_columns((pl.lit('2025-09-') + pl.col('fact_uid')).alias('fact_uid'),
+                                        pl.lit('2025-09').alias('year_month'))
+        later = pl.concat([
+            august.with_columns(pl.when(pl.col('fact_uid') == 'f1').then(99.0)
+                                .otherwise(pl.col('negotiated_rate')).alias('negotiated_rate')),
+            september,
+        ])
+        august.write_parquet(root / "august.parquet")
+        later.write_parquet(root / "later.parquet")
+        bundle = DimensionBundle.load_or_build(root / "bundle", dim_paths, xref_paths, august.columns)
+
+        def s3(bucket):
+            s3_etl = S3PartitionedETL(bucket, "us-east-1")
+            s3_etl.s3_client.create_bucket(Bucket=bucket)
+            s3_etl.load_partition_index(PREFIX)
+            return s3_etl
+
+        first = _run(_config(root, root / "august.parquet", dim_paths, xref_paths, "incremental"),
+                     bundle, s3("incremental"))
+        assert first['mode'] == 'full' and first['committed']
+        incremental_etl = s3("incremental")
+        august_partitions = _bucket_contents(incremental_etl)
+        second = _run(_config(root, root / "later.parquet", dim_paths, xref_paths, "incremental"),
+                      bundle, incremental_etl)
+        assert second['mode'] == 'incremental' and second['committed']
+        assert (second['rows_new'], second['rows_changed'], second['rows_skipped']) == (september.height, 1,
+                                                                                      august.height - 1)
+        # Only f1's August partition is rewritten; the rest of August is skipped
+        assert second['partitions_written'] == len(_bucket_contents(incremental_etl)) - len(august_partitions) + 1
+        assert second['partitions_skipped'] == len(august_partitions) - 1 > 0
+
+        full_etl = s3("full")
+        _run(_config(root, root / "later.parquet", dim_paths, xref_paths, "full"), bundle, full_etl)
+
+        incremental = _bucket_contents(incremental_etl)
+        full = _bucket_contents(full_etl)
+        assert incremental.keys() == full.keys()
+        for key in full:
+            assert incremental[key].equals(full[key]), key
+
+        third = _run(_config(root, root / "later.parquet", dim_paths, xref_paths, "incremental"),
+                     bundle, s3("incremental"))
+        assert third['rows_skipped'] == later.height and third['partitions_written'] == 0
+        assert not (root / "fact_delta.parquet").exists()
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Only new and changed rows pass", test_only_new_and_changed_rows_pass),
+        ("Commit merges in blocks", test_commit_merges_in_blocks),
+        ("Signature change and full refresh reset", test_signature_change_and_full_refresh_reset),
+        ("Incremental publish matches full publish", test_incremental_publish_matches_full_publish),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the vectorized surrogate key hashing module.
+
+Checks that key_hashing produces exactly the same md5 hex values as the
+per-row ScalableETL1 helpers, on both the batched hashlib path (small chunks)
+and the native DuckDB path (large chunks).
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+import key_hashing
+from key_hashing import with_md5, pg_uid_key, pos_set_key, fact_uid
+
+
+def _make_etl(tmp: str) -> ScalableETL1:
+    config = ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING")
+    return ScalableETL1(config)
+
+
+def _edge_case_chunk() -> pl.DataFrame:
+    """Rows covering nulls, empty sets, unicode and awkward float formatting."""
+    return pl.DataFrame({
+        "state": ["GA", "GA", None, "GA", "GA", "GA", "GA"],
+        "year_month": ["2025-08", "", "2025-07", None, "2025-08", "2025-08", "2025-08"],
+        "payer_slug": ["aetna", None, "aetna", "überhealth", "aetna", "aetna", "aetna"],
+        "version": ["1.0.0", "1.0.0", None, "1.0.0", "1.0.0", "1.0.0", "1.0.0"],
+        "billing_class": ["professional", "institutional", None, "professional", "professional", "professional", "professional"],
+        "code_type": ["CPT", "HCPCS", "CPT", None, "CPT", "CPT", "CPT"],
+        "code": ["99213", "J1100", None, "0001U", "99213", "99214", "99215"],
+        "provider_reference_id": [1, None, 300, 42, 7, 8, 9],
+        "provider_group_id_raw": [1, None, 300, 42, 7, 8, 9],
+        "pos_members": [["11", "22"], [], None, ["02"], ["11"], [], ["10", "11", "22"]],
+        "negotiated_type": ["negotiated", None, "fee schedule", "negotiated", "negotiated", "negotiated", "negotiated"],
+        "negotiation_arrangement": ["ffs", "ffs", None, "ffs", "ffs", "ffs", "ffs"],
+        "negotiated_rate": [123.456789, None, 0.00005, float("inf"), -0.0, float("nan"), 1e6],
+        "expiration_date": ["9999-12-31", None, "2026-01-01", "9999-12-31", "", "9999-12-31", "9999-12-31"],
+    }, schema_overrides={"pos_members": pl.List(pl.Utf8)})
+
+
+def _per_row_keys(etl: ScalableETL1, chunk: pl.DataFrame) -> pl.DataFrame:
+    chunk = chunk.with_columns([
+        pl.col("pos_members").map_elements(etl.pos_set_id_from_members, return_dtype=pl.Utf8).alias("pos_set_id"),
+        pg_uid_key("provider_reference_id").map_elements(etl.md5, return_dtype=pl.Utf8).alias("pg_uid"),
+    ])
+    return chunk.with_columns(
+        pl.struct(key_hashing.FACT_UID_FIELDS)
+        .map_elements(etl.fact_uid_from_struct, return_dtype=pl.Utf8)
+        .alias("fact_uid")
+    ).select(["pos_set_id", "pg_uid", "fact_uid"])
+
+
+def _vectorized_keys(chunk: pl.DataFrame) -> pl.DataFrame:
+    chunk = with_md5(chunk, pos_set_key("pos_members"), "pos_set_id")
+    chunk = with_md5(chunk, pg_uid_key("provider_reference_id"), "pg_uid")
+    return chunk.with_columns(fact_uid(chunk)).select(["pos_set_id", "pg_uid", "fact_uid"])
+
+
+def _assert_parity(native_min_rows: int):
+    original = key_hashing.NATIVE_MIN_ROWS
+    key_hashing.NATIVE_MIN_ROWS = native_min_rows
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            etl = _make_etl(tmp)
+            chunk = _edge_case_chunk()
+            expected = _per_row_keys(etl, chunk)
+            actual = _vectorized_keys(chunk)
+            assert expected.equals(actual), f"Key mismatch:\n{expected}\n{actual}"
+    finally:
+        key_hashing.NATIVE_MIN_ROWS = original
+
+
+def test_batched_hashlib_parity():
+    """Small chunks hash through the batched hashlib path"""
+    _assert_parity(native_min_rows=10**9)
+
+
+def test_native_duckdb_parity():
+    """Large chunks hash through DuckDB's native md5()"""
+    _assert_parity(native_min_rows=0)
+
+
+def test_fact_uid_missing_fields():
+    """Fields absent from the chunk hash as empty strings, like dict.get()"""
+    with tempfile.TemporaryDirectory() as tmp:
+        etl = _make_etl(tmp)
+        chunk = pl.DataFrame({"state": ["GA", "FL"], "negotiated_rate": [10.0, None]})
+        expected = [etl.fact_uid_from_struct(row) for row in chunk.iter_rows(named=True)]
+        original = key_hashing.NATIVE_MIN_ROWS
+        for native_min_rows in (0, 10**9):
+            key_hashing.NATIVE_MIN_ROWS = native_min_rows
+            try:
+                assert fact_uid(chunk).to_list() == expected
+            finally:
+                key_hashing.NATIVE_MIN_ROWS = original
+
+
+def test_process_fact_table_matches_per_row():
+    """End-to-end: process_rates_chunk + process_fact_table keys match the per-row helpers"""
+    with tempfile.TemporaryDirectory() as tmp:
+        etl = _make_etl(tmp)
+        rates = pl.DataFrame({
+            "last_updated_on": ["2025-08-01", None, "202507"],
+            "reporting_entity_name": ["Aetna Life", "Aetna Life", None],
+            "version": ["1.0.0", None, "1.0.0"],
+            "billing_class": ["professional", "institutional", "professional"],
+            "billing_code_type": ["CPT", "HCPCS", "CPT"],
+            "billing_code": ["99213", "J1100", "99214"],
+            "service_codes": ['["11","22"]', None, ""],
+            "negotiated_type": ["negotiated"] * 3,
+            "negotiation_arrangement": ["ffs"] * 3,
+            "negotiated_rate": [100.12345, 55.5, None],
+            "expiration_date": ["9999-12-31"] * 3,
+            "description": ["d"] * 3,
+            "name": ["n"] * 3,
+            "provider_reference_id": [1, 2, None],
+            "reporting_entity_type": ["x"] * 3,
+        })
+        fact = etl.process_fact_table(etl.process_rates_chunk(rates))
+        for row in fact.iter_rows(named=True):
+            assert row["fact_uid"] == etl.fact_uid_from_struct(row)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Batched hashlib parity", test_batched_hashlib_parity),
+        ("Native DuckDB parity", test_native_duckdb_parity),
+        ("Missing fact_uid fields", test_fact_uid_missing_fields),
+        ("process_fact_table parity", test_process_fact_table_matches_per_row),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
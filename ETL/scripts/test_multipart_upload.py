@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming partition uploads (utils/multipart_upload.py and
+S3PartitionedETL.stream_partition_to_s3).
+
+Large partitions must round-trip through a multipart upload with the upload
+buffer bounded by the part size, small ones must keep the single PUT, and a
+failure part-way must abort the upload. S3 round trips use moto's in-process
+S3 (skipped without moto); the memory bound is measured with a client that
+discards the parts.
+"""
+
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from multipart_upload import MultipartUploadWriter, MIN_PART_SIZE
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the S3 round trips
+    mock_aws = None
+
+BUCKET = "test-bucket"
+
+
+def _partition(rows: int, seed: int = 5) -> pl.DataFrame:
+    """Mostly incompressible rows, so encoded size tracks row count."""
+    rng = np.random.default_rng(seed)
+    return pl.DataFrame({
+        "fact_uid": [f"{v:016x}" for v in rng.integers(0, 2**62, rows)],
+        "negotiated_rate": rng.random(rows) * 2000,
+        "npi": rng.integers(1_000_000_000, 2_000_000_000, rows),
+    })
+
+
+class DiscardingClient:
+    """S3 client stand-in that records part sizes and keeps no data."""
+
+    def __init__(self, fail_on_part: int = 0):
+        self.fail_on_part = fail_on_part
+        self.part_sizes = []
+        self.puts = 0
+        self.completed = False
+        self.aborted = False
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        if PartNumber == self.fail_on_part:
+            raise ConnectionError(f"simulated failure on part {PartNumber}")
+        self.part_sizes.append(len(Body))
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.completed = True
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+    def put_object(self, Body, **kwargs):
+        self.puts += 1
+
+
+def _s3_etl(**kwargs):
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    from s3_etl_utils import S3PartitionedETL
+
+    s3_etl = S3PartitionedETL(BUCKET, "us-east-1", **kwargs)
+    s3_etl.s3_client.create_bucket(Bucket=BUCKET)
+    return s3_etl
+
+
+def test_buffer_bounded_by_part_size():
+    """Streaming a partition several parts long never buffers much more than one part"""
+    df = _partition(1_500_000)
+    client = DiscardingClient()
+    sink = MultipartUploadWriter(client, BUCKET, "big.parquet", part_size=MIN_PART_SIZE)
+
+    tracemalloc.start()
+    with sink:
+        df.write_parquet(sink, compression="zstd", use_pyarrow=True, row_group_size=131_072)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert client.completed and not client.aborted
+    assert len(client.part_sizes) >= 4, f"only {len(client.part_sizes)} parts"
+    assert all(MIN_PART_SIZE <= size <= MIN_PART_SIZE + 2 * 1024 * 1024 for size in client.part_sizes[:-1])
+    assert sum(client.part_sizes) == sink.bytes_written
+    assert sink.peak_buffer_bytes <= MIN_PART_SIZE + 2 * 1024 * 1024
+    # A BytesIO would hold the whole encoded file (and getvalue() a second copy)
+    assert peak <= 2 * MIN_PART_SIZE, f"peak {peak:,} bytes for {sink.bytes_written:,} encoded"
+
+
+def test_failure_aborts_upload():
+    """A failing part aborts the multipart upload and re-raises"""
+    client = DiscardingClient(fail_on_part=2)
+    sink = MultipartUploadWriter(client, BUCKET, "big.parquet", part_size=MIN_PART_SIZE)
+    try:
+        with sink:
+            _partition(1_000_000).write_parquet(sink, use_pyarrow=True)
+        raise AssertionError("upload did not fail")
+    except ConnectionError:
+        pass
+    assert client.aborted and not client.completed and client.puts == 0
+
+
+def test_small_partition_single_put():
+    """Writes that never fill a part are sent with one PUT"""
+    client = DiscardingClient()
+    with MultipartUploadWriter(client, BUCKET, "small.parquet", part_size=MIN_PART_SIZE) as sink:
+        _partition(1_000).write_parquet(sink, use_pyarrow=True)
+    assert client.puts == 1 and client.part_sizes == [] and not sink.multipart
+
+
+def test_streamed_partition_round_trip():
+    """Large partitions stream through a multipart upload and read back unchanged (moto S3)"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+
+    with mock_aws():
+        s3_etl = _s3_etl(multipart_threshold_mb=1, multipart_part_size_mb=5)
+        large = _partition(1_000_000)
+        small = _partition(2_000)
+        large_path = f"s3://{BUCKET}/partitioned-data/p=large/fact_rate_enriched.parquet"
+        small_path = f"s3://{BUCKET}/partitioned-data/p=small/fact_rate_enriched.parquet"
+
+        s3_etl.upload_partition_to_s3(large, large_path)
+        s3_etl.upload_partition_to_s3(small, small_path)
+
+        assert s3_etl.streamed_uploads == 1
+        assert s3_etl.read_partition(large_path).equals(large)
+        assert s3_etl.read_partition(small_path).equals(small)
+        head = s3_etl.s3_client.head_object(Bucket=BUCKET, Key=large_path.split(f"{BUCKET}/", 1)[1])
+        assert "-" in head["ETag"], "large partition was not a multipart upload"
+        assert head["ServerSideEncryption"] == "AES256"
+
+
+def test_pool_streams_large_partitions():
+    """With an upload pool, small partitions are queued and large ones streamed (moto S3)"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+
+    with mock_aws():
+        s3_etl = _s3_etl(upload_workers=2, multipart_threshold_mb=1, multipart_part_size_mb=5)
+        partitions = {f"s3://{BUCKET}/partitioned-data/p={i}/fact_rate_enriched.parquet": _partition(rows, i)
+                      for i, rows in enumerate([500, 800_000, 1_200])}
+        for path, df in partitions.items():
+            s3_etl.submit_partition_upload(df, path)
+        assert s3_etl.close() == []
+
+        assert s3_etl.streamed_uploads == 1
+        assert s3_etl.upload_pool.stats()["uploads"] == 2
+        for path, df in partitions.items():
+            assert s3_etl.read_partition(path).equals(df)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Buffer bounded by part size", test_buffer_bounded_by_part_size),
+        ("Failure aborts upload", test_failure_aborts_upload),
+        ("Small partition single PUT", test_small_partition_single_put),
+        ("Streamed partition round trip", test_streamed_partition_round_trip),
+        ("Pool streams large partitions", test_pool_streams_large_partitions),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
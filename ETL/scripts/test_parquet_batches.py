@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass Parquet chunk reader shared by ETL1 and ETL3.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from parquet_batches import ParquetBatchReader
+
+
+def _write(path: Path, rows: int, row_group_size: int) -> pl.DataFrame:
+    df = pl.DataFrame({"id": list(range(rows)), "code": [str(i % 7) for i in range(rows)]})
+    df.write_parquet(path, row_group_size=row_group_size)
+    return df
+
+
+def test_chunks_cross_row_groups():
+    """Chunks have the configured size regardless of row group boundaries"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "data.parquet"
+        expected = _write(path, rows=2_500, row_group_size=700)
+
+        with ParquetBatchReader(path, chunk_size=1_000) as reader:
+            assert reader.num_rows == 2_500
+            assert reader.num_chunks == 3
+            chunks = list(reader)
+
+        assert [c.height for c in chunks] == [1_000, 1_000, 500]
+        assert pl.concat(chunks).equals(expected)
+
+
+def test_matches_scan_slice():
+    """Each chunk equals the old scan_parquet().slice() result"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "data.parquet"
+        _write(path, rows=1_234, row_group_size=100)
+
+        with ParquetBatchReader(path, chunk_size=250) as reader:
+            for idx, chunk in enumerate(reader):
+                old = pl.scan_parquet(path).slice(idx * 250, 250).collect()
+                assert chunk.equals(old)
+
+
+def test_column_subset():
+    """Requested columns that are missing from the file are ignored"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "data.parquet"
+        _write(path, rows=10, row_group_size=4)
+
+        with ParquetBatchReader(path, chunk_size=3, columns=["code", "not_there"]) as reader:
+            chunks = list(reader)
+
+        assert all(c.columns == ["code"] for c in chunks)
+        assert sum(c.height for c in chunks) == 10
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Chunks cross row groups", test_chunks_cross_row_groups),
+        ("Matches scan_parquet().slice()", test_matches_scan_slice),
+        ("Column subset", test_column_subset),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests for the partition file layouts (utils/parquet_layout.py) and their use
+by S3PartitionedETL and the streaming engine's staging.
+
+Files are written to a file:// storage URI and inspected through their
+Parquet footers: row order, row group sizes, sorting columns, statistics and
+bloom filters.
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from parquet_layout import DEFAULT_LAYOUT, QUERY_LAYOUT, parquet_layout
+from s3_etl_utils import S3PartitionedETL
+
+PREFIX = "partitioned-data"
+
+
+def _rows(count: int = 1000) -> pl.DataFrame:
+    return pl.DataFrame({
+        'fact_uid': [f"f{i}" for i in range(count)],
+        'code_type': [['HCPCS', 'CPT', None][i % 3] for i in range(count)],
+        'code': [f"{99201 + (i * 7919) % 300}" for i in range(count)],
+        'npi': [1_000_000_000 + (i * 104729) % 5000 for i in range(count)],
+        'tin_value': [f"T{i % 37}" for i in range(count)],
+        'negotiated_rate': [float(i) for i in range(count)],
+    })
+
+
+def _sort_key(df: pl.DataFrame) -> list:
+    return df.select('code_type', 'code', 'npi').rows()
+
+
+def _column_chunks(metadata: pq.FileMetaData) -> dict:
+    """Column name -> first row group's column chunk"""
+    group = metadata.row_group(0)
+    return {group.column(i).path_in_schema: group.column(i) for i in range(group.num_columns)}
+
+
+def test_query_layout_file():
+    """Rows sorted (nulls last), row groups sized, sort order, statistics and bloom filters recorded"""
+    layout = QUERY_LAYOUT._replace(row_group_size=256)
+    data = _rows()
+    buffer = io.BytesIO()
+    layout.write(layout.order(data), buffer)
+
+    written = pl.read_parquet(io.BytesIO(buffer.getvalue()))
+    assert written.sort('fact_uid').equals(data.sort('fact_uid'))
+    assert written['code_type'].null_count() == 333 and written['code_type'].tail(333).is_null().all()
+    assert _sort_key(written.head(667)) == sorted(_sort_key(written.head(667)))
+
+    metadata = pq.read_metadata(io.BytesIO(buffer.getvalue()))
+    assert metadata.num_row_groups == 4 and metadata.row_group(0).num_rows == 256
+    assert [c.column_index for c in metadata.row_group(0).sorting_columns] == [1, 2, 3]
+    chunks = _column_chunks(metadata)
+    assert all(chunks[name].bloom_filter_length for name in ('code', 'npi', 'tin_value'))
+    assert not chunks['fact_uid'].bloom_filter_length and chunks['fact_uid'].statistics.has_min_max
+    assert 'RLE_DICTIONARY' in chunks['code'].encodings
+
+
+def test_default_layout_and_overrides():
+    """The default layout keeps arrival order and writes no bloom filters; settings override profiles"""
+    data = _rows()
+    buffer = io.BytesIO()
+    DEFAULT_LAYOUT.write(DEFAULT_LAYOUT.order(data), buffer)
+    assert pl.read_parquet(io.BytesIO(buffer.getvalue())).equals(data)
+    metadata = pq.read_metadata(io.BytesIO(buffer.getvalue()))
+    assert metadata.num_row_groups == 1 and not metadata.row_group(0).sorting_columns
+    assert not any(chunk.bloom_filter_length for chunk in _column_chunks(metadata).values())
+
+    layout = parquet_layout('query', sort_by=['npi'], row_group_size=100, bloom_filter_columns=[])
+    assert layout == QUERY_LAYOUT._replace(sort_by=('npi',), row_group_size=100, bloom_filter_columns=())
+    assert parquet_layout('default') is DEFAULT_LAYOUT
+    try:
+        parquet_layout('columnar')
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+
+def test_missing_and_nested_columns():
+    """Sort and bloom filter columns a partition lacks, or that are nested, are skipped"""
+    data = _rows(100).drop('npi', 'tin_value').with_columns(
+        pl.concat_list(pl.col('code'), pl.col('code')).alias('tin_value'),
+        pl.col('code_type').cast(pl.Categorical),
+    )
+    layout = QUERY_LAYOUT._replace(sort_by=('code_type', 'code', 'tin_value', 'npi'))
+    buffer = io.BytesIO()
+    layout.write(layout.order(data), buffer)
+    written = pl.read_parquet(io.BytesIO(buffer.getvalue()))
+    assert written.sort('fact_uid').equals(data.sort('fact_uid'))
+    assert [c.column_index for c in pq.read_metadata(io.BytesIO(buffer.getvalue())).row_group(0).sorting_columns] \
+        == [data.columns.index('code_type'), data.columns.index('code')]
+
+
+def test_partition_writes_use_layout():
+    """Direct, streamed and queued uploads and rollups are written in the S3PartitionedETL's layout"""
+    with tempfile.TemporaryDirectory() as tmp:
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage", upload_workers=2, multipart_threshold_mb=0.01,
+                                  layout=QUERY_LAYOUT)
+        data = _rows()
+        paths = [s3_etl.create_s3_path({'payer_slug': payer, 'state': 'GA'}, PREFIX) for payer in ('a', 'b', 'c')]
+        s3_etl.upload_partition_to_s3(data, paths[0])       # streamed (over the 0.01 MB threshold)
+        s3_etl.submit_partition_upload(data.head(10), paths[1])
+        assert not s3_etl.close() and s3_etl.streamed_uploads == 1
+        for path in paths[:2]:
+            metadata = s3_etl.read_partition_metadata(path)
+            assert metadata.row_group(0).sorting_columns and _column_chunks(metadata)['code'].bloom_filter_length
+            written = s3_etl.read_partition(path)
+            assert _sort_key(written.drop_nulls('code_type')) == sorted(_sort_key(written.drop_nulls('code_type')))
+
+        # Rollups keep each member's rows together and in order, and claim no order for the whole file
+        rollup = s3_etl.storage.key(paths[2])
+        members = {'x': data.head(500), 'y': data.tail(500)}
+        s3_etl.write_rollup(rollup, members)
+        assert not s3_etl.read_partition_metadata(paths[2]).row_group(0).sorting_columns
+        stored = pl.read_parquet(io.BytesIO(s3_etl.storage.get(rollup)))
+        for name, rows in members.items():
+            first, count = s3_etl.rollup_members(rollup)[name]
+            assert stored.slice(first, count).equals(QUERY_LAYOUT.order(rows))
+
+
+def test_staged_partitions_use_layout():
+    """The streaming engine rewrites staged files in the layout, streamed, with duplicates still removed"""
+    from partition_staging import stage_partitions
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = _rows().with_columns(pl.lit('aetna').alias('payer_slug'),
+                                    pl.col('tin_value').str.slice(0, 2).alias('state'))
+        duplicated = pl.concat([data, data.head(5).with_columns(pl.lit(-1.0).alias('negotiated_rate'))])
+        columns = ['payer_slug', 'state']
+        layout = QUERY_LAYOUT._replace(row_group_size=64)
+        # Staging reads a staged file's fact_uid column, never the whole file
+        read_parquet = pl.read_parquet
+
+        def fact_uid_only(source, *args, columns=None, **kwargs):
+            assert columns == ['fact_uid'], f"staging read all of {source}"
+            return read_parquet(source, *args, columns=columns, **kwargs)
+        pl.read_parquet = fact_uid_only
+        try:
+            staged = {layout: stage_partitions(duplicated.lazy(), Path(tmp) / name, columns, PREFIX, layout=layout)
+                      for name, layout in (('default', DEFAULT_LAYOUT), ('query', layout))}
+        finally:
+            pl.read_parquet = read_parquet
+        for query in staged[layout]:
+            stored = pl.read_parquet(query.path)
+            assert stored.equals(layout.order(stored))
+            metadata = pq.read_metadata(query.path)
+            assert {metadata.row_group(i).num_rows for i in range(metadata.num_row_groups - 1)} <= {64}
+            assert all(chunk.bloom_filter_length for name, chunk in _column_chunks(metadata).items()
+                       if name in ('code', 'npi', 'tin_value'))
+        staged[QUERY_LAYOUT] = staged.pop(layout)
+        assert [p.key for p in staged[DEFAULT_LAYOUT]] == [p.key for p in staged[QUERY_LAYOUT]]
+        for default, query in zip(staged[DEFAULT_LAYOUT], staged[QUERY_LAYOUT]):
+            assert default.rows == query.rows == pl.read_parquet(query.path).height
+            assert pl.read_parquet(default.path).sort('fact_uid').equals(pl.read_parquet(query.path).sort('fact_uid'))
+            assert pq.read_metadata(query.path).row_group(0).sorting_columns
+            assert not pq.read_metadata(default.path).row_group(0).sorting_columns
+        assert sum(p.rows for p in staged[QUERY_LAYOUT]) == data.height
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Query layout file", test_query_layout_file),
+        ("Default layout and overrides", test_default_layout_and_overrides),
+        ("Missing and nested columns", test_missing_and_nested_columns),
+        ("Partition writes use layout", test_partition_writes_use_layout),
+        ("Staged partitions use layout", test_staged_partitions_use_layout),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for ETL3's partition accumulation mode (utils/partition_accumulator.py).
+
+Chunks are written through _create_partitions_for_chunk against an in-memory
+stand-in for S3PartitionedETL, once per chunk and once accumulated; the final
+partitions must match, and the accumulated run must make exactly the PUT, GET
+and HEAD savings it reports.
+"""
+
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from partition_accumulator import PartitionAccumulator
+from ETL.ETL_3 import _create_partitions_for_chunk, write_partition_idempotent
+
+PARTITION_COLUMNS = ["state", "billing_class"]
+
+
+class InMemoryS3:
+    """Partition store with the S3PartitionedETL methods ETL3 writes through."""
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = {"head": 0, "get": 0, "put": 0}
+
+    def create_s3_path(self, partition_values, prefix):
+        parts = "/".join(f"{c}={partition_values[c]}" for c in PARTITION_COLUMNS)
+        return f"s3://bucket/{prefix}/{parts}/fact_rate_enriched.parquet"
+
+    def partition_exists(self, s3_path):
+        self.requests["head"] += 1
+        return s3_path in self.objects
+
+    def read_partition(self, s3_path):
+        self.requests["get"] += 1
+        return self.objects[s3_path]
+
+    def submit_partition_upload(self, partition_data, s3_path):
+        self.requests["put"] += 1
+        self.objects[s3_path] = partition_data
+
+
+def _chunks(count: int, rows: int, seed: int) -> list:
+    """Chunks whose fact_uids repeat across chunks (later chunks update rates)."""
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        uids = rng.sample(range(rows * 3), rows)
+        chunks.append(pl.DataFrame({
+            "fact_uid": [f"{u:08x}" for u in uids],
+            # State and billing class are fixed per fact_uid, so each key has one partition
+            "state": [["GA", "FL", "AL"][u % 3] for u in uids],
+            "billing_class": [["professional", "institutional"][u % 2] for u in uids],
+            "negotiated_rate": [rng.random() * 500 for _ in uids],
+        }))
+    return chunks
+
+
+def _normalized(objects: dict) -> dict:
+    return {path: df.sort("fact_uid") for path, df in objects.items()}
+
+
+def _run_per_chunk(chunks: list, store: InMemoryS3):
+    for chunk in chunks:
+        _create_partitions_for_chunk(chunk, PARTITION_COLUMNS, store, "partitioned-data")
+
+
+def _run_accumulated(chunks: list, store: InMemoryS3, spill_dir: Path, budget_mb: float) -> PartitionAccumulator:
+    accumulator = PartitionAccumulator(
+        spill_dir,
+        writer=lambda df, path: write_partition_idempotent(df, path, store),
+        disk_budget_mb=budget_mb,
+    )
+    for chunk in chunks:
+        _create_partitions_for_chunk(chunk, PARTITION_COLUMNS, store, "partitioned-data", accumulator=accumulator)
+    accumulator.flush_all()
+    accumulator.close()
+    return accumulator
+
+
+def _check_against_per_chunk(budget_mb: float, preexisting: bool) -> PartitionAccumulator:
+    chunks = _chunks(12, 400, 7)
+    seed_chunk = _chunks(1, 400, 8)[0]
+
+    expected = InMemoryS3()
+    actual = InMemoryS3()
+    if preexisting:
+        _run_per_chunk([seed_chunk], expected)
+        _run_per_chunk([seed_chunk], actual)
+    before = dict(expected.requests)
+
+    _run_per_chunk(chunks, expected)
+    with tempfile.TemporaryDirectory() as tmp:
+        actual.requests = dict(before)
+        accumulator = _run_accumulated(chunks, actual, Path(tmp) / "spill", budget_mb)
+
+    assert _normalized(actual.objects).keys() == _normalized(expected.objects).keys()
+    for path, df in _normalized(expected.objects).items():
+        assert _normalized(actual.objects)[path].equals(df), f"Partition {path} differs"
+
+    stats = accumulator.stats()
+    for request in ("put", "get", "head"):
+        saved = expected.requests[request] - actual.requests[request]
+        assert stats[f"{request}s_avoided"] == saved, f"{request}: reported {stats[f'{request}s_avoided']}, saved {saved}"
+    return accumulator
+
+
+def test_matches_per_chunk_writes():
+    """Accumulated partitions equal per-chunk writes, with one upload per partition"""
+    accumulator = _check_against_per_chunk(budget_mb=1024, preexisting=False)
+    assert accumulator.uploads == 6
+    assert accumulator.early_flushes == 0
+
+
+def test_merges_with_existing_partitions():
+    """Partitions already in S3 are merged once at the end"""
+    _check_against_per_chunk(budget_mb=1024, preexisting=True)
+
+
+def test_disk_budget_flushes_early():
+    """A tiny disk budget flushes partitions early and still gives the same result"""
+    accumulator = _check_against_per_chunk(budget_mb=0.02, preexisting=False)
+    assert accumulator.early_flushes > 0
+    assert accumulator.uploads > 6
+
+
+def test_last_wins_across_chunks():
+    """The latest chunk's row is kept for a repeated fact_uid"""
+    store = InMemoryS3()
+    chunks = [
+        pl.DataFrame({"fact_uid": ["a", "b"], "state": ["GA", "GA"], "billing_class": ["professional"] * 2,
+                      "negotiated_rate": [1.0, 2.0]}),
+        pl.DataFrame({"fact_uid": ["a"], "state": ["GA"], "billing_class": ["professional"],
+                      "negotiated_rate": [3.0]}),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        accumulator = _run_accumulated(chunks, store, Path(tmp) / "spill", budget_mb=1024)
+
+    (partition,) = store.objects.values()
+    assert dict(partition.select("fact_uid", "negotiated_rate").iter_rows()) == {"a": 3.0, "b": 2.0}
+    assert accumulator.duplicates_removed == 1
+    assert store.requests == {"head": 1, "get": 0, "put": 1}
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Matches per-chunk writes", test_matches_per_chunk_writes),
+        ("Merges with existing partitions", test_merges_with_existing_partitions),
+        ("Disk budget flushes early", test_disk_budget_flushes_early),
+        ("Last wins across chunks", test_last_wins_across_chunks),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Tests for partition compaction (utils/partition_compaction.py) and for ETL3
+writes into compacted partitions.
+
+The planner is checked on inventory entries built from keys; compaction runs
+against a file:// storage URI, so no AWS is needed. Every test reads each
+partition back through a fresh S3PartitionedETL and compares it with the rows
+written, including after a compaction interrupted between its write and its
+deletes or before it published its staged files, and lists each partition
+directory the way Athena does after every write, copy and delete to check no
+row is ever visible twice.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from s3_etl_utils import STAGING_DIR, S3PartitionedETL, partition_key, rollup_key
+from s3_partition_inventory import S3PartitionInventory
+from partition_compaction import (CompactionPolicy, PartitionCompactor, PurgeAction, RollupAction, SplitAction,
+                                  plan_compaction)
+
+PREFIX = "partitioned-data"
+ROLLUP = 'procedure_class'
+
+
+def _values(payer: str, taxonomy: str, procedure_class: str = 'Surgery') -> dict:
+    return {'payer_slug': payer, 'state': 'GA', 'billing_class': 'professional', 'procedure_set': 'Evaluation',
+            'procedure_class': procedure_class, 'primary_taxonomy_code': taxonomy, 'stat_area_name': 'Atlanta',
+            'year': 2025, 'month': 8}
+
+
+def _rows(name: str, count: int) -> pl.DataFrame:
+    return pl.DataFrame({'fact_uid': [f"{name}-{i}" for i in range(count)],
+                         'negotiated_rate': [float(i) for i in range(count)]})
+
+
+def _info(key: str, size: int):
+    info = S3PartitionInventory("unused", storage=object()).parse_partition_path(key)
+    info.file_size_bytes = size
+    return info
+
+
+def test_plan():
+    """Oversized files split, undersized ones roll up per directory, stale copies are purged"""
+    policy = CompactionPolicy(target_file_bytes=100, min_file_bytes=20, max_file_bytes=150, rollup_level=ROLLUP)
+    small = [partition_key(_values('aetna', t)) for t in ('101', '102', '103')]
+    lone = partition_key(_values('aetna', '101', 'Radiology'))
+    big = partition_key(_values('cigna', '101'))
+    capped = partition_key(_values('cigna', '102'))
+    normal = partition_key(_values('cigna', '103'))
+    stale_part = normal.replace('fact_rate_enriched.parquet', 'fact_rate_enriched.part-00000.parquet')
+    partitions = ([_info(key, 10) for key in small] + [_info(lone, 10), _info(big, 450), _info(capped, 160),
+                                                       _info(normal, 60), _info(stale_part, 30)])
+
+    actions = plan_compaction(partitions, policy, row_count=lambda key: 1, rollup_members=lambda key: {})
+    assert SplitAction(big, 450, None, 5) in actions
+    # Four 40-byte parts would be under min_file_bytes: at most 160 // 20
+    assert SplitAction(capped, 160, None, 2) in actions
+    assert RollupAction(rollup_key(small[0], 'procedure_class'), small, 30, False) in actions
+    assert PurgeAction(normal, [stale_part], None) in actions
+    # A lone small partition is not rewritten into a rollup of one
+    assert len(actions) == 4
+
+    # Row limits, and a lone partition joining an existing rollup it is stale in
+    rollup = rollup_key(lone, 'procedure_class')
+    policy = policy._replace(max_rows=100, min_rows=5)
+    counts = {normal: 250, capped: 3}
+    actions = plan_compaction([_info(normal, 60), _info(capped, 160), _info(lone, 10), _info(rollup, 40)], policy,
+                              row_count=lambda key: counts[key], rollup_members=lambda key: {lone: (0, 1)})
+    assert actions[0] == SplitAction(normal, 60, 250, 3)
+    assert RollupAction(rollup_key(capped, 'procedure_class'), [capped], 160, False) not in actions
+    assert RollupAction(rollup, [lone], 50, True) in actions
+
+    # No rollup level (the default): small partitions are left alone
+    assert plan_compaction([_info(key, 10) for key in small], policy._replace(rollup_level=None),
+                           row_count=lambda key: 1, rollup_members=lambda key: {}) == []
+    assert CompactionPolicy(target_file_bytes=100, min_file_bytes=20, max_file_bytes=150).rollup_level is None
+
+
+def _seed(root: Path) -> dict:
+    """Six small partitions in two rollup directories and one large one; returns path -> rows"""
+    s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+    written = {}
+    for payer in ('aetna', 'uhc'):
+        for taxonomy in ('101', '102', '103'):
+            written[s3_etl.create_s3_path(_values(payer, taxonomy), PREFIX)] = _rows(f"{payer}{taxonomy}", 5)
+    written[s3_etl.create_s3_path(_values('cigna', '101'), PREFIX)] = _rows("big", 30_000)
+    for path, rows in written.items():
+        s3_etl.upload_partition_to_s3(rows, path)
+    return written
+
+
+def _policy(root: Path) -> CompactionPolicy:
+    big = max(p.stat().st_size for p in (root / "stage").rglob("*.parquet"))
+    return CompactionPolicy(target_file_bytes=big // 3 + 1, min_file_bytes=8 * 1024, max_file_bytes=big - 1,
+                            rollup_level=ROLLUP)
+
+
+def _check(root: Path, written: dict):
+    """Every partition reads back as written; no rows are stored twice"""
+    s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+    for path, rows in written.items():
+        assert s3_etl.read_partition(path).sort('fact_uid').equals(rows.sort('fact_uid')), path
+    stored = pl.concat([pl.read_parquet(p) for p in (root / "stage").rglob("*.parquet")])
+    assert stored.height == sum(rows.height for rows in written.values())
+
+
+def test_compaction_preserves_rows():
+    """Compaction splits the large partition, rolls up the small ones and reads back the same rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        written = _seed(root)
+        policy = _policy(root)
+        compactor = PartitionCompactor(S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP), PREFIX, policy)
+
+        planned = compactor.run(dry_run=True)
+        assert planned['files_before'] == 7 and planned['files_after'] == 5
+        report = compactor.run()
+        assert not report['failed'] and (report['splits'], report['parts_written']) == (1, 3)
+        assert (report['rollups'], report['partitions_rolled_up']) == (2, 6)
+        assert report['files_after'] == planned['files_after'] == len(list((root / "stage").rglob("*.parquet")))
+        assert report['bytes_per_get_after'] > report['bytes_per_get_before']
+        _check(root, written)
+
+        # Nothing left to do, and no empty leaf directories
+        assert compactor.plan() == []
+        assert not [d for d in (root / "stage").rglob("*") if d.is_dir() and not any(d.iterdir())]
+
+
+def test_writes_into_compacted_partitions():
+    """ETL merges into a rolled-up or split partition write it back as its own file, once"""
+    from ETL.ETL_3 import write_partition_idempotent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        written = _seed(root)
+        policy = _policy(root)
+        PartitionCompactor(S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP), PREFIX, policy).run()
+
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        s3_etl.load_partition_index(PREFIX, workers=2)
+        rolled = s3_etl.create_s3_path(_values('aetna', '102'), PREFIX)
+        split = s3_etl.create_s3_path(_values('cigna', '101'), PREFIX)
+        assert s3_etl.locate_partition(rolled)[0] == 'rollup' and s3_etl.locate_partition(split)[0] == 'parts'
+        for path in (rolled, split):
+            update = pl.concat([written[path].head(2).with_columns(pl.lit(-1.0).alias('negotiated_rate')),
+                                _rows(f"new-{path[-40:]}", 3)])
+            write_partition_idempotent(update, path, s3_etl)
+            written[path] = pl.concat([written[path].slice(2), update])
+        assert not s3_etl.close()
+
+        assert s3_etl.locate_partition(rolled)[0] == 'file' and s3_etl.locate_partition(split)[0] == 'file'
+        assert s3_etl.storage.key(rolled) not in s3_etl.rollup_members(rollup_key(s3_etl.storage.key(rolled),
+                                                                                  'procedure_class'))
+        _check(root, written)
+
+        # The next compaction folds them back in
+        compactor = PartitionCompactor(S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP), PREFIX, policy)
+        assert not compactor.run()['failed'] and compactor.plan() == []
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        assert s3_etl.locate_partition(rolled)[0] == 'rollup' and s3_etl.locate_partition(split)[0] == 'parts'
+        _check(root, written)
+
+
+def test_interrupted_swap_recovers():
+    """A compaction that fails between writing and deleting leaves readable data; a rerun finishes it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        written = _seed(root)
+        policy = _policy(root)
+
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+
+        def fail(key):
+            raise OSError(f"connection reset deleting {key}")
+        s3_etl.delete_object = fail
+        report = PartitionCompactor(s3_etl, PREFIX, policy).run()
+        # Each split and rollup stopped at its first delete
+        assert len(report['failed']) == 3 and report['files_after'] > report['files_before']
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        for path, rows in written.items():
+            assert s3_etl.read_partition(path).sort('fact_uid').equals(rows.sort('fact_uid')), path
+
+        report = PartitionCompactor(S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP), PREFIX, policy).run()
+        assert not report['failed'] and report['files_after'] == 5
+        _check(root, written)
+
+
+def _listed_rows(s3_etl: S3PartitionedETL, directories) -> pl.Series:
+    """fact_uid of the rows in each directory's Parquet files, skipping names starting with '_' or '.' like Athena"""
+    files = [key for directory in directories for page in s3_etl.storage.list(directory + '/', delimiter='/')
+             for key in page.objects
+             if key.endswith('.parquet') and not key.rsplit('/', 1)[-1].startswith(('_', '.'))]
+    if not files:
+        return pl.Series('fact_uid', [], pl.String)
+    return pl.concat([pl.read_parquet(s3_etl.storage.get(key), columns=['fact_uid']) for key in files])['fact_uid']
+
+
+def _watch(s3_etl: S3PartitionedETL, root: Path, written: dict, steps: list):
+    """After every put, copy and delete: no row listed twice, and every partition reads back whole"""
+    keys = [s3_etl.storage.key(path) for path in written]
+    directories = {key.rsplit('/', 1)[0] for key in keys} | {rollup_key(key, ROLLUP).rsplit('/', 1)[0] for key in keys}
+
+    def check(name):
+        listed = _listed_rows(s3_etl, directories)
+        assert listed.n_unique() == listed.len(), f"rows listed twice after {name} #{len(steps)}"
+        reader = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        for path, rows in written.items():
+            assert reader.read_partition(path).height == rows.height, f"{path} after {name} #{len(steps)}"
+        steps.append(name)
+
+    for name in ('put', 'copy', 'delete'):
+        def checked(*args, _method=getattr(s3_etl.storage, name), _name=name):
+            result = _method(*args)
+            check(_name)
+            return result
+        setattr(s3_etl.storage, name, checked)
+
+
+def test_swaps_never_list_rows_twice():
+    """New files are staged, the old ones deleted, then the new ones published; a rerun publishes leftovers"""
+    from ETL.ETL_3 import write_partition_idempotent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        written = _seed(root)
+        policy = _policy(root)
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        steps = []
+        _watch(s3_etl, root, written, steps)
+        report = PartitionCompactor(s3_etl, PREFIX, policy).run()
+        assert not report['failed'] and (report['splits'], report['rollups']) == (1, 2)
+        assert {'put', 'copy', 'delete'} <= set(steps)
+        assert not list((root / "stage").rglob(STAGING_DIR))
+        _check(root, written)
+
+    # Interrupted before publishing: readers use the staged files, a rerun publishes them
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        written = _seed(root)
+        policy = _policy(root)
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+
+        def fail(source, key):
+            raise OSError(f"connection reset copying {source}")
+        s3_etl.storage.copy = fail
+        report = PartitionCompactor(s3_etl, PREFIX, policy).run()
+        assert len(report['failed']) == 3 and list((root / "stage").rglob(STAGING_DIR))
+        reader = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        for path, rows in written.items():
+            assert reader.locate_partition(path)[1][0].split('/')[-2] == STAGING_DIR, path
+            assert reader.read_partition(path).sort('fact_uid').equals(rows.sort('fact_uid')), path
+        keys = [reader.storage.key(path) for path in written]
+        listed = _listed_rows(reader, {key.rsplit('/', 1)[0] for key in keys})
+        assert listed.len() == 0
+
+        # ETL3 rewrites the split partition and one rolled-up partition from their staged copies
+        split = reader.create_s3_path(_values('cigna', '101'), PREFIX)
+        rolled = reader.create_s3_path(_values('aetna', '102'), PREFIX)
+        for name, path in (('split', split), ('rolled', rolled)):
+            update = _rows(f"new-{name}", 3)
+            write_partition_idempotent(update, path, reader)
+            written[path] = pl.concat([written[path], update])
+
+        steps = []
+        s3_etl = S3PartitionedETL(f"file://{root}/stage", rollup_level=ROLLUP)
+        _watch(s3_etl, root, written, steps)
+        compactor = PartitionCompactor(s3_etl, PREFIX, policy)
+        report = compactor.run()
+        assert not report['failed'] and report['recovered'] == 3
+        assert not list((root / "stage").rglob(STAGING_DIR))
+        assert compactor.plan() == []
+        _check(root, written)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Compaction plan", test_plan),
+        ("Compaction preserves rows", test_compaction_preserves_rows),
+        ("Writes into compacted partitions", test_writes_into_compacted_partitions),
+        ("Interrupted swap recovers", test_interrupted_swap_recovers),
+        ("Swaps never list rows twice", test_swaps_never_list_rows_twice),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for the partition existence index (utils/partition_index.py) and its use
+by S3PartitionedETL.partition_exists.
+
+Runs against moto's in-process S3 (skipped without moto). Requests are counted
+with botocore's before-call events, so the tests check that existence checks
+under the indexed prefix send no HEADs at all.
+"""
+
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from partition_index import PartitionIndex
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for these tests
+    mock_aws = None
+
+BUCKET = "test-bucket"
+PREFIX = "partitioned-data"
+
+
+def _s3_etl(**kwargs):
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    from s3_etl_utils import S3PartitionedETL
+
+    s3_etl = S3PartitionedETL(BUCKET, "us-east-1", **kwargs)
+    s3_etl.s3_client.create_bucket(Bucket=BUCKET)
+    return s3_etl
+
+
+def _count_requests(s3_client) -> Counter:
+    counts = Counter()
+    s3_client.meta.events.register(
+        "before-call.s3.*", lambda model, **kwargs: counts.update([model.name]))
+    return counts
+
+
+def _key(payer: str, state: str) -> str:
+    return f"{PREFIX}/payer_slug={payer}/state={state}/year=2025/month=08/fact_rate_enriched.parquet"
+
+
+def _seed(s3_client, keys):
+    for key in keys:
+        s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"x" * 10)
+
+
+def _skip() -> bool:
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return True
+    return False
+
+
+def test_one_list_pass_indexes_everything():
+    """Every parquet object under the prefix is indexed, with ETag and size, nothing else"""
+    if _skip():
+        return
+    with mock_aws():
+        s3_etl = _s3_etl()
+        keys = [_key(payer, state) for payer in ("aetna", "cigna", "uhc") for state in ("GA", "FL")]
+        _seed(s3_etl.s3_client, keys + [f"{PREFIX}/athena-output/result.csv", "other/fact_rate_enriched.parquet"])
+
+        index = PartitionIndex(s3_etl.storage, PREFIX).load(workers=4)
+        assert len(index) == len(keys)
+        assert index.get(keys[0]).size == 10 and index.get(keys[0]).etag
+        assert not index.covers("other/fact_rate_enriched.parquet")
+        assert index.stats()["list_requests"] >= 4  # delimited pass + one listing per payer
+
+
+def test_exists_without_heads():
+    """partition_exists answers from the index and sends no HEAD requests"""
+    if _skip():
+        return
+    with mock_aws():
+        s3_etl = _s3_etl()
+        existing = [_key("aetna", state) for state in ("GA", "FL", "AL")]
+        _seed(s3_etl.s3_client, existing)
+        s3_etl.load_partition_index(PREFIX, workers=4)
+        counts = _count_requests(s3_etl.s3_client)
+
+        for _ in range(5):
+            for key in existing:
+                assert s3_etl.partition_exists(f"s3://{BUCKET}/{key}")
+            assert not s3_etl.partition_exists(f"s3://{BUCKET}/{_key('cigna', 'GA')}")
+
+        assert counts["HeadObject"] == 0
+        stats = s3_etl.partition_index.stats()
+        # A missing partition is also looked for as split parts, published or staged (there is no rollup level)
+        assert stats["heads_avoided"] == 15 + 5 * 3 and stats["hits"] == 15
+
+        # Outside the indexed prefix the HEADs are still sent (the file, then its first part and staged first part)
+        assert not s3_etl.partition_exists(f"s3://{BUCKET}/elsewhere/fact_rate_enriched.parquet")
+        assert counts["HeadObject"] == 3
+
+
+def test_uploads_update_index():
+    """Objects written during the run (queued, direct or streamed) are found afterwards"""
+    if _skip():
+        return
+    with mock_aws():
+        s3_etl = _s3_etl(upload_workers=2, multipart_threshold_mb=1, multipart_part_size_mb=5)
+        s3_etl.load_partition_index(PREFIX)
+        counts = _count_requests(s3_etl.s3_client)
+
+        small = pl.DataFrame({"fact_uid": [f"{i:04x}" for i in range(100)], "negotiated_rate": [1.0] * 100})
+        large = pl.DataFrame({"fact_uid": [f"{i:016x}" for i in range(400_000)],
+                              "negotiated_rate": [float(i) for i in range(400_000)]})
+        queued = f"s3://{BUCKET}/{_key('aetna', 'GA')}"
+        direct = f"s3://{BUCKET}/{_key('aetna', 'FL')}"
+        streamed = f"s3://{BUCKET}/{_key('cigna', 'GA')}"
+
+        s3_etl.submit_partition_upload(small, queued)
+        assert s3_etl.partition_exists(queued)  # waits for the queued upload
+        s3_etl.upload_partition_to_s3(small, direct)
+        s3_etl.upload_partition_to_s3(large, streamed)
+        assert s3_etl.close() == []
+
+        assert all(s3_etl.partition_exists(path) for path in (queued, direct, streamed))
+        assert counts["HeadObject"] == 0
+        for path in (queued, direct, streamed):
+            key = path.split(f"{BUCKET}/", 1)[1]
+            head = s3_etl.s3_client.head_object(Bucket=BUCKET, Key=key)
+            assert s3_etl.partition_index.get(key) == (head["ETag"], head["ContentLength"])
+
+
+def test_idempotent_writes_match_head_checks():
+    """write_partition_idempotent gives the same partitions with and without the index"""
+    if _skip():
+        return
+    from ETL.ETL_3 import write_partition_idempotent
+
+    chunks = [
+        pl.DataFrame({"fact_uid": ["a", "b"], "negotiated_rate": [1.0, 2.0]}),
+        pl.DataFrame({"fact_uid": ["b", "c"], "negotiated_rate": [5.0, 3.0]}),
+    ]
+    results = []
+    for use_index in (False, True):
+        with mock_aws():
+            s3_etl = _s3_etl(upload_workers=2)
+            path = f"s3://{BUCKET}/{_key('aetna', 'GA')}"
+            if use_index:
+                s3_etl.load_partition_index(PREFIX)
+            counts = _count_requests(s3_etl.s3_client)
+            for chunk in chunks:
+                write_partition_idempotent(chunk, path, s3_etl)
+            s3_etl.close()
+            results.append(s3_etl.read_partition(path).sort("fact_uid"))
+            # Without the index: file, first-part and staged first-part HEADs for the new partition, one for the merge
+            assert counts["HeadObject"] == (0 if use_index else 4)
+
+    assert results[0].equals(results[1])
+    assert dict(results[1].iter_rows()) == {"a": 1.0, "b": 5.0, "c": 3.0}
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("One LIST pass indexes everything", test_one_list_pass_indexes_everything),
+        ("Exists without HEADs", test_exists_without_heads),
+        ("Uploads update index", test_uploads_update_index),
+        ("Idempotent writes match HEAD checks", test_idempotent_writes_match_head_checks),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
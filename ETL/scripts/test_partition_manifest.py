@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Tests for partition manifests (utils/partition_manifest.py): their contents,
+the sidecars S3PartitionedETL writes next to partition files, and the
+inventory's use of them instead of size-based row estimates.
+
+Everything runs against a file:// storage URI, so no AWS is needed.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from partition_manifest import MANIFEST_FILE, PartitionManifest, manifest_key
+from s3_etl_utils import S3PartitionedETL, partition_part_key
+from s3_partition_inventory import S3PartitionInventory
+from partition_compaction import CompactionPolicy, PartitionCompactor
+
+PREFIX = "partitioned-data"
+
+
+def _values(payer: str, taxonomy: str = '101') -> dict:
+    return {'payer_slug': payer, 'state': 'GA', 'billing_class': 'professional', 'procedure_set': 'Evaluation',
+            'procedure_class': 'Surgery', 'primary_taxonomy_code': taxonomy, 'stat_area_name': 'Atlanta',
+            'year': 2025, 'month': 8}
+
+
+def _rows(name: str, count: int) -> pl.DataFrame:
+    return pl.DataFrame({
+        'fact_uid': [f"{name}-{i:06d}" for i in range(count)],
+        'code': [f"{99201 + i % 7}" for i in range(count)],
+        'npi': [1_000_000_000 + i % 13 for i in range(count)],
+        'negotiated_rate': [float(i) for i in range(count)],
+    })
+
+
+def test_manifest_contents():
+    """Counts, codes, rate percentiles and fact_uid range; the content hash ignores row order"""
+    data = _rows("a", 101).with_columns(pl.when(pl.col('negotiated_rate') == 3).then(None)
+                                        .otherwise(pl.col('negotiated_rate')).alias('negotiated_rate'))
+    manifest = PartitionManifest.from_rows(data, "k/fact_rate_enriched.parquet", file_size=10)
+    assert (manifest.rows, manifest.distinct_npis) == (101, 13)
+    assert manifest.codes == [f"{99201 + i}" for i in range(7)]
+    assert manifest.negotiated_rate['min'] == 0.0 and manifest.negotiated_rate['max'] == 100.0
+    assert manifest.negotiated_rate['p50'] == data['negotiated_rate'].quantile(0.5, 'nearest')
+    assert (manifest.fact_uid_min, manifest.fact_uid_max) == ("a-000000", "a-000100")
+
+    shuffled = data.sample(fraction=1.0, shuffle=True, seed=7).select(reversed(data.columns))
+    assert PartitionManifest.from_rows(shuffled, "k").content_hash == manifest.content_hash
+    categorical = data.with_columns(pl.col('code').cast(pl.Categorical))
+    assert PartitionManifest.from_rows(categorical, "k").content_hash == manifest.content_hash
+    changed = data.with_columns(pl.when(pl.col('fact_uid') == "a-000050").then(-1.0)
+                                .otherwise(pl.col('negotiated_rate')).alias('negotiated_rate'))
+    assert PartitionManifest.from_rows(changed, "k").content_hash != manifest.content_hash
+
+    assert PartitionManifest.from_json(manifest.to_json()) == manifest
+    assert manifest.describes(10) and not manifest.describes(11)
+    for bad in (b"not json", b"[1]", b'{"rows": 1}'):
+        try:
+            PartitionManifest.from_json(bad)
+            raise AssertionError(f"expected ValueError for {bad!r}")
+        except ValueError:
+            pass
+
+    # Compact providers: NPIs are counted over the nested members
+    compact = data.head(3).with_columns(pl.Series('providers', [
+        [{'npi': 1}, {'npi': 2}], [{'npi': 2}, {'npi': 3}], [{'npi': None}],
+    ]))
+    assert PartitionManifest.from_rows(compact, "k").distinct_npis == 3
+
+    # From a Parquet file, summarized lazily and hashed per row group: the same manifest
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (data, compact, data.clear()):
+            path = Path(tmp) / "staged.parquet"
+            rows.write_parquet(path, row_group_size=16)
+            from_file = PartitionManifest.from_file(path, "k", file_size=10)
+            assert from_file == replace(PartitionManifest.from_rows(rows, "k", file_size=10),
+                                        written_at=from_file.written_at)
+
+
+def test_manifests_written_with_partitions():
+    """Direct, streamed, queued and staged uploads and merges write manifests; parts and disabled runs do not"""
+    from ETL.ETL_3 import write_partition_idempotent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage", upload_workers=2, multipart_threshold_mb=0.05)
+        paths = {payer: s3_etl.create_s3_path(_values(payer), PREFIX) for payer in ('a', 'b', 'c', 'd', 'e')}
+        s3_etl.upload_partition_to_s3(_rows("a", 10), paths['a'])
+        s3_etl.upload_partition_to_s3(_rows("b", 5000), paths['b'])        # streamed
+        s3_etl.submit_partition_upload(_rows("c", 20), paths['c'])         # queued
+        staged = Path(tmp) / "c.parquet"
+        _rows("d", 30).write_parquet(staged)
+        read_parquet = pl.read_parquet
+
+        def not_loaded(source, *args, **kwargs):
+            raise AssertionError(f"{source} was loaded to build its manifest")
+        pl.read_parquet = not_loaded
+        try:
+            s3_etl.submit_file_upload(staged, paths['d'])
+        finally:
+            pl.read_parquet = read_parquet
+        s3_etl.upload_partition_to_s3(_rows("e", 5), s3_etl.storage.uri(partition_part_key(
+            s3_etl.storage.key(paths['e']), 0)))
+        assert not s3_etl.close() and s3_etl.streamed_uploads == 1
+
+        for payer, rows in (('a', 10), ('b', 5000), ('c', 20), ('d', 30)):
+            manifest = s3_etl.read_manifest(paths[payer])
+            key = s3_etl.storage.key(paths[payer])
+            assert manifest.partition == key and manifest.rows == rows
+            assert manifest.describes(len(s3_etl.storage.get(key)))
+            assert manifest.content_hash == PartitionManifest.from_rows(s3_etl.read_partition(paths[payer]),
+                                                                        key).content_hash
+        assert s3_etl.read_manifest(paths['e']) is None
+
+        # A merge rewrites the manifest with the merged rows
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage")
+        write_partition_idempotent(_rows("x", 4), paths['a'], s3_etl)
+        assert s3_etl.read_manifest(paths['a']).rows == 14
+
+        s3_etl = S3PartitionedETL(f"file://{tmp}/plain", manifests=False)
+        s3_etl.upload_partition_to_s3(_rows("a", 10), paths['a'].replace("/stage", "/plain"))
+        assert not list((Path(tmp) / "plain").rglob(MANIFEST_FILE))
+
+
+def test_inventory_uses_manifests():
+    """Exact counts from manifests, estimates without or with a stale one, and the navigation database"""
+    with tempfile.TemporaryDirectory() as tmp:
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage")
+        paths = {payer: s3_etl.create_s3_path(_values(payer), PREFIX) for payer in ('a', 'b', 'c')}
+        s3_etl.upload_partition_to_s3(_rows("a", 10), paths['a'])
+        s3_etl.upload_partition_to_s3(_rows("b", 20), paths['b'])
+        # Rewritten without a manifest: the one left describes another file
+        S3PartitionedETL(f"file://{tmp}/stage", manifests=False).upload_partition_to_s3(_rows("b", 500), paths['b'])
+        S3PartitionedETL(f"file://{tmp}/stage", manifests=False).upload_partition_to_s3(_rows("c", 30), paths['c'])
+
+        inventory = S3PartitionInventory("unused", prefix=PREFIX, storage=s3_etl.storage)
+        found = {p.payer_slug: p for p in inventory.discover_partitions()}
+        assert (found['a'].record_count, found['a'].record_count_estimate) == (10, 10)
+        assert found['b'].record_count is None and found['c'].record_count is None
+        assert found['b'].record_count_estimate == inventory._estimate_record_count(found['b'].file_size_bytes)
+        summary = inventory.analyze_partitions(list(found.values()))['summary']
+        assert (summary['partitions_with_manifests'], summary['manifest_records']) == (1, 10)
+
+        db = inventory.create_navigation_database(list(found.values()), output_db=os.path.join(tmp, "nav.db"))
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT record_count FROM partitions WHERE payer_slug = 'a'").fetchone() == (10,)
+            rows = conn.execute("SELECT payer_slug, rows, rate_min, rate_max FROM v_code_partitions "
+                                "WHERE code = '99202'").fetchall()
+            assert rows == [('a', 10, 0.0, 9.0)]
+        assert not manifest_key(s3_etl.storage.key(paths['a'])).endswith('.parquet')
+
+
+def test_manifests_survive_compaction():
+    """Split and rolled-up partitions keep their manifests, and the inventory counts their rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage")
+        written = {s3_etl.create_s3_path(_values('aetna', t), PREFIX): _rows(f"s{t}", 5) for t in ('101', '102')}
+        big = s3_etl.create_s3_path(_values('cigna'), PREFIX)
+        written[big] = _rows("big", 30_000)
+        for path, rows in written.items():
+            s3_etl.upload_partition_to_s3(rows, path)
+
+        size = max(p.stat().st_size for p in Path(tmp).rglob("*.parquet"))
+        policy = CompactionPolicy(target_file_bytes=size // 3 + 1, min_file_bytes=8 * 1024, max_file_bytes=size - 1,
+                                  max_rows=1_000_000, rollup_level='procedure_class')
+        report = PartitionCompactor(S3PartitionedETL(f"file://{tmp}/stage", rollup_level='procedure_class'), PREFIX,
+                                    policy).run()
+        assert not report['failed'] and report['splits'] == 1 and report['rollups'] == 1
+
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage", rollup_level='procedure_class')
+        for path, rows in written.items():
+            assert s3_etl.locate_partition(path)[0] in ('parts', 'rollup')
+            assert s3_etl.read_manifest(path).rows == rows.height
+
+        inventory = S3PartitionInventory("unused", prefix=PREFIX, storage=s3_etl.storage)
+        partitions = inventory.discover_partitions()
+        by_kind = {kind: [p for p in partitions if p.file_kind == kind] for kind in ('part', 'rollup')}
+        assert sum(p.record_count_estimate for p in by_kind['part']) == 30_000
+        assert [p.record_count_estimate for p in by_kind['rollup']] == [10]
+        assert set(inventory.manifest_locations.values()) == {p.partition_path for p in by_kind['rollup']} | {
+            min(p.partition_path for p in by_kind['part'])}
+        assert inventory.analyze_partitions(partitions)['summary']['manifest_records'] == 30_010
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Manifest contents", test_manifest_contents),
+        ("Manifests written with partitions", test_manifests_written_with_partitions),
+        ("Inventory uses manifests", test_inventory_uses_manifests),
+        ("Manifests survive compaction", test_manifests_survive_compaction),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Tests for partition specs (utils/partition_spec.py): parsing, bucket and
+truncate levels, the keys, inventory parser and Athena DDL derived from a
+spec, writes, staging and compaction under a bucketed spec, and the planner.
+
+Everything runs against a file:// storage URI, so no AWS is needed.
+"""
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from partition_spec import (DEFAULT_SPEC, PartitionField, PartitionSpec, partition_file_sizes,
+                            plan_partition_spec)
+from s3_etl_utils import S3PartitionedETL, partition_key, rollup_key
+from s3_partition_inventory import S3PartitionInventory
+from partition_compaction import CompactionPolicy, PartitionCompactor
+
+PREFIX = "partitioned-data"
+BUCKETED = ['payer_slug', 'state', 'billing_class', 'bucket(4, primary_taxonomy_code)', 'year', 'month']
+
+
+def _values(payer: str, taxonomy: str = '101', stat_area: str = 'Atlanta') -> dict:
+    return {'payer_slug': payer, 'state': 'GA', 'billing_class': 'professional', 'procedure_set': 'Evaluation',
+            'procedure_class': 'Surgery', 'primary_taxonomy_code': taxonomy, 'stat_area_name': stat_area,
+            'year': 2025, 'month': 8}
+
+
+def _rows(name: str, count: int, taxonomies: int = 1) -> pl.DataFrame:
+    return pl.DataFrame({
+        'fact_uid': [f"{name}-{i:06d}" for i in range(count)],
+        'payer_slug': name, 'state': 'GA', 'billing_class': 'professional',
+        'primary_taxonomy_code': [f"2{i % taxonomies:03d}X" for i in range(count)],
+        'year': 2025, 'month': 8,
+        'negotiated_rate': [float(i) for i in range(count)],
+    })
+
+
+def test_parse():
+    """Config entries parse into levels and print back; malformed specs are refused"""
+    spec = PartitionSpec.parse(['payer_slug', ' bucket( 16 ,primary_taxonomy_code)', 'truncate(3, stat_area_name)',
+                                'year', 'month'])
+    assert spec.fields == (PartitionField('payer_slug'), PartitionField('primary_taxonomy_code', 'bucket', 16),
+                           PartitionField('stat_area_name', 'truncate', 3))
+    assert spec.levels == ['payer_slug', 'primary_taxonomy_code_bucket', 'stat_area_name_trunc']
+    assert spec.columns == spec.levels + ['year', 'month']
+    assert PartitionSpec.parse(spec.entries) == spec
+    assert spec.entries[1] == 'bucket(16, primary_taxonomy_code)'
+    assert PartitionSpec.parse(DEFAULT_SPEC.entries) == DEFAULT_SPEC
+
+    for bad in (['hash(4, state)'], ['bucket(1, state)'], ['truncate(0, state)'], ['bucket(4 state)'],
+                ['state', 'state'], ['year', 'month'], ['bucket(4, state)', 'state_bucket']):
+        try:
+            PartitionSpec.parse(bad)
+            raise AssertionError(f"expected ValueError for {bad}")
+        except ValueError:
+            pass
+
+
+def test_keys_and_transforms():
+    """The default spec keeps today's keys; buckets are stable and computed alike eagerly, lazily or per key"""
+    assert partition_key(_values('aetna', stat_area='St Louis/MO')) == (
+        "partitioned-data/payer_slug=aetna/state=GA/billing_class=professional/procedure_set=Evaluation/"
+        "procedure_class=Surgery/primary_taxonomy_code=101/stat_area_name=St_Louis_MO/year=2025/month=08/"
+        "fact_rate_enriched.parquet")
+
+    bucket = PartitionField('primary_taxonomy_code', 'bucket', 16)
+    # md5 based: the same in every process and Python version
+    assert [bucket.apply(code) for code in ('207Q00000X', '101Y00000X')] == ['05', '09']
+    assert bucket.apply(None) == bucket.apply('__NULL__')
+    truncate = PartitionField('stat_area_name', 'truncate', 3)
+    assert (truncate.apply('Atlanta'), truncate.apply(None), truncate.apply('__NULL__')) == ('Atl', '__NULL__',
+                                                                                            '__NULL__')
+
+    spec = PartitionSpec((PartitionField('payer_slug'), bucket, truncate))
+    frame = pl.DataFrame({
+        'payer_slug': ['a'] * 6,
+        'primary_taxonomy_code': [f"2{i}7Q00000X" for i in range(4)] + ['__NULL__', None],
+        'stat_area_name': ['Atlanta', 'Macon', 'Athens', None, '__NULL__', 'Augusta'],
+        'year': 2025, 'month': 8,
+    }).with_columns(pl.col('primary_taxonomy_code').cast(pl.Categorical))
+    eager = spec.with_partition_columns(frame)
+    lazy = spec.with_partition_columns(frame.lazy()).collect(engine='streaming')
+    assert eager.equals(lazy)
+    assert eager['primary_taxonomy_code_bucket'].to_list() == [
+        bucket.apply(code) for code in frame['primary_taxonomy_code'].cast(pl.String).to_list()]
+    assert eager['stat_area_name_trunc'].to_list() == ['Atl', 'Mac', 'Ath', '__NULL__', '__NULL__', 'Aug']
+    assert DEFAULT_SPEC.with_partition_columns(frame) is frame
+
+    # Keys from derived columns or from their source values agree
+    row = eager.row(0, named=True)
+    assert spec.path(row) == spec.path(frame.row(0, named=True)) == (
+        f"partitioned-data/payer_slug=a/primary_taxonomy_code_bucket={row['primary_taxonomy_code_bucket']}/"
+        f"stat_area_name_trunc=Atl/year=2025/month=08")
+
+
+def test_inventory_and_athena():
+    """The inventory parses bucketed paths and their rollups; the DDL's partitions follow the spec"""
+    spec = PartitionSpec.parse(BUCKETED)
+    key = partition_key(_values('aetna', '207Q00000X'), PREFIX, spec)
+    bucket = PartitionField('primary_taxonomy_code', 'bucket', 4).apply('207Q00000X')
+    assert f"/billing_class=professional/primary_taxonomy_code_bucket={bucket}/year=2025/" in key
+
+    inventory = S3PartitionInventory("unused", storage=object(), spec=spec)
+    info = inventory.parse_partition_path(key)
+    assert (info.payer_slug, info.billing_class, info.taxonomy_code, info.file_kind) == (
+        'aetna', 'professional', None, 'file')
+    assert info.levels == {'payer_slug': 'aetna', 'state': 'GA', 'billing_class': 'professional',
+                           'primary_taxonomy_code_bucket': bucket}
+    rolled = inventory.parse_partition_path(rollup_key(key, 'state', spec.levels))
+    assert rolled.file_kind == 'rollup' and rolled.levels['billing_class'] is None
+    # The default parser does not take a bucketed path for a partition
+    assert S3PartitionInventory("unused", storage=object()).parse_partition_path(key) is None
+
+    s3_etl = S3PartitionedETL("my-bucket", partition_spec=spec)
+    sql = s3_etl.athena_table_sql("db", "fact_rate_enriched", projection={'state': {'type': 'enum',
+                                                                                    'values': ['GA', 'FL']}})
+    partitioned = sql.split("PARTITIONED BY (")[1].split(")")[0]
+    assert [line.split()[0] for line in partitioned.strip().splitlines()] == spec.columns
+    assert "primary_taxonomy_code_bucket int" in partitioned
+    data_columns = sql.split("PARTITIONED BY")[0]
+    assert not any(re.search(rf"^\s+{name} ", data_columns, re.M) for name in spec.columns)
+    assert re.search(r"^\s+primary_taxonomy_code string", data_columns, re.M)
+    assert "'projection.primary_taxonomy_code_bucket.range' = '0,3'" in sql
+    assert "'projection.state.values' = 'GA,FL'" in sql and "'projection.month.digits' = '2'" in sql
+
+    # The location template, filled in with a written key's values, is that key's directory
+    template = re.search(r"'storage.location.template' = '([^']+)'", sql).group(1)
+    filled = template
+    for name, value in {**info.levels, 'year': '2025', 'month': '08'}.items():
+        filled = filled.replace(f"${{{name}}}", value)
+    assert filled == f"s3://my-bucket/{key.rsplit('/', 1)[0]}/"
+
+
+def test_bucketed_writes_and_compaction():
+    """Chunked writes, staging and compaction under a bucketed spec; every partition reads back"""
+    from ETL.ETL_3 import _create_partitions_for_chunk
+    from partition_staging import stage_partitions
+
+    spec = PartitionSpec.parse(BUCKETED)
+    with tempfile.TemporaryDirectory() as tmp:
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage", partition_spec=spec, rollup_level='state')
+        written = {}
+        for payer, count in (('aetna', 40), ('cigna', 30_000)):
+            chunk = spec.with_partition_columns(_rows(payer, count, taxonomies=12))
+            for path in _create_partitions_for_chunk(chunk, spec.columns, s3_etl, PREFIX):
+                written[path] = chunk.filter(pl.col('primary_taxonomy_code_bucket') ==
+                                             re.search(r"_bucket=(\d+)/", path).group(1))
+        assert not s3_etl.close()
+        assert len(written) == 8 and all('primary_taxonomy_code=' not in path for path in written)
+        assert {s3_etl.storage.key(path) for path in written} == {
+            p.relative_to(f"{tmp}/stage").as_posix() for p in Path(tmp).rglob("*.parquet")}
+
+        # The streaming engine stages the same keys
+        staged = stage_partitions(pl.concat([_rows('aetna', 40, 12), _rows('cigna', 30_000, 12)]).lazy(),
+                                  Path(tmp) / "staging", spec.columns, PREFIX, spec=spec)
+        assert {p.key for p in staged} == {s3_etl.storage.key(path) for path in written}
+
+        sizes = sorted(p.stat().st_size for p in Path(f"{tmp}/stage").rglob("*.parquet"))
+        policy = CompactionPolicy(target_file_bytes=sizes[-1] // 3 + 1, min_file_bytes=sizes[3] + 1,
+                                  max_file_bytes=sizes[-1] - 1, rollup_level='state')
+        report = PartitionCompactor(S3PartitionedETL(f"file://{tmp}/stage", partition_spec=spec,
+                                                     rollup_level='state'), PREFIX, policy).run()
+        assert not report['failed'] and report['rollups'] >= 1 and report['splits'] >= 1
+
+        reader = S3PartitionedETL(f"file://{tmp}/stage", partition_spec=spec, rollup_level='state')
+        kinds = set()
+        for path, rows in written.items():
+            kinds.add(reader.locate_partition(path)[0])
+            assert reader.read_partition(path).sort('fact_uid').equals(rows.sort('fact_uid')), path
+        assert kinds >= {'rollup', 'parts'}
+
+        inventory = S3PartitionInventory("unused", prefix=PREFIX, storage=reader.storage, spec=spec)
+        partitions = inventory.discover_partitions()
+        assert {p.file_kind for p in partitions} >= {'rollup', 'part'}
+        assert sum(p.record_count_estimate for p in partitions) == 30_040
+
+        try:
+            PartitionCompactor(S3PartitionedETL(f"file://{tmp}/stage", partition_spec=spec),
+                               PREFIX, policy._replace(rollup_level='procedure_class'))
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+
+
+def test_config_spec():
+    """partition_columns in etl3_config.yaml is the spec; a rollup level outside it fails validation"""
+    from ETL.ETL_3 import ETL3Config
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "etl3_config.yaml"
+        path.write_text("partitioning:\n  partition_columns:\n" + "".join(f'    - "{e}"\n' for e in BUCKETED)
+                        + "  rollup_level: procedure_class\n")
+        config = ETL3Config(str(path))
+        assert config.partition_spec() == PartitionSpec.parse(BUCKETED)
+        assert not config.validate()
+        config.PARTITION_COLUMNS = ['bucket(one, state)']
+        try:
+            config.partition_spec()
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+
+
+def test_planner():
+    """Tiny taxonomy and statistical area partitions are bucketed or dropped, and more files land in range"""
+    rng = np.random.default_rng(5)
+    n = 200_000
+
+    def draw(values, p=None):
+        return rng.choice(values, n, p=p)
+
+    sample = pl.DataFrame({
+        'payer_slug': draw([f"payer-{i}" for i in range(4)]),
+        'state': draw(['GA', 'FL', 'TX']),
+        'billing_class': draw(['professional', 'institutional'], p=[0.8, 0.2]),
+        'procedure_set': draw([f"set-{i}" for i in range(7)]),
+        'procedure_class': draw([f"class-{i}" for i in range(3)]),
+        'primary_taxonomy_code': draw([f"T{i:04d}" for i in range(400)]),
+        'stat_area_name': draw([f"area-{i}" for i in range(60)]),
+        'year': 2025, 'month': 8,
+    })
+    # 200K sample rows standing for 20M rows of 100 bytes
+    scale, bytes_per_row, low, high = 100, 100, 4_000_000, 64_000_000
+    suggested, report = plan_partition_spec(sample, scale, bytes_per_row, low, high)
+    assert suggested.levels[0] == 'payer_slug' and set(report) == set(DEFAULT_SPEC.levels[1:])
+    assert 'primary_taxonomy_code' not in suggested.levels and 'stat_area_name' not in suggested.levels
+
+    def within(spec):
+        sizes = partition_file_sizes(sample, spec, scale, bytes_per_row)
+        return ((sizes >= low) & (sizes <= high)).mean()
+
+    assert within(DEFAULT_SPEC) == 0.0 and within(suggested) >= 0.9
+    assert PartitionSpec.parse(suggested.entries) == suggested
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Parse", test_parse),
+        ("Keys and transforms", test_keys_and_transforms),
+        ("Inventory and Athena", test_inventory_and_athena),
+        ("Bucketed writes and compaction", test_bucketed_writes_and_compaction),
+        ("Config spec", test_config_spec),
+        ("Planner", test_planner),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass partition split used by ETL3
+(split_partitions in utils/s3_etl_utils.py).
+
+Each partition must equal the per-tuple filter it replaces, in the same
+partition order, with null partition values kept as their own partition.
+"""
+
+import sys
+import random
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from s3_etl_utils import split_partitions
+
+PARTITION_COLUMNS = ["state", "billing_class", "primary_taxonomy_code", "year"]
+
+
+def _chunk(rows: int, seed: int) -> pl.DataFrame:
+    rng = random.Random(seed)
+    return pl.DataFrame({
+        "fact_uid": [f"{i:08x}" for i in range(rows)],
+        "state": [rng.choice(["GA", "FL", None]) for _ in range(rows)],
+        "billing_class": [rng.choice(["professional", "institutional"]) for _ in range(rows)],
+        "primary_taxonomy_code": [rng.choice(["207Q00000X", "208D00000X", "363L00000X", None]) for _ in range(rows)],
+        "year": [rng.choice(["2024", "2025"]) for _ in range(rows)],
+        "negotiated_rate": [rng.random() * 500 for _ in range(rows)],
+    })
+
+
+def _split_with_filters(df: pl.DataFrame, partition_cols: list) -> list:
+    partitions = []
+    combinations = df.select(partition_cols).unique().sort(partition_cols)
+    for partition_row in combinations.iter_rows(named=True):
+        conditions = [pl.col(c).is_null() if v is None else pl.col(c) == v for c, v in partition_row.items()]
+        partitions.append((partition_row, df.filter(pl.all_horizontal(conditions))))
+    return partitions
+
+
+def test_matches_filter_per_tuple():
+    """Partitions, their order and their rows equal the per-tuple filters"""
+    chunk = _chunk(5_000, 1)
+    expected = _split_with_filters(chunk, PARTITION_COLUMNS)
+    actual = list(split_partitions(chunk, PARTITION_COLUMNS))
+
+    assert len(actual) == len(expected), f"{len(actual)} partitions, expected {len(expected)}"
+    for (exp_row, exp_df), (act_row, act_df) in zip(expected, actual):
+        assert act_row == exp_row, f"Partition {act_row} != {exp_row}"
+        assert act_df.equals(exp_df), f"Rows differ for {exp_row}"
+
+
+def test_null_partition_values():
+    """Null partition values form their own partition"""
+    chunk = pl.DataFrame({"state": [None, "GA", None], "year": ["2025", "2025", "2025"], "v": [1, 2, 3]})
+    actual = list(split_partitions(chunk, ["state", "year"]))
+
+    assert [row for row, _ in actual] == [{"state": None, "year": "2025"}, {"state": "GA", "year": "2025"}]
+    assert actual[0][1]["v"].to_list() == [1, 3]
+
+
+def test_empty_chunk():
+    """An empty chunk yields no partitions"""
+    chunk = _chunk(0, 2)
+    assert list(split_partitions(chunk, PARTITION_COLUMNS)) == []
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Matches filter per tuple", test_matches_filter_per_tuple),
+        ("Null partition values", test_null_partition_values),
+        ("Empty chunk", test_empty_chunk),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for compact provider enrichment (utils/provider_compaction.py).
+
+Uses the synthetic dims of test_dimension_bundle.py: compact enrichment must
+keep one row per fact, nest exactly the member rows expanded enrichment would
+have produced, pick the documented representative for the partition keys,
+and give the same result through the per-dim joins and the dimension bundle.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from provider_compaction import FanoutTracker, PROVIDERS_COLUMN, FANOUT_COLUMN, expanded_rows
+from dimension_bundle import DimensionBundle
+from ETL.ETL_3 import _enrich_fact_table
+from test_dimension_bundle import _dims, _fact, _write
+
+MEMBER_COLUMNS = ['npi', 'primary_taxonomy_code', 'tin_value', 'state_geo', 'latitude', 'longitude',
+                  'county_name', 'county_fips', 'stat_area_name', 'stat_area_code', 'matched_address']
+
+
+def _member_rows(df: pl.DataFrame) -> list:
+    # Expanded rows carry the partition keys' '__NULL__' fill; nested members keep the raw nulls
+    raw = df.select(MEMBER_COLUMNS).with_columns(pl.col(pl.Utf8).replace('__NULL__', None))
+    return sorted(raw.rows(), key=repr)
+
+
+def test_one_row_per_fact_with_all_members():
+    """Compact rows nest exactly the member rows of the expanded enrichment"""
+    # f1's code has two dim_code rows: that (non-provider) fan-out is kept
+    dims, xrefs = _dims()
+    fact = _fact()
+    expanded = _enrich_fact_table(fact, dims, xrefs)
+    compact = _enrich_fact_table(fact, dims, xrefs, compact_providers=True)
+
+    assert compact.height == fact.height + 1
+    assert compact['fact_uid'].unique(maintain_order=True).to_list() == fact['fact_uid'].to_list()
+    assert compact.columns == expanded.columns[:-4] + [PROVIDERS_COLUMN, FANOUT_COLUMN] + expanded.columns[-4:]
+    assert expanded_rows(compact) == expanded.height
+
+    for row in compact.iter_rows(named=True):
+        wanted = expanded.filter((pl.col('fact_uid') == row['fact_uid'])
+                                 & pl.col('code_description').eq_missing(row['code_description']))
+        assert row[FANOUT_COLUMN] == wanted.height
+        if row[PROVIDERS_COLUMN] is None:
+            assert _member_rows(wanted) == [(None,) * len(MEMBER_COLUMNS)]
+        else:
+            nested = pl.DataFrame(row[PROVIDERS_COLUMN], schema=wanted.select(MEMBER_COLUMNS).schema)
+            assert _member_rows(nested) == _member_rows(wanted)
+
+
+def test_representative_member():
+    """The representative has the most partition attributes, then the smallest NPI"""
+    dims, xrefs = _dims()
+    compact = _enrich_fact_table(_fact(), dims, xrefs, compact_providers=True)
+    by_uid = {row['fact_uid']: row for row in compact.iter_rows(named=True)}
+
+    # pg1: NPI 1001 (GA and FL LOCATION addresses) and 1002 -> 1001, FL sorts first
+    assert (by_uid['f0']['npi'], by_uid['f0']['state'], by_uid['f0']['stat_area_name']) == (1001, 'FL', 'Miami')
+    # pg4: NPI 1004 has no LOCATION address, so 1001 represents the group
+    assert by_uid['f3']['npi'] == 1001 and by_uid['f3']['state'] == 'FL'
+    # pg2: its only NPI has no taxonomy or address; partition keys fall back to __NULL__
+    assert by_uid['f1']['primary_taxonomy_code'] == '__NULL__' and by_uid['f1']['state'] == '__NULL__'
+    # No provider group at all: a single expanded row, nothing nested
+    assert by_uid['f6'][FANOUT_COLUMN] == 1 and by_uid['f6'][PROVIDERS_COLUMN] is None
+
+
+def test_bundle_matches_per_dim_joins():
+    """Compact enrichment from the dimension bundle equals the per-dim compact path"""
+    dims, xrefs = _dims()
+    fact = _fact()
+    with tempfile.TemporaryDirectory() as tmp:
+        dim_paths, xref_paths = _write(Path(tmp), dims, xrefs)
+        bundle = DimensionBundle.load_or_build(Path(tmp) / "bundle", dim_paths, xref_paths, fact.columns)
+        actual = _enrich_fact_table(fact, {}, {}, bundle=bundle, compact_providers=True)
+    expected = _enrich_fact_table(fact, dims, xrefs, compact_providers=True)
+
+    assert actual.columns == expected.columns
+    assert actual.schema == expected.schema
+    order = ['fact_uid', 'code_description']
+    assert actual.sort(order, nulls_last=True).equals(expected.sort(order, nulls_last=True))
+
+
+def test_fanout_tracker():
+    """The diagnostic reports expanded rows per fact row, per chunk and overall"""
+    dims, xrefs = _dims()
+    fact = _fact()
+    tracker = FanoutTracker()
+    expanded = _enrich_fact_table(fact, dims, xrefs)
+    compact = _enrich_fact_table(fact, dims, xrefs, compact_providers=True)
+
+    assert tracker.observe(0, fact.height, expanded) == expanded.height / fact.height
+    assert tracker.observe(1, fact.height, compact) == expanded.height / fact.height
+    assert tracker.observe(2, 1, compact.head(1)) == 3.0
+
+    summary = tracker.summary()
+    assert summary['expanded_rows'] == 2 * expanded.height + 3
+    assert summary['output_rows'] == expanded.height + compact.height + 1
+    assert summary['max_ratio'] == 3.0 and summary['max_ratio_chunk'] == 3
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("One row per fact with all members", test_one_row_per_fact_with_all_members),
+        ("Representative member", test_representative_member),
+        ("Bundle matches per-dim joins", test_bundle_matches_per_dim_joins),
+        ("Fan-out tracker", test_fanout_tracker),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the cross-chunk seen-key filter (utils/seen_keys.py).
+
+The filter may only drop rows whose absence cannot change the last-wins merge
+result, so the main check merges filtered and unfiltered chunks and compares.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from seen_keys import SeenKeySet, DimensionKeyFilter
+from chunk_merge import ChunkMerger
+
+
+def _reference_mask(state: dict, keys, rows) -> np.ndarray:
+    """Row-at-a-time model of SeenKeySet.filter."""
+    groups = {}
+    for i, (k, r) in enumerate(zip(keys.tolist(), rows.tolist())):
+        groups.setdefault(k, []).append((i, r))
+    mask = np.zeros(len(keys), dtype=bool)
+    for k, members in groups.items():
+        last = members[-1][1]
+        if k not in state or len({r for _, r in members}) > 1 or state[k] != last:
+            for i, _ in members:
+                mask[i] = True
+            state[k] = last
+    return mask
+
+
+def _check_against_model(max_memory_keys: int) -> SeenKeySet:
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        seen = SeenKeySet("dim", Path(tmp), max_memory_keys)
+        seen.MIN_DELTA = 256
+        state = {}
+        for _ in range(120):
+            keys = rng.integers(0, 50_000, 1_000).astype(np.uint64)
+            rows = rng.integers(0, 3, 1_000).astype(np.uint64)
+            assert (seen.filter(keys, rows) == _reference_mask(state, keys, rows)).all()
+        assert len(seen) == len(state)
+        spilled = seen.spilled
+        seen.close()
+        assert not list(Path(tmp).glob("*.npy"))
+    return spilled
+
+
+def test_matches_model_in_memory():
+    """Sorted-array state matches a dict model"""
+    assert not _check_against_model(max_memory_keys=10**9)
+
+
+def test_matches_model_spilled():
+    """Memory-mapped state gives the same answers as in-memory state"""
+    assert _check_against_model(max_memory_keys=2_000)
+
+
+def test_filtered_merge_matches_unfiltered():
+    """Last-wins merge of filtered chunks equals the merge of all rows"""
+    rng = np.random.default_rng(5)
+    chunks = [
+        pl.DataFrame({
+            "code_type": ["CPT"] * 200,
+            "code": [str(c) for c in rng.integers(0, 40, 200)],
+            "code_description": [f"d{v}" for v in rng.integers(0, 2, 200)],
+        })
+        for _ in range(25)
+    ]
+    keys = ["code_type", "code"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        key_filter = DimensionKeyFilter({"dim_code": keys}, tmp / "spill")
+        merged = {}
+        for variant in ("all", "filtered"):
+            temp_dir = tmp / variant / "temp_chunks"
+            temp_dir.mkdir(parents=True)
+            files = []
+            for idx, chunk in enumerate(chunks):
+                if variant == "filtered":
+                    chunk = key_filter.filter("dim_code", chunk)
+                if chunk.is_empty():
+                    continue
+                path = temp_dir / f"dim_code_chunk_{idx:06d}.parquet"
+                chunk.write_parquet(path)
+                files.append(path)
+            output = tmp / variant / "dim_code.parquet"
+            ChunkMerger(256, temp_dir / "spill").merge("dim_code", files, output, keys)
+            merged[variant] = pl.read_parquet(output).sort(keys)
+
+        stats = key_filter.stats()["dim_code"]
+        assert stats["rows_emitted"] < stats["rows_in"]
+        assert merged["filtered"].equals(merged["all"])
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Matches model in memory", test_matches_model_in_memory),
+        ("Matches model when spilled", test_matches_model_spilled),
+        ("Filtered merge matches unfiltered", test_filtered_merge_matches_unfiltered),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
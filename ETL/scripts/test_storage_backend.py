@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Tests for the partition storage backends (utils/storage_backend.py) and their
+use by S3PartitionedETL and the ETL3 pipeline.
+
+The local backend is checked against the S3 backend on moto's in-process S3
+(the parity test is skipped without moto). The pipeline tests run both ETL3
+engines against a file:// URI with boto3 patched to fail, so they also check
+that a local run creates no AWS client at all.
+"""
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import boto3
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from storage_backend import LocalBackend, S3Backend, StorageBackend, open_storage
+from test_dimension_bundle import _dims, _write
+from test_streaming_engine import _fact_file
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the S3 parity test
+    mock_aws = None
+
+BUCKET = "test-bucket"
+PREFIX = "partitioned-data"
+
+
+def _key(payer: str, state: str) -> str:
+    return f"{PREFIX}/payer_slug={payer}/state={state}/fact_rate_enriched.parquet"
+
+
+def _exercise(storage) -> dict:
+    """The same operations on any backend, with everything they returned"""
+    storage.put(_key('aetna', 'GA'), io.BytesIO(b"0123456789"))
+    storage.put(_key('aetna', 'FL'), io.BytesIO(b"abc"))
+    with storage.open_writer(_key('cigna', 'GA'), part_size=5 * 1024 * 1024) as writer:
+        writer.write(b"streamed ")
+        writer.write(b"object")
+    try:
+        with storage.open_writer(_key('uhc', 'GA'), part_size=5 * 1024 * 1024) as writer:
+            writer.write(b"partial")
+            raise RuntimeError("encoder failed")
+    except RuntimeError:
+        pass
+    storage.put(f"{PREFIX}/_SUCCESS", io.BytesIO(b""))
+    # Deleted objects leave no prefix behind; deleting a missing object is not an error
+    storage.put(_key('wellcare', 'GA'), io.BytesIO(b"gone"))
+    storage.delete(_key('wellcare', 'GA'))
+    storage.delete(_key('wellcare', 'FL'))
+
+    storage.copy(_key('aetna', 'FL'), _key('aetna', 'TX'))
+    try:
+        storage.get(_key('uhc', 'GA'))
+        missing = False
+    except FileNotFoundError:
+        missing = True
+    try:
+        storage.copy(_key('uhc', 'GA'), _key('uhc', 'FL'))
+        missing_copy = False
+    except FileNotFoundError:
+        missing_copy = True
+
+    delimited = list(storage.list(f"{PREFIX}/", delimiter='/'))
+    return {
+        'get': storage.get(_key('aetna', 'GA')),
+        'streamed': storage.get(_key('cigna', 'GA')),
+        'writer_bytes': writer.bytes_written,
+        'range': storage.range_get(_key('aetna', 'GA'), 2, 3),
+        'suffix': storage.range_get(_key('aetna', 'GA'), -4, 4),
+        'suffix_head': storage.range_get(_key('aetna', 'GA'), -4, 2),
+        'exists': [storage.exists(_key('aetna', 'FL')), storage.exists(_key('uhc', 'GA'))],
+        'missing_raises': missing,
+        'copied': storage.get(_key('aetna', 'TX')),
+        'missing_copy_raises': missing_copy,
+        'listed': {key: obj.size for page in storage.list(f"{PREFIX}/payer_slug=aetna")
+                   for key, obj in page.objects.items()},
+        'prefixes': sorted(p for page in delimited for p in page.prefixes),
+        'direct': sorted(key for page in delimited for key in page.objects),
+        'round_trip': storage.key(storage.uri(_key('aetna', 'GA'))),
+    }
+
+
+def test_local_backend_matches_s3():
+    """put/get/range_get/exists/list/copy/delete/open_writer return the same on a directory and on S3"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        s3 = open_storage(f"s3://{BUCKET}")
+        s3.client.create_bucket(Bucket=BUCKET)
+        local = open_storage(f"file://{tmp}/stage")
+
+        expected = _exercise(s3)
+        assert _exercise(local) == expected
+        assert expected['get'] == b"0123456789" and expected['streamed'] == b"streamed object"
+        assert (expected['range'], expected['suffix'], expected['suffix_head']) == (b"234", b"6789", b"67")
+        assert expected['exists'] == [True, False] and expected['missing_raises']
+        assert expected['copied'] == b"abc" and expected['missing_copy_raises']
+        assert expected['prefixes'] == [f"{PREFIX}/payer_slug=aetna/", f"{PREFIX}/payer_slug=cigna/"]
+        assert expected['direct'] == [f"{PREFIX}/_SUCCESS"]
+        # Aborted and in-progress writes leave nothing behind
+        assert not [p for p in Path(tmp).rglob("*") if p.name.startswith('.')]
+
+
+def test_open_storage_uris():
+    """URIs pick the backend; keys round-trip through uri() verbatim; backends implement every operation"""
+    local = open_storage("file:///mnt/stage")
+    assert isinstance(local, LocalBackend) and local.uri("a b/c=1.parquet") == "file:///mnt/stage/a b/c=1.parquet"
+    assert local.key("file:///mnt/stage/a b/c=1.parquet") == "a b/c=1.parquet"
+    assert isinstance(open_storage("/mnt/stage"), LocalBackend)
+    s3 = open_storage("s3://healthcare-data-lake-prod/")
+    assert isinstance(s3, S3Backend) and s3.bucket == "healthcare-data-lake-prod"
+    assert isinstance(open_storage("healthcare-data-lake-prod"), S3Backend)
+    for bad in (lambda: open_storage("s3://bucket/prefix"), lambda: local.key("s3://bucket/key")):
+        try:
+            bad()
+            raise AssertionError("expected ValueError")
+        except ValueError:
+            pass
+
+    # A backend missing an operation fails when it is created, not mid-run
+    class NoCopy(StorageBackend):
+        uri = key = put = get = range_get = exists = list = delete = open_writer = LocalBackend.uri
+    try:
+        NoCopy()
+        raise AssertionError("expected TypeError")
+    except TypeError as e:
+        assert "copy" in str(e)
+
+
+class _NoAWS:
+    """Patch boto3 so that creating any client or resource fails the test"""
+
+    def __enter__(self):
+        self.saved = boto3.client, boto3.resource
+
+        def fail(service, *args, **kwargs):
+            raise AssertionError(f"AWS {service} client created for local storage")
+        boto3.client = boto3.resource = fail
+        return self
+
+    def __exit__(self, *exc):
+        boto3.client, boto3.resource = self.saved
+        return False
+
+
+def test_partition_round_trip_without_aws():
+    """S3PartitionedETL writes, indexes, lists, reads and merges partitions in a local directory"""
+    from s3_etl_utils import S3PartitionedETL
+    from ETL.ETL_3 import write_partition_idempotent
+
+    with tempfile.TemporaryDirectory() as tmp, _NoAWS():
+        s3_etl = S3PartitionedETL(f"file://{tmp}/stage", upload_workers=2, multipart_threshold_mb=1)
+        rows = pl.DataFrame({'fact_uid': [f"f{i}" for i in range(100)], 'negotiated_rate': [float(i) for i in range(100)]})
+        path = s3_etl.create_s3_path({'payer_slug': 'aetna', 'state': 'GA'}, PREFIX)
+        assert path.startswith(f"file://{tmp}/stage/{PREFIX}/payer_slug=aetna/state=GA/")
+        s3_etl.submit_partition_upload(rows, path)
+
+        s3_etl.load_partition_index(PREFIX, workers=2)
+        assert s3_etl.partition_exists(path)
+        assert not s3_etl.partition_exists(s3_etl.create_s3_path({'payer_slug': 'cigna', 'state': 'GA'}, PREFIX))
+        assert s3_etl.list_partitions(PREFIX) == [path]
+        assert s3_etl.read_partition_metadata(path).num_rows == 100
+
+        update = rows.tail(10).with_columns(pl.lit(-1.0).alias('negotiated_rate'))
+        write_partition_idempotent(pl.concat([update, pl.DataFrame({'fact_uid': ['f100'], 'negotiated_rate': [1.0]})]),
+                                   path, s3_etl)
+        assert not s3_etl.close()
+        merged = s3_etl.read_partition(path)
+        assert merged.height == 101 and merged.filter(pl.col('negotiated_rate') < 0).height == 10
+        assert s3_etl._clients == {}
+
+
+def _pipeline_config(root: Path, engine: str):
+    from ETL.ETL_3 import ETL3Config
+
+    dims, xrefs = _dims()
+    dims['code'] = dims['code'].unique(['code_type', 'code'], keep='first', maintain_order=True)
+    dim_paths, xref_paths = _write(root, dims, xrefs)
+    config = ETL3Config(str(root / "missing.yaml"))
+    config.FACT_RATE_PATH = _fact_file(root)
+    config.DIM_PATHS, config.XREF_PATHS = dim_paths, xref_paths
+    config.DIM_BUNDLE_DIR = root / "bundle"
+    config.PARTITION_SPILL_DIR = root / "spill"
+    config.PARTITION_STAGING_DIR = root / "staging"
+    config.FACT_LEDGER_DIR = root / f"ledger_{engine}"
+    config.FACT_DELTA_PATH = root / "fact_delta.parquet"
+    config.STORAGE_URI = f"file://{root}/stage_{engine}"
+    config.ENGINE = engine
+    config.INCREMENTAL = True
+    config.COMPACT_PROVIDERS = True
+    config.CHUNK_SIZE = 4
+    return config
+
+
+def test_pipeline_runs_on_local_storage():
+    """Both engines publish the same partitions to file:// with no AWS client, then skip an unchanged rerun"""
+    from ETL.ETL_3 import run_etl3_pipeline
+
+    with tempfile.TemporaryDirectory() as tmp, _NoAWS():
+        root = Path(tmp)
+        published = {}
+        for engine in ('chunked', 'streaming'):
+            config = _pipeline_config(root, engine)
+            summary = run_etl3_pipeline(config)
+            assert summary['status'] == 'SUCCESS' and summary['storage_uri'] == config.STORAGE_URI
+            stage = root / f"stage_{engine}"
+            published[engine] = {path.relative_to(stage).as_posix(): sorted(pl.read_parquet(path)['fact_uid'])
+                                 for path in stage.rglob("*.parquet")}
+            assert published[engine] and summary['incremental']['partitions_written'] == len(published[engine])
+
+            rerun = run_etl3_pipeline(config)
+            assert rerun['incremental']['rows_skipped'] == pl.read_parquet(config.FACT_RATE_PATH).height
+            assert rerun['incremental']['partitions_skipped'] == len(published[engine])
+        assert published['chunked'] == published['streaming']
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Local backend matches S3", test_local_backend_matches_s3),
+        ("open_storage URIs", test_open_storage_uris),
+        ("Partition round trip without AWS", test_partition_round_trip_without_aws),
+        ("Pipeline runs on local storage", test_pipeline_runs_on_local_storage),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
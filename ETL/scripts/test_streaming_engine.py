@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming ETL3 engine (utils/partition_staging.py and
+ETL_3._build_streaming_plan).
+
+The streaming plan is staged from a fact Parquet file and compared with the
+chunked engine run over the same file (chunks enriched from the dimension
+bundle, split and accumulated): each staged file must sit at its partition's
+S3 key and hold the rows the chunked engine would write there. Syncing
+runs against moto's in-process S3 (skipped without moto).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from partition_staging import stage_partitions, sync_staged_partitions
+from partition_accumulator import PartitionAccumulator
+from parquet_batches import ParquetBatchReader
+from dimension_bundle import DimensionBundle
+from s3_etl_utils import split_partitions, partition_key
+from ETL.ETL_3 import _build_streaming_plan, _enrich_fact_table, write_partition_idempotent
+from test_dimension_bundle import _dims, _fact, _write
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the sync test
+    mock_aws = None
+
+BUCKET = "test-bucket"
+PREFIX = "partitioned-data"
+PARTITION_COLUMNS = ['payer_slug', 'state', 'billing_class', 'procedure_set', 'procedure_class',
+                     'primary_taxonomy_code', 'stat_area_name', 'year', 'month']
+
+
+def _fact_file(root: Path) -> Path:
+    """Three months of the synthetic facts, in row groups of 4 rows"""
+    months = []
+    for month in ('2025-07', '2025-08', '2025-09'):
+        fact = _fact()
+        months.append(fact.with_columns(
+            (pl.lit(month + '-') + pl.col('fact_uid')).alias('fact_uid'),
+            pl.lit(month).alias('year_month'),
+        ))
+    path = root / "fact_rate.parquet"
+    pl.concat(months).write_parquet(path, row_group_size=4)
+    return path
+
+
+def _setup(root: Path, unique_codes: bool):
+    dims, xrefs = _dims()
+    if unique_codes:
+        dims['code'] = dims['code'].unique(['code_type', 'code'], keep='first', maintain_order=True)
+    fact_path = _fact_file(root)
+    dim_paths, xref_paths = _write(root, dims, xrefs)
+    bundle = DimensionBundle.load_or_build(root / "bundle", dim_paths, xref_paths,
+                                           pl.read_parquet_schema(fact_path).keys())
+    return fact_path, bundle
+
+
+def _chunked(fact_path: Path, bundle: DimensionBundle, root: Path, compact: bool, dedup: bool = True) -> dict:
+    """Partition key -> rows, as the chunked engine with accumulation writes them"""
+    written = {}
+    accumulator = PartitionAccumulator(root / "spill", writer=lambda data, path: written.__setitem__(path, data))
+    with ParquetBatchReader(fact_path, 4) as reader:
+        for chunk in reader:
+            enriched = _enrich_fact_table(chunk, {}, {}, bundle=bundle, compact_providers=compact)
+            for values, rows in split_partitions(enriched, PARTITION_COLUMNS):
+                if dedup:
+                    accumulator.append(partition_key(values, PREFIX), rows)
+                else:
+                    key = partition_key(values, PREFIX)
+                    written[key] = pl.concat([written[key], rows]) if key in written else rows
+    if dedup:
+        accumulator.flush_all()
+    accumulator.close()
+    return written
+
+
+def _stage(fact_path: Path, bundle: DimensionBundle, root: Path, compact: bool):
+    config = SimpleNamespace(FACT_RATE_PATH=fact_path, CATEGORICAL_COLUMNS=False, COMPACT_PROVIDERS=compact)
+    return stage_partitions(_build_streaming_plan(config, bundle), root / "staging", PARTITION_COLUMNS, PREFIX)
+
+
+def test_compact_matches_chunked_engine():
+    """Compact mode: every staged file equals the chunked engine's partition"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        fact_path, bundle = _setup(root, unique_codes=True)
+        expected = _chunked(fact_path, bundle, root, compact=True)
+        staged = _stage(fact_path, bundle, root, compact=True)
+
+        assert [p.key for p in staged] == sorted(expected)
+        for partition in staged:
+            actual = pl.read_parquet(partition.path)
+            assert partition.path == root / "staging" / partition.key
+            assert partition.rows == actual.height
+            assert actual.schema == expected[partition.key].schema
+            assert actual.sort('fact_uid').equals(expected[partition.key].sort('fact_uid'))
+
+
+def test_expanded_dedups_like_chunked_engine():
+    """Expanded mode: same fact_uids per partition, each row one of the fanned-out rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        fact_path, bundle = _setup(root, unique_codes=False)
+        expected = _chunked(fact_path, bundle, root, compact=False)
+        fanned_out = _chunked(fact_path, bundle, root, compact=False, dedup=False)
+        staged = _stage(fact_path, bundle, root, compact=False)
+
+        assert [p.key for p in staged] == sorted(expected)
+        for partition in staged:
+            actual = pl.read_parquet(partition.path)
+            assert actual['fact_uid'].n_unique() == actual.height
+            assert sorted(actual['fact_uid']) == sorted(expected[partition.key]['fact_uid'])
+            candidates = fanned_out[partition.key].drop('pos_members')
+            assert actual.drop('pos_members').join(candidates, on=candidates.columns, how='anti',
+                                                   nulls_equal=True).is_empty()
+
+
+def test_colliding_partition_keys_rejected():
+    """Values that only differ in characters partition_key replaces must not overwrite each other"""
+    plan = pl.LazyFrame({
+        'fact_uid': ['a', 'b'],
+        'payer_slug': ['blue cross', 'blue_cross'],
+        'year': ['2025', '2025'],
+        'month': ['08', '08'],
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            stage_partitions(plan, Path(tmp) / "staging", ['payer_slug', 'year', 'month'], PREFIX)
+        except Exception as e:
+            assert "both map to" in str(e)
+        else:
+            raise AssertionError("colliding partitions were staged")
+
+
+def test_sync_uploads_and_merges():
+    """New partitions are uploaded as staged (pooled or streamed); existing ones are merged"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    from s3_etl_utils import S3PartitionedETL
+
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        root = Path(tmp)
+        fact_path, bundle = _setup(root, unique_codes=True)
+        staged = _stage(fact_path, bundle, root, compact=True)
+        existing = staged[0]
+        staged_bytes = {p.key: p.path.read_bytes() for p in staged}
+
+        s3_etl = S3PartitionedETL(BUCKET, "us-east-1", upload_workers=2)
+        s3_etl.s3_client.create_bucket(Bucket=BUCKET)
+        old = pl.read_parquet(existing.path).head(1).with_columns(pl.lit('old').alias('fact_uid'))
+        s3_etl.upload_partition_to_s3(old, f"s3://{BUCKET}/{existing.key}")
+        s3_etl.load_partition_index(PREFIX)
+        # The largest new partitions are streamed in parts, the others go through the pool
+        s3_etl.multipart_threshold_bytes = max(p.bytes for p in staged[1:])
+        largest = sum(p.bytes == s3_etl.multipart_threshold_bytes for p in staged[1:])
+
+        sync = sync_staged_partitions(staged, s3_etl, lambda data, path: write_partition_idempotent(data, path, s3_etl))
+        assert not s3_etl.close()
+        assert (sync['uploaded'], sync['merged'], sync['failed']) == (len(staged) - 1, 1, [])
+        assert 0 < s3_etl.streamed_uploads == largest < len(staged) - 1
+
+        for partition in staged[1:]:
+            body = s3_etl.s3_client.get_object(Bucket=BUCKET, Key=partition.key)['Body'].read()
+            assert body == staged_bytes[partition.key]
+        merged = s3_etl.read_partition(f"s3://{BUCKET}/{existing.key}")
+        assert merged.height == existing.rows + 1 and 'old' in merged['fact_uid'].to_list()
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Compact mode matches chunked engine", test_compact_matches_chunked_engine),
+        ("Expanded mode dedups like chunked engine", test_expanded_dedups_like_chunked_engine),
+        ("Colliding partition keys rejected", test_colliding_partition_keys_rejected),
+        ("Sync uploads and merges", test_sync_uploads_and_merges),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
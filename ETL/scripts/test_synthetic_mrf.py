@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic MRF generator (utils/synthetic_mrf.py) and the
+stage-level ETL1 benchmark built on it (bench_etl1_stages.py).
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+import polars as pl
+import pyarrow.parquet as pq
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from synthetic_mrf import generate_mrf_files
+from bench_etl1_stages import STAGES, run_benchmark
+from ETL.etl1_scalable import ScalableETL1, ETL1Config
+
+
+def test_schema_and_determinism():
+    """Files have ETL1's input columns and the same seed gives the same rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        first = generate_mrf_files(Path(tmp) / "a", 20_000, batch_rows=6_000)
+        second = generate_mrf_files(Path(tmp) / "b", 20_000, batch_rows=6_000)
+        etl = ScalableETL1(ETL1Config(data_root=Path(tmp), log_file=None, log_level="WARNING"))
+
+        rates = pl.read_parquet(first["rates"])
+        providers = pl.read_parquet(first["providers"])
+        assert rates.columns == etl.rates_cols
+        assert providers.columns == etl.prov_cols
+        assert rates.height == 20_000 and providers.height == 5_000
+        assert pq.ParquetFile(first["rates"]).metadata.num_row_groups == 4
+        assert first["rates"].name == "202508_aetna_ga_rates.parquet"
+        assert rates.equals(pl.read_parquet(second["rates"]))
+        assert providers.equals(pl.read_parquet(second["providers"]))
+
+
+def test_cardinalities():
+    """Codes and groups scale with the row count; NPIs belong to several groups"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_mrf_files(Path(tmp), 100_000)
+        rates = pl.read_parquet(paths["rates"])
+        providers = pl.read_parquet(paths["providers"])
+
+        assert 500 <= rates["billing_code"].n_unique() <= 1_000
+        assert set(rates["billing_code_type"].unique()) == {"CPT", "HCPCS", "RC", "MS-DRG"}
+        assert 400 <= rates["provider_reference_id"].n_unique() <= 500
+        assert rates["service_codes"].null_count() > 0
+        assert 15 <= rates["service_codes"].n_unique() <= 20
+
+        # Providers cover the rates' provider groups
+        assert set(providers["provider_group_id"].unique()) <= set(rates["provider_reference_id"].unique())
+        groups_per_npi = providers.group_by("npi").agg(pl.col("provider_group_id").n_unique())["provider_group_id"]
+        assert groups_per_npi.max() > 1
+
+
+def test_stage_benchmark():
+    """Every stage is measured and the results serialize to JSON"""
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run_benchmark(Path(tmp), 20_000, chunk_size=6_000)
+        assert list(result["stages"]) == STAGES
+        for name, stats in result["stages"].items():
+            assert stats["rows"] > 0 and stats["seconds"] >= 0, name
+            assert stats["peak_rss_mb"] > 0, name
+        assert result["stages"]["derive"]["calls"] == 4 + 1
+        assert result["rates_rows"] == 20_000 and result["providers_rows"] == 5_000
+        assert result["output_rows"]["fact_rate"] > 0
+        json.dumps(result)
+
+        # Same-size inputs are reused rather than regenerated
+        assert run_benchmark(Path(tmp), 20_000, chunk_size=6_000)["generate_seconds"] == 0.0
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Schema and determinism", test_schema_and_determinism),
+        ("Cardinalities", test_cardinalities),
+        ("Stage benchmark", test_stage_benchmark),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded concurrent upload pool (utils/upload_pool.py) and
+S3PartitionedETL's queued partition uploads.
+
+Pool behaviour (retries, in-flight cap, failure order, per-key ordering,
+overlap) is checked against a local directory standing in for S3; the
+S3PartitionedETL path runs against moto's in-process S3 when moto is installed.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+
+from upload_pool import UploadPool, UploadError
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the S3 test
+    mock_aws = None
+
+
+class DirectoryStore:
+    """Writes each key to a file; can fail a key's first attempts or add latency."""
+
+    def __init__(self, root: Path, fail_first: dict = None, always_fail: set = None, latency: float = 0.0):
+        self.root = root
+        self.fail_first = dict(fail_first or {})
+        self.always_fail = set(always_fail or ())
+        self.latency = latency
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def upload(self, key: str, body: bytes):
+        with self.lock:
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            attempt = self.attempts[key]
+        if self.latency:
+            time.sleep(self.latency)
+        if key in self.always_fail or attempt <= self.fail_first.get(key, 0):
+            raise ConnectionError(f"simulated failure for {key} (attempt {attempt})")
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+
+
+def test_retries_then_succeeds():
+    """Transient failures are retried and every object lands"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DirectoryStore(Path(tmp), fail_first={"p/1": 2, "p/3": 1})
+        pool = UploadPool(store.upload, max_workers=4, max_attempts=3, sleep=lambda s: None)
+        for i in range(6):
+            pool.submit(f"p/{i}", f"body {i}".encode())
+        failures = pool.close()
+
+        assert failures == []
+        assert pool.stats()["retries"] == 3
+        for i in range(6):
+            assert (Path(tmp) / f"p/{i}").read_bytes() == f"body {i}".encode()
+
+
+def test_failures_in_submission_order():
+    """Permanent failures are reported in submission order and can be raised"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DirectoryStore(Path(tmp), always_fail={"p/7", "p/2", "p/5"})
+        pool = UploadPool(store.upload, max_workers=3, max_attempts=2, sleep=lambda s: time.sleep(0.001 * (hash(s) % 5)))
+        for i in range(10):
+            pool.submit(f"p/{i}", b"x" * (10 - i))
+        try:
+            pool.close(raise_on_failure=True)
+            raise AssertionError("close() did not raise")
+        except UploadError as e:
+            assert [f.key for f in e.failures] == ["p/2", "p/5", "p/7"]
+            assert all(f.attempts == 2 for f in e.failures)
+
+
+def test_inflight_cap():
+    """Queued bytes never exceed the cap (after the first body)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DirectoryStore(Path(tmp), latency=0.01)
+        cap_mb = 0.25
+        pool = UploadPool(store.upload, max_workers=2, max_inflight_mb=cap_mb)
+        body = b"x" * 64 * 1024
+        for i in range(24):
+            pool.submit(f"p/{i}", body)
+        pool.close()
+
+        stats = pool.stats()
+        assert stats["uploads"] == 24
+        assert pool.peak_inflight_bytes <= cap_mb * 1024 * 1024
+        assert stats["submit_wait_seconds"] > 0
+
+
+def test_same_key_last_submission_wins():
+    """Uploads of one key run in submission order"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DirectoryStore(Path(tmp), latency=0.002)
+        pool = UploadPool(store.upload, max_workers=8)
+        for i in range(20):
+            pool.submit("hot/partition", f"version {i}".encode())
+            pool.submit(f"cold/{i}", b"x")
+        pool.wait_for("hot/partition")
+        assert (Path(tmp) / "hot/partition").read_bytes() == b"version 19"
+        pool.close()
+
+
+def test_uploads_overlap():
+    """Uploads run concurrently, so latency-bound uploads finish faster than in series"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DirectoryStore(Path(tmp), latency=0.05)
+        pool = UploadPool(store.upload, max_workers=8)
+        start = time.perf_counter()
+        for i in range(32):
+            pool.submit(f"p/{i}", b"x")
+        pool.close()
+        elapsed = time.perf_counter() - start
+        assert elapsed < 32 * 0.05 / 3, f"{elapsed:.2f}s for 32 uploads on 8 threads"
+
+
+def test_s3_partitioned_etl_queued_uploads():
+    """S3PartitionedETL queues partition uploads on its pool (moto S3)"""
+    if mock_aws is None:
+        print("  (moto not installed, skipped)")
+        return
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    from s3_etl_utils import S3PartitionedETL
+
+    with mock_aws():
+        s3_etl = S3PartitionedETL("test-bucket", "us-east-1", upload_workers=4, upload_inflight_mb=1)
+        s3_etl.s3_client.create_bucket(Bucket="test-bucket")
+
+        df = pl.DataFrame({
+            "fact_uid": [f"{i:04x}" for i in range(300)],
+            "payer_slug": ["aetna"] * 300,
+            "state": [["GA", "FL", "AL"][i % 3] for i in range(300)],
+            "billing_class": ["professional"] * 300,
+            "year": ["2025"] * 300,
+            "month": ["08"] * 300,
+            "negotiated_rate": [float(i) for i in range(300)],
+        })
+        columns = ["payer_slug", "state", "billing_class", "year", "month"]
+        created = s3_etl.create_s3_partitions(df, columns, "partitioned-data")
+        assert len(created) == 3
+
+        # A read of a partition waits for its queued rewrite
+        state_ga = created[-1]
+        s3_etl.submit_partition_upload(df.head(1), state_ga)
+        assert s3_etl.read_partition(state_ga).height == 1
+
+        assert s3_etl.close() == []
+        total = sum(s3_etl.read_partition(path).height for path in created[:-1])
+        assert total == df.filter(pl.col("state") != "GA").height
+        assert s3_etl.list_partitions("partitioned-data") == sorted(created)
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Retries then succeeds", test_retries_then_succeeds),
+        ("Failures in submission order", test_failures_in_submission_order),
+        ("In-flight cap", test_inflight_cap),
+        ("Same key last submission wins", test_same_key_last_submission_wins),
+        ("Uploads overlap", test_uploads_overlap),
+        ("S3PartitionedETL queued uploads", test_s3_partitioned_etl_queued_uploads),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
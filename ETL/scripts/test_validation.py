@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the one-pass chunk validators: check_partition_columns (behind
+ETL_3.validate_partition_data) and DataQualityChecker.validate_partition,
+against the old one-filter-per-check validators kept in bench_validation.py.
+"""
+
+import sys
+from pathlib import Path
+
+import polars as pl
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "ETL" / "utils"))
+sys.path.append(str(project_root / "ETL" / "scripts"))
+
+from data_quality import DataQualityChecker, check_partition_columns
+from bench_partition_split import PARTITION_COLUMNS, make_enriched_chunk
+from bench_validation import check_with_filters, validate_with_filters, with_quality_columns
+
+
+def _chunk(rows: int = 20_000) -> pl.DataFrame:
+    return with_quality_columns(make_enriched_chunk(rows, 40, 30, 10))
+
+
+def test_partition_columns_match_filters():
+    """Per-column counts and combinations equal the old filters; LazyFrames and Categoricals work too"""
+    chunk = _chunk()
+    expected = check_with_filters(chunk, PARTITION_COLUMNS)
+    for data in (chunk, chunk.lazy(), chunk.with_columns(pl.col('stat_area_name', 'state').cast(pl.Categorical))):
+        report = check_partition_columns(data, PARTITION_COLUMNS)
+        assert report.rows == chunk.height
+        assert report.columns == expected['columns'] and report.combinations == expected['combinations']
+    assert report.columns['stat_area_name']['null_marker'] > 0 and report.columns['billing_class']['unknown'] > 0
+
+
+def test_partition_issues():
+    """Thresholds per column, missing and numeric columns, and too few combinations"""
+    rows = 100
+    df = pl.DataFrame({
+        'state': ['GA'] * 85 + ['Unknown'] * 15,                             # 15% Unknown > 10%
+        'stat_area_name': ['Atlanta'] * 60 + ['__NULL__'] * 40,             # 40% __NULL__ <= 50%
+        'primary_taxonomy_code': ['101'] * 60 + ['__NULL__'] * 40,          # 40% __NULL__ > 30%
+        'billing_class': ['professional'] * 94 + [None] * 6,               # 6% nulls > 5%
+        'year': [2025] * rows,
+    })
+    report = check_partition_columns(df, ['state', 'stat_area_name', 'primary_taxonomy_code', 'billing_class',
+                                          'year', 'month'])
+    assert not report.passed and report.missing_columns == ['month']
+    assert report.columns['year'] == {'unknown': 0, 'null_marker': 0, 'null': 0}
+    assert report.ratio('state', 'unknown') == 0.15
+    issues = "\n".join(report.issues)
+    assert "Column state has 15.0% default values (15/100 rows)" in issues
+    assert "stat_area_name" not in issues
+    assert "primary_taxonomy_code has 40.0% __NULL__ values (40/100 rows, threshold: 30.0%)" in issues
+    assert "billing_class has 6.0% actual null values" in issues
+    assert "Partition column month not found in data" in issues
+    assert report.combinations == 4 and "combinations" not in issues
+
+    single = pl.DataFrame({'state': ['GA'] * 20, 'payer_slug': ['aetna'] * 20})
+    report = check_partition_columns(single, ['state', 'payer_slug'])
+    assert report.issues == ["Only 1 unique partition combinations found (may indicate data quality issues)"]
+    assert check_partition_columns(single, ['state']).passed
+    assert check_partition_columns(single, ['state']).combinations is None
+
+
+def test_validate_partition_data():
+    """validate_partition_data returns the report or raises ValueError with every issue"""
+    from ETL.ETL_3 import ETL3Config, validate_partition_data
+
+    config = ETL3Config()
+    chunk = _chunk().with_columns(pl.col('stat_area_name').replace('__NULL__', 'Atlanta'),
+                                  pl.col('state').fill_null('__NULL__'),
+                                  pl.col('primary_taxonomy_code').fill_null('__NULL__'))
+    chunk = chunk.with_columns(pl.col('stat_area_name').fill_null('__NULL__'))
+    report = validate_partition_data(chunk, config)
+    assert report.passed and set(report.columns) == set(config.partition_spec().columns)
+
+    try:
+        validate_partition_data(chunk.with_columns(pl.lit('Unknown').alias('state')), config)
+        raise AssertionError("expected ValueError")
+    except ValueError as e:
+        assert str(e).startswith("Partition validation failed:\n  - Column state has 100.0% default values")
+
+
+def test_quality_checks_match_filters():
+    """Every rule's failing rows equal the old filters, with the old error and warning entries"""
+    checker = DataQualityChecker()
+    chunk = _chunk().with_columns(
+        pl.when(pl.col('fact_uid').str.ends_with('a')).then(-5.0).otherwise(pl.col('negotiated_rate'))
+        .alias('negotiated_rate'),
+        pl.when(pl.col('fact_uid').str.ends_with('b')).then(pl.lit('Bad Payer')).otherwise(pl.col('payer_slug'))
+        .alias('payer_slug'),
+    )
+    expected = validate_with_filters(checker, chunk)
+    results = checker.validate_partition(chunk)
+    assert {f"{c['rule']}.{c['field']}.{c['check']}": c['rows'] for c in results['checks']} == expected
+    assert results['partition_rows'] == chunk.height and results['has_errors']
+
+    negative = expected['rate_validation.negotiated_rate.negative']
+    assert negative > 0
+    assert {'rule': 'rate_validation', 'field': 'negotiated_rate', 'error': f'{negative:,} rows have negative rates',
+            'severity': 'error'} in results['errors']
+    assert [w['field'] for w in results['warnings']] == ['latitude']
+    assert results['warnings'][0]['warning'].endswith('rows have invalid latitude values')
+    assert {e['rule'] for e in results['errors']} == {'required_fields', 'rate_validation', 'state_validation',
+                                                      'payer_validation'}
+
+    metrics = results['metrics']
+    assert metrics['state_completeness'] == 1 - chunk['state'].null_count() / chunk.height
+    assert metrics['unique_npis'] == chunk['npi'].n_unique()
+    assert metrics['unique_counties'] == chunk['county_name'].n_unique()
+    assert metrics['min_rate'] == -5.0 and abs(metrics['avg_rate'] - chunk['negotiated_rate'].mean()) < 1e-9
+    assert metrics['medicare_benchmark_coverage'] == chunk['medicare_state_rate'].is_not_null().mean()
+    assert 'recommendations' in checker.generate_quality_report([results])
+
+
+def test_quality_checks_edge_cases():
+    """Absent fields are skipped, a clean partition passes and an empty one has no ratios"""
+    checker = DataQualityChecker()
+    clean = pl.DataFrame({'fact_uid': ['a', 'b'], 'negotiated_rate': [10.0, 20.0], 'state': ['GA', 'FL'],
+                          'payer_slug': ['aetna', 'blue-cross'], 'npi': ['1234567890', None]})
+    results = checker.validate_partition(clean)
+    assert not results['has_errors'] and not results['errors'] and not results['warnings']
+    assert all(c['rows'] == 0 for c in results['checks'])
+    assert not any(c['rule'] == 'geocoding_validation' for c in results['checks'])
+    assert results['metrics']['median_rate'] == 15.0 and results['metrics']['unique_npis'] == 2
+
+    empty = checker.validate_partition(clean.clear())
+    assert empty['partition_rows'] == 0 and not empty['has_errors']
+    assert 'state_completeness' not in empty['metrics'] and empty['metrics']['avg_rate'] == 0
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Partition columns match filters", test_partition_columns_match_filters),
+        ("Partition issues", test_partition_issues),
+        ("validate_partition_data", test_validate_partition_data),
+        ("Quality checks match filters", test_quality_checks_match_filters),
+        ("Quality check edge cases", test_quality_checks_edge_cases),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"✅ {name}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
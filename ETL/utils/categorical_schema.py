@@ -0,0 +1,88 @@
+"""
+Categorical Schema Mode for Low-Cardinality Columns
+
+fact_rate carries a handful of columns (billing_class, negotiated_type, ...)
+whose values repeat on nearly every row. As Utf8 each row stores its own copy
+of the string in every chunk and again in the wide rows ETL3 builds. In the
+opt-in categorical mode these columns are Polars Categoricals instead:
+
+- all categoricals share one process-wide string-to-id mapping (the global
+  categories in current Polars, the global string cache in older releases), so
+  ETL3 joins and compares them on their integer ids without decoding
+- Parquet files written from categoricals use dictionary-encoded pages, and
+  ETL1 writes the merged fact_rate back as categoricals after its DuckDB merge
+- ETL3 reads them back as categoricals via pyarrow's read_dictionary, and
+  decodes them when it runs without categorical mode (categorical_mode)
+
+Surrogate keys (fact_uid and friends) are computed from the string values
+before encoding, so they are identical in both modes.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Sequence
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# fact_rate columns with a handful of distinct values per MRF file
+LOW_CARDINALITY_COLUMNS = (
+    "billing_class",
+    "negotiated_type",
+    "negotiation_arrangement",
+    "code_type",
+    "payer_slug",
+    "state",
+    "reporting_entity_name",
+)
+
+
+def enable_global_categories() -> None:
+    """
+    Make categoricals created anywhere in this process share one mapping.
+
+    Polars 1.32+ always uses global categories for pl.Categorical, so this only
+    needs to switch on the string cache for older releases.
+    """
+    if not hasattr(pl, "Categories"):
+        pl.enable_string_cache()
+
+
+def present_columns(schema: Iterable[str], columns: Sequence[str] = LOW_CARDINALITY_COLUMNS) -> List[str]:
+    """Low-cardinality columns that exist in a schema, in schema order."""
+    wanted = set(columns)
+    return [name for name in schema if name in wanted]
+
+
+def encode_categoricals(df: pl.DataFrame, columns: Sequence[str] = LOW_CARDINALITY_COLUMNS) -> pl.DataFrame:
+    """Cast the String columns among columns to Categorical (others are left alone)."""
+    casts = {name: pl.Categorical for name, dtype in df.collect_schema().items()
+             if name in columns and dtype == pl.Utf8}
+    return df.cast(casts) if casts else df
+
+
+def decode_categoricals(df: pl.DataFrame) -> pl.DataFrame:
+    """Cast every Categorical column back to String."""
+    casts = {name: pl.Utf8 for name, dtype in df.collect_schema().items() if dtype == pl.Categorical}
+    return df.cast(casts) if casts else df
+
+
+def categorical_mode(df: pl.DataFrame, categorical: bool) -> pl.DataFrame:
+    """
+    Fact rows in the given mode, whichever mode the file they came from was
+    written in (encoded when categorical, decoded otherwise).
+    """
+    return encode_categoricals(df) if categorical else decode_categoricals(df)
+
+
+def align_dtypes(df: pl.DataFrame, target: Dict[str, pl.DataType]) -> pl.DataFrame:
+    """
+    Cast columns of df whose dtype differs from target (by name).
+
+    Used when a partition written in one mode is merged with rows from the
+    other, since Categorical and String columns can't be concatenated.
+    """
+    casts = {name: target[name] for name, dtype in df.schema.items()
+             if name in target and dtype != target[name]}
+    return df.cast(casts) if casts else df
+
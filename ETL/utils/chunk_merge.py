@@ -0,0 +1,199 @@
+"""
+Key-Aware Temp Chunk Merge
+
+This module consolidates ETL1 temp chunk files (temp_chunks/{table}_chunk_*.parquet)
+into one output file per table with DuckDB.
+
+Rows are deduplicated on the table's primary key columns with a "last wins"
+rule: every row gets a merge order of (chunk number, row number in chunk) and
+the row with the highest order is kept for each key. Deduplication is a grouped
+max() over the key columns followed by a semi join on the merge order; DuckDB
+runs both out of core, spilling to a temp directory once the connection's
+memory_limit is reached.
+
+When a table has more chunk files than the configured fan-in, groups of
+fan_in files are first merged into intermediate run files that keep their
+merge order column, so later passes still resolve "last wins" against the
+original chunk order. Tables without keys are concatenated in one pass.
+"""
+
+import os
+import time
+import logging
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Column carrying the global merge order through intermediate runs
+ORDER_COLUMN = "__merge_order"
+
+# Merge order = chunk ordinal * ROW_SPAN + row number within the chunk
+ROW_SPAN = 1 << 32
+
+
+@dataclass
+class MergeStats:
+    """I/O summary for one table merge (each input file counts once per pass)"""
+    table: str
+    input_files: int = 0
+    passes: int = 0
+    rows_written: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _quote(name: str) -> str:
+    """Quote an identifier for DuckDB SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(path: Path) -> str:
+    """Quote a file path as a DuckDB string literal."""
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+class ChunkMerger:
+    """Merges temp chunk files for one table into a single deduplicated Parquet file."""
+
+    def __init__(self, memory_limit_mb: int, spill_dir: Path, fan_in: int = 10,
+                 threads: Optional[int] = None):
+        """
+        Args:
+            memory_limit_mb: DuckDB memory_limit for this merge
+            spill_dir: Directory for DuckDB spill files
+            fan_in: Maximum number of files read by one merge pass
+            threads: Optional DuckDB thread count
+        """
+        if fan_in < 2:
+            raise ValueError(f"fan_in must be at least 2, got {fan_in}")
+
+        self.memory_limit_mb = max(64, int(memory_limit_mb))
+        self.spill_dir = Path(spill_dir)
+        self.fan_in = fan_in
+        self.threads = threads
+
+    def _connect(self) -> duckdb.DuckDBPyConnection:
+        """Open a DuckDB connection configured to spill under the memory limit."""
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        con = duckdb.connect()
+        con.execute(f"SET memory_limit='{self.memory_limit_mb}MB'")
+        con.execute(f"SET temp_directory={_literal(self.spill_dir)}")
+        con.execute("SET preserve_insertion_order=false")
+        if self.threads:
+            con.execute(f"SET threads={int(self.threads)}")
+        return con
+
+    def merge(self, table_name: str, files: List[Path], output_path: Path,
+              keys: List[str]) -> MergeStats:
+        """
+        Merge chunk files into output_path.
+
+        Args:
+            table_name: Table name (used for logging and run file names)
+            files: Chunk files in chunk order (later files win on key conflicts)
+            output_path: Final Parquet file
+            keys: Primary key columns; empty means concatenate without dedup
+
+        Returns:
+            MergeStats for the table
+        """
+        stats = MergeStats(table=table_name, input_files=len(files))
+        start = time.time()
+        run_dir = output_path.parent / "temp_chunks"
+        staging_path = output_path.with_suffix(".temp.parquet")
+
+        con = self._connect()
+        try:
+            runs = list(files)
+            ordered = False  # Level-0 chunk files carry no merge order column yet
+            level = 0
+
+            while keys and len(runs) > self.fan_in:
+                next_runs = []
+                for group_idx, offset in enumerate(range(0, len(runs), self.fan_in)):
+                    group = runs[offset:offset + self.fan_in]
+                    run_path = run_dir / f"{table_name}_run_{level:02d}_{group_idx:06d}.parquet"
+                    self._merge_pass(con, group, run_path, keys, ordered, keep_order=True,
+                                     first_ordinal=offset, stats=stats)
+                    next_runs.append(run_path)
+                    if ordered:
+                        for run in group:
+                            run.unlink(missing_ok=True)
+                logger.info(f"{table_name}: merge pass {level + 1} reduced {len(runs)} files to {len(next_runs)} runs")
+                runs = next_runs
+                ordered = True
+                level += 1
+
+            stats.rows_written = self._merge_pass(con, runs, staging_path, keys, ordered,
+                                                  keep_order=False, first_ordinal=0, stats=stats)
+            os.replace(staging_path, output_path)
+
+            if ordered:
+                for run in runs:
+                    run.unlink(missing_ok=True)
+        finally:
+            con.close()
+            if staging_path.exists():
+                staging_path.unlink()
+
+        stats.seconds = time.time() - start
+        logger.info(
+            f"{table_name}: merged {stats.input_files} files in {stats.passes} passes -> "
+            f"{stats.rows_written:,} rows, read {stats.bytes_read / 1e6:.1f}MB, "
+            f"wrote {stats.bytes_written / 1e6:.1f}MB"
+        )
+        return stats
+
+    def _merge_pass(self, con: duckdb.DuckDBPyConnection, files: List[Path], output: Path,
+                    keys: List[str], ordered: bool, keep_order: bool, first_ordinal: int,
+                    stats: MergeStats) -> int:
+        """Run one merge pass over files and return the number of rows written."""
+        source = self._source_sql(files, ordered, first_ordinal, with_order=bool(keys))
+        columns = [c for c in con.execute(f"DESCRIBE SELECT * FROM ({source})").pl()["column_name"].to_list()
+                   if c != ORDER_COLUMN]
+
+        if keys:
+            group_by = ", ".join(_quote(k) for k in keys)
+            select_cols = ", ".join(f"src.{_quote(c)}" for c in columns)
+            order_sql = f", src.{ORDER_COLUMN}" if keep_order else ""
+            # Merge order is unique per row, so the per-key maximum identifies
+            # exactly one winning row; both the aggregate and the join spill.
+            query = f"""
+                WITH src AS ({source}),
+                winners AS (SELECT max({ORDER_COLUMN}) AS {ORDER_COLUMN} FROM src GROUP BY {group_by})
+                SELECT {select_cols}{order_sql} FROM src SEMI JOIN winners USING ({ORDER_COLUMN})
+            """
+        else:
+            query = f"SELECT {', '.join(_quote(c) for c in columns)} FROM ({source})"
+
+        rows = con.execute(
+            f"COPY ({query}) TO {_literal(output)} (FORMAT PARQUET, COMPRESSION ZSTD)"
+        ).fetchone()[0]
+
+        stats.passes += 1
+        stats.bytes_read += sum(f.stat().st_size for f in files)
+        stats.bytes_written += output.stat().st_size
+        return rows
+
+    @staticmethod
+    def _source_sql(files: List[Path], ordered: bool, first_ordinal: int, with_order: bool) -> str:
+        """SQL reading files with a global merge order column."""
+        if ordered or not with_order:
+            paths = ", ".join(_literal(f) for f in files)
+            return f"SELECT * FROM read_parquet([{paths}], union_by_name=true)"
+
+        parts = [
+            f"SELECT * EXCLUDE (file_row_number), "
+            f"{first_ordinal + i}::BIGINT * {ROW_SPAN} + file_row_number AS {ORDER_COLUMN} "
+            f"FROM read_parquet({_literal(f)}, file_row_number=true)"
+            for i, f in enumerate(files)
+        ]
+        return " UNION ALL BY NAME ".join(parts)
@@ -0,0 +1,181 @@
+"""
+Adaptive Chunk Sizing
+
+ETL1 and ETL3 process their input in fixed-size chunks, and the defaults are
+sized for the worst case (1,000 rows), so machines with headroom spend most of
+their time on per-chunk overhead. This module provides a small feedback
+controller that picks the size of the next chunk from the memory the previous
+chunks actually used:
+
+- after each chunk the caller reports the rows held in memory and the measured
+  resident memory (RSS); the controller keeps an estimate of MB per row above
+  the baseline RSS measured before the first chunk
+- the estimate follows increases immediately and decays slowly, so one cheap
+  chunk does not undo the evidence of an expensive one
+- with headroom below the target (target_fraction of memory_limit_mb) the chunk
+  size grows by grow_factor per step, capped by what the estimate says fits
+- above the pressure mark the size is cut by backoff_factor at once
+
+Changes smaller than the deadband are ignored so the size does not jitter
+from chunk to chunk.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Adjustments kept in the summary (later ones are only counted)
+MAX_RECORDED_ADJUSTMENTS = 100
+
+
+def process_memory_mb(include_children: bool = False) -> float:
+    """Resident memory of this process (and optionally its children) in MB."""
+    process = psutil.Process()
+    total = process.memory_info().rss
+    if include_children:
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+    return total / (1024 * 1024)
+
+
+class AdaptiveChunkSizer:
+    """Feedback controller for the row count of the next chunk."""
+
+    def __init__(self, initial_size: int, memory_limit_mb: int, baseline_mb: float,
+                 min_size: int = 500, max_size: int = 500_000,
+                 target_fraction: float = 0.6, pressure_fraction: float = 0.8,
+                 grow_factor: float = 2.0, backoff_factor: float = 0.5,
+                 decay: float = 0.25, deadband: float = 0.1):
+        """
+        Args:
+            initial_size: Rows in the first chunk
+            memory_limit_mb: Memory limit the run must stay under
+            baseline_mb: RSS before the first chunk (memory not attributable to chunks)
+            min_size: Smallest chunk the controller will choose
+            max_size: Largest chunk the controller will choose
+            target_fraction: Fraction of memory_limit_mb chunks should fill
+            pressure_fraction: Fraction of memory_limit_mb that triggers a back-off
+            grow_factor: Maximum growth per chunk when there is headroom
+            backoff_factor: Size multiplier applied under memory pressure
+            decay: Weight of a new, lower MB/row sample in the estimate
+            deadband: Relative size changes smaller than this are ignored
+        """
+        if not 0 < target_fraction < pressure_fraction <= 1:
+            raise ValueError("Expected 0 < target_fraction < pressure_fraction <= 1")
+        if min_size <= 0 or max_size < min_size:
+            raise ValueError(f"Invalid chunk size bounds: {min_size}..{max_size}")
+
+        self.memory_limit_mb = memory_limit_mb
+        self.baseline_mb = baseline_mb
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_fraction = target_fraction
+        self.pressure_fraction = pressure_fraction
+        self.grow_factor = grow_factor
+        self.backoff_factor = backoff_factor
+        self.decay = decay
+        self.deadband = deadband
+
+        self.initial_size = self._clamp(initial_size)
+        self.size = self.initial_size
+        self.mb_per_row: Optional[float] = None
+        self.observations = 0
+        self.backoffs = 0
+        self.smallest_used = self.size
+        self.largest_used = self.size
+        self.adjustments: List[Dict[str, Any]] = []
+        self.adjustment_count = 0
+
+    def _clamp(self, size: float) -> int:
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def next_size(self) -> int:
+        """Rows to put in the next chunk (passed to ParquetBatchReader.iter_sized)."""
+        self.smallest_used = min(self.smallest_used, self.size)
+        self.largest_used = max(self.largest_used, self.size)
+        return self.size
+
+    def capacity_rows(self, concurrency: int = 1) -> Optional[int]:
+        """Rows per chunk that fit the target with concurrency chunks in memory, if known."""
+        if not self.mb_per_row:
+            return None
+        budget_mb = self.memory_limit_mb * self.target_fraction - self.baseline_mb
+        return int(max(0.0, budget_mb) / self.mb_per_row / max(1, concurrency))
+
+    def observe(self, rows: int, memory_mb: float, concurrency: int = 1) -> int:
+        """
+        Feed back one measurement and choose the next chunk size.
+
+        Args:
+            rows: Rows held in memory when memory_mb was measured
+            memory_mb: Measured RSS in MB
+            concurrency: Chunks of the next size that will be in memory at once
+
+        Returns:
+            The new chunk size
+        """
+        if rows <= 0:
+            return self.size
+        self.observations += 1
+
+        # RSS below the baseline means the baseline included transient memory
+        self.baseline_mb = min(self.baseline_mb, memory_mb)
+        sample = (memory_mb - self.baseline_mb) / rows
+        if self.mb_per_row is None or sample >= self.mb_per_row:
+            self.mb_per_row = sample
+        else:
+            self.mb_per_row += self.decay * (sample - self.mb_per_row)
+
+        capacity = self.capacity_rows(concurrency)
+        if memory_mb > self.memory_limit_mb * self.pressure_fraction:
+            proposed = self.size * self.backoff_factor
+            if capacity is not None:
+                proposed = min(proposed, capacity)
+            self.backoffs += 1
+            reason = "pressure"
+        elif capacity is None or capacity > self.size:
+            proposed = self.size * self.grow_factor
+            if capacity is not None:
+                proposed = min(proposed, capacity)
+            reason = "headroom"
+        else:
+            proposed = capacity
+            reason = "target"
+
+        proposed = self._clamp(proposed)
+        if proposed != self.size and (reason == "pressure"
+                                      or abs(proposed - self.size) > self.deadband * self.size):
+            logger.info(
+                f"Chunk size {self.size:,} -> {proposed:,} rows ({reason}: {memory_mb:.1f}MB / "
+                f"{self.memory_limit_mb}MB, ~{self.mb_per_row * 1000:.2f}MB per 1k rows)"
+            )
+            self.adjustment_count += 1
+            if len(self.adjustments) < MAX_RECORDED_ADJUSTMENTS:
+                self.adjustments.append({
+                    "after_chunk": self.observations,
+                    "size": proposed,
+                    "reason": reason,
+                    "memory_mb": round(memory_mb, 1),
+                })
+            self.size = proposed
+        return self.size
+
+    def summary(self) -> Dict[str, Any]:
+        """Chosen chunk sizes and the memory estimate behind them."""
+        return {
+            "initial_size": self.initial_size,
+            "final_size": self.size,
+            "smallest_size": self.smallest_used,
+            "largest_size": self.largest_used,
+            "chunks_observed": self.observations,
+            "backoffs": self.backoffs,
+            "mb_per_1k_rows": round(self.mb_per_row * 1000, 3) if self.mb_per_row is not None else None,
+            "adjustment_count": self.adjustment_count,
+            "adjustments": self.adjustments,
+        }
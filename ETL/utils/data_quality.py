@@ -5,12 +5,108 @@ This module provides utilities for validating data quality in the ETL pipeline.
 """
 
 import logging
+from dataclasses import dataclass, field
 from typing import Dict, List, Any, Optional
 import polars as pl
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Partition column checks: the largest share of rows that may hold the
+# 'Unknown' default, the '__NULL__' marker (by column) and actual nulls
+UNKNOWN_THRESHOLD = 0.1
+NULL_MARKER_THRESHOLD = 0.2
+NULL_MARKER_THRESHOLDS = {
+    'stat_area_name': 0.5,           # geographical data is commonly missing
+    'primary_taxonomy_code': 0.3,
+}
+ACTUAL_NULL_THRESHOLD = 0.05
+
+
+@dataclass
+class PartitionValidationReport:
+    """Partition column checks of one chunk"""
+    rows: int
+    # Per column: rows holding 'Unknown', '__NULL__' and actual nulls
+    columns: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    missing_columns: List[str] = field(default_factory=list)
+    # Distinct partition key combinations (None with a single column)
+    combinations: Optional[int] = None
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not self.issues
+
+    def ratio(self, column: str, check: str) -> float:
+        return self.columns[column][check] / self.rows if self.rows > 0 else 0
+
+
+def check_partition_columns(df: pl.DataFrame, partition_columns: List[str]) -> PartitionValidationReport:
+    """
+    Check that partition columns hold real data, not defaults, in one pass.
+
+    The 'Unknown', '__NULL__' and null counts of every column and the number
+    of distinct key combinations are aggregations of a single lazy select.
+
+    Args:
+        df: Rows with partition columns (a DataFrame or LazyFrame)
+        partition_columns: Partition columns to check
+
+    Returns:
+        PartitionValidationReport; issues lists the failed checks
+    """
+    frame = df.lazy()
+    schema = frame.collect_schema()
+    present = [c for c in partition_columns if c in schema]
+
+    exprs = [pl.len().alias('rows')]
+    for column in present:
+        col = pl.col(column)
+        # Only string-like columns can hold the 'Unknown' and '__NULL__' markers
+        if schema[column] in (pl.String, pl.Categorical, pl.Enum):
+            exprs += [(col == 'Unknown').sum().alias(f'{column}.unknown'),
+                      (col == '__NULL__').sum().alias(f'{column}.null_marker')]
+        else:
+            exprs += [pl.lit(0).alias(f'{column}.unknown'), pl.lit(0).alias(f'{column}.null_marker')]
+        exprs.append(col.null_count().alias(f'{column}.null'))
+    if len(partition_columns) > 1 and present:
+        exprs.append(pl.struct(present).n_unique().alias('combinations'))
+    counts = frame.select(exprs).collect().row(0, named=True)
+
+    report = PartitionValidationReport(rows=counts['rows'], combinations=counts.get('combinations'))
+    rows = report.rows
+    for column in partition_columns:
+        if column not in schema:
+            report.missing_columns.append(column)
+            report.issues.append(f"Partition column {column} not found in data")
+            continue
+        report.columns[column] = {check: counts[f'{column}.{check}'] for check in ('unknown', 'null_marker', 'null')}
+        unknown, null_marker, null = (report.columns[column][check] for check in ('unknown', 'null_marker', 'null'))
+
+        if report.ratio(column, 'unknown') > UNKNOWN_THRESHOLD:
+            report.issues.append(f"Column {column} has {report.ratio(column, 'unknown'):.1%} default values "
+                                 f"({unknown:,}/{rows:,} rows)")
+        threshold = NULL_MARKER_THRESHOLDS.get(column, NULL_MARKER_THRESHOLD)
+        if report.ratio(column, 'null_marker') > threshold:
+            report.issues.append(f"Column {column} has {report.ratio(column, 'null_marker'):.1%} __NULL__ values "
+                                 f"({null_marker:,}/{rows:,} rows, threshold: {threshold:.1%})")
+        # Nulls should have been replaced by __NULL__
+        if report.ratio(column, 'null') > ACTUAL_NULL_THRESHOLD:
+            report.issues.append(f"Column {column} has {report.ratio(column, 'null'):.1%} actual null values "
+                                 f"({null:,}/{rows:,} rows)")
+
+    if report.combinations is not None:
+        # Too few combinations only fails a chunk that is not tiny
+        if report.combinations < 3 and rows > 10:
+            report.issues.append(f"Only {report.combinations} unique partition combinations found "
+                                 f"(may indicate data quality issues)")
+        elif report.combinations < 2:
+            report.issues.append(f"Only {report.combinations} unique partition combinations found "
+                                 f"(insufficient for partitioning)")
+
+    return report
+
 
 class DataQualityChecker:
     """Data quality validation for ETL pipeline."""
@@ -55,253 +151,167 @@ class DataQualityChecker:
         }
     
     def validate_partition(self, partition_data: pl.DataFrame) -> Dict[str, Any]:
-        """Validate data quality for a single partition."""
-        
-        logger.info(f"Validating partition with {partition_data.height:,} rows...")
-        
+        """
+        Validate data quality for a single partition.
+
+        Every rule and metric is one aggregation of a single lazy select, so
+        the partition is scanned once however many rules apply.
+
+        Args:
+            partition_data: Partition rows (a DataFrame or LazyFrame)
+
+        Returns:
+            partition_rows, has_errors, errors, warnings and metrics, plus
+            checks: every rule evaluated, with the rows that failed it
+        """
+        frame = partition_data.lazy()
+        schema = frame.collect_schema()
+        checks = self._rule_checks(schema)
+        metrics = self._metric_exprs(schema)
+        counts = frame.select(
+            pl.len().alias('rows'),
+            *[check['expr'].alias(check['name']) for check in checks],
+            *[expr.alias(name) for name, expr in metrics.items()],
+        ).collect().row(0, named=True)
+        rows = counts['rows']
+
         validation_results = {
-            'partition_rows': partition_data.height,
+            'partition_rows': rows,
             'has_errors': False,
             'errors': [],
             'metrics': {},
-            'warnings': []
+            'warnings': [],
+            'checks': [],
         }
-        
-        # Check required fields
-        required_errors = self._check_required_fields(partition_data)
-        if required_errors:
-            validation_results['errors'].extend(required_errors)
-            validation_results['has_errors'] = True
-        
-        # Check rate validation
-        rate_errors = self._check_rate_validation(partition_data)
-        if rate_errors:
-            validation_results['errors'].extend(rate_errors)
-            validation_results['has_errors'] = True
-        
-        # Check state validation
-        state_errors = self._check_state_validation(partition_data)
-        if state_errors:
-            validation_results['errors'].extend(state_errors)
-            validation_results['has_errors'] = True
-        
-        # Check payer validation
-        payer_errors = self._check_payer_validation(partition_data)
-        if payer_errors:
-            validation_results['errors'].extend(payer_errors)
-            validation_results['has_errors'] = True
-        
-        # Check NPI validation
-        npi_errors = self._check_npi_validation(partition_data)
-        if npi_errors:
-            validation_results['errors'].extend(npi_errors)
-            validation_results['has_errors'] = True
-        
-        # Check geocoding validation
-        geo_errors = self._check_geocoding_validation(partition_data)
-        if geo_errors:
-            validation_results['warnings'].extend(geo_errors)  # Warnings, not errors
-        
-        # Calculate quality metrics
-        validation_results['metrics'] = self._calculate_quality_metrics(partition_data)
-        
-        logger.info(f"Validation completed: {len(validation_results['errors'])} errors, {len(validation_results['warnings'])} warnings")
-        
-        return validation_results
-    
-    def _check_required_fields(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check that required fields are not null."""
-        
-        errors = []
-        required_fields = self.quality_rules['required_fields']['fields']
-        
-        for field in required_fields:
-            if field in df.columns:
-                null_count = df.filter(pl.col(field).is_null()).height
-                if null_count > 0:
-                    errors.append({
-                        'rule': 'required_fields',
-                        'field': field,
-                        'error': f'{null_count:,} rows have null values in required field: {field}',
-                        'severity': 'error'
-                    })
-        
-        return errors
-    
-    def _check_rate_validation(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check negotiated rate validation."""
-        
-        errors = []
-        field = self.quality_rules['rate_validation']['field']
-        min_value = self.quality_rules['rate_validation']['min_value']
-        max_value = self.quality_rules['rate_validation']['max_value']
-        
-        if field in df.columns:
-            # Check for negative rates
-            negative_count = df.filter(pl.col(field) < 0).height
-            if negative_count > 0:
-                errors.append({
-                    'rule': 'rate_validation',
-                    'field': field,
-                    'error': f'{negative_count:,} rows have negative rates',
-                    'severity': 'error'
-                })
-            
-            # Check for rates outside valid range
-            invalid_range_count = df.filter(
-                (pl.col(field) < min_value) | (pl.col(field) > max_value)
-            ).height
-            if invalid_range_count > 0:
-                errors.append({
-                    'rule': 'rate_validation',
-                    'field': field,
-                    'error': f'{invalid_range_count:,} rows have rates outside valid range (${min_value}-${max_value})',
-                    'severity': 'error'
-                })
-        
-        return errors
-    
-    def _check_state_validation(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check state code validation."""
-        
-        errors = []
-        field = self.quality_rules['state_validation']['field']
-        valid_values = self.quality_rules['state_validation']['valid_values']
-        
-        if field in df.columns:
-            invalid_states = df.filter(~pl.col(field).is_in(valid_values)).height
-            if invalid_states > 0:
-                errors.append({
-                    'rule': 'state_validation',
-                    'field': field,
-                    'error': f'{invalid_states:,} rows have invalid state codes',
-                    'severity': 'error'
-                })
-        
-        return errors
-    
-    def _check_payer_validation(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check payer slug validation."""
-        
-        errors = []
-        field = self.quality_rules['payer_validation']['field']
-        pattern = self.quality_rules['payer_validation']['pattern']
-        
-        if field in df.columns:
-            # Check for invalid characters in payer slug
-            invalid_payers = df.filter(
-                pl.col(field).str.contains(r'[^a-z0-9-]')
-            ).height
-            if invalid_payers > 0:
-                errors.append({
-                    'rule': 'payer_validation',
-                    'field': field,
-                    'error': f'{invalid_payers:,} rows have invalid payer slug format',
-                    'severity': 'error'
-                })
-        
-        return errors
-    
-    def _check_npi_validation(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check NPI validation."""
-        
-        errors = []
-        field = self.quality_rules['npi_validation']['field']
-        pattern = self.quality_rules['npi_validation']['pattern']
-        
-        if field in df.columns:
-            # Check NPI format (10 digits)
-            invalid_npis = df.filter(
-                pl.col(field).is_not_null() & 
-                ~pl.col(field).str.contains(pattern)
-            ).height
-            if invalid_npis > 0:
-                errors.append({
-                    'rule': 'npi_validation',
-                    'field': field,
-                    'error': f'{invalid_npis:,} rows have invalid NPI format',
-                    'severity': 'error'
+        for check in checks:
+            failed = counts[check['name']]
+            validation_results['checks'].append({'rule': check['rule'], 'field': check['field'],
+                                                 'check': check['check'], 'rows': failed,
+                                                 'severity': check['severity']})
+            if failed > 0:
+                # Geocoding failures are warnings, not errors
+                kind = check['severity']
+                validation_results[f'{kind}s'].append({
+                    'rule': check['rule'],
+                    'field': check['field'],
+                    kind: check['message'].format(count=failed),
+                    'severity': kind
                 })
-        
-        return errors
-    
-    def _check_geocoding_validation(self, df: pl.DataFrame) -> List[Dict[str, Any]]:
-        """Check geocoding validation."""
-        
-        warnings = []
-        lat_range = self.quality_rules['geocoding_validation']['latitude_range']
-        lon_range = self.quality_rules['geocoding_validation']['longitude_range']
-        
-        if 'latitude' in df.columns and 'longitude' in df.columns:
-            # Check latitude range
-            invalid_lat = df.filter(
-                pl.col('latitude').is_not_null() & 
-                ((pl.col('latitude') < lat_range[0]) | (pl.col('latitude') > lat_range[1]))
-            ).height
-            if invalid_lat > 0:
-                warnings.append({
-                    'rule': 'geocoding_validation',
-                    'field': 'latitude',
-                    'warning': f'{invalid_lat:,} rows have invalid latitude values',
-                    'severity': 'warning'
-                })
-            
-            # Check longitude range
-            invalid_lon = df.filter(
-                pl.col('longitude').is_not_null() & 
-                ((pl.col('longitude') < lon_range[0]) | (pl.col('longitude') > lon_range[1]))
-            ).height
-            if invalid_lon > 0:
-                warnings.append({
-                    'rule': 'geocoding_validation',
-                    'field': 'longitude',
-                    'warning': f'{invalid_lon:,} rows have invalid longitude values',
-                    'severity': 'warning'
-                })
-        
-        return warnings
-    
-    def _calculate_quality_metrics(self, df: pl.DataFrame) -> Dict[str, float]:
-        """Calculate data quality metrics."""
-        
+        validation_results['has_errors'] = bool(validation_results['errors'])
+        validation_results['metrics'] = self._quality_metrics(counts, schema)
+
+        logger.info(f"Validated partition with {rows:,} rows: {len(validation_results['errors'])} errors, "
+                    f"{len(validation_results['warnings'])} warnings")
+
+        return validation_results
+
+    @staticmethod
+    def _as_string(column: str, schema: pl.Schema) -> pl.Expr:
+        """column as a String expression, for regex rules on Categorical or numeric columns."""
+        return pl.col(column) if schema[column] == pl.String else pl.col(column).cast(pl.String)
+
+    def _rule_checks(self, schema: pl.Schema) -> List[Dict[str, Any]]:
+        """
+        The checks of every rule whose fields are in schema.
+
+        Each check's expr counts the rows that fail it; message is formatted
+        with that count.
+        """
+
+        checks = []
+
+        def add(rule: str, column: str, check: str, expr: pl.Expr, message: str, severity: str = 'error'):
+            checks.append({'name': f'{rule}.{column}.{check}', 'rule': rule, 'field': column, 'check': check,
+                           'expr': expr.sum(), 'message': message, 'severity': severity})
+
+        # Required fields must not be null
+        for column in self.quality_rules['required_fields']['fields']:
+            if column in schema:
+                add('required_fields', column, 'null', pl.col(column).is_null(),
+                    f'{{count:,}} rows have null values in required field: {column}')
+
+        rule = self.quality_rules['rate_validation']
+        column = rule['field']
+        if column in schema:
+            add('rate_validation', column, 'negative', pl.col(column) < 0, '{count:,} rows have negative rates')
+            add('rate_validation', column, 'range',
+                (pl.col(column) < rule['min_value']) | (pl.col(column) > rule['max_value']),
+                f"{{count:,}} rows have rates outside valid range (${rule['min_value']}-${rule['max_value']})")
+
+        rule = self.quality_rules['state_validation']
+        column = rule['field']
+        if column in schema:
+            add('state_validation', column, 'invalid', ~self._as_string(column, schema).is_in(rule['valid_values']),
+                '{count:,} rows have invalid state codes')
+
+        column = self.quality_rules['payer_validation']['field']
+        if column in schema:
+            # Any character outside the slug alphabet
+            add('payer_validation', column, 'invalid', self._as_string(column, schema).str.contains(r'[^a-z0-9-]'),
+                '{count:,} rows have invalid payer slug format')
+
+        rule = self.quality_rules['npi_validation']
+        column = rule['field']
+        if column in schema:
+            add('npi_validation', column, 'invalid',
+                pl.col(column).is_not_null() & ~self._as_string(column, schema).str.contains(rule['pattern']),
+                '{count:,} rows have invalid NPI format')
+
+        rule = self.quality_rules['geocoding_validation']
+        if 'latitude' in schema and 'longitude' in schema:
+            for column, (low, high) in (('latitude', rule['latitude_range']), ('longitude', rule['longitude_range'])):
+                add('geocoding_validation', column, 'range',
+                    pl.col(column).is_not_null() & ((pl.col(column) < low) | (pl.col(column) > high)),
+                    f'{{count:,}} rows have invalid {column} values', severity='warning')
+
+        return checks
+
+    def _metric_exprs(self, schema: pl.Schema) -> Dict[str, pl.Expr]:
+        """Aggregations behind the quality metrics, by name."""
+
+        exprs = {}
+        for column in ['fact_uid', 'negotiated_rate', 'state', 'payer_slug']:
+            if column in schema:
+                exprs[f'{column}_nulls'] = pl.col(column).null_count()
+
+        # Rate statistics
+        if 'negotiated_rate' in schema:
+            rate = pl.col('negotiated_rate')
+            exprs.update(avg_rate=rate.mean(), median_rate=rate.median(), min_rate=rate.min(), max_rate=rate.max())
+
+        # Geographic and provider coverage
+        for column, metric in (('stat_area_name', 'unique_stat_areas'), ('county_name', 'unique_counties'),
+                               ('npi', 'unique_npis')):
+            if column in schema:
+                exprs[metric] = pl.col(column).n_unique()
+
+        # Medicare benchmark coverage
+        if 'medicare_state_rate' in schema:
+            exprs['medicare_benchmark_coverage'] = pl.col('medicare_state_rate').is_not_null().mean()
+
+        return exprs
+
+    def _quality_metrics(self, counts: Dict[str, Any], schema: pl.Schema) -> Dict[str, float]:
+        """Data quality metrics from the aggregated counts."""
+
         metrics = {}
-        
+        total_rows = counts['rows']
+
         # Completeness metrics
-        total_rows = df.height
         if total_rows > 0:
-            for field in ['fact_uid', 'negotiated_rate', 'state', 'payer_slug']:
-                if field in df.columns:
-                    null_count = df.filter(pl.col(field).is_null()).height
-                    completeness = (total_rows - null_count) / total_rows
-                    metrics[f'{field}_completeness'] = completeness
-        
-        # Rate statistics
-        if 'negotiated_rate' in df.columns:
-            rate_stats = df.select(pl.col('negotiated_rate')).describe()
-            metrics['avg_rate'] = rate_stats['mean'].item() if 'mean' in rate_stats.columns else 0
-            metrics['median_rate'] = rate_stats['median'].item() if 'median' in rate_stats.columns else 0
-            metrics['min_rate'] = rate_stats['min'].item() if 'min' in rate_stats.columns else 0
-            metrics['max_rate'] = rate_stats['max'].item() if 'max' in rate_stats.columns else 0
-        
-        # Geographic coverage
-        if 'stat_area_name' in df.columns:
-            unique_areas = df.select('stat_area_name').n_unique()
-            metrics['unique_stat_areas'] = unique_areas
-        
-        if 'county_name' in df.columns:
-            unique_counties = df.select('county_name').n_unique()
-            metrics['unique_counties'] = unique_counties
-        
-        # Provider coverage
-        if 'npi' in df.columns:
-            unique_npis = df.select('npi').n_unique()
-            metrics['unique_npis'] = unique_npis
-        
-        # Medicare benchmark coverage
-        if 'medicare_state_rate' in df.columns:
-            benchmark_coverage = df.filter(pl.col('medicare_state_rate').is_not_null()).height / total_rows
-            metrics['medicare_benchmark_coverage'] = benchmark_coverage
-        
+            for column in ['fact_uid', 'negotiated_rate', 'state', 'payer_slug']:
+                if column in schema:
+                    metrics[f'{column}_completeness'] = (total_rows - counts[f'{column}_nulls']) / total_rows
+
+        for name in self._metric_exprs(schema):
+            if name.endswith('_nulls'):
+                continue
+            if name.endswith('_rate'):
+                # Rate statistics of an empty partition
+                metrics[name] = counts[name] if counts[name] is not None else 0
+            elif name != 'medicare_benchmark_coverage' or total_rows > 0:
+                metrics[name] = counts[name]
+
         return metrics
     
     def generate_quality_report(self, validation_results: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -322,14 +332,14 @@ class DataQualityChecker:
         overall_metrics = {}
         if validation_results:
             # Average completeness across all partitions
-            for field in ['fact_uid', 'negotiated_rate', 'state', 'payer_slug']:
+            for column in ['fact_uid', 'negotiated_rate', 'state', 'payer_slug']:
                 completeness_values = [
-                    result['metrics'].get(f'{field}_completeness', 0) 
+                    result['metrics'].get(f'{column}_completeness', 0) 
                     for result in validation_results 
-                    if f'{field}_completeness' in result['metrics']
+                    if f'{column}_completeness' in result['metrics']
                 ]
                 if completeness_values:
-                    overall_metrics[f'{field}_completeness'] = sum(completeness_values) / len(completeness_values)
+                    overall_metrics[f'{column}_completeness'] = sum(completeness_values) / len(completeness_values)
         
         # Quality score calculation
         error_count = len(all_errors)
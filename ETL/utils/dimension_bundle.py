@@ -0,0 +1,396 @@
+"""
+Precomputed Dimension Bundle for ETL3 Enrichment
+
+_enrich_fact_table joined every chunk against code, code_cat, payer,
+provider_group, pos_set, the NPI and TIN cross-references, dim_npi and the
+geocoded addresses in turn, and every ETL3 start re-read all of those files.
+This module pre-joins the dimension side once:
+
+- code: keyed by (code_type, code), dim_code with dim_code_cat folded in
+- provider: keyed by pg_uid, dim_provider_group with its NPIs, their primary
+  taxonomy, TINs and LOCATION address geography, sorted by pg_uid with an
+  offset index so a chunk gathers only the rows of its own provider groups
+- payer and pos_set: a few rows each, stored with their output column names
+
+The tables are written as uncompressed Arrow IPC and memory-mapped by later
+runs, so a warm start reads only the pages chunks actually touch. Each chunk
+is then enriched with one join per table, and the result equals the per-dim
+joins row for row, with the same column names (join suffixes included),
+order and dtypes. Names are resolved at build time by replaying the per-dim
+join sequence on placeholder columns for everything a join would see on its
+left, so no join at chunk time has to suffix anything.
+
+The bundle is rebuilt when its fingerprint changes: a content digest of every
+source file (re-hashed only when a file's size or mtime changed), the fact
+table's column names, the categorical mode and the bundle format version.
+
+One assumption differs from the per-dim joins: dim_code_cat rows are matched
+for the code types present in dim_code, which ETL1 builds from the same rates
+as fact_rate.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import polars as pl
+import pyarrow as pa
+
+from categorical_schema import encode_categoricals
+from provider_compaction import compact_members, PROVIDERS_COLUMN, FANOUT_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# Bump when the bundle's layout or join semantics change
+BUNDLE_VERSION = 2
+
+TABLES = ("code", "payer", "pos_set", "provider", "provider_index")
+MANIFEST = "manifest.json"
+
+GEO_COLUMNS = ['npi', 'state', 'latitude', 'longitude', 'county_name', 'county_fips',
+               'stat_area_name', 'stat_area_code', 'matched_address']
+
+
+def file_digest(path: Path, block_size: int = 8 * 1024 * 1024) -> str:
+    """blake2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_digests(paths: Mapping[str, Path], cached: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    """
+    Content digest per existing source file.
+
+    A cached entry is reused while the file's size and mtime are unchanged, so
+    a warm start does not re-read gigabytes of dimensions; a touched but
+    unchanged file is re-hashed and still matches.
+    """
+    cached = cached or {}
+    digests = {}
+    for name, path in sorted(paths.items()):
+        path = Path(path)
+        if not path.exists():
+            continue
+        stat = path.stat()
+        entry = cached.get(name)
+        if not (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns):
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': file_digest(path)}
+        digests[name] = entry
+    return digests
+
+
+def bundle_fingerprint(digests: Dict[str, dict], fact_columns: Sequence[str], categorical: bool) -> str:
+    """Fingerprint of everything a bundle's contents depend on."""
+    payload = {
+        'version': BUNDLE_VERSION,
+        'sources': {name: entry['digest'] for name, entry in digests.items()},
+        'fact_columns': list(fact_columns),
+        'categorical': categorical,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _with_placeholders(keys: pl.DataFrame, columns: Sequence[str]) -> pl.DataFrame:
+    """keys plus a null column for every other name in columns, in columns order."""
+    placeholders = [pl.lit(None).alias(name) for name in columns if name not in keys.columns]
+    return keys.with_columns(placeholders).select(list(columns))
+
+
+def _added(frame: pl.DataFrame, columns: Sequence[str]) -> List[str]:
+    """Columns a join sequence appended after the placeholder columns."""
+    return frame.columns[len(columns):]
+
+
+def build_tables(dimensions: Dict[str, pl.DataFrame], xrefs: Dict[str, pl.DataFrame],
+                 fact_columns: Sequence[str]) -> Dict[str, object]:
+    """
+    Pre-join the dimension side of _enrich_fact_table.
+
+    Each table is built by replaying the per-dim joins on its distinct keys
+    carrying a placeholder for every column the per-dim join would have seen
+    on its left, which gives the added columns their final (suffixed) names.
+
+    Returns:
+        Table name -> DataFrame (missing dimensions give no table), plus
+        'output_columns': the enriched column order
+    """
+    columns = list(fact_columns)
+    tables: Dict[str, object] = {}
+
+    # Code and code categorization, keyed by (code_type, code)
+    if 'code' in dimensions or 'code_cat' in dimensions:
+        code_cat_codes = None
+        if 'code_cat' in dimensions:
+            code_cat_codes = dimensions['code_cat'].select(pl.col('proc_cd').alias('code')).unique()
+        if 'code' in dimensions:
+            code_keys = ['code_type', 'code']
+            keys = dimensions['code'].select(code_keys).unique()
+            if code_cat_codes is not None:
+                # code_cat matches on code alone: offer its codes under every code type
+                extra = keys.select('code_type').unique().join(code_cat_codes, how='cross')
+                keys = pl.concat([keys, extra.cast(keys.schema)]).unique()
+        else:
+            code_keys = ['code']
+            keys = code_cat_codes
+
+        proto = _with_placeholders(keys, columns)
+        if 'code' in dimensions:
+            proto = proto.join(dimensions['code'], on=['code_type', 'code'], how='left')
+        if 'code_cat' in dimensions:
+            proto = proto.join(dimensions['code_cat'], left_on='code', right_on='proc_cd', how='left')
+        added = _added(proto, columns)
+        tables['code'] = proto.select(code_keys + added)
+        tables['code_keys'] = code_keys
+        columns += added
+
+    # Payer
+    if 'payer' in dimensions:
+        keys = dimensions['payer'].select('payer_slug').unique()
+        proto = _with_placeholders(keys, columns).join(dimensions['payer'], on='payer_slug', how='left')
+        added = _added(proto, columns)
+        tables['payer'] = proto.select(['payer_slug'] + added)
+        columns += added
+
+    # Provider side, keyed by pg_uid: every pg_uid any provider table knows
+    pg_sources = [dimensions.get('provider_group'), xrefs.get('pg_member_npi'), xrefs.get('pg_member_tin')]
+    pg_keys = [frame.select('pg_uid') for frame in pg_sources if frame is not None]
+    provider = None
+    provider_columns: List[str] = []
+    if pg_keys:
+        keys = pl.concat([frame.cast(pg_keys[0].schema) for frame in pg_keys]).unique()
+        provider = _with_placeholders(keys, columns)
+        if 'provider_group' in dimensions:
+            provider = provider.join(dimensions['provider_group'], on='pg_uid', how='left')
+        provider_columns = _added(provider, columns)
+        columns += provider_columns
+
+    # POS set (joined between provider group and NPIs, so placed there)
+    if 'pos_set' in dimensions:
+        keys = dimensions['pos_set'].select('pos_set_id').unique()
+        proto = _with_placeholders(keys, columns).join(dimensions['pos_set'], on='pos_set_id', how='left')
+        added = _added(proto, columns)
+        tables['pos_set'] = proto.select(['pos_set_id'] + added)
+        if provider is not None:
+            provider = provider.with_columns([pl.lit(None).alias(name) for name in added])
+        columns += added
+
+    # NPIs, TINs and geography of each provider group
+    if provider is not None:
+        start = len(columns)
+        if 'pg_member_npi' in xrefs and 'npi' in dimensions:
+            npi_dim = dimensions['npi']
+            npi_dim_narrow = npi_dim.select(['npi', 'primary_taxonomy_code']) \
+                if 'primary_taxonomy_code' in npi_dim.columns else npi_dim.select(['npi'])
+            provider = (
+                provider
+                .join(xrefs['pg_member_npi'].select(['pg_uid', 'npi']), on='pg_uid', how='left')
+                .join(npi_dim_narrow, on='npi', how='left')
+            )
+        if 'pg_member_tin' in xrefs:
+            tin = xrefs['pg_member_tin']
+            provider = provider.join(
+                tin.select([col for col in ['pg_uid', 'tin_value'] if col in tin.columns]),
+                on='pg_uid', how='left'
+            )
+        if 'npi_address_geo' in dimensions and 'npi' in provider.columns:
+            location_addresses = dimensions['npi_address_geo'].filter(
+                pl.col('address_purpose') == 'LOCATION'
+            ).select(GEO_COLUMNS)
+            provider = provider.join(location_addresses, on='npi', how='left', suffix='_geo')
+        tables['member_columns'] = provider.columns[start:]
+        provider_columns += provider.columns[start:]
+        columns += provider.columns[start:]
+
+        # Sorted by pg_uid, so each provider group is one contiguous run
+        provider = provider.select(['pg_uid'] + provider_columns).sort('pg_uid')
+        tables['provider'] = provider
+        tables['provider_index'] = (
+            provider
+            .select(pl.col('pg_uid').rle().alias('run'))
+            .unnest('run')
+            .select(
+                pl.col('value').alias('pg_uid'),
+                (pl.col('len').cum_sum() - pl.col('len')).cast(pl.Int64).alias('offset'),
+                pl.col('len').cast(pl.Int64).alias('length'),
+            )
+        )
+
+    tables['output_columns'] = columns
+    return tables
+
+
+def _write_ipc(df: pl.DataFrame, path: Path) -> None:
+    """Write an uncompressed IPC file (so readers can memory-map it) atomically."""
+    tmp = path.with_suffix('.tmp')
+    df.write_ipc(tmp, compression='uncompressed')
+    os.replace(tmp, path)
+
+
+def _map_ipc(path: Path) -> pl.DataFrame:
+    """Memory-map an IPC file; no data is read until it is used."""
+    table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    return pl.from_arrow(table, rechunk=False)
+
+
+class DimensionBundle:
+    """Memory-mapped pre-joined dimension tables with one join per table per chunk."""
+
+    def __init__(self, tables: Dict[str, pl.DataFrame], output_columns: List[str],
+                 code_keys: List[str], member_columns: List[str], fingerprint: str):
+        self.code = tables.get('code')
+        self.payer = tables.get('payer')
+        self.pos_set = tables.get('pos_set')
+        self.provider = tables.get('provider')
+        self.provider_index = tables.get('provider_index')
+        self.output_columns = output_columns
+        self.code_keys = code_keys
+        self.member_columns = member_columns
+        self.fingerprint = fingerprint
+
+        self.rebuilt = False
+        self.build_seconds = 0.0
+        self.load_seconds = 0.0
+
+    @classmethod
+    def load_or_build(cls, bundle_dir: Path, dim_paths: Mapping[str, Path], xref_paths: Mapping[str, Path],
+                      fact_columns: Sequence[str], categorical: bool = False) -> 'DimensionBundle':
+        """
+        Memory-map the bundle in bundle_dir, rebuilding it first if its
+        fingerprint no longer matches the sources.
+
+        Args:
+            bundle_dir: Directory holding the bundle's IPC files and manifest
+            dim_paths: Dimension name -> Parquet path (as in ETL3Config.DIM_PATHS)
+            xref_paths: Cross-reference name -> Parquet path
+            fact_columns: fact_rate column names, in order
+            categorical: Build with low-cardinality columns as categoricals
+        """
+        bundle_dir = Path(bundle_dir)
+        manifest_path = bundle_dir / MANIFEST
+        manifest = {}
+        if manifest_path.exists():
+            try:
+                manifest = json.loads(manifest_path.read_text())
+            except ValueError:
+                logger.warning(f"Ignoring unreadable bundle manifest {manifest_path}")
+
+        sources = {**{f"dim_{name}": path for name, path in dim_paths.items()},
+                   **{f"xref_{name}": path for name, path in xref_paths.items()}}
+        digests = source_digests(sources, manifest.get('sources'))
+        fingerprint = bundle_fingerprint(digests, fact_columns, categorical)
+
+        build_seconds = 0.0
+        rebuilt = manifest.get('fingerprint') != fingerprint
+        if rebuilt:
+            logger.info(f"Building dimension bundle in {bundle_dir}...")
+            started = time.perf_counter()
+            manifest = cls._build(bundle_dir, dim_paths, xref_paths, fact_columns, categorical)
+            manifest.update({'fingerprint': fingerprint, 'sources': digests})
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+            build_seconds = time.perf_counter() - started
+            logger.info(f"Built dimension bundle in {build_seconds:.1f}s: {manifest['rows']}")
+        else:
+            # Refresh cached stats (e.g. a touched but unchanged file) without rebuilding
+            if digests != manifest.get('sources'):
+                manifest['sources'] = digests
+                manifest_path.write_text(json.dumps(manifest, indent=2))
+            logger.info(f"Dimension bundle is current ({fingerprint[:12]})")
+
+        started = time.perf_counter()
+        tables = {name: _map_ipc(bundle_dir / f"{name}.arrow") for name in manifest['tables']}
+        bundle = cls(tables, manifest['output_columns'], manifest['code_keys'],
+                     manifest['member_columns'], fingerprint)
+        bundle.rebuilt = rebuilt
+        bundle.build_seconds = build_seconds
+        bundle.load_seconds = time.perf_counter() - started
+        return bundle
+
+    @staticmethod
+    def _build(bundle_dir: Path, dim_paths: Mapping[str, Path], xref_paths: Mapping[str, Path],
+               fact_columns: Sequence[str], categorical: bool) -> dict:
+        """Read the sources, pre-join them and write the IPC files; return the manifest."""
+        bundle_dir.mkdir(parents=True, exist_ok=True)
+        # A half-written bundle must never look current
+        (bundle_dir / MANIFEST).unlink(missing_ok=True)
+
+        dimensions = {name: pl.read_parquet(path) for name, path in dim_paths.items() if Path(path).exists()}
+        xrefs = {name: pl.read_parquet(path) for name, path in xref_paths.items() if Path(path).exists()}
+        if categorical:
+            # Same encoding as the per-dim path, so dtypes match it column for column
+            dimensions = {name: encode_categoricals(df) for name, df in dimensions.items()}
+
+        built = build_tables(dimensions, xrefs, fact_columns)
+        written = [name for name in TABLES if name in built]
+        for name in written:
+            _write_ipc(built[name], bundle_dir / f"{name}.arrow")
+
+        return {
+            'version': BUNDLE_VERSION,
+            'tables': written,
+            'rows': {name: built[name].height for name in written},
+            'output_columns': built['output_columns'],
+            'code_keys': built.get('code_keys', []),
+            'member_columns': built.get('member_columns', []),
+        }
+
+    def _provider_rows(self, pg_uids: pl.Series) -> pl.DataFrame:
+        """Provider rows of the given provider groups (a gather of their runs)."""
+        runs = (
+            pg_uids.unique().to_frame('pg_uid')
+            .join(self.provider_index, on='pg_uid', how='inner')
+        )
+        rows = runs.select(pl.int_ranges('offset', pl.col('offset') + pl.col('length')).explode().alias('row'))
+        return self.provider.select(pl.all().gather(rows['row']))
+
+    def enrich(self, fact: pl.DataFrame, compact_providers: bool = False) -> pl.DataFrame:
+        """
+        Join a fact chunk with the bundle: the same rows, columns and dtypes
+        as the per-dim joins of _enrich_fact_table (before partition keys).
+        
+        With compact_providers, each fact row joins one row per provider group
+        (see provider_compaction) instead of one per member.
+        
+        A LazyFrame fact (the streaming engine's scan of the whole fact table)
+        gives a LazyFrame joined with the whole provider table.
+        """
+        lazy = isinstance(fact, pl.LazyFrame)
+        table = (lambda df: df.lazy()) if lazy else (lambda df: df)
+        
+        enriched = fact
+        if self.code is not None:
+            enriched = enriched.join(table(self.code), on=self.code_keys, how='left')
+        if self.payer is not None:
+            enriched = enriched.join(table(self.payer), on='payer_slug', how='left')
+        if self.pos_set is not None:
+            enriched = enriched.join(table(self.pos_set), on='pos_set_id', how='left')
+        if self.provider is None:
+            return enriched.select(self.output_columns)
+        
+        provider_rows = self.provider.lazy() if lazy else self._provider_rows(fact['pg_uid'])
+        if not compact_providers:
+            return enriched.join(provider_rows, on='pg_uid', how='left').select(self.output_columns)
+        
+        compacted = compact_members(provider_rows, self.member_columns)
+        return (
+            enriched
+            .join(compacted, on='pg_uid', how='left')
+            .with_columns(pl.col(FANOUT_COLUMN).fill_null(1))
+            .select(self.output_columns + [PROVIDERS_COLUMN, FANOUT_COLUMN])
+        )
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'fingerprint': self.fingerprint[:12],
+            'rebuilt': self.rebuilt,
+            'build_seconds': round(self.build_seconds, 2),
+            'load_seconds': round(self.load_seconds, 3),
+            'code_rows': self.code.height if self.code is not None else 0,
+            'provider_rows': self.provider.height if self.provider is not None else 0,
+        }
@@ -0,0 +1,88 @@
+"""
+Distinct-Value Evaluation for Python Normalizers
+
+ETL1 derives payer_slug, year_month and pos_members with Python functions
+(payer_slug_from_name, normalize_yymm, normalize_service_codes). Called through
+map_elements they run once per row, although reporting_entity_name,
+last_updated_on and service_codes have only a handful of distinct values per
+MRF file.
+
+DistinctValueMapper calls the function once per distinct non-null value of a
+chunk, remembers results across chunks in an LRU cache, and joins the results
+back onto the rows. Nulls map to null, as with map_elements.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(value: Any) -> Hashable:
+    """Hashable cache key for a Python value from Series.to_list()."""
+    return tuple(value) if isinstance(value, list) else value
+
+
+class DistinctValueMapper:
+    """Applies a Python function to a Series once per distinct value."""
+
+    def __init__(self, func: Callable[[Any], Any], return_dtype: pl.DataType,
+                 cache_size: int = 4096):
+        """
+        Args:
+            func: Function of one non-null value
+            return_dtype: Polars dtype of the function's results
+            cache_size: Results kept across calls (least recently used are evicted)
+        """
+        self.func = func
+        self.return_dtype = return_dtype
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.rows = 0
+        self.calls = 0
+        self.cache_hits = 0
+
+    def _lookup(self, value: Any) -> Any:
+        key = _cache_key(value)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return self.cache[key]
+
+        result = self.func(value)
+        self.calls += 1
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def map(self, series: pl.Series) -> pl.Series:
+        """
+        Evaluate the function for every row of series.
+
+        Returns:
+            Series of return_dtype with the same name and length as series
+        """
+        self.rows += len(series)
+        distinct = series.drop_nulls().unique(maintain_order=True)
+        if distinct.is_empty():
+            return pl.Series(series.name, [None] * len(series), dtype=self.return_dtype)
+
+        results = [self._lookup(value) for value in distinct.to_list()]
+        lookup = pl.DataFrame([
+            distinct.alias("key"),
+            pl.Series("value", results, dtype=self.return_dtype),
+        ])
+        return (
+            series.alias("key").to_frame()
+            .join(lookup, on="key", how="left", maintain_order="left")
+            .get_column("value")
+            .alias(series.name)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Rows mapped, function calls made and cache hits so far."""
+        return {"rows": self.rows, "calls": self.calls, "cache_hits": self.cache_hits}
@@ -0,0 +1,296 @@
+"""
+Published Fact Ledger
+
+Every ETL3 run used to enrich and rewrite every row of fact_rate.parquet, even
+when ETL1 had only added one payer's new month. The ledger remembers what the
+last successful run published: for each fact_uid a 64-bit hash of the key and
+a 64-bit hash of its whole fact row, in sorted uint64 numpy arrays (16 bytes
+per fact, memory-mapped from data/fact_ledger).
+
+An incremental run first passes over the fact table once, hashing each chunk,
+and writes the rows whose fact_uid is new or whose row hash changed to a delta
+file. The engines then enrich and partition only the delta. The idempotent
+partition writes merge it into the partitions it touches, and every other
+partition is left alone. A 64-bit key collision cannot hide a new fact: its
+row hash still differs from the one recorded for the other fact.
+
+The new hashes are folded into the ledger (commit) only after a run with no
+failed chunks or uploads. A failed run leaves the ledger as it was, so the
+next run retries the same rows.
+
+The ledger only describes output produced the same way. It is stamped with a
+signature of everything else that shapes a partition row: the dimension and
+cross-reference file contents, the partition columns, the categorical and
+compact-provider modes and the Polars version whose row hashes it holds. A
+different signature starts from an empty ledger, which makes the run a full
+refresh.
+
+Incremental publishing is append-only, which is why it is opt-in
+(processing.incremental). fact_uid is a digest of the whole fact, rate
+included, so a changed rate arrives as a new fact_uid: the partition merge
+adds it next to the superseded row instead of replacing it. Facts deleted
+from the fact table are not detected either. Both stay published, and skew
+rate statistics, until a full refresh.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from parquet_batches import ParquetBatchReader
+from categorical_schema import decode_categoricals
+from dimension_bundle import source_digests
+from seen_keys import KEY_SEED, ROW_SEED
+
+logger = logging.getLogger(__name__)
+
+LEDGER_VERSION = 1
+KEY_COLUMN = "fact_uid"
+META = "ledger.json"
+
+
+def ledger_signature(digests: Dict[str, dict], settings: Mapping[str, Any]) -> str:
+    """Fingerprint of the sources and settings a ledger's output depends on."""
+    payload = {
+        'version': LEDGER_VERSION,
+        'polars': pl.__version__,
+        'sources': {name: entry['digest'] for name, entry in digests.items()},
+        'settings': dict(settings),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class FactLedger:
+    """Key and row hashes of the fact rows the last successful run published."""
+
+    # Published hashes are rewritten this many entries at a time on commit
+    MERGE_BLOCK = 1 << 20
+
+    def __init__(self, ledger_dir: Path, sources: Mapping[str, Path], settings: Mapping[str, Any],
+                 full_refresh: bool = False):
+        """
+        Args:
+            ledger_dir: Directory holding the hash arrays and their metadata
+            sources: Name -> path of every file the enriched rows depend on
+            settings: Options that shape the published rows (JSON-serializable)
+            full_refresh: Ignore the published hashes (every row counts as new)
+        """
+        self.ledger_dir = Path(ledger_dir)
+        meta = {}
+        meta_path = self.ledger_dir / META
+        if meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text())
+            except ValueError:
+                logger.warning(f"Ignoring unreadable fact ledger metadata {meta_path}")
+
+        self.digests = source_digests(sources, meta.get('sources'))
+        self.settings = dict(settings)
+        self.signature = ledger_signature(self.digests, self.settings)
+        self._generation = meta.get('generation', 0)
+
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.vals = np.empty(0, dtype=np.uint64)
+        if full_refresh:
+            self.reset_reason = "full refresh requested"
+        elif not meta:
+            self.reset_reason = "no ledger yet"
+        elif meta.get('signature') != self.signature:
+            self.reset_reason = self._describe_change(meta)
+        else:
+            self.reset_reason = None
+            self.keys = np.load(self._path('keys', self._generation), mmap_mode='r')
+            self.vals = np.load(self._path('vals', self._generation), mmap_mode='r')
+        if self.reset_reason:
+            logger.info(f"Fact ledger starts empty ({self.reset_reason}): every fact row will be published")
+        else:
+            logger.info(f"Fact ledger loaded: {len(self.keys):,} published facts")
+
+        self._pending_keys: List[np.ndarray] = []
+        self._pending_vals: List[np.ndarray] = []
+        self.rows_scanned = 0
+        self.rows_new = 0
+        self.rows_changed = 0
+        self.committed = False
+
+    def _path(self, name: str, generation: int) -> Path:
+        return self.ledger_dir / f"{name}_{generation:06d}.npy"
+
+    def _describe_change(self, meta: Dict[str, Any]) -> str:
+        """Which part of the signature differs from the stored ledger's."""
+        old_sources = {name: entry.get('digest') for name, entry in meta.get('sources', {}).items()}
+        new_sources = {name: entry['digest'] for name, entry in self.digests.items()}
+        changed = sorted(name for name in old_sources.keys() | new_sources.keys()
+                         if old_sources.get(name) != new_sources.get(name))
+        changed += sorted(name for name in meta.get('settings', {}).keys() | self.settings.keys()
+                          if meta.get('settings', {}).get(name) != self.settings.get(name))
+        if meta.get('polars') != pl.__version__:
+            changed.append(f"polars {meta.get('polars')} -> {pl.__version__}")
+        return f"changed since the last run: {', '.join(changed) or 'ledger format'}"
+
+    @property
+    def incremental(self) -> bool:
+        """Whether published hashes were loaded (otherwise every row is new)."""
+        return self.reset_reason is None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def changed_mask(self, chunk: pl.DataFrame) -> np.ndarray:
+        """
+        Flag the rows of a fact chunk that are new or changed since the last
+        commit, and remember their hashes for the next commit.
+
+        Returns:
+            Boolean mask over the chunk's rows
+        """
+        key_hashes = chunk.select(KEY_COLUMN).hash_rows(seed=KEY_SEED).to_numpy()
+        row_hashes = chunk.hash_rows(seed=ROW_SEED).to_numpy()
+
+        pos = np.searchsorted(self.keys, key_hashes)
+        found = np.zeros(len(key_hashes), dtype=bool)
+        in_range = pos < len(self.keys)
+        found[in_range] = self.keys[pos[in_range]] == key_hashes[in_range]
+        same = np.zeros(len(key_hashes), dtype=bool)
+        same[found] = self.vals[pos[found]] == row_hashes[found]
+        mask = ~same
+
+        self.rows_scanned += len(mask)
+        self.rows_new += int((~found).sum())
+        self.rows_changed += int((found & ~same).sum())
+
+        # fact_uid is unique in fact_rate (ETL1 merges on it); should a key repeat,
+        # all its rows pass together and the last one is recorded, as merges keep it
+        order = np.argsort(key_hashes, kind="stable")
+        sorted_keys = key_hashes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        last = order[np.r_[starts[1:], len(order)] - 1]
+        if len(starts) < len(mask):
+            emit = np.logical_or.reduceat(mask[order], starts)
+            mask[order] = np.repeat(emit, np.diff(np.r_[starts, len(order)]))
+        else:
+            emit = mask[last]
+        if emit.any():
+            self._pending_keys.append(key_hashes[last[emit]])
+            self._pending_vals.append(row_hashes[last[emit]])
+        return mask
+
+    def scan(self, fact_path: Path, chunk_size: int, delta_path: Optional[Path] = None) -> int:
+        """
+        Hash every row of the fact table, writing new or changed rows to
+        delta_path (if given).
+
+        Returns:
+            Number of new or changed rows
+        """
+        writer = None
+        changed = 0
+        if delta_path is not None:
+            Path(delta_path).unlink(missing_ok=True)
+        with ParquetBatchReader(fact_path, chunk_size) as reader:
+            for chunk in reader:
+                # Hash String values, so the hashes don't depend on the file's categorical mode
+                chunk = decode_categoricals(chunk)
+                mask = self.changed_mask(chunk)
+                rows = int(mask.sum())
+                changed += rows
+                if delta_path is None or rows == 0:
+                    continue
+                table = chunk.filter(pl.Series(mask)).to_arrow()
+                writer = writer or pq.ParquetWriter(str(delta_path), table.schema, compression="zstd")
+                writer.write_table(table)
+        if writer is not None:
+            writer.close()
+
+        logger.info(f"Fact ledger scan: {self.rows_scanned:,} rows, {self.rows_new:,} new, "
+                    f"{self.rows_changed:,} changed, {self.rows_scanned - changed:,} already published")
+        return changed
+
+    def commit(self):
+        """Fold the pending hashes into the published ledger (last row per key wins)."""
+        keys = np.concatenate([self.keys[:0]] + self._pending_keys).astype(np.uint64, copy=False)
+        vals = np.concatenate([self.vals[:0]] + self._pending_vals).astype(np.uint64, copy=False)
+        order = np.argsort(keys, kind="stable")
+        keys, vals = keys[order], vals[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        keys, vals = keys[last], vals[last]
+
+        pos = np.searchsorted(self.keys, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        in_range = pos < len(self.keys)
+        found[in_range] = self.keys[pos[in_range]] == keys[in_range]
+
+        self.ledger_dir.mkdir(parents=True, exist_ok=True)
+        generation = self._generation + 1
+        total = len(self.keys) + int((~found).sum())
+        out_keys = np.lib.format.open_memmap(self._path('keys', generation), mode="w+", dtype=np.uint64, shape=(total,))
+        out_vals = np.lib.format.open_memmap(self._path('vals', generation), mode="w+", dtype=np.uint64, shape=(total,))
+        self._merge(vals[found], pos[found], keys[~found], vals[~found], out_keys, out_vals,
+                    self.MERGE_BLOCK)
+        out_keys.flush()
+        out_vals.flush()
+
+        meta = {
+            'generation': generation,
+            'signature': self.signature,
+            'polars': pl.__version__,
+            'sources': self.digests,
+            'settings': self.settings,
+            'facts': total,
+        }
+        meta_tmp = self.ledger_dir / f"{META}.tmp"
+        meta_tmp.write_text(json.dumps(meta, indent=2, default=str))
+        os.replace(meta_tmp, self.ledger_dir / META)
+
+        old_generation = self._generation
+        self.keys, self.vals = out_keys, out_vals
+        self._generation = generation
+        self._pending_keys, self._pending_vals = [], []
+        for name in ('keys', 'vals'):
+            self._path(name, old_generation).unlink(missing_ok=True)
+        self.committed = True
+        logger.info(f"Fact ledger committed: {total:,} published facts")
+
+    def _merge(self, update_vals, update_pos, new_keys, new_vals, out_keys, out_vals, block: int):
+        """Write the published hashes with updates applied and new keys merged in, block by block."""
+        base_keys, base_vals = self.keys, self.vals
+        # New key i goes right before published key insert_at[i]
+        insert_at = np.searchsorted(base_keys, new_keys)
+        out = 0
+        n_start = 0
+        u_start = 0
+        for b_start in range(0, len(base_keys), block):
+            b_end = min(len(base_keys), b_start + block)
+            block_vals = np.array(base_vals[b_start:b_end])
+            u_end = int(np.searchsorted(update_pos, b_end, side="left"))
+            block_vals[update_pos[u_start:u_end] - b_start] = update_vals[u_start:u_end]
+            n_end = int(np.searchsorted(insert_at, b_end, side="left"))
+            keys = np.concatenate([base_keys[b_start:b_end], new_keys[n_start:n_end]])
+            vals = np.concatenate([block_vals, new_vals[n_start:n_end]])
+            order = np.argsort(keys, kind="stable")
+            out_keys[out:out + len(keys)] = keys[order]
+            out_vals[out:out + len(keys)] = vals[order]
+            out += len(keys)
+            n_start, u_start = n_end, u_end
+        out_keys[out:] = new_keys[n_start:]
+        out_vals[out:] = new_vals[n_start:]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': 'incremental' if self.incremental else 'full',
+            'reset_reason': self.reset_reason,
+            'rows_scanned': self.rows_scanned,
+            'rows_new': self.rows_new,
+            'rows_changed': self.rows_changed,
+            'rows_skipped': self.rows_scanned - self.rows_new - self.rows_changed,
+            'published_facts': len(self.keys),
+            'committed': self.committed,
+        }
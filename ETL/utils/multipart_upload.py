@@ -0,0 +1,150 @@
+"""
+Streaming Multipart Upload Sink
+
+Serializing a partition into a BytesIO and then calling getvalue() keeps two
+full copies of the encoded file alive next to the DataFrame. This module
+provides a write-only file object that Parquet writers stream into directly:
+bytes are buffered until a part is full, then the buffer itself becomes the
+upload_part body (no copy) and a fresh buffer is started, so memory stays
+bounded by the part size plus one writer flush (~1MB for pyarrow) whatever
+the partition size. Parts are therefore at least part_size bytes, overshooting
+by less than one write.
+
+If fewer than part_size bytes are ever written, close() sends them with one
+put_object instead, so small partitions keep the single-request fast path.
+A failure before close() completes aborts the multipart upload, leaving no
+orphaned parts behind.
+"""
+
+import io
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects non-final parts smaller than 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """Write-only file object that uploads to S3 in parts as it is written."""
+
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int = 16 * 1024 * 1024,
+                 extra_args: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket: Target bucket
+            key: Target key
+            part_size: Minimum bytes per uploaded part (at least 5 MiB)
+            extra_args: Extra put_object / create_multipart_upload arguments
+                (ContentType, ServerSideEncryption, ...)
+        """
+        super().__init__()
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes, got {part_size}")
+
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.extra_args = dict(extra_args or {})
+
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+        self.peak_buffer_bytes = 0
+        self.multipart = False
+        self.etag: Optional[str] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed MultipartUploadWriter")
+
+        view = memoryview(data).cast("B")
+        self._buffer += view
+        self.bytes_written += len(view)
+        self.peak_buffer_bytes = max(self.peak_buffer_bytes, len(self._buffer))
+
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+        return len(view)
+
+    def _upload_part(self):
+        """Send the whole buffer as the next part and start a new buffer."""
+        body, self._buffer = self._buffer, bytearray()
+        try:
+            if self._upload_id is None:
+                response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra_args)
+                self._upload_id = response["UploadId"]
+                self.multipart = True
+
+            part_number = len(self._parts) + 1
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        except Exception:
+            self.abort()
+            raise
+
+    def close(self):
+        """Finish the upload: one PUT if it never reached a part, else the last part and complete."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                response = self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=self._buffer, **self.extra_args)
+            else:
+                if self._buffer:
+                    self._upload_part()
+                response = self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+                logger.debug(f"Completed multipart upload of {self.bytes_written:,} bytes "
+                             f"in {len(self._parts)} parts to s3://{self.bucket}/{self.key}")
+            self.etag = (response or {}).get("ETag")
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+            super().close()
+
+    def abort(self):
+        """Abort the multipart upload (if one was started) and drop buffered bytes."""
+        if self._upload_id is not None:
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload of s3://{self.bucket}/{self.key}: {e}")
+            self._upload_id = None
+        self._buffer = bytearray()
+        if not self.closed:
+            super().close()
+
+    def __del__(self):
+        # IOBase.__del__ would close(), i.e. upload whatever a failed writer left behind
+        if not self.closed:
+            self.abort()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return False
+        self.close()
+        return False
@@ -0,0 +1,170 @@
+"""
+Parquet Layout Profiles
+
+Partition files used to be written with the writer's defaults and rows in
+arrival order, so the min/max statistics of every row group spanned nearly
+every code and NPI of the partition and a query filtering on one code or NPI
+(the webapp's lookups, Athena, DuckDB over a local copy) read every row
+group. A ParquetLayout says how S3PartitionedETL lays a partition file out:
+
+- sort_by: rows are sorted by these columns (nulls last) before writing, so
+  each row group covers a narrow code/NPI range and its statistics let
+  readers skip the others; the order is recorded as the file's sorting columns
+- row_group_size: rows per row group (smaller groups are skipped more
+  precisely, at the cost of more footer metadata)
+- statistics / dictionary: column min/max statistics and dictionary encoding
+  of repeated values (both on in every profile)
+- bloom_filter_columns: a Parquet bloom filter per row group for these
+  columns, sized from the column's distinct values, so an equality filter on
+  a value that falls inside a row group's min/max but is not in it still
+  skips the group
+
+Profiles: 'default' (arrival order, writer defaults, as before) and 'query'
+(sorted by code_type, code, npi; 32K-row groups; bloom filters on code, npi
+and tin_value). Columns a partition does not have, and nested columns (the
+compact providers list), are left out of sorting and bloom filters.
+
+write lays out a DataFrame; rewrite lays out a Parquet file already in the
+layout's order (such as a staged partition sorted by a lazy plan) one row
+group at a time, so the file is never loaded whole.
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+import polars as pl
+import pyarrow.parquet as pq
+
+
+class ParquetLayout(NamedTuple):
+    """How a partition file's rows and row groups are laid out"""
+    sort_by: Tuple[str, ...] = ()
+    row_group_size: Optional[int] = None        # None: the writer's default (or the caller's)
+    bloom_filter_columns: Tuple[str, ...] = ()
+    bloom_filter_fpp: float = 0.05
+    statistics: bool = True
+    dictionary: bool = True
+
+    def _columns(self, df: Union[pl.DataFrame, pl.LazyFrame], names: Sequence[str]) -> list:
+        schema = df.collect_schema()
+        return [name for name in names if name in schema and not schema[name].is_nested()]
+
+    def order(self, df: Union[pl.DataFrame, pl.LazyFrame]) -> Union[pl.DataFrame, pl.LazyFrame]:
+        """Rows in the layout's order (unchanged without sort columns); a LazyFrame stays lazy."""
+        columns = self._columns(df, self.sort_by)
+        if not columns or (isinstance(df, pl.DataFrame) and df.height < 2):
+            return df
+        return df.sort(columns, nulls_last=True, maintain_order=True)
+
+    def _bloom_filters(self, distinct: Dict[str, int], row_group_size: Optional[int]) -> Dict[str, Dict[str, float]]:
+        # Sized for one row group's distinct values
+        return {name: {'ndv': max(1, min(count, row_group_size or count)), 'fpp': self.bloom_filter_fpp}
+                for name, count in distinct.items()}
+
+    def _sorting(self, schema, columns: Sequence[str]):
+        if not columns:
+            return None
+        return pq.SortingColumn.from_ordering(schema, [(name, 'ascending') for name in columns],
+                                              null_placement='at_end')
+
+    def write(self, df: pl.DataFrame, sink: BinaryIO, compression: str = 'zstd',
+              row_group_size: Optional[int] = None, metadata: Optional[Dict[str, str]] = None,
+              sorted_rows: bool = True) -> None:
+        """
+        Write df (already in the layout's order) as Parquet to a path or file object.
+
+        Args:
+            df: Rows to write
+            sink: Path or writable file object
+            compression: Parquet compression
+            row_group_size: Rows per row group when the layout does not set one
+            metadata: Footer key-value metadata
+            sorted_rows: Whether df is in the layout's order (recorded as the
+                file's sorting columns); False for files that concatenate
+                separately sorted blocks, such as compaction rollups
+        """
+        table = df.to_arrow()
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+
+        row_group_size = self.row_group_size or row_group_size
+        bloom_filters = self._bloom_filters({name: df[name].n_unique()
+                                             for name in self._columns(df, self.bloom_filter_columns)},
+                                            row_group_size or df.height)
+        sorting = self._sorting(table.schema, self._columns(df, self.sort_by) if sorted_rows else [])
+
+        pq.write_table(
+            table,
+            sink,
+            compression=compression,
+            row_group_size=row_group_size,
+            write_statistics=self.statistics,
+            use_dictionary=self.dictionary,
+            sorting_columns=sorting,
+            bloom_filter_options=bloom_filters or None,
+        )
+
+    def rewrite(self, source: Union[str, Path], sink: Union[str, Path, BinaryIO], compression: str = 'zstd',
+                row_group_size: Optional[int] = None) -> None:
+        """
+        Copy a Parquet file whose rows are already in the layout's order to
+        sink in the layout, one row group at a time. Bloom filters are sized
+        from a streaming count of distinct values, so memory holds one row
+        group and those values, not the file.
+
+        Args:
+            source: Parquet file in the layout's order (e.g. sunk from order(lazy_frame))
+            sink: Path or writable file object (not source)
+            compression: Parquet compression
+            row_group_size: Rows per row group when the layout does not set one
+        """
+        data = pl.scan_parquet(source)
+        row_group_size = self.row_group_size or row_group_size
+        names = self._columns(data, self.bloom_filter_columns)
+        distinct = (data.select(pl.col(names).n_unique()).collect(engine='streaming').row(0, named=True)
+                    if names else {})
+        reader = pq.ParquetFile(source)
+        bloom_filters = self._bloom_filters(distinct, row_group_size or reader.metadata.num_rows)
+        with pq.ParquetWriter(
+            sink,
+            reader.schema_arrow,
+            compression=compression,
+            write_statistics=self.statistics,
+            use_dictionary=self.dictionary,
+            sorting_columns=self._sorting(reader.schema_arrow, self._columns(data, self.sort_by)),
+            bloom_filter_options=bloom_filters or None,
+        ) as writer:
+            for batch in reader.iter_batches(batch_size=row_group_size or 131_072):
+                writer.write_batch(batch, row_group_size=row_group_size)
+
+
+DEFAULT_LAYOUT = ParquetLayout()
+
+QUERY_LAYOUT = ParquetLayout(
+    sort_by=('code_type', 'code', 'npi'),
+    row_group_size=32_768,
+    bloom_filter_columns=('code', 'npi', 'tin_value'),
+)
+
+LAYOUTS = {'default': DEFAULT_LAYOUT, 'query': QUERY_LAYOUT}
+
+
+def parquet_layout(profile: str = 'query', sort_by: Optional[Sequence[str]] = None,
+                   row_group_size: Optional[int] = None,
+                   bloom_filter_columns: Optional[Sequence[str]] = None) -> ParquetLayout:
+    """
+    A named profile, with any of its settings overridden.
+
+    Raises:
+        ValueError: For an unknown profile
+    """
+    if profile not in LAYOUTS:
+        raise ValueError(f"Unknown Parquet layout {profile!r} (expected one of {sorted(LAYOUTS)})")
+    layout = LAYOUTS[profile]
+    if sort_by is not None:
+        layout = layout._replace(sort_by=tuple(sort_by))
+    if row_group_size is not None:
+        layout = layout._replace(row_group_size=int(row_group_size))
+    if bloom_filter_columns is not None:
+        layout = layout._replace(bloom_filter_columns=tuple(bloom_filter_columns))
+    return layout
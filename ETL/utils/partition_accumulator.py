@@ -0,0 +1,185 @@
+"""
+Local Partition Accumulator
+
+In per-chunk mode ETL3 writes every chunk slice straight to S3: a HEAD, a GET
+of the existing partition file, a merge and a PUT of the whole file again. A
+partition touched by k chunks is downloaded and rewritten k times, so bytes
+moved grow with k squared.
+
+This module instead appends each chunk slice to local Arrow IPC fragment files,
+one directory per partition. After the last chunk every partition is read back
+once, deduplicated on fact_uid ("last wins", in chunk order) and handed to the
+writer exactly once.
+
+Fragments stay under a disk budget: when appending would exceed it, the largest
+partitions are flushed early through the same writer (which merges with what
+is already in S3) and their fragments deleted.
+
+Each flush replaces k per-chunk writes of a partition with one, so it saves
+k - 1 PUTs, k - 1 HEADs and k - 1 GETs: per-chunk mode only skips the GET on
+the very first write of a partition that did not exist yet, and so does the
+single flush.
+"""
+
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+DEDUP_KEY = "fact_uid"
+
+
+@dataclass
+class _PartitionFragments:
+    """Spilled fragments of one partition"""
+    directory: Path
+    files: List[Path] = field(default_factory=list)
+    bytes: int = 0
+    rows: int = 0
+
+
+class PartitionAccumulator:
+    """Collects chunk slices per partition on local disk and writes each partition once."""
+
+    def __init__(self, spill_dir: Path, writer: Callable[[pl.DataFrame, str], Any],
+                 disk_budget_mb: float = 2048, compression: str = "lz4"):
+        """
+        Args:
+            spill_dir: Directory for fragment files (cleared on start and close)
+            writer: Called as writer(partition_data, s3_path) to write a partition
+            disk_budget_mb: Maximum bytes of fragments kept on disk
+            compression: Arrow IPC compression for fragments
+        """
+        self.spill_dir = Path(spill_dir)
+        self.writer = writer
+        self.disk_budget_bytes = int(disk_budget_mb * 1024 * 1024)
+        self.compression = compression
+        self.partitions: Dict[str, _PartitionFragments] = {}
+        self.spill_bytes = 0
+
+        self.slices_appended = 0
+        self.rows_appended = 0
+        self.uploads = 0
+        self.early_flushes = 0
+        self.rows_uploaded = 0
+        self.duplicates_removed = 0
+        self.peak_spill_bytes = 0
+        self.requests_saved = 0
+        self.failed_partitions: List[str] = []
+
+        if self.spill_dir.exists():
+            shutil.rmtree(self.spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def append(self, s3_path: str, partition_data: pl.DataFrame):
+        """Spill one chunk's slice of a partition."""
+        if partition_data.is_empty():
+            return
+
+        fragments = self.partitions.get(s3_path)
+        if fragments is None:
+            # Partition paths are long and contain '/', '=' and spaces
+            name = hashlib.sha1(s3_path.encode()).hexdigest()
+            fragments = _PartitionFragments(self.spill_dir / name)
+            fragments.directory.mkdir(parents=True, exist_ok=True)
+            self.partitions[s3_path] = fragments
+
+        path = fragments.directory / f"fragment_{len(fragments.files):06d}.arrow"
+        partition_data.write_ipc(path, compression=self.compression)
+        size = path.stat().st_size
+
+        fragments.files.append(path)
+        fragments.bytes += size
+        fragments.rows += partition_data.height
+        self.spill_bytes += size
+        self.slices_appended += 1
+        self.rows_appended += partition_data.height
+        self.peak_spill_bytes = max(self.peak_spill_bytes, self.spill_bytes)
+
+        if self.spill_bytes > self.disk_budget_bytes:
+            self._enforce_budget()
+
+    def _enforce_budget(self):
+        """Flush the largest partitions until fragments fit in half the budget."""
+        target = self.disk_budget_bytes // 2
+        largest_first = sorted(self.partitions, key=lambda p: self.partitions[p].bytes, reverse=True)
+        for s3_path in largest_first:
+            if self.spill_bytes <= target:
+                break
+            self.early_flushes += 1
+            self._flush(s3_path)
+        logger.info(f"Partition spill over budget: flushed early, {self.spill_bytes / 1e6:.1f}MB left on disk")
+
+    def _read_fragments(self, fragments: _PartitionFragments) -> pl.DataFrame:
+        """Read a partition's fragments back, deduplicated on fact_uid (last wins)."""
+        frames = [pl.read_ipc(path) for path in fragments.files]
+        # A column that was all-null in one chunk may have been written as Null
+        combined = pl.concat(frames, how="diagonal_relaxed") if len(frames) > 1 else frames[0]
+
+        if DEDUP_KEY in combined.columns:
+            deduped = combined.unique(subset=[DEDUP_KEY], keep="last", maintain_order=True)
+            self.duplicates_removed += combined.height - deduped.height
+            return deduped
+        return combined
+
+    def _flush(self, s3_path: str):
+        """Write one partition through the writer and drop its fragments."""
+        fragments = self.partitions.pop(s3_path)
+        try:
+            partition_data = self._read_fragments(fragments)
+            self.writer(partition_data, s3_path)
+            self.uploads += 1
+            self.rows_uploaded += partition_data.height
+            self.requests_saved += len(fragments.files) - 1
+        except Exception as e:
+            logger.error(f"Failed to write accumulated partition {s3_path}: {e}")
+            self.failed_partitions.append(s3_path)
+        finally:
+            self.spill_bytes -= fragments.bytes
+            shutil.rmtree(fragments.directory, ignore_errors=True)
+
+    def flush_all(self) -> List[str]:
+        """
+        Write every pending partition once.
+
+        Returns:
+            Partition paths written successfully by this call
+        """
+        pending = sorted(self.partitions)
+        failed_before = len(self.failed_partitions)
+        logger.info(f"Writing {len(pending):,} accumulated partitions "
+                    f"({self.spill_bytes / 1e6:.1f}MB of fragments)")
+
+        for s3_path in pending:
+            self._flush(s3_path)
+
+        failed = set(self.failed_partitions[failed_before:])
+        return [p for p in pending if p not in failed]
+
+    def stats(self) -> Dict[str, Any]:
+        """Slices, uploads and the S3 requests saved versus per-chunk writes."""
+        return {
+            "slices_appended": self.slices_appended,
+            "rows_appended": self.rows_appended,
+            "uploads": self.uploads,
+            "early_flushes": self.early_flushes,
+            "rows_uploaded": self.rows_uploaded,
+            "duplicates_removed": self.duplicates_removed,
+            "failed_partitions": len(self.failed_partitions),
+            "peak_spill_mb": round(self.peak_spill_bytes / (1024 * 1024), 1),
+            "puts_avoided": self.requests_saved,
+            "gets_avoided": self.requests_saved,
+            "heads_avoided": self.requests_saved,
+        }
+
+    def close(self):
+        """Delete all fragment files."""
+        self.partitions.clear()
+        self.spill_bytes = 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,406 @@
+"""
+Partition Compaction
+
+create_s3_path nests every partition nine levels deep (payer, state, billing
+class, procedure set and class, taxonomy, statistical area, year, month), so
+most partition files hold a few KB and every one of them costs a GET in the
+webapp and in Athena. A few partitions go the other way and grow past the
+partitioning limits in etl3_config.yaml. This module enforces those limits
+after the fact:
+
+- oversized: a partition file larger than max_partition_size_mb (or with more
+  rows than max_partition_rows) is split into numbered part files next to it
+  (fact_rate_enriched.part-00000.parquet, ...) of about target_file_size_mb,
+  never smaller than min_file_size_mb
+- undersized: with a rollup_level, partition files smaller than
+  min_file_size_mb (or with fewer rows than min_partition_rows) are rolled up
+  into one file per rollup_level directory (the partition path without the
+  levels below rollup_level), up to target_file_size_mb. Each partition's rows
+  stay contiguous in the rollup and its footer maps partition key -> row
+  range, so one partition can still be read or taken out without touching the
+  others. Only S3PartitionedETL reads rollups: Athena's partition locations
+  and the webapp's leaf keys name every level, so rollups are opt-in (a
+  coarser partition spec, see partition_spec.py, is the way to fewer files
+  for those readers).
+
+Plans come from the partition inventory (S3PartitionInventory), which lists
+the prefix once and recognizes partition, part and rollup files.
+
+No row is ever published twice. New parts and rollups are written under a
+_staging/ directory next to their final key, which readers that list
+directories (Athena, Hive) skip; the old files are deleted; only then are the
+staged files copied into place (part 0 last) and the staged copies deleted.
+Readers that list directories see the old files, then no files or some of the
+new parts while they are published, then the new files. Readers that go
+through S3PartitionedETL.locate_partition always find every row: a partition's
+own file wins over its parts, parts over a rollup, and without either they
+read the staged parts or rollup.
+
+Each run first finishes what an interrupted one staged: staged parts whose
+partition file still exists are discarded (the split did not get to its
+delete, or ETL3 has since rewritten the partition), others are published; a
+staged rollup is published without the partitions whose own file still
+exists. Superseded parts and rollup copies are purged.
+
+ETL3 writes stay correct on a compacted prefix: write_partition_idempotent
+reads a split or rolled-up partition from its parts or rollup and writes it
+back as its own file, S3PartitionedETL then takes it out of them, and the next
+compaction folds it in again.
+"""
+
+import io
+import math
+import time
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import polars as pl
+
+from s3_etl_utils import (PART_FILE_PREFIX, PARTITION_FILE, PARTITION_LEVELS, STAGING_DIR, partition_part_key,
+                          published_key, rollup_key, staging_key)
+from s3_partition_inventory import PartitionInfo, S3PartitionInventory
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class CompactionPolicy(NamedTuple):
+    """File size and row limits compaction enforces"""
+    target_file_bytes: int
+    min_file_bytes: int
+    max_file_bytes: int
+    max_rows: Optional[int] = None
+    min_rows: int = 0
+    rollup_level: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config) -> 'CompactionPolicy':
+        """Policy from an ETL3Config's partitioning settings."""
+        return cls(
+            target_file_bytes=int(config.TARGET_FILE_SIZE_MB * MB),
+            min_file_bytes=int(config.MIN_FILE_SIZE_MB * MB),
+            max_file_bytes=int(config.MAX_PARTITION_SIZE_MB * MB),
+            max_rows=config.MAX_PARTITION_ROWS,
+            min_rows=config.MIN_PARTITION_ROWS,
+            rollup_level=config.ROLLUP_LEVEL,
+        )
+
+
+class SplitAction(NamedTuple):
+    """Split an oversized partition file into numbered parts"""
+    key: str
+    bytes: int
+    rows: Optional[int]
+    parts: int
+
+
+class RollupAction(NamedTuple):
+    """Fold undersized partition files into the rollup file of their rollup_level directory"""
+    key: str
+    partitions: List[str]
+    bytes: int
+    existing: bool
+
+
+class PurgeAction(NamedTuple):
+    """Remove copies of a partition superseded by its own file (left by an interrupted swap or a write)"""
+    key: str
+    parts: List[str]
+    rollup: Optional[str]
+
+
+Action = Union[SplitAction, RollupAction, PurgeAction]
+
+
+def plan_compaction(partitions: Sequence[PartitionInfo], policy: CompactionPolicy,
+                    row_count: Callable[[str], int],
+                    rollup_members: Callable[[str], Dict[str, Any]],
+                    levels: Sequence[str] = PARTITION_LEVELS) -> List[Action]:
+    """
+    Actions that bring an inventoried prefix within the policy.
+
+    Args:
+        partitions: Inventory of the prefix (partition, part and rollup files)
+        policy: Limits to enforce
+        row_count: Rows of a partition file (read from its footer; only called
+            for files not already undersized by size, and only with row limits set)
+        rollup_members: Partition keys held by a rollup file
+        levels: Business levels of the partition paths (the partition spec's)
+    """
+    files = sorted((p for p in partitions if p.file_kind == 'file'), key=lambda p: p.partition_path)
+    rollups = {p.partition_path: p for p in partitions if p.file_kind == 'rollup'}
+    parts_by_dir: Dict[str, List[str]] = defaultdict(list)
+    for p in partitions:
+        if p.file_kind == 'part':
+            parts_by_dir[p.partition_path.rsplit('/', 1)[0]].append(p.partition_path)
+    rolled_up = {name: key for key in rollups for name in rollup_members(key)}
+
+    actions: List[Action] = []
+    small: Dict[str, List[PartitionInfo]] = defaultdict(list)
+    for p in files:
+        key, size = p.partition_path, p.file_size_bytes
+        stale_parts = sorted(parts_by_dir.get(key.rsplit('/', 1)[0], []))
+        stale_rollup = rolled_up.get(key)
+
+        rows = None
+        undersized = size < policy.min_file_bytes
+        if not undersized and (policy.max_rows or policy.min_rows > 1):
+            rows = row_count(key)
+            undersized = rows < policy.min_rows
+        if undersized and policy.rollup_level:
+            # The rollup replaces any copy it already holds; parts are purged first
+            if stale_parts:
+                actions.append(PurgeAction(key, stale_parts, None))
+            small[rollup_key(key, policy.rollup_level, levels)].append(p)
+            continue
+
+        parts = math.ceil(size / policy.target_file_bytes)
+        too_many_rows = bool(policy.max_rows and rows is not None and rows > policy.max_rows)
+        if too_many_rows:
+            parts = max(parts, math.ceil(rows / policy.max_rows))
+        parts = min(parts, max(1, size // max(1, policy.min_file_bytes)))
+        if (size > policy.max_file_bytes or too_many_rows) and parts > 1:
+            # Splitting replaces stale parts too
+            actions.append(SplitAction(key, size, rows, parts))
+            if stale_rollup:
+                actions.append(PurgeAction(key, [], stale_rollup))
+        elif stale_parts or stale_rollup:
+            actions.append(PurgeAction(key, stale_parts, stale_rollup))
+
+    for key in sorted(small):
+        existing = rollups.get(key)
+        used = existing.file_size_bytes if existing else 0
+        if used >= policy.target_file_bytes:
+            continue
+        members: List[str] = []
+        for p in small[key]:
+            if members and used + p.file_size_bytes > policy.target_file_bytes:
+                break
+            members.append(p.partition_path)
+            used += p.file_size_bytes
+        # Only worth a rewrite if it leaves fewer files
+        if len(members) + (1 if existing else 0) >= 2:
+            actions.append(RollupAction(key, members, used, existing is not None))
+    return actions
+
+
+class PartitionCompactor:
+    """Plans and runs compaction of one partition prefix through an S3PartitionedETL."""
+
+    def __init__(self, s3_etl, prefix: str, policy: CompactionPolicy, compression: str = 'zstd'):
+        """
+        Args:
+            s3_etl: S3PartitionedETL for the storage holding the prefix (its
+                rollup_level must match the policy's, so reads find rollups)
+            prefix: Partition prefix (e.g. 'partitioned-data')
+            policy: Limits to enforce
+            compression: Parquet compression of rewritten files
+        """
+        levels = s3_etl.partition_spec.levels
+        if policy.rollup_level and policy.rollup_level not in levels[:-1]:
+            raise ValueError(f"Rollup level must be one of {levels[:-1]}, not {policy.rollup_level}")
+        if s3_etl.rollup_level != policy.rollup_level and policy.rollup_level:
+            raise ValueError(f"Compaction rolls up to {policy.rollup_level} but partitions are "
+                             f"read from rollups at {s3_etl.rollup_level}")
+        self.s3_etl = s3_etl
+        self.storage = s3_etl.storage
+        self.prefix = prefix.rstrip('/')
+        self.policy = policy
+        self.compression = compression
+
+    def plan(self) -> List[Action]:
+        """Inventory the prefix and plan the actions."""
+        inventory = S3PartitionInventory(self.s3_etl.bucket_name, prefix=self.prefix + '/', storage=self.storage,
+                                         spec=self.s3_etl.partition_spec)
+        # Row limits are checked against manifest counts, or the file's footer without a manifest
+        row_limits = self.policy.max_rows is not None or self.policy.min_rows > 1
+        partitions = inventory.discover_partitions(read_manifests=row_limits)
+        counts = {p.partition_path: p.record_count for p in partitions if p.record_count is not None}
+        return plan_compaction(
+            partitions, self.policy,
+            row_count=lambda key: counts[key] if key in counts else self.s3_etl.read_partition_metadata(
+                self.storage.uri(key)).num_rows,
+            rollup_members=self.s3_etl.rollup_members,
+            levels=self.s3_etl.partition_spec.levels,
+        )
+
+    def measure(self) -> Dict[str, int]:
+        """Parquet objects and bytes under the prefix (every object is one GET for a full read)."""
+        files = total = 0
+        for page in self.storage.list(self.prefix + '/'):
+            for key, obj in page.objects.items():
+                if key.endswith('.parquet'):
+                    files += 1
+                    total += obj.size
+        return {'files': files, 'bytes': total}
+
+    def run(self, actions: Optional[List[Action]] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Run the planned actions (planning first if none are given, or if
+        swaps staged by an interrupted run had to be finished first).
+
+        Returns:
+            Report with file counts and bytes per GET before and after (estimated
+            from the plan for a dry run), action counts and failures
+        """
+        start = time.perf_counter()
+        recovered = 0 if dry_run else self.recover()
+        if recovered and actions is not None:
+            logger.info(f"Replanning: {recovered} interrupted swaps were finished first")
+            actions = None
+        before = self.measure()
+        actions = self.plan() if actions is None else actions
+        failed: List[str] = []
+        parts_written = 0
+        if not dry_run:
+            for action in actions:
+                try:
+                    if isinstance(action, SplitAction):
+                        parts_written += self._split(action)
+                    elif isinstance(action, RollupAction):
+                        self._rollup(action)
+                    else:
+                        self._purge(action)
+                except Exception as e:
+                    logger.error(f"Compaction of {action.key} failed: {type(e).__name__}: {e}")
+                    failed.append(action.key)
+            after = self.measure()
+        else:
+            after = {'files': before['files'] + self._file_delta(actions), 'bytes': before['bytes']}
+
+        splits = [a for a in actions if isinstance(a, SplitAction)]
+        rollups = [a for a in actions if isinstance(a, RollupAction)]
+        report = {
+            'dry_run': dry_run,
+            'files_before': before['files'],
+            'files_after': after['files'],
+            'bytes_before': before['bytes'],
+            'bytes_after': after['bytes'],
+            'bytes_per_get_before': before['bytes'] / before['files'] if before['files'] else 0,
+            'bytes_per_get_after': after['bytes'] / after['files'] if after['files'] else 0,
+            'splits': len(splits),
+            'parts_written': parts_written if not dry_run else sum(a.parts for a in splits),
+            'rollups': len(rollups),
+            'partitions_rolled_up': sum(len(a.partitions) for a in rollups),
+            'purges': len(actions) - len(splits) - len(rollups),
+            'recovered': recovered,
+            'failed': failed,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+        logger.info(f"Compaction {'plan' if dry_run else 'run'}: {report['files_before']:,} -> "
+                    f"{report['files_after']:,} files, {report['bytes_per_get_before'] / 1024:,.1f} -> "
+                    f"{report['bytes_per_get_after'] / 1024:,.1f} KB per GET")
+        return report
+
+    @staticmethod
+    def _file_delta(actions: List[Action]) -> int:
+        delta = 0
+        for action in actions:
+            if isinstance(action, SplitAction):
+                delta += action.parts - 1
+            elif isinstance(action, RollupAction):
+                delta += (0 if action.existing else 1) - len(action.partitions)
+            else:
+                delta -= len(action.parts)
+        return delta
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        return [key for page in self.storage.list(prefix) for key in page.objects]
+
+    def _delete_parts(self, key: str):
+        for part in self._list_keys(f"{key.rsplit('/', 1)[0]}/{PART_FILE_PREFIX}"):
+            self.s3_etl.delete_object(part)
+
+    def _publish_parts(self, key: str):
+        """Replace the published parts of partition key by its staged ones."""
+        staged = self._list_keys(staging_key(f"{key.rsplit('/', 1)[0]}/{PART_FILE_PREFIX}"))
+        # Parts of an earlier split, or some of these already published by an interrupted run
+        self._delete_parts(key)
+        self.s3_etl.publish_staged(staged)
+
+    def _split(self, action: SplitAction) -> int:
+        """Stage the parts, delete the partition file, then publish the parts."""
+        data = pl.read_parquet(io.BytesIO(self.storage.get(action.key)))
+        # Parts staged by an interrupted split would mix with the new ones
+        for part in self._list_keys(staging_key(f"{action.key.rsplit('/', 1)[0]}/{PART_FILE_PREFIX}")):
+            self.s3_etl.delete_object(part)
+        rows_per_part = math.ceil(data.height / action.parts)
+        parts = 0
+        for offset in range(0, data.height, rows_per_part):
+            part_uri = self.storage.uri(staging_key(partition_part_key(action.key, parts)))
+            self.s3_etl.upload_partition_to_s3(data.slice(offset, rows_per_part), part_uri, self.compression)
+            parts += 1
+        # Stale parts go while the partition file still hides them from locate_partition
+        self._delete_parts(action.key)
+        self.s3_etl.delete_object(action.key)
+        self._publish_parts(action.key)
+        logger.info(f"Split {action.key} ({data.height:,} rows, {action.bytes:,} bytes) into {parts} parts")
+        return parts
+
+    def _rollup(self, action: RollupAction):
+        """Stage the rollup (one PUT), delete each partition file, then publish the rollup."""
+        members: Dict[str, pl.DataFrame] = {}
+        if action.existing:
+            data = pl.read_parquet(io.BytesIO(self.storage.get(action.key)))
+            members = {name: data.slice(*span) for name, span in self.s3_etl.rollup_members(action.key).items()}
+        for key in action.partitions:
+            # A partition's own file is newer than any copy the rollup already holds
+            members[key] = pl.read_parquet(io.BytesIO(self.storage.get(key)))
+        staged = staging_key(action.key)
+        written = self.s3_etl.write_rollup(staged, dict(sorted(members.items())), self.compression)
+        for key in action.partitions:
+            self.s3_etl.delete_object(key)
+        self.s3_etl.publish_staged([staged])
+        logger.info(f"Rolled {len(action.partitions)} partitions ({action.bytes:,} bytes) up into "
+                    f"{action.key} ({len(members)} partitions, {written:,} bytes)")
+
+    def recover(self) -> int:
+        """
+        Finish or discard the swaps an interrupted run left staged.
+
+        Returns:
+            Number of staged splits and rollups dealt with
+        """
+        staged: Dict[str, List[str]] = defaultdict(list)
+        for key in self._list_keys(self.prefix + '/'):
+            if f"/{STAGING_DIR}/" in key and key.endswith('.parquet'):
+                staged[published_key(key).rsplit('/', 1)[0]].append(key)
+        for directory, keys in sorted(staged.items()):
+            key = f"{directory}/{PARTITION_FILE}"
+            if staging_key(key) in keys:
+                self._recover_rollup(key)
+            elif self.storage.exists(key):
+                for part in keys:
+                    self.s3_etl.delete_object(part)
+                logger.info(f"Discarded the parts staged for {key}: the partition file is still there")
+            else:
+                self._publish_parts(key)
+                logger.info(f"Published the parts staged for {key}")
+        return len(staged)
+
+    def _recover_rollup(self, key: str):
+        """Publish a staged rollup without the partitions that have their own file again."""
+        staged = staging_key(key)
+        members = self.s3_etl.rollup_members(staged)
+        current = {name for name in members if self.storage.exists(name)}
+        if current:
+            data = pl.read_parquet(io.BytesIO(self.storage.get(staged)))
+            self.s3_etl.write_rollup(staged, {name: data.slice(*span) for name, span in members.items()
+                                              if name not in current}, self.compression)
+        if len(current) < len(members):
+            self.s3_etl.publish_staged([staged])
+        logger.info(f"Published the rollup staged for {key} with {len(members) - len(current)} of its "
+                    f"{len(members)} partitions")
+
+    def _purge(self, action: PurgeAction):
+        for part in action.parts:
+            self.s3_etl.delete_object(part)
+        if action.rollup:
+            members = self.s3_etl.rollup_members(action.rollup)
+            if action.key in members:
+                data = pl.read_parquet(io.BytesIO(self.storage.get(action.rollup)))
+                self.s3_etl.write_rollup(action.rollup, {name: data.slice(*span) for name, span in members.items()
+                                                         if name != action.key}, self.compression)
+        logger.info(f"Purged superseded copies of {action.key}")
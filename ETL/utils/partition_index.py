@@ -0,0 +1,178 @@
+"""
+Partition Existence Index
+
+write_partition_idempotent asks whether every partition it touches already
+exists, and each question was a head_object round trip: one HEAD per partition
+per chunk, tens of thousands per run. This module lists the target prefix once
+instead (paginated list_objects_v2, one listing per top-level prefix, run in
+parallel) and keeps the keys it found, with their ETag and size, in memory.
+Existence checks are then set lookups, and uploads record the objects they
+write so the index stays current for the rest of the run.
+
+The index assumes nothing else writes under the prefix while ETL3 runs (the
+read-merge-write in write_partition_idempotent already assumes this). Listings
+go through the storage backend, so a local staging directory is indexed the
+same way as a bucket.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from storage_backend import StorageBackend, ListPage
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedObject(NamedTuple):
+    """What the index knows about one object"""
+    etag: Optional[str]
+    size: int
+
+
+class PartitionIndex:
+    """In-memory set of the objects under a prefix, built from one LIST pass."""
+
+    def __init__(self, storage: StorageBackend, prefix: str, suffix: str = '.parquet'):
+        """
+        Args:
+            storage: Storage backend to list (thread-safe, shared by the listing threads)
+            prefix: Key prefix to index (e.g. 'partitioned-data')
+            suffix: Only keys ending with this are indexed
+        """
+        self.storage = storage
+        self.prefix = prefix.rstrip('/') + '/'
+        self.suffix = suffix
+
+        self._objects: Dict[str, IndexedObject] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        # Keys found by the listing, before anything the run wrote
+        self.listed_keys: FrozenSet[str] = frozenset()
+
+        self.list_requests = 0
+        self.list_seconds = 0.0
+        self.objects_listed = 0
+        self.lookups = 0
+        self.hits = 0
+        self.recorded = 0
+
+    def covers(self, key: str) -> bool:
+        """Whether key lies under the indexed prefix (and can be answered locally)."""
+        return self.loaded and key.startswith(self.prefix)
+
+    def load(self, workers: int = 16) -> 'PartitionIndex':
+        """
+        List every object under the prefix.
+
+        The prefix is split on '/' into its top-level prefixes (payer_slug=...),
+        going one level deeper while there are fewer prefixes than workers, and
+        each one is paginated on its own thread.
+        """
+        started = time.perf_counter()
+        objects: Dict[str, IndexedObject] = {}
+
+        prefixes = [self.prefix]
+        for _ in range(2):
+            if len(prefixes) >= workers:
+                break
+            next_level = []
+            for prefix in prefixes:
+                children, direct = self._list_level(prefix)
+                objects.update(direct)
+                next_level.extend(children)
+            prefixes = next_level
+
+        if prefixes:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(prefixes))),
+                                    thread_name_prefix="list") as executor:
+                for listed in executor.map(self._list_all, prefixes):
+                    objects.update(listed)
+
+        with self._lock:
+            self.listed_keys = frozenset(objects)
+            # Uploads recorded while the listing ran are newer than what it saw
+            objects.update(self._objects)
+            self._objects = objects
+            self.objects_listed = len(objects)
+            self.loaded = True
+        self.list_seconds = time.perf_counter() - started
+
+        logger.info(f"Indexed {len(objects):,} objects under {self.storage.uri(self.prefix)} "
+                    f"with {self.list_requests:,} LIST requests in {self.list_seconds:.1f}s")
+        return self
+
+    def _list_level(self, prefix: str) -> Tuple[List[str], Dict[str, IndexedObject]]:
+        """One delimited listing: the child prefixes, and the objects directly under prefix."""
+        children: List[str] = []
+        direct: Dict[str, IndexedObject] = {}
+        for page in self.storage.list(prefix, delimiter='/'):
+            self._count_request()
+            children.extend(page.prefixes)
+            direct.update(self._page_objects(page))
+        return children, direct
+
+    def _list_all(self, prefix: str) -> Dict[str, IndexedObject]:
+        """Every object under prefix (runs on a listing thread)."""
+        listed: Dict[str, IndexedObject] = {}
+        for page in self.storage.list(prefix):
+            self._count_request()
+            listed.update(self._page_objects(page))
+        return listed
+
+    def _page_objects(self, page: ListPage) -> Dict[str, IndexedObject]:
+        return {
+            key: IndexedObject(obj.etag, obj.size)
+            for key, obj in page.objects.items()
+            if key.endswith(self.suffix)
+        }
+
+    def _count_request(self):
+        with self._lock:
+            self.list_requests += 1
+
+    def contains(self, key: str) -> bool:
+        """Whether key exists; each call stands in for one HEAD request."""
+        with self._lock:
+            self.lookups += 1
+            found = key in self._objects
+            if found:
+                self.hits += 1
+        return found
+
+    def get(self, key: str) -> Optional[IndexedObject]:
+        with self._lock:
+            return self._objects.get(key)
+
+    def record(self, key: str, etag: Optional[str], size: int):
+        """Note an object written during the run (safe to call from upload threads)."""
+        if not key.endswith(self.suffix):
+            return
+        with self._lock:
+            self._objects[key] = IndexedObject(etag, size)
+            self.recorded += 1
+
+    def discard(self, key: str):
+        """Forget an object deleted during the run."""
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._objects)
+
+    def stats(self) -> Dict[str, float]:
+        """LIST cost and the HEAD requests it replaced."""
+        with self._lock:
+            return {
+                'objects_listed': self.objects_listed,
+                'objects_indexed': len(self._objects),
+                'list_requests': self.list_requests,
+                'list_seconds': round(self.list_seconds, 2),
+                'uploads_recorded': self.recorded,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'heads_avoided': self.lookups,
+            }
@@ -0,0 +1,183 @@
+"""
+Partition Manifests
+
+The partition inventory only lists objects, so it guessed each partition's
+row count from its file size, and the webapp opened whole partitions just to
+learn which codes and rate ranges they hold. S3PartitionedETL now writes a
+small JSON sidecar, _manifest.json, next to every fact_rate_enriched.parquet
+it writes (and rewrites it with every merge), summarizing the partition:
+
+- rows, and distinct NPIs (of the nested provider members in compact mode)
+- the sorted distinct codes
+- negotiated_rate min, p10, p25, p50, p75, p90 and max
+- the fact_uid range (fact_uids are md5 digests, so min/max is a hash range)
+  and a content hash: the wrapping sum of the rows' Polars row hashes, which
+  does not depend on row order (the Polars version is recorded with it, since
+  row hashes are only stable within one version)
+- the size of the partition file it describes, so a reader can tell a
+  manifest left behind by a file written without one
+
+from_rows summarizes rows in memory; from_file summarizes a Parquet file with
+one lazy aggregation and hashes it a row group at a time, so an already
+encoded partition (a staged file) is never loaded whole.
+
+A manifest describes the partition, not a file: compaction moves a
+partition's rows into parts or a rollup without changing them, so the
+manifest stays next to where the partition's own file was and stays valid.
+"""
+
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from provider_compaction import PROVIDERS_COLUMN
+
+MANIFEST_FILE = "_manifest.json"
+MANIFEST_VERSION = 1
+
+RATE_COLUMN = "negotiated_rate"
+RATE_PERCENTILES = {'p10': 0.1, 'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p90': 0.9}
+# Seed of the content hash (fixed, so equal rows hash equally across runs)
+CONTENT_SEED = 0x6D616E69
+
+
+def manifest_key(key: str) -> str:
+    """Key of the manifest of the partition whose file is key."""
+    return f"{key.rsplit('/', 1)[0]}/{MANIFEST_FILE}"
+
+
+def _row_hash_sum(df: pl.DataFrame) -> int:
+    """Wrapping sum of the rows' hashes (columns compared by name)."""
+    columns = sorted(df.columns)
+    # Categorical codes depend on the string cache; hash the strings
+    data = df.select([pl.col(name).cast(pl.String) if df.schema[name] in (pl.Categorical, pl.Enum) else pl.col(name)
+                      for name in columns])
+    return int(data.hash_rows(seed=CONTENT_SEED).to_numpy().sum(dtype=np.uint64))
+
+
+def content_hash(df: pl.DataFrame) -> str:
+    """Order-independent hash of a partition's rows (columns compared by name)."""
+    return f"{_row_hash_sum(df):016x}"
+
+
+def file_content_hash(path: Union[str, Path]) -> str:
+    """content_hash of a Parquet file's rows, one row group at a time (the sum wraps, so it adds up per group)."""
+    reader = pq.ParquetFile(path)
+    total = 0
+    for group in range(reader.num_row_groups):
+        total = (total + _row_hash_sum(pl.from_arrow(reader.read_row_group(group)))) % 2 ** 64
+    return f"{total:016x}"
+
+
+def _summary(schema: pl.Schema) -> List[pl.Expr]:
+    """Aggregations of a manifest's counts, codes, rates and fact_uid range over rows of schema."""
+    exprs = [pl.len().alias('rows')]
+    if PROVIDERS_COLUMN in schema:
+        exprs.append(pl.col(PROVIDERS_COLUMN).explode().struct.field('npi').drop_nulls().n_unique()
+                     .alias('distinct_npis'))
+    elif 'npi' in schema:
+        exprs.append(pl.col('npi').drop_nulls().n_unique().alias('distinct_npis'))
+    if 'code' in schema:
+        exprs.append(pl.col('code').cast(pl.String).drop_nulls().unique().sort().implode().alias('codes'))
+    if RATE_COLUMN in schema:
+        rate = pl.col(RATE_COLUMN).cast(pl.Float64)
+        exprs += [rate.min().alias('min'),
+                  *[rate.quantile(q, interpolation='nearest').alias(name) for name, q in RATE_PERCENTILES.items()],
+                  rate.max().alias('max')]
+    if 'fact_uid' in schema:
+        uid = pl.col('fact_uid').cast(pl.String)
+        exprs += [uid.min().alias('fact_uid_min'), uid.max().alias('fact_uid_max')]
+    return exprs
+
+
+@dataclass
+class PartitionManifest:
+    """Summary of one partition's rows"""
+    partition: str
+    rows: int
+    distinct_npis: Optional[int]
+    codes: List[str]
+    negotiated_rate: Dict[str, Optional[float]]
+    fact_uid_min: Optional[str]
+    fact_uid_max: Optional[str]
+    content_hash: str
+    file_size: Optional[int] = None
+    hash_version: str = field(default_factory=lambda: f"polars {pl.__version__}")
+    written_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    version: int = MANIFEST_VERSION
+
+    @classmethod
+    def from_rows(cls, df: pl.DataFrame, partition: str, file_size: Optional[int] = None) -> 'PartitionManifest':
+        """
+        Summarize a partition's rows.
+
+        Args:
+            df: Every row of the partition
+            partition: Key of the partition's file
+            file_size: Size of the partition file written from df
+        """
+        summary = df.select(_summary(df.schema)).row(0, named=True)
+        return cls._from_summary(summary, partition, content_hash(df), file_size)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], partition: str,
+                  file_size: Optional[int] = None) -> 'PartitionManifest':
+        """
+        Summarize a partition's Parquet file without loading it: one lazy
+        aggregation over the columns the manifest needs, and the content hash
+        a row group at a time. Equal to from_rows of the file's rows.
+
+        Args:
+            path: Local Parquet file holding every row of the partition
+            partition: Key the file is written to
+            file_size: Size of the file
+        """
+        data = pl.scan_parquet(path)
+        summary = data.select(_summary(data.collect_schema())).collect(engine='streaming').row(0, named=True)
+        return cls._from_summary(summary, partition, file_content_hash(path), file_size)
+
+    @classmethod
+    def _from_summary(cls, summary: Dict[str, Any], partition: str, row_hash: str,
+                      file_size: Optional[int]) -> 'PartitionManifest':
+        rates: Dict[str, Optional[float]] = dict.fromkeys(['min', *RATE_PERCENTILES, 'max'])
+        if summary['rows'] and 'min' in summary:
+            rates = {name: None if summary[name] is None else float(summary[name]) for name in rates}
+        return cls(
+            partition=partition,
+            rows=summary['rows'],
+            distinct_npis=summary.get('distinct_npis'),
+            codes=summary.get('codes') or [],
+            negotiated_rate=rates,
+            fact_uid_min=summary.get('fact_uid_min'),
+            fact_uid_max=summary.get('fact_uid_max'),
+            content_hash=row_hash,
+            file_size=file_size,
+        )
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self), separators=(',', ':')).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> 'PartitionManifest':
+        """
+        Parse a manifest (fields added by later versions are ignored).
+
+        Raises:
+            ValueError: If data is not a manifest
+        """
+        try:
+            fields = json.loads(data)
+            known = {name: fields[name] for name in cls.__dataclass_fields__ if name in fields}
+            return cls(**known)
+        except (TypeError, KeyError, json.JSONDecodeError) as e:
+            raise ValueError(f"Not a partition manifest: {e}") from e
+
+    def describes(self, file_size: int) -> bool:
+        """Whether this manifest was written with a partition file of file_size bytes."""
+        return self.file_size is None or self.file_size == file_size
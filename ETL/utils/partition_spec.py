@@ -0,0 +1,338 @@
+"""
+Partition Specs
+
+Every partition path used to name all seven business levels (payer, state,
+billing class, procedure set and class, taxonomy, statistical area), then
+year and month. Taxonomy codes and statistical areas multiply into a huge
+number of tiny partitions per payer and state, which slows ETL3 uploads, S3
+listing and Athena planning alike. A PartitionSpec says which levels a
+partition path has and how each is derived from the enriched rows:
+
+- 'state': the column's value, as before
+- 'bucket(16, primary_taxonomy_code)': a stable hash bucket of the value,
+  00 to 15 (directory primary_taxonomy_code_bucket=07), so a high-cardinality
+  level fans out into a fixed number of directories; the same value always
+  lands in the same bucket, in every run and process (missing values,
+  __NULL__, share one)
+- 'truncate(3, stat_area_name)': the first 3 characters of the value
+  (directory stat_area_name_trunc=Atl)
+
+Levels are listed outermost first in partitioning.partition_columns; year
+and month always close the path. The partition keys S3PartitionedETL writes,
+the inventory's path parser, rollup keys and the Athena table's partition
+columns and projections are all derived from the one spec. The default spec
+is the seven identity levels and gives the same keys as before.
+
+plan_partition_spec suggests a spec from a sample of enriched rows: level by
+level it keeps the column, buckets it or drops it, whichever leaves most
+files within a target size range.
+"""
+
+import re
+import math
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Business dimensions of the default partition path, outermost first (year and month follow)
+PARTITION_LEVELS = ['payer_slug', 'state', 'billing_class', 'procedure_set', 'procedure_class',
+                    'primary_taxonomy_code', 'stat_area_name']
+TIME_LEVELS = ('year', 'month')
+
+# Partition value of missing keys (see extract_partition_keys in ETL_3.py)
+NULL_VALUE = '__NULL__'
+
+_TRANSFORM_PATTERN = re.compile(r'^\s*(\w+)\s*\(\s*(\d+)\s*,\s*(\w+)\s*\)\s*$')
+_NAME_SUFFIX = {'bucket': 'bucket', 'truncate': 'trunc'}
+
+# Projections Athena cannot enumerate from the spec alone
+KNOWN_VALUES = {
+    'payer_slug': ['unitedhealthcare-of-georgia-inc', 'anthem-blue-cross-blue-shield'],
+    'state': ['GA', 'FL', 'CA', 'TX', 'NY'],
+    'billing_class': ['professional', 'institutional'],
+}
+YEAR_RANGE = '2020,2030'
+
+
+class PartitionField(NamedTuple):
+    """One level of a partition path"""
+    source: str
+    transform: str = 'identity'
+    width: int = 0      # Buckets, or characters kept by truncate
+
+    @classmethod
+    def parse(cls, entry: str) -> 'PartitionField':
+        """
+        A level from its config form: 'state', 'bucket(16, state)' or 'truncate(3, state)'.
+
+        Raises:
+            ValueError: For an unknown transform or a malformed entry
+        """
+        entry = str(entry).strip()
+        if re.fullmatch(r'\w+', entry):
+            return cls(entry)
+        match = _TRANSFORM_PATTERN.match(entry)
+        if not match or match.group(1) not in _NAME_SUFFIX:
+            raise ValueError(f"Bad partition level {entry!r} (expected a column, 'bucket(N, column)' "
+                             f"or 'truncate(N, column)')")
+        transform, width, source = match.group(1), int(match.group(2)), match.group(3)
+        if width < (2 if transform == 'bucket' else 1):
+            raise ValueError(f"Bad partition level {entry!r}: {transform} needs a width of at least "
+                             f"{2 if transform == 'bucket' else 1}")
+        return cls(source, transform, width)
+
+    def __str__(self) -> str:
+        return self.source if self.transform == 'identity' else f"{self.transform}({self.width}, {self.source})"
+
+    @property
+    def name(self) -> str:
+        """Partition column (and path level) name."""
+        return self.source if self.transform == 'identity' else f"{self.source}_{_NAME_SUFFIX[self.transform]}"
+
+    @property
+    def digits(self) -> int:
+        """Digits of a bucket label (zero-padded, so labels sort in bucket order)."""
+        return len(str(self.width - 1))
+
+    def apply(self, value: Any) -> Any:
+        """The level's value for one source value."""
+        if self.transform == 'identity':
+            return value
+        if value is None or value == NULL_VALUE:
+            # Missing values keep their marker when truncated and share a bucket when hashed
+            if self.transform == 'truncate':
+                return NULL_VALUE
+            value = NULL_VALUE
+        if self.transform == 'truncate':
+            return str(value)[:self.width]
+        digest = hashlib.md5(str(value).encode('utf-8')).digest()
+        return str(int.from_bytes(digest[:8], 'big') % self.width).zfill(self.digits)
+
+    def expr(self, schema: pl.Schema) -> pl.Expr:
+        """Expression computing the level's column from the source column."""
+        if self.transform == 'identity':
+            return pl.col(self.source)
+        # Categorical and numeric sources are transformed as strings
+        source = pl.col(self.source)
+        if schema.get(self.source) != pl.String:
+            source = source.cast(pl.String)
+        if self.transform == 'truncate':
+            return (pl.when(source.is_null() | (source == NULL_VALUE)).then(pl.lit(NULL_VALUE))
+                    .otherwise(source.str.slice(0, self.width)).alias(self.name))
+        return (source.fill_null(NULL_VALUE)
+                .map_batches(self._buckets, return_dtype=pl.String, is_elementwise=True).alias(self.name))
+
+    def _buckets(self, values: pl.Series) -> pl.Series:
+        # Hash each distinct value once
+        distinct = values.unique()
+        labels = pl.Series([self.apply(value) for value in distinct.to_list()], dtype=pl.String)
+        return values.replace_strict(distinct, labels, return_dtype=pl.String)
+
+
+class PartitionSpec(NamedTuple):
+    """Business levels of a partition path, outermost first (year and month follow)"""
+    fields: Tuple[PartitionField, ...]
+
+    @classmethod
+    def parse(cls, entries: Sequence[Union[str, PartitionField]]) -> 'PartitionSpec':
+        """
+        A spec from partitioning.partition_columns (year and month entries are
+        optional: they always close the path).
+
+        Raises:
+            ValueError: For a malformed level, a repeated one or no business level
+        """
+        fields = tuple(entry if isinstance(entry, PartitionField) else PartitionField.parse(entry)
+                       for entry in entries if str(entry).strip() not in TIME_LEVELS)
+        if not fields:
+            raise ValueError("A partition spec needs at least one level besides year and month")
+        names = [f.name for f in fields]
+        repeated = sorted({name for name in names if names.count(name) > 1 or name in TIME_LEVELS})
+        if repeated:
+            raise ValueError(f"Partition levels repeated: {repeated}")
+        return cls(fields)
+
+    def __str__(self) -> str:
+        return ", ".join(str(f) for f in self.fields)
+
+    @property
+    def entries(self) -> List[str]:
+        """Config form of the spec (partitioning.partition_columns)."""
+        return [str(f) for f in self.fields] + list(TIME_LEVELS)
+
+    @property
+    def levels(self) -> List[str]:
+        """Business level names, outermost first."""
+        return [f.name for f in self.fields]
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns that define a partition (business levels, then year and month)."""
+        return self.levels + list(TIME_LEVELS)
+
+    def with_partition_columns(self, frame: Union[pl.DataFrame, pl.LazyFrame]) -> Union[pl.DataFrame, pl.LazyFrame]:
+        """frame with the spec's bucket and truncate columns added (eager or lazy)."""
+        derived = [f for f in self.fields if f.transform != 'identity']
+        if not derived:
+            return frame
+        schema = frame.collect_schema() if isinstance(frame, pl.LazyFrame) else frame.schema
+        return frame.with_columns([f.expr(schema) for f in derived])
+
+    def path(self, partition_values: Dict[str, Any], prefix: str = 'partitioned-data') -> str:
+        """
+        Directory of a partition (prefix/level=value/.../year=YYYY/month=MM).
+
+        partition_values holds the level columns; a bucket or truncate level
+        missing from it is computed from its source column.
+        """
+        path_parts = [prefix]
+
+        # Business dimensions
+        for f in self.fields:
+            if f.name in partition_values or f.transform == 'identity':
+                value = partition_values.get(f.name)
+            else:
+                value = f.apply(partition_values.get(f.source))
+            if value is None:
+                value = "null"
+            # S3-safe encoding
+            value = str(value).replace("/", "_").replace("\\", "_").replace(" ", "_")
+            path_parts.append(f"{f.name}={value}")
+
+        # Time dimensions
+        year = partition_values.get('year', datetime.now().year)
+        month = partition_values.get('month', datetime.now().month)
+
+        # Ensure month is properly formatted as string with zero padding
+        if isinstance(month, str):
+            month_str = month.zfill(2)
+        else:
+            month_str = f"{month:02d}"
+
+        path_parts.extend([f"year={year}", f"month={month_str}"])
+        return "/".join(path_parts)
+
+    def path_regex(self) -> str:
+        """
+        Regex of a partition directory, one named group per level. Levels
+        below the first are optional: compaction rollups leave them out.
+        """
+        levels = [rf'{re.escape(self.levels[0])}=(?P<{self.levels[0]}>[^/]+)/']
+        levels += [rf'(?:{re.escape(name)}=(?P<{name}>[^/]+)/)?' for name in self.levels[1:]]
+        return ''.join(levels) + r'year=(?P<year>\d{4})/month=(?P<month>\d{2})/'
+
+    def athena_partition_columns(self) -> List[Tuple[str, str]]:
+        """(name, Athena type) of the table's partition columns."""
+        return ([(f.name, 'int' if f.transform == 'bucket' else 'string') for f in self.fields]
+                + [('year', 'int'), ('month', 'int')])
+
+    def athena_projection(self, overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Partition projection of every partition column: known enums, bucket
+        and time ranges, and 'injected' (values taken from the query) for the
+        rest. overrides (athena.projection in etl3_config.yaml) replace the
+        settings of the columns they name.
+        """
+        projection: Dict[str, Dict[str, str]] = {}
+        for f in self.fields:
+            if f.transform == 'bucket':
+                projection[f.name] = {'type': 'integer', 'range': f"0,{f.width - 1}", 'digits': str(f.digits)}
+            elif f.transform == 'identity' and f.name in KNOWN_VALUES:
+                projection[f.name] = {'type': 'enum', 'values': ",".join(KNOWN_VALUES[f.name])}
+            else:
+                projection[f.name] = {'type': 'injected'}
+        projection['year'] = {'type': 'integer', 'range': YEAR_RANGE}
+        projection['month'] = {'type': 'integer', 'range': '1,12', 'digits': '2'}
+
+        for name, settings in (overrides or {}).items():
+            if name in projection:
+                # Enum values and ranges may be given as YAML lists
+                projection[name] = {**projection[name], **{
+                    key: ",".join(str(v) for v in value) if isinstance(value, (list, tuple)) else str(value)
+                    for key, value in settings.items()}}
+        return projection
+
+    def athena_properties(self, location: str,
+                          overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, str]:
+        """TBLPROPERTIES of the partition projection and the storage location template."""
+        properties = {'projection.enabled': 'true'}
+        for name, settings in self.athena_projection(overrides).items():
+            properties.update({f"projection.{name}.{key}": value for key, value in settings.items()})
+        template = "/".join(f"{name}=${{{name}}}" for name in self.columns)
+        properties['storage.location.template'] = f"{location.rstrip('/')}/{template}/"
+        return properties
+
+
+DEFAULT_SPEC = PartitionSpec(tuple(PartitionField(level) for level in PARTITION_LEVELS))
+
+
+def partition_file_sizes(sample: pl.DataFrame, spec: PartitionSpec, scale: float, bytes_per_row: float) -> pl.Series:
+    """Estimated bytes of each partition file the spec makes of the sampled rows."""
+    columns = spec.levels + [level for level in TIME_LEVELS if level in sample.columns]
+    return spec.with_partition_columns(sample).group_by(columns).len()['len'].cast(pl.Float64) * scale * bytes_per_row
+
+
+def _score(sizes: pl.Series, min_file_bytes: int, max_file_bytes: int) -> Tuple[float, float]:
+    """(share of files within range, minus their mean log distance from it)"""
+    within = ((sizes >= min_file_bytes) & (sizes <= max_file_bytes)).mean()
+    logs = sizes.log()
+    distance = ((math.log(max(1, min_file_bytes)) - logs).clip(lower_bound=0)
+                + (logs - math.log(max_file_bytes)).clip(lower_bound=0)).mean()
+    return within, -distance
+
+
+def plan_partition_spec(sample: pl.DataFrame, scale: float, bytes_per_row: float,
+                        min_file_bytes: int, max_file_bytes: int,
+                        levels: Sequence[str] = PARTITION_LEVELS,
+                        bucket_counts: Sequence[int] = (4, 8, 16, 32, 64)) -> Tuple[PartitionSpec, Dict[str, Any]]:
+    """
+    Suggest a spec whose files mostly fall within [min_file_bytes, max_file_bytes].
+
+    Greedy, outermost level first: the first level is kept as is; every
+    further level is kept, bucketed into one of bucket_counts buckets (fewer
+    than its distinct values) or dropped, whichever scores best with the
+    levels below it dropped. A score is the share of files within range, ties
+    broken by how far the others fall outside it (in log size); remaining ties
+    go to the finer option.
+
+    Args:
+        sample: Enriched rows with partition key columns (and year, month)
+        scale: Fact table rows per sample row (file sizes are extrapolated)
+        bytes_per_row: Compressed bytes per row of a partition file
+        min_file_bytes, max_file_bytes: Target file size range
+        levels: Candidate levels, outermost first
+        bucket_counts: Bucket counts to try for each level
+
+    Returns:
+        The spec, and per level the options tried with their scores
+    """
+    if sample.is_empty():
+        raise ValueError("Cannot plan partitions from an empty sample")
+
+    chosen = [PartitionField(levels[0])]
+    report: Dict[str, Any] = {}
+    for level in levels[1:]:
+        distinct = sample[level].n_unique()
+        options: List[Optional[PartitionField]] = [PartitionField(level)]
+        options += [PartitionField(level, 'bucket', n) for n in bucket_counts if n < distinct]
+        options.append(None)
+
+        scores = []
+        for option in options:
+            spec = PartitionSpec(tuple(chosen + ([option] if option else [])))
+            scores.append(_score(partition_file_sizes(sample, spec, scale, bytes_per_row),
+                                 min_file_bytes, max_file_bytes))
+        # max() keeps the first of equal scores, and options run finest first
+        best = max(range(len(options)), key=lambda i: scores[i])
+        report[level] = {str(option or 'drop'): scores[i][0] for i, option in enumerate(options)}
+        if options[best]:
+            chosen.append(options[best])
+        logger.info(f"Partition level {level}: {options[best] or 'dropped'} "
+                    f"({scores[best][0]:.0%} of files within range)")
+    return PartitionSpec(tuple(chosen)), report
+
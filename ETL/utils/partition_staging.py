@@ -0,0 +1,204 @@
+"""
+Streaming Partition Staging
+
+The chunked ETL3 engine pulls the fact table through Python a chunk at a
+time: read, enrich eagerly, split into partitions, write every slice. The
+streaming engine instead expresses the whole job as one Polars LazyFrame
+plan (scan_parquet of the fact table, joined with the dimension bundle,
+partition keys extracted) and lets the streaming engine run it:
+
+- stage_partitions sinks the plan with one Parquet file per partition into a
+  local staging directory. Each file is named by its partition's S3 key
+  (partition_key), so the directory mirrors the S3 prefix and staged files
+  map one to one onto objects. Rows are then deduplicated on fact_uid
+  within a partition, last wins, as the partition accumulator does, so both
+  engines write the same partition contents. The dedup runs per staged
+  file rather than in the plan: a plan-wide unique() holds every key of the
+  whole job in memory, while a file only needs its fact_uid column read to
+  show it has no duplicates. Files that do are rewritten by streaming them
+  through a filter on the row numbers to keep, picked from that column.
+  With a Parquet layout other than the default (parquet_layout.py), every
+  staged file is rewritten in that layout, as S3PartitionedETL writes them:
+  the streaming engine sorts it (scan_parquet(...).sort(...).sink_parquet(...),
+  the same pass as the dedup filter), then ParquetLayout.rewrite copies it
+  one row group at a time, adding sorting columns and bloom filters.
+- sync_staged_partitions then uploads the staged files in bulk. A partition
+  that already exists in S3 is read back and passed to the merge writer
+  (write_partition_idempotent) instead, so reruns merge exactly as the
+  chunked engine's writes do.
+
+Only the streaming engine's bounded buffers and the open partition files'
+row groups are in memory while staging, however many rows the plan fans out
+to, plus the fact_uid column of one staged file at a time while it is
+checked for duplicates, and, with a sorted layout, what the streaming
+engine's sort of one staged file needs.
+"""
+
+import os
+import time
+import shutil
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from s3_etl_utils import partition_key
+from partition_spec import DEFAULT_SPEC, PartitionSpec
+from parquet_layout import DEFAULT_LAYOUT, ParquetLayout
+
+logger = logging.getLogger(__name__)
+
+DEDUP_KEY = "fact_uid"
+
+
+class StagedPartition(NamedTuple):
+    """One staged partition file"""
+    key: str
+    path: Path
+    rows: int
+    bytes: int
+
+
+def stage_partitions(plan: pl.LazyFrame, staging_dir: Path, partition_columns: Sequence[str], prefix: str,
+                     compression: str = "zstd", row_group_size: Optional[int] = None,
+                     layout: ParquetLayout = DEFAULT_LAYOUT,
+                     spec: PartitionSpec = DEFAULT_SPEC) -> List[StagedPartition]:
+    """
+    Run an enrichment plan on the streaming engine, one file per partition.
+
+    Args:
+        plan: Enriched rows with partition key columns
+        staging_dir: Local directory for the files (cleared first)
+        partition_columns: Columns that define a partition
+        prefix: S3 prefix the staged keys are relative to
+        compression: Parquet compression of the staged files
+        row_group_size: Parquet row group size of the staged files
+        layout: Layout the staged files are rewritten in (row order, row
+            groups, bloom filters); the default layout leaves them as sunk
+        spec: Partition spec of the keys; its bucket and truncate columns are
+            added to the plan (partition_columns names them, e.g. spec.columns)
+
+    Returns:
+        Staged partitions, sorted by key
+
+    Raises:
+        ValueError: If two partitions map to the same S3 key
+    """
+    staging_dir = Path(staging_dir)
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+
+    plan = spec.with_partition_columns(plan)
+    partition_columns = list(partition_columns)
+    dedup = DEDUP_KEY in plan.collect_schema().names()
+    values_by_key: Dict[str, Dict[str, Any]] = {}
+
+    def file_path(args) -> str:
+        values = args.partition_keys.row(0, named=True)
+        key = partition_key(values, prefix, spec)
+        # partition_key makes values S3-safe, so distinct values can collide
+        first = values_by_key.setdefault(key, values)
+        if first != values:
+            raise ValueError(f"Partitions {first} and {values} both map to {key}")
+        return key
+
+    sinked = []
+    plan.sink_parquet(
+        pl.PartitionBy(
+            staging_dir,
+            key=partition_columns,
+            file_path_provider=file_path,
+            include_key=True,
+            approximate_bytes_per_file=None,
+        ),
+        compression=compression,
+        row_group_size=row_group_size,
+        mkdir=True,
+        engine="streaming",
+        sinked_paths_callback=lambda args: sinked.extend(args.paths),
+    )
+
+    staged = []
+    duplicates = 0
+    for sinked_path in sinked:
+        path = Path(sinked_path.path)
+        key = path.resolve().relative_to(staging_dir.resolve()).as_posix()
+        partition = StagedPartition(key, path, sinked_path.num_rows, sinked_path.num_bytes)
+        partition = _finish_staged(partition, dedup, compression, row_group_size, layout)
+        duplicates += sinked_path.num_rows - partition.rows
+        staged.append(partition)
+    staged.sort()
+
+    logger.info(f"Staged {len(staged):,} partitions ({sum(p.rows for p in staged):,} rows, "
+                f"{sum(p.bytes for p in staged) / 1e6:.1f}MB, {duplicates:,} duplicates removed) in {staging_dir}")
+    return staged
+
+
+def _finish_staged(partition: StagedPartition, dedup: bool, compression: str,
+                   row_group_size: Optional[int], layout: ParquetLayout) -> StagedPartition:
+    """Rewrite a staged file without duplicate fact_uids (last wins) and in the layout, streamed, if either changes it"""
+    relayout = layout != DEFAULT_LAYOUT
+    keys = pl.read_parquet(partition.path, columns=[DEDUP_KEY])[DEDUP_KEY] if dedup else None
+    duplicated = keys is not None and keys.is_duplicated().any()
+    if not duplicated and not relayout:
+        return partition
+    rows = pl.scan_parquet(partition.path, row_index_name="_row" if duplicated else None)
+    if duplicated:
+        # Only the fact_uid column and the kept row numbers are in memory; the rows stream through
+        keep = keys.is_last_distinct().arg_true()
+        rows = rows.filter(pl.col("_row").is_in(keep.implode())).drop("_row")
+    rewritten = partition.path.with_name(f".{partition.path.name}.tmp")
+    layout.order(rows).sink_parquet(rewritten, compression=compression,
+                                    row_group_size=layout.row_group_size or row_group_size, engine="streaming")
+    if relayout:
+        layout.rewrite(rewritten, partition.path, compression, row_group_size=row_group_size)
+        rewritten.unlink()
+    else:
+        os.replace(rewritten, partition.path)
+    return partition._replace(rows=pq.read_metadata(partition.path).num_rows, bytes=partition.path.stat().st_size)
+
+
+def sync_staged_partitions(staged: Sequence[StagedPartition], s3_etl,
+                           merge_writer: Callable[[pl.DataFrame, str], Any]) -> Dict[str, Any]:
+    """
+    Upload staged partitions to S3.
+
+    Args:
+        staged: Output of stage_partitions
+        s3_etl: S3PartitionedETL for the target bucket
+        merge_writer: Called as merge_writer(partition_data, s3_path) for
+            partitions that already exist in S3
+
+    Returns:
+        Counts of uploaded, merged and failed partitions, bytes and seconds
+    """
+    start = time.perf_counter()
+    uploaded = merged = uploaded_bytes = 0
+    failed: List[str] = []
+
+    for partition in staged:
+        s3_path = s3_etl.storage.uri(partition.key)
+        try:
+            if s3_etl.partition_exists(s3_path):
+                merge_writer(pl.read_parquet(partition.path), s3_path)
+                merged += 1
+            else:
+                s3_etl.submit_file_upload(partition.path, s3_path)
+                uploaded += 1
+                uploaded_bytes += partition.bytes
+        except Exception as e:
+            logger.error(f"Failed to sync staged partition {s3_path}: {e}")
+            failed.append(s3_path)
+
+    stats = {
+        'uploaded': uploaded,
+        'merged': merged,
+        'failed': failed,
+        'uploaded_mb': round(uploaded_bytes / (1024 * 1024), 1),
+        'sync_seconds': round(time.perf_counter() - start, 2),
+    }
+    logger.info(f"Synced staged partitions: {uploaded:,} uploaded, {merged:,} merged, {len(failed):,} failed")
+    return stats
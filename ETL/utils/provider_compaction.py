@@ -0,0 +1,126 @@
+"""
+Compact Provider Enrichment
+
+ETL3's expanded enrichment joins every fact row with every NPI of its provider
+group, every TIN of the group and every LOCATION address of each NPI, so one
+fact becomes NPIs x TINs x addresses rows. A 1,000-row chunk can turn into
+hundreds of thousands of rows that repeat the same rate, and since they share
+a fact_uid the fact_uid-keyed merges collapse them again anyway.
+
+In compact mode each fact stays one row:
+
+- the group's member combinations are nested in a 'providers' column (a list
+  of structs with the same fields the expanded rows carry)
+- the top-level member columns (npi, primary_taxonomy_code, state_geo,
+  stat_area_name, ...) hold a deterministic representative member, so the
+  partition keys come out of extract_partition_keys unchanged
+- 'provider_fanout' records how many expanded rows the fact stands for
+
+The representative is the member row with the most partition attributes
+present (taxonomy, LOCATION state, CBSA), ties broken by the smallest values
+of the member columns in order (NPI first).
+
+FanoutTracker is the per-chunk diagnostic for either mode: enriched rows (or
+the rows they stand for) per fact row.
+"""
+
+import logging
+from typing import Dict, Optional, Sequence
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS_COLUMN = "providers"
+FANOUT_COLUMN = "provider_fanout"
+
+# Member columns that feed partition keys, preferred when picking the representative
+REPRESENTATIVE_PREFERENCE = ("primary_taxonomy_code", "state_geo", "stat_area_name")
+
+
+def compact_members(rows: pl.DataFrame, member_columns: Sequence[str], key: str = "pg_uid") -> pl.DataFrame:
+    """
+    Collapse member rows to one row per key.
+
+    Args:
+        rows: key, any per-group columns (constant within a key) and the member columns
+            (a DataFrame, or a LazyFrame for the streaming engine)
+        member_columns: Columns that vary by member (NPI, TIN, address, ...)
+        key: Grouping column
+
+    Returns:
+        key, the per-group columns, the representative's member columns,
+        PROVIDERS_COLUMN (every member row as a struct) and FANOUT_COLUMN
+    """
+    member_columns = list(member_columns)
+    other_columns = [c for c in rows.collect_schema().names() if c != key and c not in member_columns]
+    if not member_columns:
+        return rows.unique(key, keep="first", maintain_order=True).with_columns(
+            pl.lit(1, dtype=pl.Int64).alias(FANOUT_COLUMN))
+
+    preferred = [c for c in REPRESENTATIVE_PREFERENCE if c in member_columns]
+    missing = pl.sum_horizontal([pl.col(c).is_null() for c in preferred]) if preferred else pl.lit(0)
+    ordered = (
+        rows
+        .with_columns(missing.alias("__missing"))
+        .sort([key, "__missing"] + member_columns, nulls_last=True, maintain_order=True)
+    )
+    compacted = ordered.group_by(key, maintain_order=True).agg(
+        [pl.col(c).first() for c in other_columns]
+        + [pl.col(c).first() for c in member_columns]
+        + [pl.struct(member_columns).alias(PROVIDERS_COLUMN), pl.len().cast(pl.Int64).alias(FANOUT_COLUMN)]
+    )
+    # A group no provider table knows has one all-null member: nest nothing,
+    # as for facts without a pg_uid
+    unknown = (pl.col(FANOUT_COLUMN) == 1) & pl.all_horizontal([pl.col(c).is_null() for c in member_columns])
+    return compacted.with_columns(
+        pl.when(unknown).then(None).otherwise(pl.col(PROVIDERS_COLUMN)).alias(PROVIDERS_COLUMN)
+    )
+
+
+def expanded_rows(enriched: pl.DataFrame) -> int:
+    """Rows enriched would have in expanded mode (its own height if it is expanded)."""
+    if FANOUT_COLUMN in enriched.columns:
+        return int(enriched[FANOUT_COLUMN].fill_null(1).sum())
+    return enriched.height
+
+
+class FanoutTracker:
+    """Per-chunk expansion ratio of enrichment (enriched rows per fact row)."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.fact_rows = 0
+        self.expanded_rows = 0
+        self.output_rows = 0
+        self.max_ratio = 0.0
+        self.max_ratio_chunk: Optional[int] = None
+
+    def observe(self, chunk_index: int, fact_rows: int, enriched: pl.DataFrame) -> float:
+        """Record one chunk; returns its expansion ratio and logs it."""
+        expanded = expanded_rows(enriched)
+        ratio = expanded / fact_rows if fact_rows else 0.0
+
+        self.chunks += 1
+        self.fact_rows += fact_rows
+        self.expanded_rows += expanded
+        self.output_rows += enriched.height
+        if ratio > self.max_ratio:
+            self.max_ratio = ratio
+            self.max_ratio_chunk = chunk_index
+
+        written = f", {enriched.height:,} compact rows written" if enriched.height != expanded else ""
+        logger.info(f"Chunk {chunk_index + 1} fan-out: {fact_rows:,} fact rows -> {expanded:,} "
+                    f"expanded rows ({ratio:.1f}x){written}")
+        return ratio
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'chunks': self.chunks,
+            'fact_rows': self.fact_rows,
+            'expanded_rows': self.expanded_rows,
+            'output_rows': self.output_rows,
+            'mean_ratio': round(self.expanded_rows / self.fact_rows, 2) if self.fact_rows else 0.0,
+            'max_ratio': round(self.max_ratio, 2),
+            'max_ratio_chunk': self.max_ratio_chunk + 1 if self.max_ratio_chunk is not None else None,
+        }
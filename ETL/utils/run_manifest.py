@@ -0,0 +1,232 @@
+"""
+ETL1 Run Manifest
+
+This module records the progress of an ETL1 run in a small SQLite database next
+to gold/, so a run killed part-way (OOM, spot reclaim) can resume instead of
+starting over.
+
+The manifest stores:
+- the run key: payer, state, every setting that changes chunk outputs (chunk
+  size and adaptive sizing, categorical columns, the seen-key filter) and the
+  fingerprint of each input file (size, mtime and a SHA-256 of the Parquet
+  footer)
+- every completed chunk with its temp output files and their sizes
+- every table whose temp files have been merged, with the final output size
+
+A chunk is recorded only after all of its temp files are written and fsynced,
+and each record is its own SQLite transaction, so a recorded chunk is durable.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Run states
+STATUS_PROCESSING = "processing"
+STATUS_MERGING = "merging"
+STATUS_COMPLETE = "complete"
+
+
+def parquet_fingerprint(path: Path) -> Dict[str, Any]:
+    """
+    Fingerprint a Parquet file without reading its data pages.
+
+    Returns:
+        Dict with path, size, mtime_ns and the SHA-256 of the footer
+        (file metadata plus length and magic bytes)
+    """
+    path = Path(path)
+    stat = path.stat()
+    with open(path, "rb") as f:
+        f.seek(-8, os.SEEK_END)
+        tail = f.read(8)
+        footer_len = int.from_bytes(tail[:4], "little")
+        f.seek(-(footer_len + 8), os.SEEK_END)
+        footer = f.read(footer_len + 8)
+
+    return {
+        "path": str(path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "footer_sha256": hashlib.sha256(footer).hexdigest(),
+    }
+
+
+class RunManifest:
+    """SQLite-backed progress manifest for one ETL1 data root."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS run (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    run_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    phase TEXT NOT NULL,
+                    chunk_idx INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    outputs TEXT NOT NULL,
+                    completed_at TEXT NOT NULL,
+                    PRIMARY KEY (phase, chunk_idx)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS merged_tables (
+                    table_name TEXT PRIMARY KEY,
+                    output_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    merged_at TEXT NOT NULL
+                )
+            """)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ------------------------------------------------------------------ run
+
+    def run_key(self) -> Optional[Dict[str, Any]]:
+        """Run key of the recorded run, or None if there is none."""
+        row = self.conn.execute("SELECT run_key FROM run WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def matches(self, run_key: Dict[str, Any]) -> bool:
+        """True if the recorded run has exactly this run key."""
+        return self.run_key() == json.loads(json.dumps(run_key))
+
+    @property
+    def status(self) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM run WHERE id = 1").fetchone()
+        return row[0] if row else None
+
+    def start(self, run_key: Dict[str, Any]):
+        """Forget any previous run and start recording a new one."""
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute("DELETE FROM run")
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM merged_tables")
+            self.conn.execute(
+                "INSERT INTO run (id, run_key, status, started_at, updated_at) VALUES (1, ?, ?, ?, ?)",
+                (json.dumps(run_key, sort_keys=True), STATUS_PROCESSING, now, now),
+            )
+
+    def set_status(self, status: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE run SET status = ?, updated_at = ? WHERE id = 1",
+                (status, datetime.now().isoformat()),
+            )
+
+    # --------------------------------------------------------------- chunks
+
+    def record_chunk(self, phase: str, chunk_idx: int, rows: int, outputs: List[Path]):
+        """Record a completed chunk and the temp files it wrote."""
+        files = [{"path": str(p), "size": Path(p).stat().st_size} for p in outputs]
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunks (phase, chunk_idx, rows, outputs, completed_at) VALUES (?, ?, ?, ?, ?)",
+                (phase, chunk_idx, rows, json.dumps(files), datetime.now().isoformat()),
+            )
+
+    def completed_chunks(self, phase: str) -> Dict[int, int]:
+        """Completed chunk numbers of a phase mapped to their row counts."""
+        rows = self.conn.execute("SELECT chunk_idx, rows FROM chunks WHERE phase = ?", (phase,)).fetchall()
+        return {idx: n for idx, n in rows}
+
+    def recorded_outputs(self) -> List[Path]:
+        """All temp files written by recorded chunks."""
+        paths = []
+        for (outputs,) in self.conn.execute("SELECT outputs FROM chunks"):
+            paths.extend(Path(f["path"]) for f in json.loads(outputs))
+        return paths
+
+    def drop_incomplete_chunks(self) -> int:
+        """
+        Forget chunks whose temp files are missing or changed size.
+
+        Returns:
+            Number of chunks dropped (they will be reprocessed)
+        """
+        dropped = []
+        for phase, chunk_idx, outputs in self.conn.execute("SELECT phase, chunk_idx, outputs FROM chunks").fetchall():
+            for f in json.loads(outputs):
+                path = Path(f["path"])
+                if not path.exists() or path.stat().st_size != f["size"]:
+                    dropped.append((phase, chunk_idx))
+                    break
+
+        if dropped:
+            with self.conn:
+                self.conn.executemany("DELETE FROM chunks WHERE phase = ? AND chunk_idx = ?", dropped)
+            logger.warning(f"Dropped {len(dropped)} recorded chunks with missing or changed temp files")
+        return len(dropped)
+
+    def truncate_chunks(self, phase: str) -> int:
+        """
+        Keep only the leading run of completed chunks (0, 1, 2, ...) of a phase.
+        
+        Adaptive chunk boundaries depend on every earlier chunk, so chunks
+        recorded after a gap cannot be matched to a rerun and are forgotten;
+        their temp files are then removed as unrecorded.
+        
+        Returns:
+            Number of chunks forgotten
+        """
+        completed = self.completed_chunks(phase)
+        keep = 0
+        while keep in completed:
+            keep += 1
+        with self.conn:
+            dropped = self.conn.execute(
+                "DELETE FROM chunks WHERE phase = ? AND chunk_idx >= ?", (phase, keep)
+            ).rowcount
+        if dropped:
+            logger.warning(f"Forgot {dropped} {phase} chunks recorded after chunk {keep}")
+        return dropped
+
+    # --------------------------------------------------------------- merges
+
+    def record_merged(self, table_name: str, output_path: Path):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO merged_tables (table_name, output_path, size, merged_at) VALUES (?, ?, ?, ?)",
+                (table_name, str(output_path), Path(output_path).stat().st_size, datetime.now().isoformat()),
+            )
+
+    def merged_tables(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT table_name FROM merged_tables")]
+
+    def outputs_intact(self) -> bool:
+        """True if every merged output still exists with its recorded size."""
+        rows = self.conn.execute("SELECT output_path, size FROM merged_tables").fetchall()
+        for output_path, size in rows:
+            path = Path(output_path)
+            if not path.exists() or path.stat().st_size != size:
+                return False
+        return True
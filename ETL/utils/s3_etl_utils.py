@@ -2,36 +2,152 @@
 S3 ETL Utilities for Partitioned Data Warehouse
 
 This module provides utilities for creating and managing S3-based partitioned data warehouses.
+Partition objects are read and written through a storage backend (storage_backend.py), so the
+same code can target a bucket or a local directory; AWS clients are only created when used.
 """
 
 import os
 import io
 import json
 import time
+import shutil
 import hashlib
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+import threading
+from typing import Dict, Iterator, List, Optional, Any, Sequence, Set, Tuple, Union
 from pathlib import Path
 
 import polars as pl
+import pyarrow.parquet as pq
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError
 import logging
 from tqdm import tqdm
 
+from upload_pool import UploadPool, UploadFailure
+from partition_index import PartitionIndex
+from storage_backend import S3Backend, open_storage
+from parquet_layout import DEFAULT_LAYOUT, ParquetLayout
+from partition_manifest import PartitionManifest, manifest_key
+from partition_spec import DEFAULT_SPEC, PARTITION_LEVELS, PartitionSpec
+
 logger = logging.getLogger(__name__)
 
 
+def split_partitions(df: pl.DataFrame, partition_cols: List[str]) -> Iterator[Tuple[Dict[str, Any], pl.DataFrame]]:
+    """
+    Split a DataFrame into one frame per distinct partition tuple in a single pass.
+    
+    The frame is stable-sorted on the partition columns once and each partition
+    is then a contiguous zero-copy slice, instead of one full filter per tuple.
+    Partitions come out in the same order as
+    select(partition_cols).unique().sort(partition_cols), and rows keep their
+    original order within a partition, so each slice equals the per-tuple filter.
+    
+    Args:
+        df: Data to split
+        partition_cols: Columns to partition by (nulls form their own partition)
+        
+    Yields:
+        (partition column -> value, rows of that partition)
+    """
+    if df.is_empty():
+        return
+    
+    ordered = df.sort(partition_cols, maintain_order=True)
+    runs = ordered.select(pl.struct(partition_cols).rle().alias("run")).unnest("run")
+    
+    offset = 0
+    for length, values in zip(runs["len"].to_list(), runs["value"].to_list()):
+        yield values, ordered.slice(offset, length)
+        offset += length
+
+
+PARTITION_FILE = "fact_rate_enriched.parquet"
+# Numbered files of a partition split by compaction (see partition_compaction.py)
+PART_FILE = "fact_rate_enriched.part-{:05d}.parquet"
+PART_FILE_PREFIX = "fact_rate_enriched.part-"
+# Footer key of a rollup file: JSON {partition key: [first row, rows]}
+ROLLUP_METADATA = "etl3.rollup"
+# Directory compaction writes new files to before publishing them next to it;
+# readers that list directories (Athena, Hive) skip names starting with '_'
+STAGING_DIR = "_staging"
+
+
+def partition_key(partition_values: Dict[str, Any], prefix: str = 'partitioned-data',
+                  spec: PartitionSpec = DEFAULT_SPEC) -> str:
+    """Object key of a partition's file (create_s3_path without the bucket)."""
+    return f"{spec.path(partition_values, prefix)}/{PARTITION_FILE}"
+
+
+def partition_part_key(key: str, index: int) -> str:
+    """Key of part index of a split partition (next to the partition's file)."""
+    return f"{key.rsplit('/', 1)[0]}/{PART_FILE.format(index)}"
+
+
+def staging_key(key: str) -> str:
+    """Key compaction stages the next version of key under (see partition_compaction.py)."""
+    directory, name = key.rsplit('/', 1)
+    return f"{directory}/{STAGING_DIR}/{name}"
+
+
+def published_key(key: str) -> str:
+    """Key a staged file is published as (key itself if it is not staged)."""
+    return key.replace(f"/{STAGING_DIR}/", "/", 1)
+
+
+def rollup_key(key: str, level: str, levels: Sequence[str] = PARTITION_LEVELS) -> str:
+    """
+    Key of the rollup file that holds partition key's rows once compacted to
+    level: the partition path with the business levels (of the partition
+    spec's levels) below level dropped (year and month are kept).
+    """
+    dropped = set(levels[list(levels).index(level) + 1:])
+    return "/".join(part for part in key.split('/') if part.split('=', 1)[0] not in dropped)
+
+
+# Data columns of the Athena table (partition columns are added from the partition spec)
+ATHENA_COLUMNS = [
+    ('fact_uid', 'string'), ('state', 'string'), ('year_month', 'string'), ('payer_slug', 'string'),
+    ('billing_class', 'string'), ('code_type', 'string'), ('code', 'string'), ('negotiated_type', 'string'),
+    ('negotiation_arrangement', 'string'), ('negotiated_rate', 'double'), ('expiration_date', 'string'),
+    ('provider_group_id_raw', 'bigint'), ('reporting_entity_name', 'string'), ('code_description', 'string'),
+    ('code_name', 'string'), ('procedure_set', 'string'), ('procedure_class', 'string'),
+    ('procedure_group', 'string'), ('pos_set_id', 'string'), ('pos_members', 'array<string>'),
+    ('npi', 'string'), ('first_name', 'string'), ('last_name', 'string'), ('organization_name', 'string'),
+    ('enumeration_type', 'string'), ('status', 'string'), ('primary_taxonomy_code', 'string'),
+    ('primary_taxonomy_desc', 'string'), ('primary_taxonomy_state', 'string'),
+    ('primary_taxonomy_license', 'string'), ('credential', 'string'), ('sole_proprietor', 'string'),
+    ('enumeration_date', 'string'), ('last_updated', 'string'), ('address_purpose', 'string'),
+    ('address_type', 'string'), ('address_1', 'string'), ('address_2', 'string'), ('city', 'string'),
+    ('postal_code', 'string'), ('country_code', 'string'), ('telephone_number', 'string'),
+    ('fax_number', 'string'), ('address_hash', 'string'), ('latitude', 'double'), ('longitude', 'double'),
+    ('county_name', 'string'), ('county_fips', 'string'), ('stat_area_name', 'string'),
+    ('stat_area_code', 'string'), ('matched_address', 'string'), ('benchmark_type', 'string'),
+    ('medicare_national_rate', 'double'), ('medicare_state_rate', 'double'), ('work_rvu', 'double'),
+    ('practice_expense_rvu', 'double'), ('malpractice_rvu', 'double'), ('total_rvu', 'double'),
+    ('conversion_factor', 'double'), ('opps_weight', 'double'), ('opps_si', 'string'), ('asc_pi', 'string'),
+    ('rate_to_medicare_ratio', 'double'), ('is_above_medicare', 'boolean'), ('provider_type', 'string'),
+    ('is_sole_proprietor', 'boolean'), ('is_individual_provider', 'boolean'),
+]
+# Compact enrichment nests each fact's provider members (see provider_compaction.py)
+ATHENA_PROVIDER_COLUMNS = [
+    ('providers', 'array<struct<npi:bigint,primary_taxonomy_code:string,tin_value:string,state_geo:string,'
+                  'latitude:double,longitude:double,county_name:string,county_fips:string,'
+                  'stat_area_name:string,stat_area_code:string,matched_address:string>>'),
+    ('provider_fanout', 'bigint'),
+]
+
+
 class S3Config:
     """Configuration for S3 operations."""
     
-    def __init__(self, region='us-east-1'):
+    def __init__(self, region='us-east-1', max_pool_connections=50):
         self.region = region
         self.s3_config = Config(
             region_name=region,
             retries={'max_attempts': 3, 'mode': 'adaptive'},
-            max_pool_connections=50,
+            max_pool_connections=max_pool_connections,
             s3={
                 'addressing_style': 'virtual',
                 'payload_signing_enabled': False
@@ -42,204 +158,395 @@ class S3Config:
 class S3PartitionedETL:
     """S3-based partitioned ETL operations."""
     
-    def __init__(self, bucket_name: str, region: str = 'us-east-1'):
-        self.bucket_name = bucket_name
+    def __init__(self, bucket_name: str, region: str = 'us-east-1', upload_workers: int = 0,
+                 upload_inflight_mb: float = 256, upload_max_attempts: int = 5,
+                 multipart_threshold_mb: float = 256, multipart_part_size_mb: int = 16,
+                 row_group_size: int = 131_072, rollup_level: Optional[str] = None,
+                 layout: ParquetLayout = DEFAULT_LAYOUT, manifests: bool = True,
+                 partition_spec: PartitionSpec = DEFAULT_SPEC):
+        """
+        Args:
+            bucket_name: Target bucket, or a storage URI ('s3://bucket', 'file:///mnt/stage')
+            region: AWS region
+            upload_workers: Threads for submit_partition_upload (0 uploads synchronously)
+            upload_inflight_mb: Cap on serialized partition bytes waiting to upload
+            upload_max_attempts: Attempts per upload before it is reported as failed
+            multipart_threshold_mb: Partitions at least this large in memory are streamed
+                to a multipart upload instead of being encoded whole first
+            multipart_part_size_mb: Part size (and upload buffer) for streamed partitions
+            row_group_size: Parquet row group size for streamed partitions
+            rollup_level: Level compaction rolls small partitions up to (None: no rollups)
+            layout: Row order, row groups, statistics and bloom filters of
+                written partition files (see parquet_layout.py)
+            manifests: Write a _manifest.json summary next to every partition
+                file written (see partition_manifest.py)
+            partition_spec: Levels of partition paths, and of the Athena
+                table's partitions (see partition_spec.py)
+        """
         self.region = region
-        self.config = S3Config(region)
-        
-        # Initialize S3 clients
-        self.s3_client = boto3.client('s3', config=self.config.s3_config)
-        self.s3_resource = boto3.resource('s3', config=self.config.s3_config)
-        
-        # Initialize other AWS clients
-        self.athena_client = boto3.client('athena', region_name=region)
-        self.glue_client = boto3.client('glue', region_name=region)
-        self.cloudwatch_client = boto3.client('cloudwatch', region_name=region)
+        self.multipart_threshold_bytes = int(multipart_threshold_mb * 1024 * 1024)
+        self.multipart_part_size = int(multipart_part_size_mb * 1024 * 1024)
+        self.row_group_size = row_group_size
+        self.rollup_level = rollup_level
+        self.layout = layout
+        self.manifests = manifests
+        self.partition_spec = partition_spec
+        self.streamed_uploads = 0
+        # Every upload thread needs its own connection from the shared client's pool
+        self.config = S3Config(region, max_pool_connections=max(50, upload_workers))
+        
+        # AWS clients are created on first use, so runs against local storage never need AWS
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+        
+        # Partition objects are read and written through the storage backend
+        # (the S3 one shares one client with all upload threads)
+        self.storage = open_storage(bucket_name, client_factory=lambda: boto3.client('s3', config=self.config.s3_config))
+        self.bucket_name = self.storage.bucket if isinstance(self.storage, S3Backend) else bucket_name
+        
+        # Set by load_partition_index(); answers partition_exists without a HEAD
+        self.partition_index: Optional[PartitionIndex] = None
+        # Rollup key -> {partition key: (first row, rows)}, read from rollup footers
+        self._rollups: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # Keys of partitions read from parts or a rollup; writing one back releases them
+        self._compacted_reads: Set[str] = set()
+        
+        self.upload_pool = None
+        if upload_workers > 0:
+            # Queued uploads are (encoded partition, manifest) pairs
+            self.upload_pool = UploadPool(
+                lambda s3_path, upload: self._put_bytes(s3_path, *upload),
+                max_workers=upload_workers,
+                max_inflight_mb=upload_inflight_mb,
+                max_attempts=upload_max_attempts,
+            )
         
-        logger.info(f"S3 ETL initialized for bucket: {bucket_name}")
+        logger.info(f"S3 ETL initialized for storage: {self.storage.uri('')}")
+    
+    def _client(self, key: str, factory):
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = factory()
+            return self._clients[key]
+    
+    @property
+    def s3_client(self):
+        """boto3 S3 client (the storage backend's own, for S3 storage)."""
+        if isinstance(self.storage, S3Backend):
+            return self.storage.client
+        return self._client('s3', lambda: boto3.client('s3', config=self.config.s3_config))
+    
+    @property
+    def s3_resource(self):
+        return self._client('s3_resource', lambda: boto3.resource('s3', config=self.config.s3_config))
+    
+    @property
+    def athena_client(self):
+        return self._client('athena', lambda: boto3.client('athena', region_name=self.region))
+    
+    @property
+    def glue_client(self):
+        return self._client('glue', lambda: boto3.client('glue', region_name=self.region))
+    
+    @property
+    def cloudwatch_client(self):
+        return self._client('cloudwatch', lambda: boto3.client('cloudwatch', region_name=self.region))
     
     def create_s3_path(self, partition_values: Dict[str, Any], prefix: str = 'partitioned-data') -> str:
-        """Create S3 path for partition."""
-        path_parts = [prefix]
-        
-        # Business dimensions
-        for dim in ['payer_slug', 'state', 'billing_class', 'procedure_set', 'procedure_class', 'primary_taxonomy_code', 'stat_area_name']:
-            value = partition_values.get(dim)
-            if value is None:
-                value = "null"
-            # S3-safe encoding
-            value = str(value).replace("/", "_").replace("\\", "_").replace(" ", "_")
-            path_parts.append(f"{dim}={value}")
-        
-        # Time dimensions
-        year = partition_values.get('year', datetime.now().year)
-        month = partition_values.get('month', datetime.now().month)
-        
-        # Ensure month is properly formatted as string with zero padding
-        if isinstance(month, str):
-            month_str = month.zfill(2)
-        else:
-            month_str = f"{month:02d}"
-            
-        path_parts.extend([f"year={year}", f"month={month_str}"])
+        """Create S3 path (storage URI) for partition."""
+        return self.storage.uri(partition_key(partition_values, prefix, self.partition_spec))
+    
+    def serialize_partition(self, partition_data: pl.DataFrame, compression: str = 'zstd') -> io.BytesIO:
+        """Encode partition data as Parquet (in the layout's order) into a buffer positioned at its start."""
+        return self._encode(self.layout.order(partition_data), compression)
+    
+    def _encode(self, data: pl.DataFrame, compression: str, metadata: Optional[Dict[str, str]] = None,
+                sorted_rows: bool = True) -> io.BytesIO:
+        parquet_buffer = io.BytesIO()
+        self.layout.write(data, parquet_buffer, compression, metadata=metadata, sorted_rows=sorted_rows)
+        parquet_buffer.seek(0)
+        return parquet_buffer
+    
+    def _put_bytes(self, s3_path: str, body: io.BytesIO, manifest: Optional[bytes] = None) -> None:
+        """PUT an encoded partition, then its manifest (thread-safe: the S3 client is shared)."""
+        key = self.storage.key(s3_path)
+        # The buffer is sent as is (no getvalue() copy); rewind it for retries
+        body.seek(0)
+        etag = self.storage.put(key, body)
+        self._record_upload(key, etag, body.getbuffer().nbytes)
+        self._put_manifest(key, manifest)
+    
+    def _manifest(self, partition_data: Union[pl.DataFrame, Path], s3_path: str, file_size: int) -> Optional[bytes]:
+        """
+        Encoded manifest of a partition file about to be written, from its rows
+        or from an encoded local file (None for parts, or when disabled).
+        """
+        key = self.storage.key(s3_path)
+        if not self.manifests or key.rsplit('/', 1)[-1] != PARTITION_FILE:
+            return None
+        if isinstance(partition_data, Path):
+            # Summarized lazily: the file is never loaded whole
+            return PartitionManifest.from_file(partition_data, key, file_size).to_json()
+        return PartitionManifest.from_rows(partition_data, key, file_size).to_json()
+    
+    def _put_manifest(self, key: str, manifest: Optional[bytes]) -> None:
+        """Write a partition's manifest after its file (so it never describes rows not yet stored)."""
+        if manifest is not None:
+            self.storage.put(manifest_key(key), io.BytesIO(manifest))
+    
+    def _record_upload(self, key: str, etag: Optional[str], size: int) -> None:
+        """Add a written object to the partition index, if one covers it."""
+        if self.partition_index is not None and self.partition_index.covers(key):
+            self.partition_index.record(key, etag, size)
+    
+    def _is_large(self, partition_data: pl.DataFrame) -> bool:
+        """Whether a partition should be streamed rather than encoded whole."""
+        return partition_data.estimated_size() >= self.multipart_threshold_bytes
+    
+    def stream_partition_to_s3(self, partition_data: pl.DataFrame, s3_path: str, compression: str = 'zstd') -> str:
+        """
+        Encode partition data straight into a multipart upload.
         
-        return f"s3://{self.bucket_name}/" + "/".join(path_parts) + "/fact_rate_enriched.parquet"
+        Row groups are written into a MultipartUploadWriter, which sends a part
+        whenever its buffer fills, so memory is bounded by the part size rather
+        than the encoded partition size.
+        """
+        key = self.storage.key(s3_path)
+        sink = self.storage.open_writer(key, self.multipart_part_size)
+        with sink:
+            self.layout.write(self.layout.order(partition_data), sink, compression, row_group_size=self.row_group_size)
+        self._record_upload(key, sink.etag, sink.bytes_written)
+        self._put_manifest(key, self._manifest(partition_data, s3_path, sink.bytes_written))
+        self.streamed_uploads += 1
+        logger.info(f"[SUCCESS] Streamed {partition_data.height:,} rows ({sink.bytes_written:,} bytes) to {s3_path}")
+        self._release_if_compacted(s3_path)
+        return s3_path
     
     def upload_partition_to_s3(self, partition_data: pl.DataFrame, s3_path: str, compression: str = 'zstd') -> str:
         """Upload partition data to S3 with memory optimization."""
         
         logger.info(f"Uploading partition to S3: {s3_path}")
         
-        # Convert to parquet in memory
-        parquet_buffer = io.BytesIO()
-        
-        # Write with compression
-        partition_data.write_parquet(
-            parquet_buffer,
-            compression=compression,
-            use_pyarrow=True
-        )
-        
-        # Reset buffer position
-        parquet_buffer.seek(0)
-        
-        # Upload to S3
-        bucket, key = self._parse_s3_path(s3_path)
+        # A queued upload of the same partition must not land after this one
+        self.wait_for_upload(s3_path)
         
         try:
-            self.s3_client.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=parquet_buffer.getvalue(),
-                ContentType='application/octet-stream',
-                ServerSideEncryption='AES256'
-            )
+            if self._is_large(partition_data):
+                return self.stream_partition_to_s3(partition_data, s3_path, compression)
+            
+            # Convert to parquet in memory
+            parquet_buffer = self.serialize_partition(partition_data, compression)
+            try:
+                self._put_bytes(s3_path, parquet_buffer,
+                                self._manifest(partition_data, s3_path, parquet_buffer.getbuffer().nbytes))
+            finally:
+                parquet_buffer.close()
             
             logger.info(f"[SUCCESS] Successfully uploaded {partition_data.height:,} rows to {s3_path}")
+            self._release_if_compacted(s3_path)
             return s3_path
             
         except ClientError as e:
             logger.error(f"[ERROR] Failed to upload to S3: {e}")
             raise
-        finally:
-            parquet_buffer.close()
+    
+    def submit_partition_upload(self, partition_data: pl.DataFrame, s3_path: str, compression: str = 'zstd') -> str:
+        """
+        Serialize partition data on this thread and upload it on the upload pool.
+        
+        Blocks only while the pool's in-flight byte cap is reached, so the caller
+        can encode the next partitions while earlier ones are on the network.
+        Without a pool, and for partitions large enough to stream, this is
+        upload_partition_to_s3.
+        """
+        if self.upload_pool is None or self._is_large(partition_data):
+            return self.upload_partition_to_s3(partition_data, s3_path, compression)
+        
+        parquet_buffer = self.serialize_partition(partition_data, compression)
+        size = parquet_buffer.getbuffer().nbytes
+        self.upload_pool.submit(s3_path, (parquet_buffer, self._manifest(partition_data, s3_path, size)), size=size)
+        logger.debug(f"Queued {partition_data.height:,} rows ({size:,} bytes) for {s3_path}")
+        self._release_if_compacted(s3_path)
+        return s3_path
+    
+    def submit_file_upload(self, local_path: Path, s3_path: str) -> str:
+        """
+        Upload an already encoded partition file (e.g. a staged Parquet file).
+        
+        Files at least multipart_threshold_mb are copied into a multipart
+        upload part by part; smaller ones are read whole and queued on the
+        upload pool like serialized partitions (or PUT directly without one).
+        """
+        size = Path(local_path).stat().st_size
+        manifest = self._manifest(Path(local_path), s3_path, size)
+        if size >= self.multipart_threshold_bytes:
+            self.wait_for_upload(s3_path)
+            key = self.storage.key(s3_path)
+            sink = self.storage.open_writer(key, self.multipart_part_size)
+            with sink, open(local_path, 'rb') as f:
+                shutil.copyfileobj(f, sink, self.multipart_part_size)
+            self._record_upload(key, sink.etag, sink.bytes_written)
+            self._put_manifest(key, manifest)
+            self.streamed_uploads += 1
+            logger.info(f"[SUCCESS] Streamed {local_path} ({size:,} bytes) to {s3_path}")
+            return s3_path
+        
+        body = io.BytesIO(Path(local_path).read_bytes())
+        if self.upload_pool is None:
+            self._put_bytes(s3_path, body, manifest)
+        else:
+            self.upload_pool.submit(s3_path, (body, manifest), size=size)
+        logger.debug(f"Uploaded {local_path} ({size:,} bytes) to {s3_path}")
+        return s3_path
+    
+    def wait_for_upload(self, s3_path: str) -> None:
+        """Block until queued uploads of s3_path have finished."""
+        if self.upload_pool is not None:
+            self.upload_pool.wait_for(s3_path)
+    
+    def wait_for_uploads(self) -> List[UploadFailure]:
+        """Wait for all queued uploads; return failures in submission order."""
+        if self.upload_pool is None:
+            return []
+        failures = self.upload_pool.drain()
+        for failure in failures:
+            logger.error(f"[ERROR] Upload #{failure.sequence} failed after {failure.attempts} attempts: "
+                         f"{failure.key}: {failure.error}")
+        return failures
+    
+    def close(self) -> List[UploadFailure]:
+        """Finish queued uploads and stop the upload threads."""
+        if self.upload_pool is None:
+            return []
+        failures = self.wait_for_uploads()
+        self.upload_pool.close()
+        return failures
     
     def create_s3_partitions(self, enriched_df: pl.DataFrame, partition_cols: List[str], prefix: str) -> List[str]:
         """Create S3 partitions from enriched data."""
         
         logger.info(f"Creating S3 partitions for {enriched_df.height:,} rows...")
         
-        # Get unique partition combinations
-        partition_combinations = (
-            enriched_df
-            .select(partition_cols)
-            .unique()
-            .sort(partition_cols)
-        )
-        
         created_partitions = []
         
-        # Process each partition
-        for partition_row in tqdm(partition_combinations.iter_rows(named=True), 
-                                total=partition_combinations.height, 
-                                desc="Creating partitions"):
+        # Process each partition (one sort of the data, then a slice per partition)
+        for partition_row, partition_data in tqdm(split_partitions(enriched_df, partition_cols),
+                                                  desc="Creating partitions"):
             
             # Create S3 path
             s3_path = self.create_s3_path(partition_row, prefix)
             
-            # Filter data for this partition
-            partition_filter = self._create_partition_filter(partition_row)
-            partition_data = enriched_df.filter(partition_filter)
-            
-            # Skip if no data
-            if partition_data.height == 0:
-                continue
-            
-            # Upload to S3
-            self.upload_partition_to_s3(partition_data, s3_path)
+            # Upload to S3 (queued when an upload pool is configured)
+            self.submit_partition_upload(partition_data, s3_path)
             created_partitions.append(s3_path)
         
+        failed = {failure.key for failure in self.wait_for_uploads()}
+        created_partitions = [path for path in created_partitions if path not in failed]
+        
         logger.info(f"[SUCCESS] Created {len(created_partitions)} partitions")
         return created_partitions
     
-    def _create_partition_filter(self, partition_row: Dict[str, Any]) -> pl.Expr:
-        """Create filter condition for partition."""
-        conditions = []
-        for col, value in partition_row.items():
-            if value is None:
-                conditions.append(pl.col(col).is_null())
-            else:
-                conditions.append(pl.col(col) == value)
-        
-        return pl.all_horizontal(conditions)
-    
-    def _parse_s3_path(self, s3_path: str) -> Tuple[str, str]:
-        """Parse S3 path into bucket and key."""
-        if s3_path.startswith('s3://'):
-            s3_path = s3_path[5:]
-        
-        parts = s3_path.split('/', 1)
-        bucket = parts[0]
-        key = parts[1] if len(parts) > 1 else ''
-        
-        return bucket, key
-    
     def list_partitions(self, prefix: str) -> List[str]:
         """List all partitions in S3."""
         
         partitions = []
-        paginator = self.s3_client.get_paginator('list_objects_v2')
         
         try:
-            pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
-            
-            for page in pages:
-                for obj in page.get('Contents', []):
-                    if obj['Key'].endswith('.parquet'):
-                        partitions.append(f"s3://{self.bucket_name}/{obj['Key']}")
+            for page in self.storage.list(prefix):
+                for key in page.objects:
+                    if key.endswith('.parquet'):
+                        partitions.append(self.storage.uri(key))
             
             logger.info(f"Found {len(partitions)} partitions in S3")
             return partitions
             
-        except ClientError as e:
+        except (ClientError, OSError) as e:
             logger.error(f"Failed to list partitions: {e}")
             return []
     
+    def load_partition_index(self, prefix: str, workers: int = 16) -> PartitionIndex:
+        """
+        List the partitions under prefix once so partition_exists needs no HEADs.
+        
+        Objects this instance uploads afterwards are added to the index as
+        their uploads complete.
+        """
+        self.partition_index = PartitionIndex(self.storage, prefix).load(workers)
+        return self.partition_index
+    
+    def _object_exists(self, key: str) -> bool:
+        if self.partition_index is not None and self.partition_index.covers(key):
+            return self.partition_index.contains(key)
+        return self.storage.exists(key)
+    
+    def locate_partition(self, s3_path: str) -> Tuple[str, List[str]]:
+        """
+        Where a partition's rows are stored: ('file', [key]), ('parts', part keys)
+        after a split, ('rollup', [rollup key]) after a rollup, or ('missing', []).
+        
+        The partition's own file wins over parts, and parts over a rollup, so
+        while compaction swaps a partition readers see the old objects until
+        the step that retires them (see partition_compaction.py). Between that
+        step and the publishing of the new objects, or after a compaction
+        interrupted there, the rows are read from the staged parts or rollup.
+        """
+        key = self.storage.key(s3_path)
+        if self._object_exists(key):
+            return 'file', [key]
+        for part_key in (partition_part_key(key, 0), staging_key(partition_part_key(key, 0))):
+            # Part 0 is published last, so once it exists every part does
+            if self._object_exists(part_key):
+                part_prefix = f"{part_key.rsplit('/', 1)[0]}/{PART_FILE_PREFIX}"
+                return 'parts', sorted(name for page in self.storage.list(part_prefix) for name in page.objects)
+        if self.rollup_level:
+            rollup = rollup_key(key, self.rollup_level, self.partition_spec.levels)
+            # A staged rollup is newer than the published one
+            for candidate in (staging_key(rollup), rollup):
+                if rollup != key and self._object_exists(candidate) and key in self.rollup_members(candidate):
+                    return 'rollup', [candidate]
+        return 'missing', []
+    
     def partition_exists(self, s3_path: str) -> bool:
-        """Check if a partition exists in S3."""
+        """Check if a partition exists in S3 (from the partition index when loaded)."""
         
-        bucket, key = self._parse_s3_path(s3_path)
+        self.wait_for_upload(s3_path)
         
         try:
-            self.s3_client.head_object(Bucket=bucket, Key=key)
-            logger.debug(f"Partition exists: {s3_path}")
-            return True
+            location, _ = self.locate_partition(s3_path)
+            logger.debug(f"Partition {'does not exist' if location == 'missing' else 'exists'}: {s3_path}")
+            return location != 'missing'
             
         except ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                logger.debug(f"Partition does not exist: {s3_path}")
-                return False
-            else:
-                logger.error(f"Error checking partition existence {s3_path}: {e}")
-                raise
+            logger.error(f"Error checking partition existence {s3_path}: {e}")
+            raise
     
     def download_partition(self, s3_path: str) -> pl.DataFrame:
-        """Download and load a partition from S3."""
+        """Download and load a partition from S3 (from its parts or rollup once compacted)."""
         
-        bucket, key = self._parse_s3_path(s3_path)
+        self.wait_for_upload(s3_path)
         
         try:
-            # Download object
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            
-            # Read parquet from bytes
-            parquet_data = response['Body'].read()
-            df = pl.read_parquet(io.BytesIO(parquet_data))
+            key = self.storage.key(s3_path)
+            try:
+                # Download object and read parquet from bytes
+                df = pl.read_parquet(io.BytesIO(self.storage.get(key)))
+            except FileNotFoundError:
+                # Not (or no longer) its own file: split into parts or rolled up
+                location, keys = self.locate_partition(s3_path)
+                if location == 'missing':
+                    raise
+                self._compacted_reads.add(key)
+                if location == 'rollup':
+                    first_row, rows = self.rollup_members(keys[0])[key]
+                    df = pl.read_parquet(io.BytesIO(self.storage.get(keys[0]))).slice(first_row, rows)
+                else:
+                    df = pl.concat([pl.read_parquet(io.BytesIO(self.storage.get(part))) for part in keys],
+                                   how='diagonal_relaxed')
             
             logger.info(f"Downloaded partition: {s3_path} ({df.height:,} rows)")
             return df
             
-        except ClientError as e:
+        except (ClientError, OSError) as e:
             logger.error(f"Failed to download partition {s3_path}: {e}")
             raise
     
@@ -247,112 +554,138 @@ class S3PartitionedETL:
         """Alias for download_partition for consistency."""
         return self.download_partition(s3_path)
     
-    def create_athena_table(self, database_name: str, table_name: str, output_location: str) -> str:
-        """Create Athena table for querying S3 partitioned data."""
+    def read_partition_metadata(self, s3_path: str) -> pq.FileMetaData:
+        """
+        Parquet footer of a partition (row count, row groups, column statistics)
+        from two ranged reads instead of a download of the whole object.
+        """
+        self.wait_for_upload(s3_path)
+        key = self.storage.key(s3_path)
+        tail = self.storage.range_get(key, -8, 8)
+        if tail[4:] != b'PAR1':
+            raise ValueError(f"Not a Parquet file: {s3_path}")
+        footer_length = int.from_bytes(tail[:4], 'little')
+        footer = self.storage.range_get(key, -(footer_length + 8), footer_length)
+        return pq.read_metadata(io.BytesIO(footer + tail))
+    
+    def read_manifest(self, s3_path: str) -> Optional[PartitionManifest]:
+        """
+        Manifest of a partition (row count, NPIs, codes, rate percentiles; see
+        partition_manifest.py), or None for a partition written without one.
+        Compacted partitions keep theirs.
+        """
+        self.wait_for_upload(s3_path)
+        try:
+            return PartitionManifest.from_json(self.storage.get(manifest_key(self.storage.key(s3_path))))
+        except FileNotFoundError:
+            return None
+    
+    def rollup_members(self, key: str) -> Dict[str, Tuple[int, int]]:
+        """Partition key -> (first row, rows) of a rollup file, from its footer (cached)."""
+        if key not in self._rollups:
+            metadata = self.read_partition_metadata(self.storage.uri(key)).metadata or {}
+            members = json.loads(metadata.get(ROLLUP_METADATA.encode(), b'{}'))
+            self._rollups[key] = {name: tuple(span) for name, span in members.items()}
+        return self._rollups[key]
+    
+    def write_rollup(self, key: str, members: Dict[str, pl.DataFrame], compression: str = 'zstd') -> int:
+        """
+        Write (or replace) a rollup file holding the rows of several partitions,
+        each partition's rows contiguous; deletes it when members is empty.
         
-        logger.info(f"Creating Athena table: {database_name}.{table_name}")
+        Returns:
+            Bytes written
+        """
+        self._rollups.pop(key, None)
+        if not members:
+            self.delete_object(key)
+            return 0
+        spans, first_row = {}, 0
+        for name, rows in members.items():
+            spans[name] = [first_row, rows.height]
+            first_row += rows.height
+        # Each partition's rows are in the layout's order, the rollup as a whole is not
+        data = pl.concat([self.layout.order(rows) for rows in members.values()], how='diagonal_relaxed')
+        buffer = self._encode(data, compression, metadata={ROLLUP_METADATA: json.dumps(spans)}, sorted_rows=False)
+        try:
+            self._put_bytes(self.storage.uri(key), buffer)
+            return buffer.getbuffer().nbytes
+        finally:
+            buffer.close()
+    
+    def publish_staged(self, staged: List[str]) -> None:
+        """
+        Copy staged files (see staging_key) to their published keys, then
+        delete the staged copies. Part 0 of a split is copied last, so
+        locate_partition reads the staged parts until every part is published.
+        """
+        for key in sorted(staged, reverse=True):
+            target = published_key(key)
+            etag = self.storage.copy(key, target)
+            indexed = self.partition_index.get(key) if self.partition_index is not None else None
+            self._record_upload(target, etag, indexed.size if indexed else 0)
+            self._rollups.pop(target, None)
+        for key in staged:
+            self.delete_object(key)
+    
+    def delete_object(self, key: str) -> None:
+        """Delete an object and drop it from the partition index."""
+        self.storage.delete(key)
+        self._rollups.pop(key, None)
+        if self.partition_index is not None:
+            self.partition_index.discard(key)
+    
+    def _release_if_compacted(self, s3_path: str) -> None:
+        key = self.storage.key(s3_path)
+        if key in self._compacted_reads:
+            self._compacted_reads.discard(key)
+            self.release_compacted_partition(s3_path)
+    
+    def release_compacted_partition(self, s3_path: str) -> None:
+        """
+        After a partition's own file has been written again (a merge of a split
+        or rolled-up partition), remove its rows from the parts or rollup that
+        held them. Does nothing unless the new file is confirmed in storage.
+        Called on this thread by the upload methods for partitions last read
+        from parts or a rollup, so rollup rewrites never race each other.
+        """
+        self.wait_for_upload(s3_path)
+        key = self.storage.key(s3_path)
+        if not self.storage.exists(key):
+            logger.error(f"Keeping the compacted copy of {s3_path}: its partition file was not written")
+            return
+        part_prefix = f"{key.rsplit('/', 1)[0]}/{PART_FILE_PREFIX}"
+        for page in self.storage.list(part_prefix):
+            for part in page.objects:
+                self.delete_object(part)
+        if self.rollup_level:
+            rollup = rollup_key(key, self.rollup_level, self.partition_spec.levels)
+            if self._object_exists(rollup) and key in self.rollup_members(rollup):
+                data = pl.read_parquet(io.BytesIO(self.storage.get(rollup)))
+                members = {name: data.slice(*span) for name, span in self.rollup_members(rollup).items() if name != key}
+                self.write_rollup(rollup, members)
+                logger.info(f"Moved {s3_path} out of rollup {rollup}")
+    
+    def create_athena_table(self, database_name: str, table_name: str, output_location: str,
+                            compact_providers: bool = False, prefix: str = 'partitioned-data',
+                            projection: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[str]:
+        """
+        Create Athena table for querying S3 partitioned data (skipped for local storage).
         
-        create_table_sql = f"""
-        CREATE EXTERNAL TABLE {database_name}.{table_name} (
-            fact_uid string,
-            state string,
-            year_month string,
-            payer_slug string,
-            billing_class string,
-            code_type string,
-            code string,
-            negotiated_type string,
-            negotiation_arrangement string,
-            negotiated_rate double,
-            expiration_date string,
-            provider_group_id_raw bigint,
-            reporting_entity_name string,
-            code_description string,
-            code_name string,
-            procedure_set string,
-            procedure_class string,
-            procedure_group string,
-            pos_set_id string,
-            pos_members array<string>,
-            npi string,
-            first_name string,
-            last_name string,
-            organization_name string,
-            enumeration_type string,
-            status string,
-            primary_taxonomy_code string,
-            primary_taxonomy_desc string,
-            primary_taxonomy_state string,
-            primary_taxonomy_license string,
-            credential string,
-            sole_proprietor string,
-            enumeration_date string,
-            last_updated string,
-            address_purpose string,
-            address_type string,
-            address_1 string,
-            address_2 string,
-            city string,
-            postal_code string,
-            country_code string,
-            telephone_number string,
-            fax_number string,
-            address_hash string,
-            latitude double,
-            longitude double,
-            county_name string,
-            county_fips string,
-            stat_area_name string,
-            stat_area_code string,
-            matched_address string,
-            benchmark_type string,
-            medicare_national_rate double,
-            medicare_state_rate double,
-            work_rvu double,
-            practice_expense_rvu double,
-            malpractice_rvu double,
-            total_rvu double,
-            conversion_factor double,
-            opps_weight double,
-            opps_si string,
-            asc_pi string,
-            rate_to_medicare_ratio double,
-            is_above_medicare boolean,
-            provider_type string,
-            is_sole_proprietor boolean,
-            is_individual_provider boolean,
-            year int,
-            month int
-        )
-        PARTITIONED BY (
-            payer_slug string,
-            state string,
-            billing_class string,
-            procedure_set string,
-            procedure_class string,
-            primary_taxonomy_code string,
-            stat_area_name string,
-            year int,
-            month int
-        )
-        STORED AS PARQUET
-        LOCATION 's3://{self.bucket_name}/partitioned-data/'
-        TBLPROPERTIES (
-            'projection.enabled' = 'true',
-            'projection.payer_slug.type' = 'enum',
-            'projection.payer_slug.values' = 'unitedhealthcare-of-georgia-inc,anthem-blue-cross-blue-shield',
-            'projection.state.type' = 'enum',
-            'projection.state.values' = 'GA,FL,CA,TX,NY',
-            'projection.billing_class.type' = 'enum',
-            'projection.billing_class.values' = 'professional,institutional',
-            'projection.year.type' = 'integer',
-            'projection.year.range' = '2020,2030',
-            'projection.month.type' = 'integer',
-            'projection.month.range' = '1,12',
-            'storage.location.template' = 's3://{self.bucket_name}/partitioned-data/payer_slug=${{payer_slug}}/state=${{state}}/billing_class=${{billing_class}}/procedure_set=${{procedure_set}}/procedure_class=${{procedure_class}}/primary_taxonomy_code=${{primary_taxonomy_code}}/stat_area_name=${{stat_area_name}}/year=${{year}}/month=${{month}}/'
-        )
+        Partition columns, their projections and the location template come
+        from the partition spec; projection (athena.projection in
+        etl3_config.yaml) overrides the projection of the columns it names.
         """
         
+        if not isinstance(self.storage, S3Backend):
+            logger.info(f"Skipping Athena table {database_name}.{table_name}: "
+                        f"partitions are in {self.storage.uri('')}, Athena reads S3 only")
+            return None
+        
+        logger.info(f"Creating Athena table: {database_name}.{table_name}")
+        
+        create_table_sql = self.athena_table_sql(database_name, table_name, compact_providers, prefix, projection)
+        
         try:
             response = self.athena_client.start_query_execution(
                 QueryString=create_table_sql,
@@ -373,6 +706,33 @@ class S3PartitionedETL:
             logger.error(f"Failed to create Athena table: {e}")
             raise
     
+    def athena_table_sql(self, database_name: str, table_name: str, compact_providers: bool = False,
+                         prefix: str = 'partitioned-data',
+                         projection: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """CREATE EXTERNAL TABLE statement of the partitioned data, per the partition spec."""
+        partition_columns = self.partition_spec.athena_partition_columns()
+        # A column can't be both a data and a partition column; partition values come from the path
+        partition_names = {name for name, _ in partition_columns}
+        columns = ATHENA_COLUMNS + (ATHENA_PROVIDER_COLUMNS if compact_providers else [])
+        data_columns = ",\n".join(f"            {name} {kind}" for name, kind in columns if name not in partition_names)
+        partitions = ",\n".join(f"            {name} {kind}" for name, kind in partition_columns)
+        location = f"s3://{self.bucket_name}/{prefix.strip('/')}"
+        properties = ",\n".join(f"            '{key}' = '{value}'"
+                                 for key, value in self.partition_spec.athena_properties(location, projection).items())
+        return f"""
+        CREATE EXTERNAL TABLE {database_name}.{table_name} (
+{data_columns}
+        )
+        PARTITIONED BY (
+{partitions}
+        )
+        STORED AS PARQUET
+        LOCATION '{location}/'
+        TBLPROPERTIES (
+{properties}
+        )
+        """
+    
     def create_glue_crawler(self, crawler_name: str, s3_path: str) -> str:
         """Create Glue crawler to automatically discover and catalog partitions."""
         
@@ -3,6 +3,9 @@
 S3 Partition Inventory Script with SQLite Database
 Efficiently discovers and catalogs partitioned healthcare data in S3
 Creates a SQLite database with navigation tables and taxonomy descriptions
+Lists through a storage backend, so a local staging directory can be inventoried too
+Reads the partition manifests ETL3 writes (partition_manifest.py) for exact row counts,
+codes and rate ranges, falling back to a size-based estimate for partitions without one
 """
 
 import boto3
@@ -13,8 +16,9 @@ import sqlite3
 import pandas as pd
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import csv
 from pathlib import Path
@@ -22,6 +26,14 @@ from pathlib import Path
 # Configure boto3 for optimal performance
 from botocore.config import Config
 
+from storage_backend import StorageBackend, open_storage
+from partition_manifest import MANIFEST_FILE, PartitionManifest
+from partition_spec import DEFAULT_SPEC, PartitionSpec
+from s3_etl_utils import PARTITION_FILE, rollup_key
+
+# PartitionInfo fields of partition levels named otherwise
+INFO_FIELDS = {'primary_taxonomy_code': 'taxonomy_code'}
+
 @dataclass
 class PartitionInfo:
     """Structured partition information"""
@@ -38,6 +50,10 @@ class PartitionInfo:
     file_size_bytes: int
     last_modified: datetime
     record_count_estimate: Optional[int] = None
+    record_count: Optional[int] = None  # Exact, from the partition's manifest
+    file_kind: str = 'file'             # 'file', 'part' (split partition) or 'rollup' (coarser level)
+    part_number: Optional[int] = None
+    levels: Dict[str, Optional[str]] = field(default_factory=dict)  # Every level of the path, by spec name
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -48,7 +64,8 @@ class PartitionInfo:
 class S3PartitionInventory:
     """Efficient S3 partition discovery and cataloging"""
     
-    def __init__(self, bucket_name: str, region: str = 'us-east-1', prefix: str = 'partitioned-data'):
+    def __init__(self, bucket_name: str, region: str = 'us-east-1', prefix: str = 'partitioned-data',
+                 storage: Optional[StorageBackend] = None, spec: PartitionSpec = DEFAULT_SPEC):
         self.bucket_name = bucket_name
         self.region = region
         self.prefix = prefix
@@ -60,31 +77,36 @@ class S3PartitionInventory:
             max_pool_connections=50
         )
         
-        self.s3_client = boto3.client('s3', config=self.s3_config)
+        # Objects are listed through the storage backend (S3 client created on first use)
+        self.storage = storage or open_storage(bucket_name, client_factory=lambda: boto3.client('s3', config=self.s3_config))
         
-        # Partition parsing regex
+        # Partition parsing regex, from the partition spec's levels; levels below the
+        # first are absent in compaction rollups, and split partitions are numbered part files
+        self.spec = spec
         self.partition_pattern = re.compile(
-            r'payer_slug=([^/]+)/'
-            r'state=([^/]+)/'
-            r'billing_class=([^/]+)/'
-            r'procedure_set=([^/]+)/'
-            r'procedure_class=([^/]+)/'
-            r'primary_taxonomy_code=([^/]+)/'
-            r'stat_area_name=([^/]+)/'
-            r'year=(\d{4})/'
-            r'month=(\d{2})/'
-            r'fact_rate_enriched\.parquet'
+            spec.path_regex() + r'fact_rate_enriched(?:\.part-(?P<part>\d{5}))?\.parquet$'
         )
         
+        # Partition file key -> manifest, and key of the file holding its rows
+        # (set by discover_partitions for manifests matching a listed file)
+        self.manifests: Dict[str, PartitionManifest] = {}
+        self.manifest_locations: Dict[str, str] = {}
+        
         # Statistics tracking
         self.stats = {
             'api_calls': 0,
+            'manifests_read': 0,
             'partitions_found': 0,
             'total_size_bytes': 0,
             'scan_duration': 0,
             'errors': []
         }
     
+    @property
+    def s3_client(self):
+        """boto3 client of the bucket being inventoried (S3 storage only)"""
+        return self.storage.client
+    
     def parse_partition_path(self, s3_key: str) -> Optional[PartitionInfo]:
         """Extract partition information from S3 key"""
         match = self.partition_pattern.search(s3_key)
@@ -92,90 +114,95 @@ class S3PartitionInventory:
             return None
         
         try:
+            part = match.group('part')
+            levels = {name: self._decode_partition_value(match.group(name)) for name in self.spec.levels}
+            # Identity levels of the default path fill the named fields; bucketed or
+            # truncated ones are only in levels
+            named = {INFO_FIELDS.get(name, name): levels.get(name) for name in DEFAULT_SPEC.levels}
             return PartitionInfo(
                 partition_path=s3_key,
-                payer_slug=self._decode_partition_value(match.group(1)),
-                state=self._decode_partition_value(match.group(2)),
-                billing_class=self._decode_partition_value(match.group(3)),
-                procedure_set=self._decode_partition_value(match.group(4)),
-                procedure_class=self._decode_partition_value(match.group(5)),
-                taxonomy_code=self._decode_partition_value(match.group(6)),
-                stat_area_name=self._decode_partition_value(match.group(7)),
-                year=int(match.group(8)),
-                month=int(match.group(9)),
+                **named,
+                year=int(match.group('year')),
+                month=int(match.group('month')),
                 file_size_bytes=0,  # Will be populated by discovery
-                last_modified=datetime.now(timezone.utc)  # Will be populated by discovery
+                last_modified=datetime.now(timezone.utc),  # Will be populated by discovery
+                file_kind='part' if part else (
+                    'rollup' if any(match.group(name) is None for name in self.spec.levels) else 'file'),
+                part_number=int(part) if part else None,
+                levels=levels
             )
         except (ValueError, IndexError) as e:
             self.stats['errors'].append(f"Error parsing partition {s3_key}: {e}")
             return None
     
-    def _decode_partition_value(self, value: str) -> str:
+    def _decode_partition_value(self, value: Optional[str]) -> Optional[str]:
         """Decode S3-encoded partition values"""
-        if value == '__NULL__':
+        if value is None or value == '__NULL__':
             return None
         return value.replace('_', ' ').replace('__NULL__', '')
     
     def discover_partitions(self, 
                           max_keys_per_request: int = 1000,
-                          include_empty: bool = False) -> List[PartitionInfo]:
+                          include_empty: bool = False,
+                          read_manifests: bool = True,
+                          manifest_workers: int = 16) -> List[PartitionInfo]:
         """
         Efficiently discover all partitions using pagination
         
         Args:
             max_keys_per_request: Number of keys to fetch per API call (max 1000)
             include_empty: Whether to include empty partitions
+            read_manifests: Read partition manifests for exact row counts (one GET each)
+            manifest_workers: Threads reading manifests
             
         Returns:
             List of PartitionInfo objects
         """
         partitions = []
+        manifest_keys = []
         start_time = time.time()
         
-        print(f"🔍 Scanning S3 bucket: s3://{self.bucket_name}/{self.prefix}")
+        print(f"🔍 Scanning S3 bucket: {self.storage.uri(self.prefix)}")
         print(f"📊 Using {max_keys_per_request} keys per request to minimize API calls")
         
-        # Use paginator for efficient scanning
-        paginator = self.s3_client.get_paginator('list_objects_v2')
-        page_iterator = paginator.paginate(
-            Bucket=self.bucket_name,
-            Prefix=self.prefix,
-            PaginationConfig={
-                'MaxItems': None,
-                'PageSize': max_keys_per_request
-            }
-        )
-        
+        # Paginated listing (one request per page)
         page_count = 0
-        for page in page_iterator:
+        for page in self.storage.list(self.prefix, page_size=max_keys_per_request):
             page_count += 1
             self.stats['api_calls'] += 1
             
-            objects = page.get('Contents', [])
-            print(f"📄 Processing page {page_count}: {len(objects)} objects")
+            print(f"📄 Processing page {page_count}: {len(page.objects)} objects")
             
-            for obj in objects:
+            for key, obj in page.objects.items():
+                if key.endswith('/' + MANIFEST_FILE):
+                    manifest_keys.append(key)
+                    continue
+                
                 # Only process parquet files
-                if not obj['Key'].endswith('.parquet'):
+                if not key.endswith('.parquet'):
                     continue
                 
                 # Skip empty files unless requested
-                if obj['Size'] == 0 and not include_empty:
+                if obj.size == 0 and not include_empty:
                     continue
                 
                 # Parse partition information
-                partition_info = self.parse_partition_path(obj['Key'])
+                partition_info = self.parse_partition_path(key)
                 if partition_info:
                     # Populate metadata from S3 object
-                    partition_info.file_size_bytes = obj['Size']
-                    partition_info.last_modified = obj['LastModified']
+                    partition_info.file_size_bytes = obj.size
+                    partition_info.last_modified = obj.last_modified or partition_info.last_modified
                     
                     # Estimate record count (rough approximation)
-                    partition_info.record_count_estimate = self._estimate_record_count(obj['Size'])
+                    partition_info.record_count_estimate = self._estimate_record_count(obj.size)
                     
                     partitions.append(partition_info)
                     self.stats['partitions_found'] += 1
-                    self.stats['total_size_bytes'] += obj['Size']
+                    self.stats['total_size_bytes'] += obj.size
+        
+        if read_manifests and manifest_keys:
+            self._apply_manifests(partitions, self._read_manifests(manifest_keys, manifest_workers))
+            print(f"📋 Exact row counts for {len(self.manifests)} of {len(manifest_keys)} partition manifests")
         
         self.stats['scan_duration'] = time.time() - start_time
         
@@ -186,11 +213,71 @@ class S3PartitionInventory:
         return partitions
     
     def _estimate_record_count(self, file_size_bytes: int) -> int:
-        """Rough estimate of record count based on file size"""
+        """Rough estimate of record count based on file size (partitions without a manifest)"""
         # Assumes approximately 200-500 bytes per record after compression
         bytes_per_record = 350  # Conservative estimate
         return max(1, file_size_bytes // bytes_per_record)
     
+    def _read_manifests(self, manifest_keys: List[str], workers: int) -> Dict[str, PartitionManifest]:
+        """Partition file key -> manifest, read concurrently"""
+        def read(key):
+            try:
+                return key, PartitionManifest.from_json(self.storage.get(key))
+            except (ValueError, OSError) as e:
+                self.stats['errors'].append(f"Error reading manifest {key}: {e}")
+                return key, None
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(read, manifest_keys))
+        self.stats['manifests_read'] += len(manifest_keys)
+        return {f"{key.rsplit('/', 1)[0]}/{PARTITION_FILE}": manifest for key, manifest in results if manifest}
+    
+    def _apply_manifests(self, partitions: List[PartitionInfo], manifests: Dict[str, PartitionManifest]):
+        """
+        Replace size-based estimates with manifest row counts.
+        
+        A partition file gets its manifest's exact count, unless the file was
+        rewritten without a manifest since (sizes differ). Compacted partitions
+        keep their manifest where their file was: a split partition's count is
+        shared among its parts by size, and a rollup counts the rows of the
+        manifests whose partitions roll up to it (matched by path, without
+        reading rollup footers).
+        """
+        by_key = {p.partition_path: p for p in partitions}
+        parts = defaultdict(list)
+        for p in partitions:
+            if p.file_kind == 'part':
+                parts[f"{p.partition_path.rsplit('/', 1)[0]}/{PARTITION_FILE}"].append(p)
+        rollup_rows = defaultdict(int)
+        
+        for key, manifest in manifests.items():
+            own = by_key.get(key)
+            if own is not None:
+                if manifest.describes(own.file_size_bytes):
+                    own.record_count = own.record_count_estimate = manifest.rows
+                    self.manifest_locations[key] = key
+            elif key in parts:
+                members = sorted(parts[key], key=lambda p: p.part_number)
+                total_size = sum(p.file_size_bytes for p in members) or 1
+                remaining = manifest.rows
+                for part in members[:-1]:
+                    part.record_count_estimate = manifest.rows * part.file_size_bytes // total_size
+                    remaining -= part.record_count_estimate
+                members[-1].record_count_estimate = remaining
+                self.manifest_locations[key] = members[0].partition_path
+            else:
+                # Finest rollup level first, in case rollups of two levels exist
+                for level in reversed(self.spec.levels[:-1]):
+                    rollup = rollup_key(key, level, self.spec.levels)
+                    if rollup in by_key and by_key[rollup].file_kind == 'rollup':
+                        rollup_rows[rollup] += manifest.rows
+                        self.manifest_locations[key] = rollup
+                        break
+        
+        for rollup, rows in rollup_rows.items():
+            by_key[rollup].record_count_estimate = rows
+        self.manifests = {key: manifests[key] for key in self.manifest_locations}
+    
     def analyze_partitions(self, partitions: List[PartitionInfo]) -> Dict:
         """Generate comprehensive partition analytics"""
         if not partitions:
@@ -201,6 +288,8 @@ class S3PartitionInventory:
                 'total_partitions': len(partitions),
                 'total_size_gb': self.stats['total_size_bytes'] / (1024**3),
                 'estimated_total_records': sum(p.record_count_estimate or 0 for p in partitions),
+                'partitions_with_manifests': len(self.manifests),
+                'manifest_records': sum(m.rows for m in self.manifests.values()),
                 'date_range': {
                     'earliest': min(p.last_modified for p in partitions).isoformat(),
                     'latest': max(p.last_modified for p in partitions).isoformat()
@@ -303,6 +392,8 @@ class S3PartitionInventory:
                         'stats': self.stats
                     },
                     'partitions': [p.to_dict() for p in partitions],
+                    'manifests': {key: {**asdict(manifest), 'stored_in': self.manifest_locations[key]}
+                                  for key, manifest in self.manifests.items()},
                     'analysis': self.analyze_partitions(partitions)
                 }, f, indent=2, default=str)
         
@@ -314,7 +405,7 @@ class S3PartitionInventory:
                     'partition_path', 'payer_slug', 'state', 'billing_class',
                     'procedure_set', 'procedure_class', 'taxonomy_code',
                     'stat_area_name', 'year', 'month', 'file_size_mb',
-                    'last_modified', 'estimated_records'
+                    'last_modified', 'estimated_records', 'records'
                 ])
                 # Data
                 for p in partitions:
@@ -324,7 +415,8 @@ class S3PartitionInventory:
                         p.stat_area_name, p.year, p.month,
                         p.file_size_bytes / (1024**2),  # Convert to MB
                         p.last_modified.isoformat(),
-                        p.record_count_estimate
+                        p.record_count_estimate,
+                        p.record_count
                     ])
         
         print(f"📁 Inventory exported to: {output_file}")
@@ -335,11 +427,15 @@ class S3PartitionInventory:
         # S3 pricing (approximate)
         list_cost_per_1000 = 0.0004  # USD
         
+        get_cost_per_1000 = 0.0004  # USD
+        
         list_requests = self.stats['api_calls']
         estimated_cost = (list_requests / 1000) * list_cost_per_1000
+        estimated_cost += (self.stats['manifests_read'] / 1000) * get_cost_per_1000
         
         return {
             'api_calls_made': list_requests,
+            'manifest_reads': self.stats['manifests_read'],
             'estimated_cost_usd': round(estimated_cost, 6),
             'note': 'Actual costs may vary by region and usage tier'
         }
@@ -397,6 +493,10 @@ class S3PartitionInventory:
             # Insert partition data
             self._insert_partition_data(cursor, partitions)
             
+            # Partition summaries and codes from the manifests
+            self._create_manifest_tables(cursor)
+            self._insert_manifest_data(cursor)
+            
             # Create indexes for performance
             self._create_indexes(cursor)
             
@@ -435,6 +535,7 @@ class S3PartitionInventory:
                 file_size_mb REAL,
                 last_modified TEXT,
                 estimated_records INTEGER,
+                record_count INTEGER,
                 s3_bucket TEXT,
                 s3_key TEXT,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP
@@ -561,8 +662,8 @@ class S3PartitionInventory:
                     partition_path, payer_slug, state, billing_class, procedure_set,
                     procedure_class, taxonomy_code, taxonomy_desc, stat_area_name,
                     year, month, file_size_bytes, file_size_mb, last_modified,
-                    estimated_records, s3_bucket, s3_key
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    estimated_records, record_count, s3_bucket, s3_key
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 partition.partition_path,
                 partition.payer_slug,
@@ -579,6 +680,7 @@ class S3PartitionInventory:
                 partition.file_size_bytes / (1024**2),  # Convert to MB
                 partition.last_modified.isoformat(),
                 partition.record_count_estimate,
+                partition.record_count,
                 s3_bucket,
                 s3_key
             ))
@@ -586,6 +688,72 @@ class S3PartitionInventory:
         # Populate dimension tables
         self._populate_dimension_tables(cursor)
     
+    def _create_manifest_tables(self, cursor):
+        """Create the partition summary and code tables (one row per manifest, one per code)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS partition_manifests (
+                partition_path TEXT PRIMARY KEY,
+                stored_in TEXT,
+                payer_slug TEXT,
+                state TEXT,
+                billing_class TEXT,
+                procedure_set TEXT,
+                procedure_class TEXT,
+                taxonomy_code TEXT,
+                stat_area_name TEXT,
+                year INTEGER,
+                month INTEGER,
+                rows INTEGER,
+                distinct_npis INTEGER,
+                code_count INTEGER,
+                rate_min REAL,
+                rate_p10 REAL,
+                rate_p25 REAL,
+                rate_p50 REAL,
+                rate_p75 REAL,
+                rate_p90 REAL,
+                rate_max REAL,
+                fact_uid_min TEXT,
+                fact_uid_max TEXT,
+                content_hash TEXT,
+                written_at TEXT
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS partition_codes (
+                partition_path TEXT,
+                code TEXT,
+                PRIMARY KEY (partition_path, code)
+            )
+        """)
+    
+    def _insert_manifest_data(self, cursor):
+        """Insert the manifests read by discover_partitions"""
+        print(f"📋 Inserting {len(self.manifests)} partition manifests...")
+        
+        for key, manifest in self.manifests.items():
+            info = self.parse_partition_path(key)
+            if info is None:
+                continue
+            rates = manifest.negotiated_rate
+            cursor.execute("""
+                INSERT OR REPLACE INTO partition_manifests VALUES
+                (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                key, self.manifest_locations[key],
+                info.payer_slug, info.state, info.billing_class, info.procedure_set, info.procedure_class,
+                info.taxonomy_code, info.stat_area_name, info.year, info.month,
+                manifest.rows, manifest.distinct_npis, len(manifest.codes),
+                rates.get('min'), rates.get('p10'), rates.get('p25'), rates.get('p50'),
+                rates.get('p75'), rates.get('p90'), rates.get('max'),
+                manifest.fact_uid_min, manifest.fact_uid_max, manifest.content_hash, manifest.written_at
+            ))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO partition_codes (partition_path, code) VALUES (?, ?)",
+                [(key, code) for code in manifest.codes]
+            )
+    
     def _populate_dimension_tables(self, cursor):
         """Populate dimension tables with aggregated data"""
         print("📈 Populating dimension tables...")
@@ -690,7 +858,9 @@ class S3PartitionInventory:
             "CREATE INDEX IF NOT EXISTS idx_partitions_time ON partitions(year, month)",
             "CREATE INDEX IF NOT EXISTS idx_partitions_billing_class ON partitions(billing_class)",
             "CREATE INDEX IF NOT EXISTS idx_partitions_procedure_set ON partitions(procedure_set)",
-            "CREATE INDEX IF NOT EXISTS idx_partitions_stat_area ON partitions(stat_area_name)"
+            "CREATE INDEX IF NOT EXISTS idx_partitions_stat_area ON partitions(stat_area_name)",
+            "CREATE INDEX IF NOT EXISTS idx_partition_codes_code ON partition_codes(code)",
+            "CREATE INDEX IF NOT EXISTS idx_partition_manifests_payer ON partition_manifests(payer_slug, state)"
         ]
         
         for index_sql in indexes:
@@ -747,6 +917,29 @@ class S3PartitionInventory:
             ORDER BY total_size_mb DESC
         """)
         
+        # Partitions holding each code, with their row counts and rate ranges (from manifests)
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS v_code_partitions AS
+            SELECT 
+                c.code,
+                m.partition_path,
+                m.stored_in,
+                m.payer_slug,
+                m.state,
+                m.billing_class,
+                m.taxonomy_code,
+                m.stat_area_name,
+                m.year,
+                m.month,
+                m.rows,
+                m.distinct_npis,
+                m.rate_min,
+                m.rate_p50,
+                m.rate_max
+            FROM partition_codes c
+            JOIN partition_manifests m ON c.partition_path = m.partition_path
+        """)
+        
         # Taxonomy summary view
         cursor.execute("""
             CREATE VIEW IF NOT EXISTS v_taxonomy_summary AS
@@ -838,6 +1031,11 @@ def main():
     parser.add_argument('--output-file', help='Output filename (auto-generated if not specified)')
     parser.add_argument('--max-keys', type=int, default=1000, 
                        help='Max keys per API request (default: 1000)')
+    parser.add_argument('--no-manifests', action='store_true',
+                       help='Skip partition manifests (estimate row counts from file sizes)')
+    parser.add_argument('--partition-level', action='append', dest='partition_levels',
+                       help="Partition level of the paths, outermost first, e.g. 'bucket(16, primary_taxonomy_code)' "
+                            "(repeat per level; default: ETL3's default levels)")
     parser.add_argument('--include-empty', action='store_true', 
                        help='Include empty partitions')
     parser.add_argument('--quiet', action='store_true', help='Suppress progress output')
@@ -851,14 +1049,16 @@ def main():
     inventory = S3PartitionInventory(
         bucket_name=args.bucket,
         region=args.region,
-        prefix=args.prefix
+        prefix=args.prefix,
+        spec=PartitionSpec.parse(args.partition_levels) if args.partition_levels else DEFAULT_SPEC
     )
     
     try:
         # Discover partitions
         partitions = inventory.discover_partitions(
             max_keys_per_request=args.max_keys,
-            include_empty=args.include_empty
+            include_empty=args.include_empty,
+            read_manifests=not args.no_manifests
         )
         
         if not partitions:
@@ -874,6 +1074,9 @@ def main():
             print(f"Total partitions: {analysis['summary']['total_partitions']:,}")
             print(f"Total size: {analysis['summary']['total_size_gb']:.2f} GB")
             print(f"Estimated records: {analysis['summary']['estimated_total_records']:,}")
+            if analysis['summary']['partitions_with_manifests']:
+                print(f"Exact records ({analysis['summary']['partitions_with_manifests']:,} manifests): "
+                      f"{analysis['summary']['manifest_records']:,}")
             print(f"Unique payers: {analysis['dimensions']['payers']}")
             print(f"Unique states: {analysis['dimensions']['states']}")
             print(f"Time periods: {analysis['dimensions']['time_periods']}")
@@ -0,0 +1,226 @@
+"""
+Cross-Chunk Seen-Key Filter
+
+ETL1 derives dimension rows from every chunk, and most chunks repeat rows that
+earlier chunks already wrote (dim_payer has one row, dim_pos_set a handful).
+This module remembers, per dimension, a 64-bit hash of each primary key and a
+64-bit hash of the last row emitted for it, so a chunk only emits:
+
+- keys never seen before, and
+- keys whose row differs from the last emitted row for that key.
+
+Dropping a row only when the last emitted row for its key is identical keeps
+the merge's "last wins" result unchanged (see chunk_merge.py): whatever a later
+merge would have picked, an identical row is already in an earlier temp file.
+
+Hashes are held in sorted uint64 numpy arrays (16 bytes per key): a large
+sorted base plus a small sorted delta that is folded into the base once it
+grows past a fraction of it. When a dimension's base exceeds the in-memory
+budget it is moved to a memory-mapped file under the spill directory.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Fixed seeds so hashes are stable for the lifetime of a run
+KEY_SEED = 0x5EED
+ROW_SEED = 0xD1A5
+
+
+class SeenKeySet:
+    """Sorted uint64 key -> row-hash map for one dimension."""
+
+    # Fold the delta into the base when it exceeds this fraction of the base
+    DELTA_FRACTION = 8
+    MIN_DELTA = 1 << 16
+
+    def __init__(self, name: str, spill_dir: Path, max_memory_keys: int):
+        self.name = name
+        self.spill_dir = Path(spill_dir)
+        self.max_memory_keys = max_memory_keys
+        self.base_keys = np.empty(0, dtype=np.uint64)
+        self.base_vals = np.empty(0, dtype=np.uint64)
+        self.delta_keys = np.empty(0, dtype=np.uint64)
+        self.delta_vals = np.empty(0, dtype=np.uint64)
+        self.spilled = False
+        self._spill_generation = 0
+
+    def __len__(self) -> int:
+        return len(self.base_keys) + len(self.delta_keys)
+
+    @staticmethod
+    def _find(keys: np.ndarray, lookup: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of lookup in sorted keys and whether each was found."""
+        pos = np.searchsorted(keys, lookup)
+        found = np.zeros(len(lookup), dtype=bool)
+        in_range = pos < len(keys)
+        found[in_range] = keys[pos[in_range]] == lookup[in_range]
+        return pos, found
+
+    def filter(self, key_hashes: np.ndarray, row_hashes: np.ndarray) -> np.ndarray:
+        """
+        Decide which rows of a chunk to emit and update the state.
+
+        All rows of a key are emitted when the key is new, when its rows in the
+        chunk differ from each other, or when they differ from the last emitted
+        row; otherwise all rows of the key are dropped.
+
+        Returns:
+            Boolean mask over the input rows
+        """
+        n = len(key_hashes)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        order = np.argsort(key_hashes, kind="stable")
+        sorted_keys = key_hashes[order]
+        sorted_rows = row_hashes[order]
+        chunk_keys, first, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        last_rows = sorted_rows[first + counts - 1]
+        uniform = np.minimum.reduceat(sorted_rows, first) == np.maximum.reduceat(sorted_rows, first)
+
+        base_pos, in_base = self._find(self.base_keys, chunk_keys)
+        delta_pos, in_delta = self._find(self.delta_keys, chunk_keys)
+        stored = np.zeros(len(chunk_keys), dtype=np.uint64)
+        stored[in_base] = self.base_vals[base_pos[in_base]]
+        stored[in_delta] = self.delta_vals[delta_pos[in_delta]]
+        seen = in_base | in_delta
+
+        emit = ~seen | ~uniform | (stored != last_rows)
+
+        # Record the last emitted row hash for every emitted key
+        update_base = emit & in_base
+        self.base_vals[base_pos[update_base]] = last_rows[update_base]
+        update_delta = emit & in_delta
+        self.delta_vals[delta_pos[update_delta]] = last_rows[update_delta]
+        new = emit & ~seen
+        if new.any():
+            self._insert(chunk_keys[new], last_rows[new])
+
+        mask = np.empty(n, dtype=bool)
+        mask[order] = np.repeat(emit, counts)
+        return mask
+
+    def _insert(self, keys: np.ndarray, vals: np.ndarray):
+        """Add new (sorted, unique) keys to the delta and fold it in when large."""
+        keys = np.concatenate([self.delta_keys, keys])
+        vals = np.concatenate([self.delta_vals, vals])
+        order = np.argsort(keys, kind="stable")
+        self.delta_keys, self.delta_vals = keys[order], vals[order]
+
+        limit = min(len(self.base_keys) // self.DELTA_FRACTION, self.max_memory_keys // 2)
+        if len(self.delta_keys) > max(self.MIN_DELTA, limit):
+            self._compact()
+
+    def _compact(self):
+        """Fold the delta into the base, spilling the base to disk if it is too large."""
+        total = len(self.base_keys) + len(self.delta_keys)
+
+        if total > self.max_memory_keys:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._spill_generation += 1
+            stem = self.spill_dir / f"{self.name}_{self._spill_generation:04d}"
+            out_keys = np.lib.format.open_memmap(f"{stem}_keys.npy", mode="w+", dtype=np.uint64, shape=(total,))
+            out_vals = np.lib.format.open_memmap(f"{stem}_vals.npy", mode="w+", dtype=np.uint64, shape=(total,))
+            if not self.spilled:
+                logger.info(f"Seen-key set for {self.name} spilled to disk at {total:,} keys")
+            self.spilled = True
+        else:
+            out_keys = np.empty(total, dtype=np.uint64)
+            out_vals = np.empty(total, dtype=np.uint64)
+
+        self._merge_sorted(out_keys, out_vals)
+        self._release_base()
+        self.base_keys, self.base_vals = out_keys, out_vals
+        self.delta_keys = np.empty(0, dtype=np.uint64)
+        self.delta_vals = np.empty(0, dtype=np.uint64)
+
+    def _merge_sorted(self, out_keys: np.ndarray, out_vals: np.ndarray, block: int = 1 << 20):
+        """Merge base and delta into out block by block (the base is never fully loaded)."""
+        base_keys, base_vals = self.base_keys, self.base_vals
+        delta_keys, delta_vals = self.delta_keys, self.delta_vals
+        # Delta entry i goes right before base element insert_at[i]
+        insert_at = np.searchsorted(base_keys, delta_keys)
+        out = 0
+        d_start = 0
+        for b_start in range(0, len(base_keys), block):
+            b_end = min(len(base_keys), b_start + block)
+            d_end = int(np.searchsorted(insert_at, b_end, side="left"))
+            keys = np.concatenate([base_keys[b_start:b_end], delta_keys[d_start:d_end]])
+            vals = np.concatenate([base_vals[b_start:b_end], delta_vals[d_start:d_end]])
+            order = np.argsort(keys, kind="stable")
+            out_keys[out:out + len(keys)] = keys[order]
+            out_vals[out:out + len(keys)] = vals[order]
+            out += len(keys)
+            d_start = d_end
+        out_keys[out:] = delta_keys[d_start:]
+        out_vals[out:] = delta_vals[d_start:]
+
+    def _release_base(self):
+        """Drop the current base, deleting its spill files if it had any."""
+        paths = [Path(arr.filename) for arr in (self.base_keys, self.base_vals)
+                 if isinstance(arr, np.memmap) and arr.filename]
+        self.base_keys = np.empty(0, dtype=np.uint64)
+        self.base_vals = np.empty(0, dtype=np.uint64)
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    def close(self):
+        self._release_base()
+
+
+class DimensionKeyFilter:
+    """Per-dimension seen-key sets used to drop rows earlier chunks already emitted."""
+
+    def __init__(self, keys_by_table: Dict[str, List[str]], spill_dir: Path,
+                 max_memory_mb: int = 256):
+        """
+        Args:
+            keys_by_table: Primary key columns per table to filter
+            spill_dir: Directory for memory-mapped key sets
+            max_memory_mb: In-memory budget for all key sets (16 bytes per key)
+        """
+        self.keys_by_table = {t: k for t, k in keys_by_table.items() if k}
+        per_table_keys = max(1, (max_memory_mb * 1024 * 1024) // (16 * max(1, len(self.keys_by_table))))
+        self.sets = {
+            table: SeenKeySet(table, spill_dir, per_table_keys)
+            for table in self.keys_by_table
+        }
+        self.rows_in = {table: 0 for table in self.keys_by_table}
+        self.rows_out = {table: 0 for table in self.keys_by_table}
+
+    def filter(self, table: str, df: pl.DataFrame) -> pl.DataFrame:
+        """Return only the rows of df that earlier chunks have not already emitted."""
+        if table not in self.sets or df.is_empty():
+            return df
+
+        key_hashes = df.select(self.keys_by_table[table]).hash_rows(seed=KEY_SEED).to_numpy()
+        row_hashes = df.hash_rows(seed=ROW_SEED).to_numpy()
+        mask = self.sets[table].filter(key_hashes, row_hashes)
+
+        self.rows_in[table] += df.height
+        kept = df.filter(pl.Series(mask))
+        self.rows_out[table] += kept.height
+        return kept
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Rows seen and emitted, distinct keys and spill state per table."""
+        return {
+            table: {
+                "rows_in": self.rows_in[table],
+                "rows_emitted": self.rows_out[table],
+                "distinct_keys": len(self.sets[table]),
+                "spilled": self.sets[table].spilled,
+            }
+            for table in self.sets
+        }
+
+    def close(self):
+        for seen in self.sets.values():
+            seen.close()
@@ -0,0 +1,375 @@
+"""
+Partition Storage Backends
+
+S3PartitionedETL used to call boto3 for every partition read and write, so an
+ETL3 run needed a bucket, credentials and a network even to benchmark or
+profile it. This module puts the few object operations ETL3 uses behind one
+interface, addressed by key under a storage URI:
+
+- put / get / range_get: write an object whole, read it whole or read a byte
+  range of it (e.g. a Parquet footer)
+- exists / list: HEAD-style checks and paginated, optionally delimited listings
+- copy: copy an object to another key (server-side on S3)
+- delete: remove an object (no error if it is already gone)
+- open_writer: a write-only file object for streaming large objects
+
+StorageBackend is abstract, so a backend missing any of them cannot be created.
+
+S3Backend implements them with one shared boto3 client (created on first use),
+put_object, ranged get_object, copy_object and multipart uploads
+(MultipartUploadWriter).
+LocalBackend implements them on a directory: each write goes to a hidden
+temporary file renamed into place, so readers never see a partial object, just
+as with S3. open_storage picks the backend from the URI, so
+'s3://healthcare-data-lake-prod' and 'file:///mnt/stage' run the same ETL3 code.
+"""
+
+import os
+import uuid
+import shutil
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from multipart_upload import MultipartUploadWriter
+
+logger = logging.getLogger(__name__)
+
+# Extra arguments of every S3 object write
+S3_WRITE_ARGS = {'ContentType': 'application/octet-stream', 'ServerSideEncryption': 'AES256'}
+
+
+class StoredObject(NamedTuple):
+    """Listing entry of one object"""
+    etag: Optional[str]
+    size: int
+    last_modified: Optional[datetime] = None
+
+
+class ListPage(NamedTuple):
+    """One page of a listing: child prefixes (delimited listings only) and objects"""
+    prefixes: List[str]
+    objects: Dict[str, StoredObject]
+
+
+class StorageBackend(ABC):
+    """Object operations on keys under one storage URI."""
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Full URI of key."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def key(self, uri: str) -> str:
+        """Key of a URI under this storage (ValueError for any other URI)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key: str, body: BinaryIO) -> Optional[str]:
+        """Write body (from its current position) as key; returns the ETag if the backend has one."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Read a whole object (FileNotFoundError if it does not exist)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def range_get(self, key: str, start: int, length: int) -> bytes:
+        """Read length bytes from offset start; a negative start counts from the end."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether key exists (a HEAD request on S3)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, prefix: str, delimiter: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[ListPage]:
+        """Objects whose key starts with prefix, one page per request (of at most page_size keys)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy(self, source: str, key: str) -> Optional[str]:
+        """Copy object source to key (FileNotFoundError if source does not exist); returns the ETag."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key (no error if it does not exist)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_writer(self, key: str, part_size: int):
+        """
+        Write-only file object for key; the object appears on close(). The
+        writer has etag and bytes_written once closed; leaving its context on
+        an exception discards what was written.
+        """
+        raise NotImplementedError
+
+
+class S3Backend(StorageBackend):
+    """Objects in one S3 bucket."""
+
+    def __init__(self, bucket: str, client_factory: Callable[[], object]):
+        """
+        Args:
+            bucket: Bucket name
+            client_factory: Creates the boto3 S3 client on first use (it is
+                thread-safe and shared by all upload and listing threads)
+        """
+        self.bucket = bucket
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def key(self, uri: str) -> str:
+        root = f"s3://{self.bucket}/"
+        if not uri.startswith(root):
+            raise ValueError(f"{uri} is not in bucket {self.bucket}")
+        return uri[len(root):]
+
+    def put(self, key: str, body: BinaryIO) -> Optional[str]:
+        response = self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **S3_WRITE_ARGS)
+        return response.get('ETag')
+
+    def _get_object(self, key: str, **kwargs) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(self.uri(key)) from e
+            raise
+
+    def get(self, key: str) -> bytes:
+        return self._get_object(key)
+
+    def range_get(self, key: str, start: int, length: int) -> bytes:
+        if start < 0:
+            # Suffix range: the last -start bytes
+            data = self._get_object(key, Range=f"bytes={start}")
+            return data[:length]
+        return self._get_object(key, Range=f"bytes={start}-{start + length - 1}")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == '404':
+                return False
+            raise
+
+    def list(self, prefix: str, delimiter: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[ListPage]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        kwargs = {'Delimiter': delimiter} if delimiter else {}
+        if page_size:
+            kwargs['PaginationConfig'] = {'PageSize': page_size}
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, **kwargs):
+            yield ListPage(
+                [p['Prefix'] for p in page.get('CommonPrefixes', [])],
+                {obj['Key']: StoredObject(obj.get('ETag'), obj.get('Size', 0), obj.get('LastModified'))
+                 for obj in page.get('Contents', [])},
+            )
+
+    def copy(self, source: str, key: str) -> Optional[str]:
+        # Server-side: the bytes never leave S3
+        try:
+            response = self.client.copy_object(Bucket=self.bucket, Key=key,
+                                               CopySource={'Bucket': self.bucket, 'Key': source},
+                                               ServerSideEncryption=S3_WRITE_ARGS['ServerSideEncryption'])
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(self.uri(source)) from e
+            raise
+        return response['CopyObjectResult'].get('ETag')
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def open_writer(self, key: str, part_size: int) -> MultipartUploadWriter:
+        return MultipartUploadWriter(self.client, self.bucket, key, part_size=part_size, extra_args=S3_WRITE_ARGS)
+
+
+class _LocalWriter:
+    """File object writing to a temporary file that replaces the target on close()."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = _temp_path(path)
+        # Topmost directory this writer creates (removed again on abort, like an S3 "directory")
+        missing = [parent for parent in path.parents if not parent.exists()]
+        self._created_dir = missing[-1] if missing else None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, 'wb')
+        self.bytes_written = 0
+        self.etag: Optional[str] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        self.bytes_written += written
+        return written
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+        if self._created_dir is not None:
+            directory = self.path.parent
+            while True:
+                try:
+                    directory.rmdir()
+                except OSError:  # not empty (another writer) or already gone
+                    break
+                if directory == self._created_dir:
+                    break
+                directory = directory.parent
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
+def _temp_path(path: Path) -> Path:
+    # Hidden, so listings skip writes in progress
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+class LocalBackend(StorageBackend):
+    """Objects as files under a local directory (keys are relative paths)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).absolute()
+
+    def uri(self, key: str) -> str:
+        # Keys are kept verbatim (no percent-encoding), like s3:// URIs
+        return f"file://{self.root.as_posix()}/{key}"
+
+    def key(self, uri: str) -> str:
+        root = f"file://{self.root.as_posix()}/"
+        if not uri.startswith(root):
+            raise ValueError(f"{uri} is not under {self.root}")
+        return uri[len(root):]
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, body: BinaryIO) -> Optional[str]:
+        with _LocalWriter(self._path(key)) as writer:
+            shutil.copyfileobj(body, writer)
+        return None
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def range_get(self, key: str, start: int, length: int) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start, os.SEEK_END if start < 0 else os.SEEK_SET)
+            return f.read(length)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def list(self, prefix: str, delimiter: Optional[str] = None, page_size: Optional[int] = None) -> Iterator[ListPage]:
+        # One page: a directory listing has no request size limit. Keys starting with prefix live under the directory part of the prefix
+        directory = self.root / prefix.rsplit('/', 1)[0] if '/' in prefix else self.root
+        if not directory.is_dir():
+            return
+        prefixes: List[str] = []
+        objects: Dict[str, StoredObject] = {}
+        if delimiter == '/':
+            entries = os.scandir(directory)
+        elif delimiter is None:
+            entries = (entry for dirpath, _, _ in os.walk(directory) for entry in os.scandir(dirpath))
+        else:
+            raise ValueError(f"Unsupported delimiter {delimiter!r}")
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            key = Path(entry.path).relative_to(self.root).as_posix()
+            if not key.startswith(prefix):
+                continue
+            if entry.is_file():
+                stat = entry.stat()
+                objects[key] = StoredObject(None, stat.st_size, datetime.fromtimestamp(stat.st_mtime, timezone.utc))
+            elif delimiter:
+                prefixes.append(key + '/')
+        yield ListPage(sorted(prefixes), dict(sorted(objects.items())))
+
+    def copy(self, source: str, key: str) -> Optional[str]:
+        with open(self._path(source), 'rb') as body, _LocalWriter(self._path(key)) as writer:
+            shutil.copyfileobj(body, writer)
+        return None
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        path.unlink(missing_ok=True)
+        # Like S3, a "directory" exists only while it holds objects
+        for directory in path.parents:
+            if directory == self.root or self.root not in directory.parents:
+                break
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+
+    def open_writer(self, key: str, part_size: int) -> _LocalWriter:
+        return _LocalWriter(self._path(key))
+
+
+def open_storage(uri: str, client_factory: Optional[Callable[[], object]] = None) -> StorageBackend:
+    """
+    Backend for a storage URI: 'file:///path' (or a plain path) is a local
+    directory, 's3://bucket' (or a bare bucket name) an S3 bucket.
+    """
+    if uri.startswith('file://'):
+        return LocalBackend(Path(uri[len('file://'):]))
+    if uri.startswith(('/', '.')):
+        return LocalBackend(Path(uri))
+    bucket = uri[len('s3://'):] if uri.startswith('s3://') else uri
+    bucket = bucket.strip('/')
+    if '/' in bucket:
+        raise ValueError(f"Storage URI must name a bucket, not a prefix: {uri}")
+    return S3Backend(bucket, client_factory or (lambda: boto3.client('s3')))
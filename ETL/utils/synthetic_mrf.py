@@ -0,0 +1,205 @@
+"""
+Synthetic MRF Input Generator
+
+Writes rates and providers Parquet files shaped like the transparency-in-coverage
+extracts ETL1 reads (202508_{payer}_ga_rates.parquet / _providers.parquet), so
+the pipeline can be run and benchmarked without the real payer files.
+
+Cardinalities follow what the GA extracts look like and grow with the row count:
+- billing codes: a few hundred up to ~12k distinct CPT/HCPCS/RC/MS-DRG codes,
+  skewed so common E/M codes dominate
+- provider_reference_id: one provider group per ~200 rates rows (max 50k)
+- service_codes: ~20 distinct POS lists, in the JSON/delimited/empty/null
+  spellings the normalizer has to handle
+- NPIs: one distinct NPI per ~3 providers rows, shared across groups the way
+  real clinicians belong to several groups; TINs mostly one per group
+
+Files are written in row groups of batch_rows, so 10M-row files don't need to
+fit in memory. The same seed always gives the same files.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Named scales for benchmarks (rates rows)
+SCALES = {
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+# POS lists as they appear in service_codes (None = missing)
+SERVICE_CODES = [
+    '["11"]', '["11","22"]', '["22","11"]', '["11","22","81"]', '["21","22","23"]',
+    '["02","10","11"]', '["02"]', '["19","22"]', '["21"]', '["22"]', '["23"]',
+    '["24"]', '["31","32"]', '["49","50","71","72"]', '["81"]', '["11","12"]',
+    "11;22", "11|22|81", "", None,
+]
+SERVICE_CODES_WEIGHTS = [
+    30, 12, 6, 4, 8, 5, 3, 2, 3, 4, 2, 2, 1, 1, 2, 2, 1, 1, 3, 8,
+]
+
+NEGOTIATED_TYPES = (["negotiated", "fee schedule", "percentage", "per diem"], [85, 10, 3, 2])
+ARRANGEMENTS = (["ffs", "bundle", "capitation"], [95, 4, 1])
+EXPIRATION_DATES = (["9999-12-31", "2025-12-31", "2026-06-30"], [90, 7, 3])
+BILLING_CLASSES = (["professional", "institutional"], [75, 25])
+TIN_TYPES = (["ein", "npi"], [90, 10])
+
+# (code_type, share of codes, rate scale in dollars)
+CODE_TYPES = [("CPT", 0.70, 150.0), ("HCPCS", 0.15, 60.0), ("RC", 0.05, 400.0), ("MS-DRG", 0.10, 12_000.0)]
+
+
+def _weights(weights) -> np.ndarray:
+    w = np.asarray(weights, dtype=float)
+    return w / w.sum()
+
+
+def _skewed(rng: np.random.Generator, size: int, n: int) -> np.ndarray:
+    """Indexes in [0, size) skewed toward the start (a few values are very common)."""
+    return np.minimum((rng.random(n) ** 3 * size).astype(np.int64), size - 1)
+
+
+def _pick(pool: pl.Series, idx: np.ndarray) -> pl.Series:
+    return pool.gather(pl.Series(idx, dtype=pl.UInt32))
+
+
+def _choice(rng: np.random.Generator, spec, n: int) -> pl.Series:
+    values, weights = spec
+    return _pick(pl.Series(values, dtype=pl.Utf8), rng.choice(len(values), n, p=_weights(weights)))
+
+
+def _code_catalog(n_codes: int, rng: np.random.Generator) -> pl.DataFrame:
+    """Distinct billing codes with their descriptions and typical rate."""
+    frames = []
+    for code_type, share, scale in CODE_TYPES:
+        n = max(1, int(n_codes * share))
+        if code_type == "CPT":
+            codes = [str(c) for c in np.sort(rng.choice(np.arange(10004, 99500), n, replace=False))]
+        elif code_type == "HCPCS":
+            letters = np.array(list("ABCEGHJKLQV"))
+            codes = [f"{letters[i % len(letters)]}{i // len(letters):04d}" for i in rng.choice(11 * 10_000, n, replace=False)]
+        elif code_type == "RC":
+            codes = [f"{c:04d}" for c in np.sort(rng.choice(np.arange(100, 1000), min(n, 900), replace=False))]
+        else:
+            codes = [f"{c:03d}" for c in np.sort(rng.choice(np.arange(1, 1000), min(n, 999), replace=False))]
+        frames.append(pl.DataFrame({
+            "billing_code_type": [code_type] * len(codes),
+            "billing_code": codes,
+            "description": [f"{code_type} service {c}" for c in codes],
+            "name": [f"{code_type} {c}" for c in codes],
+            "base_rate": np.round(rng.lognormal(np.log(scale), 0.8, len(codes)), 2),
+        }))
+    # Shuffle so the skew doesn't favour one code type
+    catalog = pl.concat(frames)
+    return catalog[rng.permutation(catalog.height)]
+
+
+def _write_batches(path: Path, total_rows: int, batch_rows: int, make_batch) -> None:
+    """Write make_batch(n) frames as consecutive row groups of one Parquet file."""
+    writer = None
+    try:
+        written = 0
+        while written < total_rows:
+            n = min(batch_rows, total_rows - written)
+            table = make_batch(n).to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            writer.write_table(table, row_group_size=n)
+            written += n
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate_mrf_files(input_dir: Path, rates_rows: int, providers_rows: Optional[int] = None,
+                       payer: str = "aetna", seed: int = 42, batch_rows: int = 250_000,
+                       file_prefix: str = "202508", state: str = "ga") -> Dict[str, Path]:
+    """
+    Write a synthetic rates/providers pair for one payer.
+
+    Args:
+        input_dir: Directory to write into (created if missing)
+        rates_rows: Rows in the rates file
+        providers_rows: Rows in the providers file (default: a quarter of rates_rows)
+        payer: Payer slug used in the file names and reporting_entity_name
+        seed: Random seed; the same seed gives identical files
+        batch_rows: Rows generated and written per row group
+        file_prefix: Leading YYYYMM of the file names
+        state: State code in the file names
+
+    Returns:
+        {"rates": path, "providers": path}
+    """
+    input_dir = Path(input_dir)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    if providers_rows is None:
+        providers_rows = max(1, rates_rows // 4)
+
+    rng = np.random.default_rng(seed)
+    n_codes = int(min(12_000, max(200, rates_rows // 100)))
+    n_groups = int(min(50_000, max(50, rates_rows // 200)))
+    n_npis = int(max(100, providers_rows // 3))
+
+    catalog = _code_catalog(n_codes, rng)
+    codes = catalog.drop("base_rate")
+    base_rates = catalog["base_rate"].to_numpy()
+    group_ids = 100_000 + rng.choice(900_000, n_groups, replace=False)
+    npis = 1_000_000_000 + rng.choice(1_000_000_000, n_npis, replace=False)
+    group_tins = pl.Series([f"{t:09d}" for t in rng.integers(10_000_000, 999_999_999, n_groups)])
+    service_codes = pl.Series(SERVICE_CODES, dtype=pl.Utf8)
+    service_weights = _weights(SERVICE_CODES_WEIGHTS)
+    entity_name = f"{payer.title()} Life Insurance Company"
+    last_updated = pl.Series(["2025-08-01", "2025-07-15"], dtype=pl.Utf8)
+
+    def rates_batch(n: int) -> pl.DataFrame:
+        code_idx = _skewed(rng, codes.height, n)
+        batch = codes[code_idx]
+        return pl.DataFrame({
+            "last_updated_on": _pick(last_updated, rng.choice(2, n, p=[0.95, 0.05])),
+            "reporting_entity_name": pl.repeat(entity_name, n, eager=True),
+            "version": pl.repeat("1.0.0", n, eager=True),
+            "billing_class": _choice(rng, BILLING_CLASSES, n),
+            "billing_code_type": batch["billing_code_type"],
+            "billing_code": batch["billing_code"],
+            "service_codes": _pick(service_codes, rng.choice(len(SERVICE_CODES), n, p=service_weights)),
+            "negotiated_type": _choice(rng, NEGOTIATED_TYPES, n),
+            "negotiation_arrangement": _choice(rng, ARRANGEMENTS, n),
+            "negotiated_rate": np.round(base_rates[code_idx] * rng.lognormal(0.0, 0.3, n), 2),
+            "expiration_date": _choice(rng, EXPIRATION_DATES, n),
+            "description": batch["description"],
+            "name": batch["name"],
+            "provider_reference_id": group_ids[_skewed(rng, n_groups, n)],
+            "reporting_entity_type": pl.repeat("health insurance issuer", n, eager=True),
+        })
+
+    def providers_batch(n: int) -> pl.DataFrame:
+        group_idx = rng.integers(0, n_groups, n)
+        # Mostly the group's own TIN, sometimes another one (groups billing under several TINs)
+        tin_idx = np.where(rng.random(n) < 0.9, group_idx, rng.integers(0, n_groups, n))
+        return pl.DataFrame({
+            "last_updated_on": pl.repeat("2025-08-01", n, eager=True),
+            "reporting_entity_name": pl.repeat(entity_name, n, eager=True),
+            "version": pl.repeat("1.0.0", n, eager=True),
+            "provider_group_id": group_ids[group_idx],
+            "npi": npis[_skewed(rng, n_npis, n)],
+            "tin_type": _choice(rng, TIN_TYPES, n),
+            "tin_value": _pick(group_tins, tin_idx),
+            "reporting_entity_type": pl.repeat("health insurance issuer", n, eager=True),
+        })
+
+    paths = {
+        "rates": input_dir / f"{file_prefix}_{payer}_{state}_rates.parquet",
+        "providers": input_dir / f"{file_prefix}_{payer}_{state}_providers.parquet",
+    }
+    logger.info(f"Writing {rates_rows:,} synthetic rates rows ({n_codes:,} codes, {n_groups:,} groups) "
+                f"and {providers_rows:,} providers rows ({n_npis:,} NPIs) to {input_dir}")
+    _write_batches(paths["rates"], rates_rows, batch_rows, rates_batch)
+    _write_batches(paths["providers"], providers_rows, batch_rows, providers_batch)
+    return paths
@@ -0,0 +1,197 @@
+"""
+Bounded Concurrent Upload Pool
+
+ETL3 throughput is set by S3 round trips, not CPU: every partition upload was a
+blocking put_object on the main thread. This module runs uploads on a pool of
+worker threads while the caller keeps serializing the next partitions, so
+Parquet encoding overlaps with network I/O.
+
+- Memory is bounded by a cap on in-flight bytes: submit() blocks once the
+  serialized bodies waiting for or being uploaded would exceed it (a single
+  body larger than the cap is still accepted when nothing else is in flight).
+- Failed uploads are retried with exponential backoff and full jitter.
+- Failures are reported in submission order, whatever order workers hit them.
+- Uploads to the same key are serialized: wait_for(key) blocks until pending
+  uploads of that key finish, so a read-merge-write never sees a stale object.
+
+The pool only knows keys and bytes; the upload callable decides where they go
+(an S3 client shared by all workers, or a local directory in tests).
+"""
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UploadFailure:
+    """An upload that failed after all attempts"""
+    sequence: int
+    key: str
+    size: int
+    attempts: int
+    error: BaseException
+
+
+class UploadError(Exception):
+    """Raised by UploadPool.close(raise_on_failure=True) when uploads failed."""
+
+    def __init__(self, failures: List[UploadFailure]):
+        self.failures = failures
+        lines = [f"  - #{f.sequence} {f.key}: {f.error}" for f in failures]
+        super().__init__(f"{len(failures)} upload(s) failed:\n" + "\n".join(lines))
+
+
+class UploadPool:
+    """Thread pool for uploads with an in-flight byte cap, retries and ordered failures."""
+
+    def __init__(self, upload: Callable[[str, Any], None], max_workers: int = 4,
+                 max_inflight_mb: float = 256, max_attempts: int = 5,
+                 base_delay: float = 0.2, max_delay: float = 10.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            upload: Called as upload(key, body) on a worker thread
+            max_workers: Number of upload threads
+            max_inflight_mb: Cap on bytes submitted but not yet uploaded
+            max_attempts: Attempts per upload before it is reported as failed
+            base_delay: First retry delay bound in seconds (doubles per attempt)
+            max_delay: Largest retry delay bound in seconds
+            sleep: Sleep function (replaced in tests)
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+
+        self.upload = upload
+        self.max_workers = max_workers
+        self.max_inflight_bytes = int(max_inflight_mb * 1024 * 1024)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self._lock = threading.Condition()
+        self._submit_lock = threading.Lock()
+        self._inflight_bytes = 0
+        self._pending: Dict[str, Future] = {}
+        self._sequence = 0
+        self._failures: List[UploadFailure] = []
+
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.retries = 0
+        self.peak_inflight_bytes = 0
+        self.submit_wait_seconds = 0.0
+
+    def submit(self, key: str, body: Any, size: Optional[int] = None) -> Future:
+        """
+        Queue body for upload to key, blocking while the in-flight cap is reached.
+
+        body is passed to the upload callable as is (bytes, or a file object
+        whose size must then be given). A later upload of the same key starts
+        only after the earlier one finished.
+        """
+        size = len(body) if size is None else size
+        with self._submit_lock:
+            with self._lock:
+                started = time.perf_counter()
+                while self._inflight_bytes > 0 and self._inflight_bytes + size > self.max_inflight_bytes:
+                    self._lock.wait()
+                self.submit_wait_seconds += time.perf_counter() - started
+
+                self._inflight_bytes += size
+                self.peak_inflight_bytes = max(self.peak_inflight_bytes, self._inflight_bytes)
+                sequence = self._sequence
+                self._sequence += 1
+                previous = self._pending.get(key)
+
+            future = self._executor.submit(self._run, sequence, key, body, size, previous)
+            with self._lock:
+                self._pending[key] = future
+            future.add_done_callback(lambda f, key=key: self._forget(key, f))
+        return future
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _run(self, sequence: int, key: str, body: Any, size: int, previous: Optional[Future]):
+        """Upload with retries; runs on a worker thread."""
+        try:
+            if previous is not None:
+                wait([previous])
+
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    self.upload(key, body)
+                    with self._lock:
+                        self.uploads += 1
+                        self.bytes_uploaded += size
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        logger.error(f"Upload of {key} failed after {attempt} attempts: {e}")
+                        with self._lock:
+                            self._failures.append(UploadFailure(sequence, key, size, attempt, e))
+                        return
+                    # Full jitter: uniform in [0, min(max_delay, base * 2^(attempt-1))]
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                    logger.warning(f"Upload of {key} failed (attempt {attempt}/{self.max_attempts}), "
+                                   f"retrying in {delay:.2f}s: {e}")
+                    with self._lock:
+                        self.retries += 1
+                    self.sleep(delay)
+        finally:
+            with self._lock:
+                self._inflight_bytes -= size
+                self._lock.notify_all()
+
+    def wait_for(self, key: str):
+        """Block until pending uploads of key have finished (successfully or not)."""
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            wait([future])
+
+    def drain(self) -> List[UploadFailure]:
+        """Wait for every submitted upload; return failures so far in submission order."""
+        while True:
+            with self._lock:
+                pending = [f for f in self._pending.values() if not f.done()]
+            if not pending:
+                break
+            wait(pending)
+        return self.failures()
+
+    def failures(self) -> List[UploadFailure]:
+        with self._lock:
+            return sorted(self._failures, key=lambda f: f.sequence)
+
+    def close(self, raise_on_failure: bool = False) -> List[UploadFailure]:
+        """Drain, shut the threads down and return (or raise) the ordered failures."""
+        failures = self.drain()
+        self._executor.shutdown(wait=True)
+        if failures and raise_on_failure:
+            raise UploadError(failures)
+        return failures
+
+    def stats(self) -> Dict[str, float]:
+        """Uploads, retries, failures and how long submit() was throttled."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "uploads": self.uploads,
+                "bytes_uploaded": self.bytes_uploaded,
+                "retries": self.retries,
+                "failures": len(self._failures),
+                "peak_inflight_mb": round(self.peak_inflight_bytes / (1024 * 1024), 1),
+                "submit_wait_seconds": round(self.submit_wait_seconds, 2),
+            }